@@ -0,0 +1,68 @@
+import frappe
+
+from chatz.utils.attachments import get_attachment_excerpts
+from chatz.utils.profiling import phase, profiled
+
+
+MAX_BUDGET_CHARS = 50000
+
+
+@frappe.whitelist()
+@profiled
+def get_attachment_context(doctype, docname, query, api_name):
+	"""
+	Get excerpts of the open record's attachments relevant to a message
+
+	Args:
+		doctype (str): Record DocType
+		docname (str): Record name
+		query (str): User message
+		api_name (str): Chatz API the message is sent through
+
+	Returns:
+		dict: Response with status and attachments ({file_name, content} or {file_name, pending})
+	"""
+	try:
+		api = frappe.db.get_value(
+			"Chatz API",
+			api_name,
+			["enabled", "include_attachments", "attachment_context_chars"],
+			as_dict=True
+		)
+		if not api or not api.enabled or not api.include_attachments:
+			return {
+				"status": "success",
+				"attachments": []
+			}
+
+		# Attachments are readable by whoever can read the record
+		if not frappe.has_permission(doctype, "read", docname):
+			return {
+				"status": "error",
+				"message": "You do not have access to this document",
+				"attachments": []
+			}
+
+		with phase("excerpts"):
+			attachments = get_attachment_excerpts(
+				doctype,
+				docname,
+				query,
+				budget=min(api.attachment_context_chars or 6000, MAX_BUDGET_CHARS)
+			)
+
+		return {
+			"status": "success",
+			"attachments": attachments
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Getting Attachment Context",
+			f"Failed to read attachments of {doctype} {docname}: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to read attachments: {str(e)}",
+			"attachments": []
+		}
@@ -0,0 +1,177 @@
+import json
+
+import frappe
+
+from chatz.api.config import build_config, resolve_model, user_can_use_api
+from chatz.chatz.doctype.chatz_batch_job.chatz_batch_job import (
+	BATCH_JOB_TIMEOUT,
+	CANCEL_FLAG_TTL,
+	CANCEL_KEY_PREFIX,
+	MAX_BATCH_RECORDS,
+	TEXT_FIELDTYPES
+)
+from chatz.utils.profiling import phase, profiled
+
+
+@frappe.whitelist(methods=["POST"])
+@profiled
+def start_batch(api_config_name, doctype, names, prompt, model=None, target_field=None, concurrency=None):
+	"""
+	Ask the same question about each of the selected records, in the background
+
+	Creates a Chatz Batch Job and queues it. Progress is published to the
+	current user as `chatz_batch_progress` realtime events.
+
+	Args:
+		api_config_name (str): Chatz API to ask
+		doctype (str): DocType of the records
+		names (str): JSON array of record names (list view selection)
+		prompt (str): Question asked once per record
+		model (str): Model to use (the API's default unless it is one of its available models)
+		target_field (str): Also write each answer into this field of the record
+		concurrency (int): Requests in flight at once (defaults to 4)
+
+	Returns:
+		dict: Response with status, job name and record count
+	"""
+	try:
+		if not user_can_use_api(api_config_name):
+			return {
+				"status": "error",
+				"message": "You do not have access to this API configuration"
+			}
+
+		if isinstance(names, str):
+			names = json.loads(names)
+		# Keep the selection order, without duplicates
+		names = list(dict.fromkeys(n for n in names or [] if n))
+		prompt = (prompt or "").strip()
+
+		if not names or not prompt:
+			return {
+				"status": "error",
+				"message": "Select at least one record and enter a question"
+			}
+		if len(names) > MAX_BATCH_RECORDS:
+			return {
+				"status": "error",
+				"message": f"A batch can have at most {MAX_BATCH_RECORDS} records"
+			}
+
+		api_config = frappe.get_doc("Chatz API", api_config_name)
+		if not api_config.enabled:
+			return {
+				"status": "error",
+				"message": "API configuration is disabled"
+			}
+
+		if target_field:
+			field = frappe.get_meta(doctype).get_field(target_field)
+			if not field or field.fieldtype not in TEXT_FIELDTYPES:
+				return {
+					"status": "error",
+					"message": f"{target_field} is not a text field of {doctype}"
+				}
+
+		with phase("permissions"):
+			ptype = "write" if target_field else "read"
+			denied = [n for n in names if not frappe.has_permission(doctype, ptype, n)]
+		if denied:
+			return {
+				"status": "error",
+				"message": f"No {ptype} permission for {len(denied)} of the selected records"
+			}
+
+		config = build_config(api_config, frappe.session.user)
+		model = resolve_model(api_config, config, model)
+
+		with phase("insert"):
+			job = frappe.get_doc({
+				"doctype": "Chatz Batch Job",
+				"chatz_api": api_config_name,
+				"model": model,
+				"reference_doctype": doctype,
+				"target_field": target_field,
+				"prompt": prompt,
+				"concurrency": int(concurrency or 4),
+				"results": [{"reference_name": name} for name in names]
+			})
+			# Users only read their own jobs; access was checked above
+			job.insert(ignore_permissions=True)
+
+		frappe.enqueue(
+			"chatz.chatz.doctype.chatz_batch_job.chatz_batch_job.run_batch_job",
+			queue="long",
+			timeout=BATCH_JOB_TIMEOUT,
+			job_id=f"chatz_batch:{job.name}",
+			deduplicate=True,
+			enqueue_after_commit=True,
+			job_name=job.name
+		)
+
+		return {
+			"status": "success",
+			"job": job.name,
+			"total": job.total_records
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Starting Batch",
+			f"Failed to start batch for {doctype}: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to start batch: {str(e)}"
+		}
+
+
+@frappe.whitelist()
+@profiled
+def get_batch_status(job_name):
+	"""
+	Get the progress of a batch job
+
+	Args:
+		job_name (str): Chatz Batch Job name
+
+	Returns:
+		dict: Response with status and progress (job, status, total, completed, failed)
+	"""
+	job = frappe.get_doc("Chatz Batch Job", job_name)
+	job.check_permission("read")
+
+	return {
+		"status": "success",
+		"progress": job.progress()
+	}
+
+
+@frappe.whitelist(methods=["POST"])
+@profiled
+def cancel_batch(job_name):
+	"""
+	Stop a batch job
+
+	Records already sent to the API are still answered; the rest stay Pending.
+
+	Args:
+		job_name (str): Chatz Batch Job name
+
+	Returns:
+		dict: Response with status and message
+	"""
+	job = frappe.get_doc("Chatz Batch Job", job_name)
+	job.check_permission("read")
+
+	if job.status not in ("Queued", "Running"):
+		return {
+			"status": "error",
+			"message": f"Batch is already {job.status}"
+		}
+
+	frappe.cache().set_value(CANCEL_KEY_PREFIX + job.name, 1, expires_in_sec=CANCEL_FLAG_TTL)
+	return {
+		"status": "success",
+		"message": "Batch cancelled"
+	}
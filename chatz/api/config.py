@@ -1,9 +1,118 @@
 import frappe
+import hashlib
 import json
-import requests
+import time
+from frappe.sessions import get_csrf_token
+from werkzeug.wrappers import Response
+
+from chatz.utils.openai_client import ChatCompletionStream, UpstreamError
+from chatz.utils.profiling import phase, profiled
+from chatz.utils.streaming import stream_in_site_context
+
+
+# Seconds between checks for a cancel_stream request while relaying
+CANCEL_POLL_SECONDS = 0.5
+CANCEL_FLAG_TTL = 600
+
+STREAM_DONE = "data: [DONE]\n\n"
+
+# Redis key of the guest payload (get_guest_payload), cleared when a Chatz API changes
+GUEST_PAYLOAD_KEY = "chatz_guest_payload"
+
+# Seconds browsers and proxies reuse the public guest config before revalidating it
+GUEST_CONFIG_MAX_AGE = 60
+
+
+# Chatz API fields needed to build a widget config
+CONFIG_FIELDS = [
+	"name", "api_endpoint", "api_key", "model_name", "available_models", "system_prompt",
+	"system_prompt_text", "system_prompt_tokens", "prompt_layout", "enable_retrieval", "include_attachments",
+	"include_csrf_token",
+	"use_server_proxy", "enable_model_router", "router_fast_model", "router_max_words",
+	"widget_title", "widget_icon", "primary_color", "secondary_color", "greeting_message"
+]
+
+
+def build_config(api_config, user, model_name=None):
+	"""
+	Build the widget config payload for a Chatz API
+
+	Args:
+		api_config (Document or dict): Chatz API (at least CONFIG_FIELDS)
+		user (str): User the config is for ("Guest" for guests)
+		model_name (str): Model override (defaults to the API's default model)
+
+	Returns:
+		dict: Config with status "success"
+	"""
+	# Parse available models
+	available_models = []
+	if api_config.available_models:
+		with phase("parse_models"):
+			try:
+				available_models = json.loads(api_config.available_models)
+			except json.JSONDecodeError:
+				pass
+
+	# A user's model override takes precedence over the router
+	model_router = None
+	if api_config.enable_model_router and api_config.router_fast_model \
+			and (model_name or api_config.model_name) == api_config.model_name:
+		model_router = {
+			"fast_model": api_config.router_fast_model,
+			"max_words": api_config.router_max_words or 0
+		}
+
+	return {
+		"status": "success",
+		"api_endpoint": api_config.api_endpoint,
+		# Proxied APIs keep the key on the server
+		"api_key": "" if api_config.use_server_proxy else api_config.api_key,
+		"model_name": model_name or api_config.model_name,
+		"available_models": available_models,
+		"model_router": model_router,
+		"system_prompt": api_config.system_prompt or "",
+		"system_prompt_text": api_config.system_prompt_text or "",
+		"system_prompt_tokens": api_config.system_prompt_tokens or 0,
+		"prompt_layout": api_config.prompt_layout or "Standard",
+		"enable_retrieval": api_config.enable_retrieval or 0,
+		"include_attachments": api_config.include_attachments or 0,
+		"api_config_name": api_config.name,
+		"include_csrf_token": api_config.include_csrf_token,
+		"use_server_proxy": api_config.use_server_proxy or 0,
+		"user": user,
+		"widget_title": api_config.widget_title or "Chatz",
+		"widget_icon": api_config.widget_icon or "comment",
+		"primary_color": api_config.primary_color or "#667eea",
+		"secondary_color": api_config.secondary_color or "#764ba2",
+		"greeting_message": api_config.greeting_message or "Hello! How can I help you today?"
+	}
+
+
+def resolve_model(api_config, config, model):
+	"""
+	The model a proxied request may use
+
+	The API's default model, one of its available models, or the model
+	router's fast model (which need not be listed); anything else falls back
+	to the default.
+
+	Args:
+		api_config (Document): Chatz API
+		config (dict): Its config (build_config)
+		model (str): Requested model
+
+	Returns:
+		str: Model to send upstream
+	"""
+	allowed = [api_config.model_name] + config["available_models"]
+	if config["model_router"]:
+		allowed.append(config["model_router"]["fast_model"])
+	return model if model and model in allowed else api_config.model_name
 
 
 @frappe.whitelist(allow_guest=True)
+@profiled
 def get_user_config():
 	"""
 	Get the current user's Chatz API configuration
@@ -19,12 +128,13 @@ def get_user_config():
 			return get_guest_config()
 
 		# First, check for user-specific settings
-		user_settings_list = frappe.get_all(
-			"User Chatz Settings",
-			filters={"assignment_type": "User", "user": user},
-			fields=["name", "chatz_enabled", "chatz_api_config", "chatz_model_name"],
-			limit=1
-		)
+		with phase("user_settings"):
+			user_settings_list = frappe.get_all(
+				"User Chatz Settings",
+				filters={"assignment_type": "User", "user": user},
+				fields=["name", "chatz_enabled", "chatz_api_config", "chatz_model_name"],
+				limit=1
+			)
 
 		# If no user-specific settings, check for role-based settings
 		if not user_settings_list:
@@ -54,7 +164,8 @@ def get_user_config():
 		api_config_name = user_settings_data.chatz_api_config
 		
 		# Get the API configuration
-		api_config = frappe.get_doc("Chatz API", api_config_name)
+		with phase("get_doc"):
+			api_config = frappe.get_doc("Chatz API", api_config_name)
 
 		if not api_config.enabled:
 			frappe.log_error(
@@ -63,35 +174,12 @@ def get_user_config():
 			)
 			return get_guest_config()
 
-		# Get available models
-		available_models = []
-		if api_config.available_models:
-			try:
-				available_models = json.loads(api_config.available_models)
-			except json.JSONDecodeError:
-				pass
-
 		# Determine which model to use
 		model_name = api_config.model_name
 		if user_settings_data.chatz_model_name:
 			model_name = user_settings_data.chatz_model_name
 
-		return {
-			"status": "success",
-			"api_endpoint": api_config.api_endpoint,
-			"api_key": api_config.api_key,
-			"model_name": model_name,
-			"available_models": available_models,
-			"system_prompt": api_config.system_prompt or "",
-			"api_config_name": api_config_name,
-			"include_csrf_token": api_config.include_csrf_token,
-			"user": user,
-			"widget_title": api_config.widget_title or "Chatz",
-			"widget_icon": api_config.widget_icon or "comment",
-			"primary_color": api_config.primary_color or "#667eea",
-			"secondary_color": api_config.secondary_color or "#764ba2",
-			"greeting_message": api_config.greeting_message or "Hello! How can I help you today?"
-		}
+		return build_config(api_config, user, model_name)
 		
 	except Exception as e:
 		frappe.log_error(
@@ -114,23 +202,25 @@ def get_role_based_settings(user):
 	"""
 	try:
 		# Get all roles for the user
-		user_roles = frappe.get_roles(user)
+		with phase("roles"):
+			user_roles = frappe.get_roles(user)
 
 		if not user_roles:
 			return []
 
 		# Find settings for any of the user's roles
-		role_settings = frappe.get_all(
-			"User Chatz Settings",
-			filters={
-				"assignment_type": "Role",
-				"role": ["in", user_roles],
-				"chatz_enabled": 1
-			},
-			fields=["name", "chatz_enabled", "chatz_api_config", "chatz_model_name", "role"],
-			order_by="creation asc",
-			limit=1
-		)
+		with phase("role_settings"):
+			role_settings = frappe.get_all(
+				"User Chatz Settings",
+				filters={
+					"assignment_type": "Role",
+					"role": ["in", user_roles],
+					"chatz_enabled": 1
+				},
+				fields=["name", "chatz_enabled", "chatz_api_config", "chatz_model_name", "role"],
+				order_by="creation asc",
+				limit=1
+			)
 
 		return role_settings
 
@@ -143,53 +233,17 @@ def get_role_based_settings(user):
 
 
 @frappe.whitelist()
+@profiled
 def get_guest_config():
 	"""
-	Get the default guest configuration
-	
+	Get the default guest configuration (cached, see get_guest_payload)
+
 	Returns:
 		dict: Guest API configuration
 	"""
 	try:
-		# Find the API config marked for guest users
-		guest_config = frappe.db.get_value(
-			"Chatz API",
-			{"is_guest_default": 1, "enabled": 1},
-			["name", "api_endpoint", "api_key", "model_name", "available_models", "system_prompt", "include_csrf_token", "widget_title", "widget_icon", "primary_color", "secondary_color", "greeting_message"],
-			as_dict=True
-		)
-
-		if not guest_config:
-			return {
-				"status": "error",
-				"message": "No guest configuration available"
-			}
-
-		# Parse available models
-		available_models = []
-		if guest_config.available_models:
-			try:
-				available_models = json.loads(guest_config.available_models)
-			except json.JSONDecodeError:
-				pass
+		return with_guest_key(get_guest_payload())
 
-		return {
-			"status": "success",
-			"api_endpoint": guest_config.api_endpoint,
-			"api_key": guest_config.api_key,
-			"model_name": guest_config.model_name,
-			"available_models": available_models,
-			"system_prompt": guest_config.system_prompt or "",
-			"api_config_name": guest_config.name,
-			"include_csrf_token": guest_config.include_csrf_token,
-			"user": "Guest",
-			"widget_title": guest_config.widget_title or "Chatz",
-			"widget_icon": guest_config.widget_icon or "comment",
-			"primary_color": guest_config.primary_color or "#667eea",
-			"secondary_color": guest_config.secondary_color or "#764ba2",
-			"greeting_message": guest_config.greeting_message or "Hello! How can I help you today?"
-		}
-		
 	except Exception as e:
 		frappe.log_error(
 			"Error Getting Guest Config",
@@ -201,6 +255,111 @@ def get_guest_config():
 		}
 
 
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+@profiled
+def get_public_guest_config():
+	"""
+	Guest configuration and API list as a public, cacheable GET response
+
+	Anonymous page views load this instead of POSTing get_user_config. The
+	payload is the same for every visitor, so it is sent with an ETag (its
+	version) and `Cache-Control: public`: browsers and a reverse proxy reuse
+	it for GUEST_CONFIG_MAX_AGE seconds and then revalidate it, which costs
+	one Redis read and an empty 304 until a Chatz API is saved.
+
+	A guest API without the server proxy needs its key in the browser; that
+	response is `private`, so only the visitor's browser keeps it.
+
+	Returns:
+		Response: {"message": {status, version, enabled, config, apis, default_api}}
+	"""
+	payload = get_guest_payload()
+	body = dict(payload, config=with_guest_key(payload), status="success", enabled=payload["default_api"] is not None)
+	body.pop("private", None)
+
+	response = Response(json.dumps({"message": body}, default=str), mimetype="application/json")
+	response.set_etag(payload["version"])
+	scope = "private" if payload.get("private") else "public"
+	response.headers["Cache-Control"] = f"{scope}, max-age={GUEST_CONFIG_MAX_AGE}"
+
+	return response.make_conditional(frappe.request)
+
+
+def get_guest_payload():
+	"""
+	Everything a guest page view needs, cached in Redis until a Chatz API changes
+
+	Returns:
+		dict: {version, config (build_config without the API key, or an error
+			dict), apis, default_api, private (the browser needs the key, see
+			with_guest_key)}; version is a hash of the rest and of the key, so
+			it changes whenever a save changes what guests get
+	"""
+	payload = frappe.cache().get_value(GUEST_PAYLOAD_KEY)
+	if payload is None:
+		payload = build_guest_payload()
+		frappe.cache().set_value(GUEST_PAYLOAD_KEY, payload)
+	return payload
+
+
+def build_guest_payload():
+	"""Read the guest default Chatz API and build the guest payload"""
+	guest_config = frappe.db.get_value(
+		"Chatz API",
+		{"is_guest_default": 1, "enabled": 1},
+		CONFIG_FIELDS,
+		as_dict=True
+	)
+
+	# The key is never part of the cached payload
+	key = ""
+	if guest_config:
+		key = "" if guest_config.use_server_proxy else guest_config.api_key
+		payload = {
+			"config": dict(build_config(guest_config, "Guest"), api_key=""),
+			"apis": [frappe._dict(
+				name=guest_config.name,
+				widget_title=guest_config.widget_title,
+				widget_icon=guest_config.widget_icon
+			)],
+			"default_api": guest_config.name,
+			"private": bool(key)
+		}
+	else:
+		payload = {
+			"config": {
+				"status": "error",
+				"message": "No guest configuration available"
+			},
+			"apis": [],
+			"default_api": None,
+			"private": False
+		}
+
+	payload["version"] = hashlib.sha1(
+		(json.dumps(payload, sort_keys=True, default=str) + key).encode()
+	).hexdigest()[:16]
+	return payload
+
+
+def with_guest_key(payload):
+	"""The guest config, with the API key when the browser calls the API directly (read per request, never cached)"""
+	if not payload.get("private"):
+		return payload["config"]
+	return dict(payload["config"], api_key=frappe.db.get_value("Chatz API", payload["default_api"], "api_key"))
+
+
+def clear_guest_payload():
+	"""
+	Drop the cached guest payload (Chatz API on_update, on_trash and rename)
+
+	Cleared again after the commit, so a page view that read the old row
+	during the save cannot keep it cached.
+	"""
+	frappe.cache().delete_value(GUEST_PAYLOAD_KEY)
+	frappe.db.after_commit.add(lambda: frappe.cache().delete_value(GUEST_PAYLOAD_KEY))
+
+
 def get_default_logged_in_config(user):
 	"""
 	Get the default configuration for logged-in users without User Chatz Settings
@@ -217,7 +376,7 @@ def get_default_logged_in_config(user):
 		default_config = frappe.db.get_value(
 			"Chatz API",
 			{"allow_for_all": 1, "enabled": 1},
-			["name", "api_endpoint", "api_key", "model_name", "available_models", "system_prompt", "include_csrf_token", "widget_title", "widget_icon", "primary_color", "secondary_color", "greeting_message"],
+			CONFIG_FIELDS,
 			as_dict=True,
 			order_by="widget_title asc"
 		)
@@ -228,30 +387,7 @@ def get_default_logged_in_config(user):
 				"message": "No default configuration available for logged-in users"
 			}
 
-		# Parse available models
-		available_models = []
-		if default_config.available_models:
-			try:
-				available_models = json.loads(default_config.available_models)
-			except json.JSONDecodeError:
-				pass
-
-		return {
-			"status": "success",
-			"api_endpoint": default_config.api_endpoint,
-			"api_key": default_config.api_key,
-			"model_name": default_config.model_name,
-			"available_models": available_models,
-			"system_prompt": default_config.system_prompt or "",
-			"api_config_name": default_config.name,
-			"include_csrf_token": default_config.include_csrf_token,
-			"user": user,
-			"widget_title": default_config.widget_title or "Chatz",
-			"widget_icon": default_config.widget_icon or "comment",
-			"primary_color": default_config.primary_color or "#667eea",
-			"secondary_color": default_config.secondary_color or "#764ba2",
-			"greeting_message": default_config.greeting_message or "Hello! How can I help you today?"
-		}
+		return build_config(default_config, user)
 
 	except Exception as e:
 		frappe.log_error(
@@ -265,6 +401,7 @@ def get_default_logged_in_config(user):
 
 
 @frappe.whitelist(allow_guest=True)
+@profiled
 def get_available_apis():
 	"""
 	Get available Chatz API configurations for the current user
@@ -278,44 +415,35 @@ def get_available_apis():
 
 		if user == "Guest":
 			# For guests, return the guest default API
-			guest_default = frappe.db.get_value(
-				"Chatz API",
-				{"is_guest_default": 1, "enabled": 1},
-				["name", "widget_title", "widget_icon"],
-				as_dict=True
-			)
-			if guest_default:
-				return {
-					"status": "success",
-					"apis": [guest_default],
-					"default_api": guest_default.name
-				}
-			else:
-				return {
-					"status": "success",
-					"apis": [],
-					"default_api": None
-				}
+			guest_payload = get_guest_payload()
+			return {
+				"status": "success",
+				"apis": guest_payload["apis"],
+				"default_api": guest_payload["default_api"]
+			}
 
 		# Get user-specific Chatz Settings
-		user_settings_list = frappe.get_all(
-			"User Chatz Settings",
-			filters={"assignment_type": "User", "user": user, "chatz_enabled": 1},
-			fields=["chatz_api_config"],
-			order_by="creation asc"
-		)
-
-		# Also get role-based settings
-		user_roles = frappe.get_roles(user)
-		role_settings_list = []
-		if user_roles:
-			role_settings_list = frappe.get_all(
+		with phase("user_settings"):
+			user_settings_list = frappe.get_all(
 				"User Chatz Settings",
-				filters={"assignment_type": "Role", "role": ["in", user_roles], "chatz_enabled": 1},
+				filters={"assignment_type": "User", "user": user, "chatz_enabled": 1},
 				fields=["chatz_api_config"],
 				order_by="creation asc"
 			)
 
+		# Also get role-based settings
+		with phase("roles"):
+			user_roles = frappe.get_roles(user)
+		role_settings_list = []
+		if user_roles:
+			with phase("role_settings"):
+				role_settings_list = frappe.get_all(
+					"User Chatz Settings",
+					filters={"assignment_type": "Role", "role": ["in", user_roles], "chatz_enabled": 1},
+					fields=["chatz_api_config"],
+					order_by="creation asc"
+				)
+
 		# Combine user and role settings
 		all_settings = user_settings_list + role_settings_list
 
@@ -391,6 +519,7 @@ def get_available_apis():
 
 
 @frappe.whitelist(allow_guest=True)
+@profiled
 def get_api_config(api_name):
 	"""
 	Get a specific API configuration by name
@@ -413,14 +542,6 @@ def get_api_config(api_name):
 				"message": "API configuration is disabled"
 			}
 
-		# Get available models
-		available_models = []
-		if api_config.available_models:
-			try:
-				available_models = json.loads(api_config.available_models)
-			except json.JSONDecodeError:
-				pass
-
 		# Get user's model override if they have one
 		model_name = api_config.model_name
 		if user != "Guest":
@@ -433,22 +554,7 @@ def get_api_config(api_name):
 			if user_settings_list and user_settings_list[0].chatz_model_name:
 				model_name = user_settings_list[0].chatz_model_name
 
-		return {
-			"status": "success",
-			"api_endpoint": api_config.api_endpoint,
-			"api_key": api_config.api_key,
-			"model_name": model_name,
-			"available_models": available_models,
-			"system_prompt": api_config.system_prompt or "",
-			"api_config_name": api_name,
-			"include_csrf_token": api_config.include_csrf_token,
-			"user": user,
-			"widget_title": api_config.widget_title or "Chatz",
-			"widget_icon": api_config.widget_icon or "comment",
-			"primary_color": api_config.primary_color or "#667eea",
-			"secondary_color": api_config.secondary_color or "#764ba2",
-			"greeting_message": api_config.greeting_message or "Hello! How can I help you today?"
-		}
+		return build_config(api_config, user, model_name)
 
 	except Exception as e:
 		frappe.log_error(
@@ -462,6 +568,7 @@ def get_api_config(api_name):
 
 
 @frappe.whitelist(allow_guest=True)
+@profiled
 def validate_user_chatz_enabled():
 	"""
 	Check if chat is enabled for the current user
@@ -474,14 +581,9 @@ def validate_user_chatz_enabled():
 
 		if user == "Guest":
 			# Check if guest config exists
-			guest_config = frappe.db.get_value(
-				"Chatz API",
-				{"is_guest_default": 1, "enabled": 1},
-				"name"
-			)
 			return {
 				"status": "success",
-				"enabled": guest_config is not None
+				"enabled": get_guest_payload()["default_api"] is not None
 			}
 
 		# Get user document
@@ -510,70 +612,77 @@ def validate_user_chatz_enabled():
 		}
 
 
-@frappe.whitelist()
-def call_streaming_api(api_config_name, messages):
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+@profiled
+def call_streaming_api(api_config_name, messages, model=None, stream_id=None):
 	"""
-	Proxy API call through Frappe backend to include CSRF token
+	Proxy a streaming chat completion through the Frappe backend
+
+	Used by Chatz APIs with "Use Server Proxy" enabled, so the API key never
+	reaches the browser. The upstream events are relayed as they arrive; when
+	the browser aborts (or cancel_stream is called for stream_id) the upstream
+	connection is closed, which stops the generation on the model server.
 
 	Args:
 		api_config_name (str): Name of the Chatz API configuration
 		messages (str): JSON string of messages array
+		model (str): Model to use (see resolve_model)
+		stream_id (str): Client-generated ID that cancel_stream can refer to
 
 	Returns:
-		dict: API response
+		Response: text/event-stream of chat.completion.chunk events (the model used
+			in the X-Chatz-Model header), or an error dict
 	"""
 	try:
-		# Get the API configuration
+		if not user_can_use_api(api_config_name):
+			return {
+				"status": "error",
+				"message": "You do not have access to this API configuration"
+			}
+
 		api_config = frappe.get_doc("Chatz API", api_config_name)
 
-		if not api_config.enabled:
+		if not api_config.enabled or not api_config.use_server_proxy:
 			return {
 				"status": "error",
-				"message": "API configuration is disabled"
+				"message": "API configuration is disabled or not proxied"
 			}
 
 		# Parse messages
 		if isinstance(messages, str):
 			messages = json.loads(messages)
 
-		# Build the payload
-		payload = {
-			"model": api_config.model_name,
-			"messages": messages,
-			"stream": True
-		}
-
-		# Build headers
-		headers = {
-			"Content-Type": "application/json",
-			"Authorization": f"Bearer {api_config.api_key}"
-		}
+		model = resolve_model(api_config, build_config(api_config, frappe.session.user), model)
 
 		# Add CSRF token if enabled
+		headers = {}
 		if api_config.include_csrf_token:
-			headers["X-Frappe-CSRF-Token"] = frappe.csrf_token
+			headers["X-Frappe-CSRF-Token"] = get_csrf_token()
 
-		# Make the API call
-		endpoint = api_config.api_endpoint.rstrip("/")
-		url = f"{endpoint}/chat/completions"
-
-		frappe.logger().info(f"Chatz: Calling API {url} with CSRF token: {api_config.include_csrf_token}")
-
-		response = requests.post(url, json=payload, headers=headers, stream=True, timeout=300)
-
-		if response.status_code != 200:
-			error_text = response.text
-			frappe.logger().error(f"Chatz API Error: {response.status_code} - {error_text}")
-			return {
-				"status": "error",
-				"message": f"API Error: {response.status_code}",
-				"error": error_text
-			}
+		upstream = ChatCompletionStream(
+			api_config.api_endpoint,
+			api_config.api_key,
+			{"model": model, "messages": messages},
+			headers=headers
+		)
 
-		# Return the streaming response
+		response = Response(
+			stream_in_site_context(relay_stream, upstream, stream_id),
+			mimetype="text/event-stream"
+		)
+		response.headers["Cache-Control"] = "no-cache"
+		# The model actually used, for the widget to record
+		response.headers["X-Chatz-Model"] = model
+		# Stop nginx from buffering the stream (and from hiding a client abort)
+		response.headers["X-Accel-Buffering"] = "no"
+		return response
+
+	except UpstreamError as e:
+		frappe.logger().error(f"Chatz API Error: {e.status} - {e.body}")
 		return {
-			"status": "success",
-			"stream": response.iter_lines()
+			"status": "error",
+			"message": f"API Error: {e.status}",
+			"error": e.body
 		}
 
 	except Exception as e:
@@ -586,3 +695,73 @@ def call_streaming_api(api_config_name, messages):
 			"message": f"Failed to call API: {str(e)}"
 		}
 
+
+def relay_stream(upstream, stream_id=None, on_event=None):
+	"""
+	Relay upstream events as server-sent events until done or cancelled
+
+	When the browser goes away the WSGI server closes this generator, and a
+	cancel_stream call is noticed within CANCEL_POLL_SECONDS; either way the
+	upstream connection is closed in `finally`.
+
+	Args:
+		upstream (ChatCompletionStream): Open upstream stream
+		stream_id (str): ID checked for a cancel request
+		on_event (callable): Called with each event before it is relayed
+	"""
+	cancel_key = stream_cancel_key(stream_id) if stream_id else None
+	last_poll = time.monotonic()
+	try:
+		for event in upstream:
+			if on_event:
+				on_event(event)
+			yield f"data: {json.dumps(event)}\n\n"
+			if cancel_key and time.monotonic() - last_poll >= CANCEL_POLL_SECONDS:
+				last_poll = time.monotonic()
+				if frappe.cache().get_value(cancel_key):
+					break
+		yield STREAM_DONE
+	finally:
+		upstream.close()
+		if cancel_key:
+			frappe.cache().delete_value(cancel_key)
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+@profiled
+def cancel_stream(stream_id):
+	"""
+	Stop a proxied generation
+
+	Aborting the fetch in the browser is usually enough, but a buffering proxy
+	in front of Frappe may keep reading the stream; the flag set here makes
+	relay_stream stop regardless.
+
+	Args:
+		stream_id (str): ID passed to call_streaming_api
+
+	Returns:
+		dict: Response with status
+	"""
+	if not stream_id:
+		return {
+			"status": "error",
+			"message": "Stream ID is required"
+		}
+
+	frappe.cache().set_value(stream_cancel_key(stream_id), 1, expires_in_sec=CANCEL_FLAG_TTL)
+	return {
+		"status": "success",
+		"message": "Stream cancelled"
+	}
+
+
+def stream_cancel_key(stream_id):
+	# Scoped to the session user, so one user cannot stop another user's stream
+	return f"chatz_stream_cancel:{frappe.session.user}:{stream_id}"
+
+
+def user_can_use_api(api_name):
+	"""Whether api_name is one of the current user's available Chatz APIs"""
+	result = get_available_apis()
+	return result.get("status") == "success" and any(api.get("name") == api_name for api in result["apis"])
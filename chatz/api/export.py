@@ -0,0 +1,92 @@
+import os
+import tempfile
+
+import frappe
+from werkzeug.wrappers import Response
+
+from chatz.utils.history_export import (
+	EXPORT_FORMATS,
+	end_watermark,
+	export_cutoff,
+	export_filename,
+	iter_export,
+	parse_list,
+	write_parquet
+)
+from chatz.utils.profiling import profiled
+from chatz.utils.streaming import stream_in_site_context
+
+
+CONTENT_TYPES = {
+	"jsonl": "application/x-ndjson",
+	"csv": "text/csv",
+	"parquet": "application/vnd.apache.parquet"
+}
+
+
+@frappe.whitelist(methods=["GET"])
+@profiled
+def export_history(format="jsonl", from_date=None, to_date=None, user=None,
+				   api_used=None, since=None, compress=1):
+	"""
+	Stream all Chatz History as a file download (System Manager only)
+
+	Rows are read with keyset pagination and written out batch by batch, so
+	the export runs in constant memory. The X-Chatz-Export-Watermark response
+	header is the `since` value for the next incremental export.
+
+	Args:
+		format (str): "jsonl", "csv" or "parquet"
+		from_date (str): Only messages created on or after this date
+		to_date (str): Only messages created on or before this date
+		user (str): User or comma separated users
+		api_used (str): Chatz API or comma separated Chatz APIs
+		since (str): Watermark of a previous export
+		compress (int): 1 to gzip (Parquet uses zstd internally)
+
+	Returns:
+		Response: Streaming file download
+	"""
+	frappe.only_for("System Manager")
+
+	if format not in EXPORT_FORMATS:
+		frappe.throw(f"Format must be one of {', '.join(EXPORT_FORMATS)}")
+
+	compress = frappe.utils.cint(compress) == 1
+	cutoff = export_cutoff()
+	filters = {
+		"from_date": from_date,
+		"to_date": to_date,
+		"users": parse_list(user),
+		"api_used": parse_list(api_used),
+		"since": since,
+		"cutoff": cutoff
+	}
+
+	if format == "parquet":
+		body = stream_in_site_context(stream_parquet, compress, filters)
+	else:
+		body = stream_in_site_context(iter_export, format=format, compress=compress, **filters)
+
+	mimetype = CONTENT_TYPES[format]
+	if compress and format != "parquet":
+		mimetype = "application/gzip"
+
+	response = Response(body, mimetype=mimetype, direct_passthrough=True)
+	response.headers["Content-Disposition"] = f'attachment; filename="{export_filename(format, compress)}"'
+	response.headers["X-Chatz-Export-Watermark"] = end_watermark(cutoff)
+	response.headers["Cache-Control"] = "no-store"
+	return response
+
+
+def stream_parquet(compress, filters, chunk_size=1024 * 1024):
+	"""Parquet needs a seekable file: write to a temp file, then stream it"""
+	fd, path = tempfile.mkstemp(suffix=".parquet")
+	os.close(fd)
+	try:
+		write_parquet(path, compress=compress, **filters)
+		with open(path, "rb") as f:
+			while chunk := f.read(chunk_size):
+				yield chunk
+	finally:
+		os.remove(path)
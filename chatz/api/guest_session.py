@@ -0,0 +1,241 @@
+import frappe
+import json
+import re
+import secrets
+from frappe.rate_limiter import rate_limit
+from frappe.utils import now_datetime
+
+from chatz.api.config import get_guest_payload
+from chatz.utils.profiling import profiled
+
+
+# Guest conversations live in Redis only, keyed by an anonymous session token
+GUEST_SESSION_TTL = 60 * 60 * 24
+GUEST_SESSION_MAX_MESSAGES = 50
+GUEST_HISTORY_WINDOW = 10
+MAX_GUEST_MESSAGE_LENGTH = 20000
+
+TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{20,64}$")
+
+
+def session_key(session_token, prefixed=True):
+	"""
+	Redis key of a guest session
+
+	RedisWrapper's list helpers (lrange, rpush, ...) add the site prefix
+	themselves and take the bare key; pipelines and delete need the full key.
+	"""
+	key = f"chatz_guest_session:{session_token}"
+	return frappe.cache().make_key(key) if prefixed else key
+
+
+def valid_token(session_token):
+	return bool(session_token and TOKEN_PATTERN.match(session_token))
+
+
+def invalid_session():
+	# A plain error result: anyone can send a bad token, so it is not logged
+	return {
+		"status": "error",
+		"message": "Invalid guest session"
+	}
+
+
+def guest_chat_enabled():
+	return get_guest_payload()["default_api"] is not None
+
+
+def read_messages(session_token, limit=None):
+	"""
+	Read the latest messages of a guest session
+
+	Args:
+		session_token (str): Guest session token
+		limit (int): Return only the latest N messages
+
+	Returns:
+		list: Messages ({role, content, timestamp}), oldest first
+	"""
+	start = -int(limit) if limit else 0
+	raw = frappe.cache().lrange(session_key(session_token, prefixed=False), start, -1)
+	messages = []
+	for item in raw or []:
+		try:
+			messages.append(json.loads(item))
+		except (TypeError, ValueError):
+			continue
+	return messages
+
+
+def append_message(session_token, role, content):
+	"""Append a message, cap the session length and refresh its TTL in one round trip"""
+	key = session_key(session_token)
+	payload = json.dumps({
+		"role": role,
+		"content": content[:MAX_GUEST_MESSAGE_LENGTH],
+		"timestamp": now_datetime().isoformat()
+	})
+
+	pipe = frappe.cache().pipeline()
+	pipe.rpush(key, payload)
+	pipe.ltrim(key, -GUEST_SESSION_MAX_MESSAGES, -1)
+	pipe.expire(key, GUEST_SESSION_TTL)
+	pipe.execute()
+
+
+@frappe.whitelist(allow_guest=True)
+@rate_limit(limit=30, seconds=60 * 60)
+@profiled
+def start_guest_session():
+	"""
+	Create an anonymous guest chat session
+
+	Returns:
+		dict: Session token and limits
+	"""
+	try:
+		if not guest_chat_enabled():
+			return {
+				"status": "error",
+				"message": "Guest chat is not enabled"
+			}
+
+		return {
+			"status": "success",
+			"session_token": secrets.token_urlsafe(24),
+			"ttl": GUEST_SESSION_TTL,
+			"max_messages": GUEST_SESSION_MAX_MESSAGES
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Starting Guest Session",
+			f"Failed to start guest session: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to start guest session: {str(e)}"
+		}
+
+
+@frappe.whitelist(allow_guest=True)
+@rate_limit(limit=300, seconds=60 * 60)
+@profiled
+def get_guest_history(session_token, limit=GUEST_SESSION_MAX_MESSAGES):
+	"""
+	Get the messages of a guest session
+
+	Args:
+		session_token (str): Guest session token
+		limit (int): Maximum number of (latest) messages
+
+	Returns:
+		dict: Messages, oldest first
+	"""
+	try:
+		if not valid_token(session_token):
+			return invalid_session()
+		limit = min(int(limit) if limit else GUEST_SESSION_MAX_MESSAGES, GUEST_SESSION_MAX_MESSAGES)
+
+		return {
+			"status": "success",
+			"messages": read_messages(session_token, limit)
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Getting Guest History",
+			f"Failed to get guest history: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to get guest history: {str(e)}"
+		}
+
+
+@frappe.whitelist(allow_guest=True)
+@rate_limit(limit=300, seconds=60 * 60)
+@profiled
+def add_guest_message(session_token, role, content, history_limit=GUEST_HISTORY_WINDOW):
+	"""
+	Append a message to a guest session
+
+	For user messages, the history window the prompt needs is returned in the
+	same round trip (read before the append, so it excludes the new message).
+
+	Args:
+		session_token (str): Guest session token
+		role (str): "user" or "assistant"
+		content (str): Message text
+		history_limit (int): Size of the returned history window
+
+	Returns:
+		dict: Status and, for user messages, the preceding history window
+	"""
+	try:
+		if not valid_token(session_token):
+			return invalid_session()
+
+		if role not in ("user", "assistant"):
+			return {
+				"status": "error",
+				"message": "Role must be 'user' or 'assistant'"
+			}
+
+		if not content:
+			return {
+				"status": "error",
+				"message": "Message content is required"
+			}
+
+		history = []
+		if role == "user":
+			limit = min(int(history_limit) if history_limit else GUEST_HISTORY_WINDOW, GUEST_SESSION_MAX_MESSAGES)
+			history = read_messages(session_token, limit)
+
+		append_message(session_token, role, content)
+
+		return {
+			"status": "success",
+			"history": history
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Saving Guest Message",
+			f"Failed to save guest message: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to save guest message: {str(e)}"
+		}
+
+
+@frappe.whitelist(allow_guest=True)
+@rate_limit(limit=300, seconds=60 * 60)
+@profiled
+def clear_guest_session(session_token):
+	"""
+	Delete a guest session
+
+	Args:
+		session_token (str): Guest session token
+
+	Returns:
+		dict: Status
+	"""
+	try:
+		if not valid_token(session_token):
+			return invalid_session()
+		frappe.cache().delete(session_key(session_token))
+		return {"status": "success"}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Clearing Guest Session",
+			f"Failed to clear guest session: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to clear guest session: {str(e)}"
+		}
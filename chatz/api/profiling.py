@@ -0,0 +1,58 @@
+import frappe
+
+from chatz.utils.profiling import MAX_STORED_PROFILES, PROFILE_INDEX_KEY, PROFILE_KEY_PREFIX
+
+
+@frappe.whitelist()
+def list_profiles():
+	"""
+	List the sampled profiles of the last day (System Manager)
+
+	Profiles are recorded for Chatz endpoints called with the
+	`X-Chatz-Profile: 1` request header.
+
+	Returns:
+		dict: Response with status and profile summaries, newest first
+	"""
+	frappe.only_for("System Manager")
+
+	profiles = []
+	for profile_id in frappe.cache().lrange(PROFILE_INDEX_KEY, 0, MAX_STORED_PROFILES - 1) or []:
+		profile_id = frappe.safe_decode(profile_id)
+		profile = frappe.cache().get_value(PROFILE_KEY_PREFIX + profile_id)
+		if profile:
+			profiles.append({k: v for k, v in profile.items() if k != "folded"})
+
+	return {
+		"status": "success",
+		"profiles": profiles
+	}
+
+
+@frappe.whitelist()
+def get_profile(profile_id):
+	"""
+	Get a sampled profile (System Manager)
+
+	`folded` holds collapsed stacks ("frame;frame;frame count" per line), which
+	flamegraph.pl, speedscope and inferno read as is.
+
+	Args:
+		profile_id (str): ID from the X-Chatz-Profile-Id response header
+
+	Returns:
+		dict: Response with status and the profile
+	"""
+	frappe.only_for("System Manager")
+
+	profile = frappe.cache().get_value(PROFILE_KEY_PREFIX + (profile_id or ""))
+	if not profile:
+		return {
+			"status": "error",
+			"message": "Profile not found or expired"
+		}
+
+	return {
+		"status": "success",
+		"profile": profile
+	}
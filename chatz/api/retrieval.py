@@ -0,0 +1,55 @@
+import frappe
+
+from chatz.utils.profiling import phase, profiled
+from chatz.utils.retrieval import search
+
+
+MAX_TOP_K = 20
+
+
+@frappe.whitelist()
+@profiled
+def search_context(query, api_name):
+	"""
+	Get indexed snippets relevant to a message, for the prompt
+
+	Only records the current user can read are returned.
+
+	Args:
+		query (str): User message
+		api_name (str): Chatz API the message is sent through
+
+	Returns:
+		dict: Response with status and snippets
+	"""
+	try:
+		api = frappe.db.get_value(
+			"Chatz API",
+			api_name,
+			["enabled", "enable_retrieval", "retrieval_top_k"],
+			as_dict=True
+		)
+		if not api or not api.enabled or not api.enable_retrieval:
+			return {
+				"status": "success",
+				"snippets": []
+			}
+
+		with phase("search"):
+			snippets = search(query, limit=min(api.retrieval_top_k or 5, MAX_TOP_K))
+
+		return {
+			"status": "success",
+			"snippets": snippets
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Searching Context",
+			f"Failed to search retrieval index: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to search: {str(e)}",
+			"snippets": []
+		}
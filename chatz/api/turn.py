@@ -0,0 +1,247 @@
+import frappe
+import frappe.client
+import json
+import time
+from frappe.sessions import get_csrf_token
+from werkzeug.wrappers import Response
+
+from chatz.api.attachments import get_attachment_context
+from chatz.api.config import STREAM_DONE, build_config, relay_stream, resolve_model, user_can_use_api
+from chatz.api.retrieval import search_context
+from chatz.chatz.doctype.chatz_history.chatz_history import save_message
+from chatz.utils.history_backends import get_history_backend
+from chatz.utils.model_router import route_model
+from chatz.utils.openai_client import ChatCompletionStream, StreamedResponse, UpstreamError
+from chatz.utils.profiling import phase, profiled
+from chatz.utils.prompt_builder import build_messages, last_sent_document, stored_context
+from chatz.utils.streaming import stream_in_site_context
+
+
+# Previous messages sent with a turn (HISTORY_WINDOW in chatz_widget.js)
+HISTORY_WINDOW = 10
+
+
+@frappe.whitelist(methods=["POST"])
+@profiled
+def stream_turn(api_config_name, conversation_id, message, context=None, model=None, stream_id=None,
+				client_message_id=None, response_message_id=None):
+	"""
+	Stream one turn of a proxied conversation and save it on the server
+
+	The browser sends only the new message and its Desk context. The prompt
+	is built here from the saved history window, the open document, indexed
+	records and attachment excerpts (as the widget would), the user message
+	is saved, and the response is relayed like call_streaming_api while it is
+	collected. When the upstream finishes, is cancelled or the browser goes
+	away, the response is saved as well ("Stopped" if it was cut short), so
+	it is never uploaded again and survives a closed tab. The IDs of both
+	saved messages are sent as a last {"chatz": {...}} event before [DONE].
+
+	With a model router the model is chosen here (chatz.utils.model_router);
+	the response records the route, the model and its latency.
+
+	Args:
+		api_config_name (str): Name of the Chatz API configuration (must use the server proxy)
+		conversation_id (str): Conversation the turn belongs to
+		message (str): New user message
+		context (str): JSON Desk context (ChatzContext.getCurrentContext)
+		model (str): Model to use (the API's default unless it is one of its available models)
+		stream_id (str): Client-generated ID that cancel_stream can refer to
+		client_message_id (str): Client ID of the user message (makes a retried turn idempotent)
+		response_message_id (str): Client ID of the response
+
+	Returns:
+		Response: text/event-stream of chat.completion.chunk events, or an error dict
+	"""
+	try:
+		if not user_can_use_api(api_config_name):
+			return {
+				"status": "error",
+				"message": "You do not have access to this API configuration"
+			}
+
+		api_config = frappe.get_doc("Chatz API", api_config_name)
+
+		if not api_config.enabled or not api_config.use_server_proxy:
+			return {
+				"status": "error",
+				"message": "API configuration is disabled or not proxied"
+			}
+
+		user = frappe.session.user
+		if isinstance(context, str):
+			context = json.loads(context)
+		context = context or {}
+
+		config = build_config(api_config, user)
+		model = resolve_model(api_config, config, model)
+
+		# The router only replaces the default model
+		route = route_model(config, message) if model == api_config.model_name else None
+		if route:
+			model = route["model"]
+
+		with phase("history"):
+			history = get_history_backend().get_messages(user, conversation_id, HISTORY_WINDOW)
+
+		with phase("context"):
+			retrieved, attachments = gather_context(api_config, context, message, history)
+
+		messages = build_messages(config, history, message, context, retrieved=retrieved, attachments=attachments)
+
+		# A document sent earlier is stored as the changes the prompt sent
+		previous = last_sent_document(history, context.get("doctype"), context.get("docname"))
+		document_context = json.dumps(stored_context(context, previous), default=str)
+		saved = save_message(user, conversation_id, "user", message, document_context, api_config.name, client_message_id)
+		if saved["status"] != "success":
+			return saved
+		# The response is saved from the stream, on a new connection
+		frappe.db.commit()
+
+		headers = {}
+		if api_config.include_csrf_token:
+			headers["X-Frappe-CSRF-Token"] = get_csrf_token()
+
+		started = time.monotonic()
+		upstream = ChatCompletionStream(
+			api_config.api_endpoint,
+			api_config.api_key,
+			{"model": model, "messages": messages},
+			headers=headers
+		)
+
+		turn = {
+			"user": user,
+			"conversation_id": conversation_id,
+			"document_context": document_context,
+			"api_used": api_config.name,
+			"user_message_id": saved["message_id"],
+			"response_message_id": response_message_id,
+			"started": started,
+			"generation": {
+				"model_used": model,
+				"model_route": route["route"] if route else None,
+				"route_reason": route["reason"] if route else None
+			}
+		}
+		response = Response(
+			stream_in_site_context(relay_turn, upstream, stream_id, turn),
+			mimetype="text/event-stream"
+		)
+		response.headers["Cache-Control"] = "no-cache"
+		# Stop nginx from buffering the stream (and from hiding a client abort)
+		response.headers["X-Accel-Buffering"] = "no"
+		return response
+
+	except UpstreamError as e:
+		frappe.logger().error(f"Chatz API Error: {e.status} - {e.body}")
+		return {
+			"status": "error",
+			"message": f"API Error: {e.status}",
+			"error": e.body
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Streaming Turn",
+			f"Failed to stream turn of conversation {conversation_id}: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to call API: {str(e)}"
+		}
+
+
+def gather_context(api_config, context, message, history=None):
+	"""
+	Add what the widget fetches before a turn: the open document (into
+	context.document_data), indexed records and attachment excerpts
+
+	Returns:
+		tuple: (retrieved snippets, attachment excerpts)
+	"""
+	doctype, docname = context.get("doctype"), context.get("docname")
+	retrieved = []
+	attachments = []
+
+	if doctype and docname:
+		try:
+			context["document_data"] = get_document(doctype, docname, last_sent_document(history, doctype, docname))
+		except Exception:
+			# As in the widget: without read access the prompt has no document data
+			frappe.clear_messages()
+
+	if api_config.enable_retrieval:
+		retrieved = search_context(message, api_config.name).get("snippets") or []
+
+	if api_config.include_attachments and doctype and docname and context.get("attachment_count"):
+		attachments = get_attachment_context(doctype, docname, message, api_config.name).get("attachments") or []
+
+	return retrieved, attachments
+
+
+def get_document(doctype, docname, sent=None):
+	"""
+	The open document as JSON data (as the widget receives it)
+
+	When a turn in the history window sent it and its modified timestamp is
+	unchanged, that version is reused instead of loading the document again.
+
+	Args:
+		doctype (str): DocType of the open document
+		docname (str): Its name
+		sent (dict): Version sent with an earlier turn (last_sent_document)
+
+	Returns:
+		dict: Document data
+	"""
+	if sent and frappe.has_permission(doctype, "read", docname) \
+			and str(frappe.db.get_value(doctype, docname, "modified")) == sent.get("modified"):
+		return sent
+	return json.loads(frappe.as_json(frappe.client.get(doctype, docname)))
+
+
+def relay_turn(upstream, stream_id, turn):
+	"""
+	Relay a turn's stream (relay_stream) and save the response
+
+	The response is saved before [DONE] is sent, or in `finally` when the
+	browser went away; either way only once.
+	"""
+	response = StreamedResponse(turn["started"])
+	saved = {}
+
+	def save():
+		saved["user_message_id"] = turn["user_message_id"]
+		# Nothing to keep if the response was stopped before it started
+		if not response.content and not response.reasoning:
+			return
+		ttft_ms, response_ms = response.timings()
+		result = save_message(
+			turn["user"],
+			turn["conversation_id"],
+			"assistant",
+			response.content or response.reasoning,
+			turn["document_context"],
+			turn["api_used"],
+			turn["response_message_id"],
+			None if response.finished else "Stopped",
+			reasoning=response.reasoning if response.content else None,
+			generation=dict(turn["generation"], ttft_ms=ttft_ms, response_ms=response_ms)
+		)
+		frappe.db.commit()
+		if result["status"] == "success":
+			saved["response_message_id"] = result["message_id"]
+
+	lines = relay_stream(upstream, stream_id, on_event=response.add)
+	try:
+		for line in lines:
+			if line == STREAM_DONE:
+				save()
+				yield f"data: {json.dumps({'chatz': saved})}\n\n"
+			yield line
+	finally:
+		# Closes the upstream connection first
+		lines.close()
+		if not saved:
+			save()
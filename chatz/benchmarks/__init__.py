@@ -0,0 +1 @@
+# Chatz benchmark and load testing tools
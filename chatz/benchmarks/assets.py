@@ -0,0 +1,72 @@
+import gzip
+import json
+import os
+
+import frappe
+
+
+# Assets loaded on first open (the markdown worker when the first message renders)
+LAZY_ASSETS = ["chatz_widget.bundle.js", "chatz_widget.bundle.css", "chatz_markdown_worker.bundle.js"]
+
+
+def asset_report():
+	"""
+	Report the weight of Chatz assets loaded on every Desk page vs on first open
+
+	Reads the built asset map (sites/assets/assets.json), so run `bench build` first.
+
+	Returns:
+		dict: Raw and gzipped sizes of eager and lazy assets
+	"""
+	assets_map = load_assets_map()
+
+	eager = []
+	for hook in ("app_include_js", "app_include_css"):
+		eager.extend(
+			path for path in frappe.get_hooks(hook, app_name="chatz")
+			if "chatz" in path
+		)
+
+	eager_sizes = [asset_size(path, assets_map) for path in eager]
+	lazy_sizes = [asset_size(path, assets_map) for path in LAZY_ASSETS]
+
+	return {
+		"eager": eager_sizes,
+		"lazy": lazy_sizes,
+		"eager_total": sum_sizes(eager_sizes),
+		"lazy_total": sum_sizes(lazy_sizes)
+	}
+
+
+def load_assets_map():
+	path = os.path.join(frappe.local.sites_path, "assets", "assets.json")
+	if not os.path.exists(path):
+		return {}
+	with open(path) as f:
+		return json.load(f)
+
+
+def asset_size(name, assets_map):
+	"""Resolve a bundle name or /assets path to a file and measure it"""
+	url = assets_map.get(name, name)
+	path = os.path.join(frappe.local.sites_path, url.lstrip("/"))
+
+	if not os.path.exists(path):
+		return {"asset": name, "path": url, "missing": True, "bytes": 0, "gzip_bytes": 0}
+
+	with open(path, "rb") as f:
+		content = f.read()
+
+	return {
+		"asset": name,
+		"path": url,
+		"bytes": len(content),
+		"gzip_bytes": len(gzip.compress(content))
+	}
+
+
+def sum_sizes(sizes):
+	return {
+		"bytes": sum(size["bytes"] for size in sizes),
+		"gzip_bytes": sum(size["gzip_bytes"] for size in sizes)
+	}
@@ -0,0 +1,103 @@
+import random
+import time
+
+from chatz.benchmarks.prefix_cache import DEFAULT_SYSTEM_PROMPT, make_document
+from chatz.benchmarks.stats import LatencyHistogram, build_report
+from chatz.utils.batch import run_batch
+from chatz.utils.openai_client import chat_completion, message_content
+from chatz.utils.prompt_builder import LAYOUT_PREFIX_CACHED, build_messages, html_to_prompt_text
+
+
+BATCH_PROMPT = "Summarise this record in one sentence and classify its urgency as Low, Medium or High."
+
+
+def run_batch_benchmark(base_url, model, records=100, concurrency_levels=None, api_key="",
+						max_tokens=60, max_retries=2, retry_delay=0.2, seed=42, timeout=120):
+	"""
+	Measure batch throughput at different concurrency levels
+
+	Answers the same synthetic records once per level through run_batch, the
+	engine behind Chatz Batch Jobs, so the numbers reflect its scheduling and
+	retries against the given backend (use chatz-fake-openai with
+	--error-rate to exercise retries).
+
+	Args:
+		base_url (str): OpenAI-compatible base URL
+		model (str): Model to request
+		records (int): Records per level
+		concurrency_levels (list): Concurrency levels to compare (defaults to 1, 4, 8 and 16)
+		api_key (str): Bearer token
+		max_tokens (int): Response length
+		max_retries (int): Retries per record
+		retry_delay (float): Seconds before the first retry
+		seed (int): Random seed
+		timeout (int): Request timeout in seconds
+
+	Returns:
+		dict: chatz-bench report with per-level throughput under extra.batch
+	"""
+	concurrency_levels = concurrency_levels or [1, 4, 8, 16]
+	rng = random.Random(seed)
+	config = {
+		"prompt_layout": LAYOUT_PREFIX_CACHED,
+		"system_prompt_text": html_to_prompt_text(DEFAULT_SYSTEM_PROMPT),
+		"user": "chatz-bench@example.com"
+	}
+	documents = [make_document(rng, index) for index in range(records)]
+
+	def items():
+		for document in documents:
+			context = {"doctype": document["doctype"], "docname": document["name"], "document_data": document}
+			yield document["name"], build_messages(config, [], BATCH_PROMPT, context)
+
+	def call(messages):
+		result = chat_completion(base_url, api_key, {
+			"model": model,
+			"messages": messages,
+			"max_tokens": max_tokens,
+			"temperature": 0
+		}, timeout=timeout)
+		return message_content(result)
+
+	histograms = {}
+	batch = {}
+	started = time.monotonic()
+
+	for concurrency in concurrency_levels:
+		histogram = histograms[f"concurrency {concurrency:02d} record"] = LatencyHistogram()
+		totals = {"records": 0, "done": 0, "failed": 0, "retries": 0}
+
+		level_started = time.monotonic()
+		for result in run_batch(items(), call, concurrency, max_retries, retry_delay):
+			totals["records"] += 1
+			totals["retries"] += result["attempts"] - 1
+			if result["status"] == "Done":
+				totals["done"] += 1
+				histogram.record(result["duration"] * 1000)
+			else:
+				totals["failed"] += 1
+				histogram.record_error()
+
+		elapsed = time.monotonic() - level_started
+		totals["elapsed_seconds"] = round(elapsed, 3)
+		totals["records_per_sec"] = round(totals["records"] / elapsed, 3) if elapsed else None
+		batch[str(concurrency)] = totals
+
+	baseline = batch[str(concurrency_levels[0])]["records_per_sec"]
+	for totals in batch.values():
+		totals["speedup"] = round(totals["records_per_sec"] / baseline, 2) if baseline else None
+
+	return build_report(
+		"chatz-batch",
+		{
+			"base_url": base_url,
+			"model": model,
+			"records": records,
+			"concurrency_levels": concurrency_levels,
+			"max_retries": max_retries,
+			"seed": seed
+		},
+		histograms,
+		time.monotonic() - started,
+		extra={"batch": batch}
+	)
@@ -0,0 +1,299 @@
+import json
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+DEFAULT_MODELS = ["fake-small", "fake-large"]
+
+WORDS = (
+	"the quick brown fox jumps over the lazy dog while invoices are reconciled "
+	"and customers receive timely updates about their orders shipments payments "
+	"projects tasks and support tickets across every department"
+).split()
+
+
+class FakeOpenAIServer:
+	"""
+	Local OpenAI-compatible server for benchmarks and tests
+
+	Serves `/models` and `/chat/completions` (streaming and non-streaming)
+	under both `/` and `/v1`, with configurable time to first token,
+	token rate and error rate. A simulated block-level prefix cache reports
+	`usage.prompt_tokens_details.cached_tokens` the way vLLM and llama.cpp do.
+	"""
+
+	# Tokens per prefix cache block
+	CACHE_BLOCK_TOKENS = 16
+
+	def __init__(self, host="127.0.0.1", port=0, ttft=0.2, tokens_per_second=50.0,
+				 response_tokens=120, error_rate=0.0, models=None, seed=None,
+				 prefix_cache_blocks=8192):
+		"""
+		Args:
+			host (str): Interface to bind
+			port (int): Port to bind (0 picks a free port)
+			ttft (float): Seconds before the first streamed token
+			tokens_per_second (float): Streaming rate after the first token (0 = unthrottled)
+			response_tokens (int): Tokens per response unless the request sets max_tokens
+			error_rate (float): Probability (0-1) of answering with a 500 error
+			models (list): Model IDs returned by /models
+			seed (int): Seed for reproducible error injection and responses
+			prefix_cache_blocks (int): Blocks kept in the simulated prefix cache (0 disables it)
+		"""
+		self.ttft = float(ttft)
+		self.tokens_per_second = float(tokens_per_second)
+		self.response_tokens = int(response_tokens)
+		self.error_rate = float(error_rate)
+		self.models = list(models or DEFAULT_MODELS)
+		self.random = random.Random(seed)
+
+		self.lock = threading.Lock()
+		self.stats = {
+			"requests": 0,
+			"errors": 0,
+			"completed_streams": 0,
+			"disconnects": 0,
+			"active_streams": 0,
+			"prompt_tokens": 0,
+			"cached_tokens": 0
+		}
+		self.prefix_cache_blocks = int(prefix_cache_blocks)
+		self.prefix_cache = OrderedDict()
+		# Most recent request payloads, for assertions in tests
+		self.requests = deque(maxlen=1000)
+
+		self.httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+		self.httpd.daemon_threads = True
+		self.thread = None
+
+	@property
+	def base_url(self):
+		"""Base URL to use as a Chatz API endpoint"""
+		host, port = self.httpd.server_address[:2]
+		return f"http://{host}:{port}/v1"
+
+	def start(self):
+		"""Serve in a background thread"""
+		self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+		self.thread.start()
+		return self
+
+	def stop(self):
+		"""Stop serving and release the socket"""
+		self.httpd.shutdown()
+		self.httpd.server_close()
+
+	def serve_forever(self):
+		"""Serve in the current thread until interrupted"""
+		try:
+			self.httpd.serve_forever()
+		except KeyboardInterrupt:
+			pass
+		finally:
+			self.httpd.server_close()
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()
+
+	def bump(self, key, delta=1):
+		with self.lock:
+			self.stats[key] += delta
+
+	def should_fail(self):
+		with self.lock:
+			return self.error_rate > 0 and self.random.random() < self.error_rate
+
+	def generation_time(self, token_count):
+		"""Seconds needed to emit token_count tokens after the first one"""
+		if self.tokens_per_second <= 0 or token_count < 2:
+			return 0.0
+		return (token_count - 1) / self.tokens_per_second
+
+	def lookup_prefix(self, messages):
+		"""
+		Run a prompt through the simulated prefix cache
+
+		The prompt is split into fixed-size token blocks, each identified by the
+		hash of everything up to and including it (as in vLLM's automatic
+		prefix caching). Leading blocks already cached count as cached tokens;
+		all blocks are then cached, evicting the least recently used.
+
+		Args:
+			messages (list): Chat messages of the request
+
+		Returns:
+			tuple: (prompt_tokens, cached_tokens)
+		"""
+		tokens = _prompt_tokens(messages)
+		if self.prefix_cache_blocks <= 0:
+			return len(tokens), 0
+
+		size = self.CACHE_BLOCK_TOKENS
+		keys = []
+		key = None
+		for start in range(0, len(tokens) - len(tokens) % size, size):
+			key = hash((key, tuple(tokens[start:start + size])))
+			keys.append(key)
+
+		with self.lock:
+			cached_blocks = 0
+			for key in keys:
+				if key not in self.prefix_cache:
+					break
+				cached_blocks += 1
+
+			for key in keys:
+				self.prefix_cache[key] = True
+				self.prefix_cache.move_to_end(key)
+			while len(self.prefix_cache) > self.prefix_cache_blocks:
+				self.prefix_cache.popitem(last=False)
+
+			cached_tokens = cached_blocks * size
+			self.stats["prompt_tokens"] += len(tokens)
+			self.stats["cached_tokens"] += cached_tokens
+
+		return len(tokens), cached_tokens
+
+	def make_tokens(self, count):
+		with self.lock:
+			return [self.random.choice(WORDS) + " " for _ in range(count)]
+
+
+def _make_handler(server):
+	class Handler(BaseHTTPRequestHandler):
+		protocol_version = "HTTP/1.1"
+
+		def log_message(self, format, *args):
+			# Keep benchmark output clean
+			pass
+
+		def do_GET(self):
+			if self.path.rstrip("/") in ("/models", "/v1/models"):
+				server.bump("requests")
+				self.send_json(200, {
+					"object": "list",
+					"data": [{"id": model, "object": "model", "owned_by": "chatz-bench"} for model in server.models]
+				})
+			else:
+				self.send_json(404, {"error": {"message": "Not found"}})
+
+		def do_POST(self):
+			if self.path.rstrip("/") not in ("/chat/completions", "/v1/chat/completions"):
+				self.send_json(404, {"error": {"message": "Not found"}})
+				return
+
+			server.bump("requests")
+			length = int(self.headers.get("Content-Length") or 0)
+			try:
+				payload = json.loads(self.rfile.read(length) or b"{}")
+			except json.JSONDecodeError:
+				self.send_json(400, {"error": {"message": "Invalid JSON"}})
+				return
+
+			with server.lock:
+				server.requests.append(payload)
+
+			if server.should_fail():
+				server.bump("errors")
+				self.send_json(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+				return
+
+			model = payload.get("model") or server.models[0]
+			tokens = server.make_tokens(int(payload.get("max_tokens") or server.response_tokens))
+			prompt_tokens, cached_tokens = server.lookup_prefix(payload.get("messages") or [])
+			usage = {
+				"prompt_tokens": prompt_tokens,
+				"completion_tokens": len(tokens),
+				"prompt_tokens_details": {"cached_tokens": cached_tokens}
+			}
+			usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+			if payload.get("stream"):
+				self.stream_tokens(model, tokens, usage)
+			else:
+				time.sleep(server.ttft + server.generation_time(len(tokens)))
+				self.send_json(200, {
+					"id": "chatcmpl-" + uuid.uuid4().hex,
+					"object": "chat.completion",
+					"created": int(time.time()),
+					"model": model,
+					"choices": [{
+						"index": 0,
+						"message": {"role": "assistant", "content": "".join(tokens).strip()},
+						"finish_reason": "stop"
+					}],
+					"usage": usage
+				})
+
+		def stream_tokens(self, model, tokens, usage):
+			completion_id = "chatcmpl-" + uuid.uuid4().hex
+			created = int(time.time())
+			interval = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0
+
+			self.send_response(200)
+			self.send_header("Content-Type", "text/event-stream")
+			self.send_header("Cache-Control", "no-cache")
+			self.send_header("Connection", "close")
+			self.end_headers()
+
+			server.bump("active_streams")
+			try:
+				time.sleep(server.ttft)
+				for index, token in enumerate(tokens):
+					if index and interval:
+						time.sleep(interval)
+					self.write_event({
+						"id": completion_id,
+						"object": "chat.completion.chunk",
+						"created": created,
+						"model": model,
+						"choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]
+					})
+
+				self.write_event({
+					"id": completion_id,
+					"object": "chat.completion.chunk",
+					"created": created,
+					"model": model,
+					"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+					"usage": usage
+				})
+				self.wfile.write(b"data: [DONE]\n\n")
+				self.wfile.flush()
+				server.bump("completed_streams")
+			except (BrokenPipeError, ConnectionResetError):
+				server.bump("disconnects")
+			finally:
+				server.bump("active_streams", -1)
+				self.close_connection = True
+
+		def write_event(self, data):
+			self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+			self.wfile.flush()
+
+		def send_json(self, status, data):
+			body = json.dumps(data).encode()
+			self.send_response(status)
+			self.send_header("Content-Type", "application/json")
+			self.send_header("Content-Length", str(len(body)))
+			self.end_headers()
+			self.wfile.write(body)
+
+	return Handler
+
+
+def _prompt_tokens(messages):
+	"""Whitespace tokens of the prompt, with a role marker per message as in chat templates"""
+	tokens = []
+	for message in messages:
+		tokens.append(f"<|{message.get('role')}|>")
+		tokens.extend(str(message.get("content") or "").split())
+	return tokens
+
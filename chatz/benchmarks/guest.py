@@ -0,0 +1,107 @@
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from chatz.benchmarks.stats import LatencyHistogram, build_report
+
+
+CONFIG_METHOD = "chatz.api.config"
+
+# How an anonymous page view gets the guest config:
+# - uncached: POST get_user_config (not cacheable, as before the public config)
+# - first visit: GET get_public_guest_config with an empty browser cache
+# - revalidated: GET with If-None-Match, as a browser whose copy is older than max-age
+MODES = ("uncached", "first visit", "revalidated")
+
+
+def run_guest_benchmark(site_url, page_loads=500, concurrency=16, timeout=30):
+	"""
+	Measure anonymous page-load throughput of the guest config
+
+	Runs the same number of anonymous page views per mode (MODES), each from
+	a cookie-less session. Point site_url at the reverse proxy to include its
+	cache, or at the Frappe port to measure Frappe alone.
+
+	Args:
+		site_url (str): Base URL of the site (or proxy) under test
+		page_loads (int): Page views per mode
+		concurrency (int): Page views in flight
+		timeout (int): Per-request timeout in seconds
+
+	Returns:
+		dict: chatz-bench report with per-mode throughput under extra.guest
+	"""
+	site_url = site_url.rstrip("/")
+	uncached_url = f"{site_url}/api/method/{CONFIG_METHOD}.get_user_config"
+	public_url = f"{site_url}/api/method/{CONFIG_METHOD}.get_public_guest_config"
+
+	with urllib.request.urlopen(public_url, timeout=timeout) as response:
+		etag = response.headers.get("ETag")
+
+	def page_view(mode):
+		# A new request without cookies each time, like a new anonymous visitor
+		if mode == "uncached":
+			request = urllib.request.Request(uncached_url, data=b"", method="POST")
+		elif mode == "first visit":
+			request = urllib.request.Request(public_url)
+		else:
+			request = urllib.request.Request(public_url, headers={"If-None-Match": etag or ""})
+
+		try:
+			with urllib.request.urlopen(request, timeout=timeout) as response:
+				response.read()
+				return response.status
+		except urllib.error.HTTPError as e:
+			# urllib reports a 304 Not Modified as an error
+			if e.code == 304:
+				return e.code
+			raise
+
+	histograms = {}
+	guest = {}
+	started = time.monotonic()
+
+	for mode in MODES:
+		histogram = histograms[f"{mode} page view"] = LatencyHistogram()
+		statuses = {}
+
+		def timed_view(_):
+			view_started = time.perf_counter()
+			try:
+				status = page_view(mode)
+			except Exception:
+				histogram.record_error()
+				return None
+			histogram.record((time.perf_counter() - view_started) * 1000)
+			return status
+
+		mode_started = time.monotonic()
+		with ThreadPoolExecutor(max_workers=concurrency) as executor:
+			for status in executor.map(timed_view, range(page_loads)):
+				if status:
+					statuses[str(status)] = statuses.get(str(status), 0) + 1
+		elapsed = time.monotonic() - mode_started
+
+		guest[mode] = {
+			"page_loads": page_loads,
+			"statuses": statuses,
+			"elapsed_seconds": round(elapsed, 3),
+			"page_loads_per_sec": round(page_loads / elapsed, 3) if elapsed else None
+		}
+
+	baseline = guest["uncached"]["page_loads_per_sec"]
+	for totals in guest.values():
+		totals["speedup"] = round(totals["page_loads_per_sec"] / baseline, 2) if baseline else None
+
+	return build_report(
+		"chatz-guest",
+		{
+			"site_url": site_url,
+			"page_loads": page_loads,
+			"concurrency": concurrency
+		},
+		histograms,
+		time.monotonic() - started,
+		extra={"guest": guest, "etag": etag}
+	)
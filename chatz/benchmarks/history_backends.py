@@ -0,0 +1,130 @@
+import json
+import random
+import time
+
+import frappe
+
+from chatz.benchmarks.seed import CONTEXT_DOCTYPES, make_message
+from chatz.benchmarks.stats import LatencyHistogram, build_report
+from chatz.utils.history_backends import BACKENDS, CONVERSATION_DOCTYPE, HISTORY_DOCTYPE, LOG_DOCTYPE
+
+
+BENCH_CONVERSATION_PREFIX = "bench_history_"
+
+
+def run_history_benchmark(conversations=100, messages_per_conversation=10, window=10,
+						  user="Administrator", seed=42):
+	"""
+	Compare write and read throughput of the history storage backends
+
+	Writes the same synthetic conversations through each backend (as
+	save_message does, one commit per message), then reads every
+	conversation's latest `window` messages and the conversation list.
+	Benchmark rows are removed afterwards.
+
+	Args:
+		conversations (int): Conversations written per backend
+		messages_per_conversation (int): Messages per conversation (alternating user/assistant)
+		window (int): Messages read per conversation (the prompt history window)
+		user (str): User owning the benchmark conversations
+		seed (int): Random seed
+
+	Returns:
+		dict: chatz-bench report with per-backend throughput under extra.backends
+	"""
+	rng = random.Random(seed)
+	plan = []
+	for conv_index in range(conversations):
+		context = json.dumps({
+			"doctype": rng.choice(CONTEXT_DOCTYPES),
+			"docname": f"BENCH-{rng.randint(1, 99999):05d}",
+			"list_filter": "",
+			"page_url": "/app",
+			"page_title": "Bench"
+		})
+		messages = []
+		for msg_index in range(messages_per_conversation):
+			message_type = "user" if msg_index % 2 == 0 else "assistant"
+			messages.append({
+				"message_type": message_type,
+				"message_content": make_message(rng, message_type),
+				"document_context": context,
+				"client_message_id": f"bench_{conv_index}_{msg_index}_{rng.random()}"
+			})
+		plan.append((f"{BENCH_CONVERSATION_PREFIX}{conv_index:05d}", messages))
+
+	histograms = {}
+	backends = {}
+	started = time.monotonic()
+
+	for name, backend in BACKENDS.items():
+		clear_history_benchmark(user)
+		writes = histograms[f"{name} write"] = LatencyHistogram()
+		reads = histograms[f"{name} read {window}"] = LatencyHistogram()
+		lists = histograms[f"{name} list"] = LatencyHistogram()
+
+		write_started = time.monotonic()
+		for conversation_id, messages in plan:
+			for message in messages:
+				began = time.perf_counter()
+				if not backend.find_message(user, conversation_id, message["client_message_id"]):
+					backend.append(user, conversation_id, message)
+				frappe.db.commit()
+				writes.record((time.perf_counter() - began) * 1000)
+		write_elapsed = time.monotonic() - write_started
+
+		read_started = time.monotonic()
+		for conversation_id, _messages in plan:
+			began = time.perf_counter()
+			backend.get_messages(user, conversation_id, window)
+			reads.record((time.perf_counter() - began) * 1000)
+		read_elapsed = time.monotonic() - read_started
+
+		for _ in range(20):
+			began = time.perf_counter()
+			backend.list_conversations(user, 20)
+			lists.record((time.perf_counter() - began) * 1000)
+
+		total = conversations * messages_per_conversation
+		backends[name] = {
+			"messages_written": total,
+			"writes_per_sec": round(total / write_elapsed, 1) if write_elapsed else None,
+			"conversation_reads_per_sec": round(conversations / read_elapsed, 1) if read_elapsed else None,
+			"rows": storage_rows(user)
+		}
+
+	clear_history_benchmark(user)
+
+	return build_report(
+		"chatz-history-backends",
+		{
+			"conversations": conversations,
+			"messages_per_conversation": messages_per_conversation,
+			"window": window,
+			"seed": seed
+		},
+		histograms,
+		time.monotonic() - started,
+		extra={"backends": backends}
+	)
+
+
+def storage_rows(user):
+	"""Rows written by the benchmark, per table"""
+	return {
+		HISTORY_DOCTYPE: frappe.db.count(HISTORY_DOCTYPE, {
+			"user": user, "conversation_id": ["like", f"{BENCH_CONVERSATION_PREFIX}%"]
+		}),
+		CONVERSATION_DOCTYPE: frappe.db.count(CONVERSATION_DOCTYPE, {
+			"user": user, "conversation_id": ["like", f"{BENCH_CONVERSATION_PREFIX}%"]
+		}),
+		LOG_DOCTYPE: frappe.db.count(LOG_DOCTYPE, {
+			"user": user, "conversation_id": ["like", f"{BENCH_CONVERSATION_PREFIX}%"]
+		})
+	}
+
+
+def clear_history_benchmark(user):
+	for doctype in (HISTORY_DOCTYPE, CONVERSATION_DOCTYPE, LOG_DOCTYPE):
+		frappe.db.delete(doctype, {"user": user, "conversation_id": ["like", f"{BENCH_CONVERSATION_PREFIX}%"]})
+	frappe.db.commit()
@@ -0,0 +1,180 @@
+import json
+import random
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+from chatz.benchmarks.stats import LatencyHistogram, build_report
+from chatz.utils.prompt_builder import (
+	LAYOUT_PREFIX_CACHED,
+	LAYOUT_STANDARD,
+	count_tokens,
+	html_to_prompt_text,
+	build_messages
+)
+
+
+DEFAULT_SYSTEM_PROMPT = (
+	"<h3>Role</h3><p>You are the ERP assistant for <strong>Acme Pty Ltd</strong>. "
+	"Answer questions about the document the user has open, explain fields and "
+	"suggest next steps.</p><h3>Rules</h3><ul><li>Be concise.</li>"
+	"<li>Quote field values exactly as they appear in the document data.</li>"
+	"<li>Never invent document names, totals or dates.</li>"
+	"<li>Use the user's language and Australian spelling.</li></ul>"
+	"<p>When a question cannot be answered from the context, say so and point "
+	"the user to the relevant Desk page instead.</p>"
+)
+
+QUESTIONS = [
+	"What is the status of this document?",
+	"Summarise the items for me.",
+	"Who is the customer and what are their payment terms?",
+	"Is anything overdue here?",
+	"Which fields are still empty?",
+	"Draft a short follow-up email about this.",
+	"What should I do next?",
+	"Explain the taxes on this document."
+]
+
+# Previous messages sent with each prompt, as in the widget
+HISTORY_WINDOW = 10
+
+
+def make_document(rng, index):
+	"""Synthetic document data of a realistic size"""
+	return {
+		"doctype": "Sales Invoice",
+		"name": f"ACC-SINV-2026-{index:05d}",
+		"customer": f"Customer {rng.randint(1, 500)}",
+		"posting_date": f"2026-0{rng.randint(1, 9)}-{rng.randint(10, 28)}",
+		"status": rng.choice(["Draft", "Unpaid", "Overdue", "Paid"]),
+		"grand_total": round(rng.uniform(100, 50000), 2),
+		"items": [
+			{"item_code": f"ITEM-{rng.randint(1, 999):03d}", "qty": rng.randint(1, 20), "rate": round(rng.uniform(5, 900), 2)}
+			for _ in range(rng.randint(2, 6))
+		]
+	}
+
+
+def post_completion(url, api_key, payload, timeout):
+	request = urllib.request.Request(
+		url,
+		data=json.dumps(payload).encode(),
+		headers={"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"},
+		method="POST"
+	)
+	with urllib.request.urlopen(request, timeout=timeout) as response:
+		return json.load(response)
+
+
+def run_prefix_cache_benchmark(base_url, model, conversations=20, turns=6, layouts=None,
+							   api_key="", system_prompt=DEFAULT_SYSTEM_PROMPT,
+							   max_tokens=60, seed=42, timeout=120):
+	"""
+	Compare prompt layouts by the prefix-cache hit rate a backend reports
+
+	Replays the same synthetic conversations (interleaved, as concurrent users
+	would be) once per layout and reads `usage.prompt_tokens_details.cached_tokens`
+	from each response, which vLLM, llama.cpp and the fake server report.
+
+	Args:
+		base_url (str): OpenAI-compatible base URL (e.g. http://127.0.0.1:8000/v1)
+		model (str): Model to request
+		conversations (int): Concurrent conversations
+		turns (int): User turns per conversation
+		layouts (list): Layouts to compare (defaults to Standard and Prefix Cached)
+		api_key (str): Bearer token
+		system_prompt (str): System prompt HTML, as stored by the Text Editor
+		max_tokens (int): Response length
+		seed (int): Random seed
+		timeout (int): Request timeout in seconds
+
+	Returns:
+		dict: chatz-bench report with per-layout hit rates under extra.prefix_cache
+	"""
+	layouts = layouts or [LAYOUT_STANDARD, LAYOUT_PREFIX_CACHED]
+	url = base_url.rstrip("/") + "/chat/completions"
+	system_prompt_text = html_to_prompt_text(system_prompt)
+
+	histograms = {}
+	prefix_cache = {}
+	started = time.monotonic()
+
+	for layout in layouts:
+		rng = random.Random(seed)
+		histogram = histograms[f"{layout} request"] = LatencyHistogram()
+		totals = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0}
+
+		sessions = []
+		for index in range(conversations):
+			document = make_document(rng, index)
+			sessions.append({
+				"config": {
+					"prompt_layout": layout,
+					"system_prompt": system_prompt,
+					"system_prompt_text": system_prompt_text,
+					"user": f"chatz-bench-{index:04d}@example.com"
+				},
+				"context": {
+					"doctype": document["doctype"],
+					"docname": document["name"],
+					"document_data": document
+				},
+				"clock": datetime(2026, 3, 2, 9, 0) + timedelta(minutes=rng.randint(0, 45)),
+				"history": []
+			})
+
+		for _turn in range(turns):
+			for session in sessions:
+				session["clock"] += timedelta(seconds=rng.randint(20, 240))
+				question = rng.choice(QUESTIONS)
+				messages = build_messages(
+					session["config"],
+					session["history"][-HISTORY_WINDOW:],
+					question,
+					session["context"],
+					session["clock"]
+				)
+
+				request_started = time.monotonic()
+				try:
+					result = post_completion(url, api_key, {
+						"model": model,
+						"messages": messages,
+						"max_tokens": max_tokens,
+						"temperature": 0
+					}, timeout)
+				except Exception:
+					histogram.record_error()
+					continue
+				histogram.record((time.monotonic() - request_started) * 1000)
+
+				usage = result.get("usage") or {}
+				details = usage.get("prompt_tokens_details") or {}
+				totals["requests"] += 1
+				totals["prompt_tokens"] += usage.get("prompt_tokens") or 0
+				totals["cached_tokens"] += details.get("cached_tokens") or 0
+
+				answer = ((result.get("choices") or [{}])[0].get("message") or {}).get("content") or ""
+				session["history"].extend([
+					{"message_type": "user", "message_content": question},
+					{"message_type": "assistant", "message_content": answer}
+				])
+
+		totals["hit_rate"] = round(totals["cached_tokens"] / totals["prompt_tokens"], 4) if totals["prompt_tokens"] else 0.0
+		prefix_cache[layout] = totals
+
+	return build_report(
+		"chatz-prefix-cache",
+		{
+			"base_url": base_url,
+			"model": model,
+			"conversations": conversations,
+			"turns": turns,
+			"system_prompt_tokens": count_tokens(system_prompt_text),
+			"seed": seed
+		},
+		histograms,
+		time.monotonic() - started,
+		extra={"prefix_cache": prefix_cache}
+	)
@@ -0,0 +1,199 @@
+import statistics
+import time
+
+from chatz.benchmarks.stats import LatencyHistogram, build_report, percentile
+from chatz.utils.batch import run_batch
+from chatz.utils.openai_client import ChatCompletionStream, delta_content
+from chatz.utils.prompt_builder import LAYOUT_PREFIX_CACHED, build_messages, count_tokens, html_to_prompt_text
+
+
+def make_target(name, base_url, model, api_key="", system_prompt="", prompt_layout=LAYOUT_PREFIX_CACHED):
+	"""A replay target; the config holds what build_messages needs"""
+	return {
+		"name": name,
+		"base_url": base_url,
+		"api_key": api_key,
+		"model": model,
+		"config": {
+			"prompt_layout": prompt_layout,
+			"system_prompt": system_prompt,
+			"system_prompt_text": html_to_prompt_text(system_prompt)
+		}
+	}
+
+
+def run_replay(cases, targets, concurrency=4, max_tokens=256, seed=42, timeout=120):
+	"""
+	Replay the same turns against each target and compare them
+
+	Every target gets identical prompts (built from each case with the
+	target's own system prompt and layout, at the case's original time), in
+	the same order, `concurrency` at a time. Requests are streamed with
+	temperature 0 and the run's seed, and are not retried, so errors count.
+
+	Args:
+		cases (list): Replay cases (chatz.benchmarks.replay_cases.load_replay_cases)
+		targets (list): Targets (resolve_targets or make_target)
+		concurrency (int): Requests in flight per target
+		max_tokens (int): Response length limit
+		seed (int): Seed sent with each request (and recorded in the report)
+		timeout (int): Request timeout in seconds
+
+	Returns:
+		dict: chatz-bench report with TTFT and total latency histograms per
+			target and per-target metrics under extra.replay
+	"""
+	histograms = {}
+	replay = {}
+	started = time.monotonic()
+
+	for target in targets:
+		ttft = histograms[f"{target['name']} ttft"] = LatencyHistogram()
+		total = histograms[f"{target['name']} total"] = LatencyHistogram()
+		samples = {"tokens_per_sec": [], "completion_tokens": [], "response_chars": []}
+		errors = {}
+
+		def items():
+			for case in cases:
+				messages = build_messages(
+					dict(target["config"], user=case.get("user") or ""),
+					case["history"],
+					case["question"],
+					case.get("context"),
+					case.get("created_at")
+				)
+				yield case["case"], messages
+
+		def call(messages, target=target):
+			return stream_completion(target, messages, max_tokens, seed, timeout)
+
+		target_started = time.monotonic()
+		for result in run_batch(items(), call, concurrency, max_retries=0):
+			if result["status"] != "Done":
+				ttft.record_error()
+				total.record_error()
+				error = (result["error"] or "Error").split(" - ")[0][:80]
+				errors[error] = errors.get(error, 0) + 1
+				continue
+
+			output = result["output"]
+			ttft.record(output["ttft_ms"])
+			total.record(output["total_ms"])
+			samples["completion_tokens"].append(output["completion_tokens"])
+			samples["response_chars"].append(output["response_chars"])
+			if output["tokens_per_sec"] is not None:
+				samples["tokens_per_sec"].append(output["tokens_per_sec"])
+
+		replay[target["name"]] = summarise_target(
+			target, len(cases), samples, errors, time.monotonic() - target_started
+		)
+
+	return build_report(
+		"chatz-replay",
+		{
+			"cases": len(cases),
+			"targets": [target["name"] for target in targets],
+			"concurrency": concurrency,
+			"max_tokens": max_tokens,
+			"seed": seed
+		},
+		histograms,
+		time.monotonic() - started,
+		extra={"replay": replay, "comparison": compare_targets(replay, histograms)}
+	)
+
+
+def stream_completion(target, messages, max_tokens, seed, timeout):
+	"""
+	One streamed request, timed
+
+	Returns:
+		dict: ttft_ms, total_ms, completion_tokens (as reported by the API,
+			else counted), tokens_per_sec (after the first token), response_chars
+	"""
+	payload = {
+		"model": target["model"],
+		"messages": messages,
+		"max_tokens": max_tokens,
+		"temperature": 0,
+		"seed": seed,
+		"stream_options": {"include_usage": True}
+	}
+
+	began = time.perf_counter()
+	first_token = None
+	parts = []
+	usage = None
+
+	with ChatCompletionStream(target["base_url"], target["api_key"], payload, timeout=timeout) as stream:
+		for event in stream:
+			content = delta_content(event)
+			if content:
+				if first_token is None:
+					first_token = time.perf_counter()
+				parts.append(content)
+			if event.get("usage"):
+				usage = event["usage"]
+
+	finished = time.perf_counter()
+	response = "".join(parts)
+	completion_tokens = (usage or {}).get("completion_tokens") or count_tokens(response)
+	first_token = first_token or finished
+	generating = finished - first_token
+
+	return {
+		"ttft_ms": (first_token - began) * 1000,
+		"total_ms": (finished - began) * 1000,
+		"completion_tokens": completion_tokens,
+		"tokens_per_sec": round(completion_tokens / generating, 2) if generating > 0 and completion_tokens > 1 else None,
+		"response_chars": len(response)
+	}
+
+
+def summarise_target(target, requests, samples, errors, elapsed):
+	failed = sum(errors.values())
+	tokens_per_sec = sorted(samples["tokens_per_sec"])
+	return {
+		"base_url": target["base_url"],
+		"model": target["model"],
+		"requests": requests,
+		"errors": failed,
+		"error_rate": round(failed / requests, 4) if requests else 0.0,
+		"error_types": errors,
+		"tokens_per_sec_p50": percentile(tokens_per_sec, 50),
+		"tokens_per_sec_mean": round(statistics.mean(tokens_per_sec), 2) if tokens_per_sec else None,
+		"completion_tokens_mean": round(statistics.mean(samples["completion_tokens"]), 1) if samples["completion_tokens"] else None,
+		"response_chars_mean": round(statistics.mean(samples["response_chars"]), 1) if samples["response_chars"] else None,
+		"requests_per_sec": round(requests / elapsed, 3) if elapsed else None
+	}
+
+
+def compare_targets(replay, histograms):
+	"""
+	Side-by-side rows per target, with each metric relative to the first target
+
+	Returns:
+		list: {target, ttft_p50_ms, ttft_p95_ms, total_p50_ms, total_p95_ms,
+			tokens_per_sec_p50, error_rate, and *_vs_first ratios}
+	"""
+	rows = []
+	for name, metrics in replay.items():
+		ttft = histograms[f"{name} ttft"].summary()
+		total = histograms[f"{name} total"].summary()
+		rows.append({
+			"target": name,
+			"ttft_p50_ms": ttft["p50_ms"],
+			"ttft_p95_ms": ttft["p95_ms"],
+			"total_p50_ms": total["p50_ms"],
+			"total_p95_ms": total["p95_ms"],
+			"tokens_per_sec_p50": metrics["tokens_per_sec_p50"],
+			"completion_tokens_mean": metrics["completion_tokens_mean"],
+			"error_rate": metrics["error_rate"]
+		})
+
+	if rows:
+		first = rows[0]
+		for row in rows:
+			for metric in ("ttft_p50_ms", "total_p50_ms", "tokens_per_sec_p50"):
+				row[f"{metric}_vs_first"] = round(row[metric] / first[metric], 3) if row[metric] and first[metric] else None
+	return rows
@@ -0,0 +1,100 @@
+import random
+
+import frappe
+
+from chatz.benchmarks.replay import make_target
+from chatz.utils.history_backends import get_history_backend
+from chatz.utils.prompt_builder import last_sent_document, message_context, restore_document
+
+
+# Previous messages sent with each replayed turn, as in the widget
+HISTORY_WINDOW = 10
+
+
+def load_replay_cases(conversations=50, seed=42, api=None, from_date=None, to_date=None):
+	"""
+	Sample real turns from the chat history for replaying
+
+	Picks `conversations` conversations at random (seeded, from a stable
+	ordering, so the same history gives the same sample), and from each one
+	user turn together with the HISTORY_WINDOW messages before it and the
+	document context it was sent with.
+
+	Args:
+		conversations (int): Conversations to sample
+		seed (int): Random seed
+		api (str): Only conversations sent through this Chatz API
+		from_date (str): Only conversations with messages on or after this date
+		to_date (str): Only conversations with messages on or before this date
+
+	Returns:
+		list: Cases {case, user, history, question, context, created_at}
+	"""
+	backend = get_history_backend()
+	candidates = backend.conversations_with_turns(api=api, from_date=from_date, to_date=to_date)
+
+	rng = random.Random(seed)
+	picked = rng.sample(candidates, min(conversations, len(candidates)))
+
+	cases = []
+	for index, conv in enumerate(picked):
+		messages = backend.all_messages(conv.user, conv.conversation_id)
+		turns = [position for position, msg in enumerate(messages) if msg.message_type == "user"]
+		if not turns:
+			continue
+
+		position = rng.choice(turns)
+		turn = messages[position]
+		context = message_context(turn) or None
+		if context and "document_changes" in context:
+			# Saved as changes to a version sent earlier: rebuild the document
+			previous = last_sent_document(messages[:position], context.get("doctype"), context.get("docname"))
+			document = restore_document(context, previous)
+			context = {field: value for field, value in context.items() if field not in ("document_changes", "document_version")}
+			if document is not None:
+				context["document_data"] = document
+
+		cases.append({
+			"case": f"{index:04d}",
+			"user": conv.user,
+			"history": [
+				{"message_type": msg.message_type, "message_content": msg.message_content}
+				for msg in messages[max(0, position - HISTORY_WINDOW):position]
+			],
+			"question": turn.message_content,
+			"context": context,
+			"created_at": turn.created_at
+		})
+
+	return cases
+
+
+def resolve_targets(specs):
+	"""
+	Targets to replay against, from Chatz API names or URLs
+
+	Args:
+		specs (list): "<Chatz API>" (its default model), "<Chatz API>@<model>",
+			or "<base URL>@<model>" for an endpoint without a Chatz API
+			(a local server or chatz-fake-openai)
+
+	Returns:
+		list: Targets {name, base_url, api_key, model, config}
+	"""
+	targets = []
+	for spec in specs:
+		source, _, model = spec.rpartition("@") if "@" in spec else (spec, "", "")
+		if source.startswith(("http://", "https://")):
+			targets.append(make_target(spec, source, model))
+			continue
+
+		api_config = frappe.get_doc("Chatz API", source)
+		targets.append(make_target(
+			spec,
+			api_config.api_endpoint,
+			model or api_config.model_name,
+			api_key=api_config.api_key,
+			system_prompt=api_config.system_prompt or "",
+			prompt_layout=api_config.prompt_layout
+		))
+	return targets
@@ -0,0 +1,227 @@
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from chatz.benchmarks.seed import DEFAULT_PASSWORD, bench_user_email
+from chatz.benchmarks.stats import LatencyHistogram, build_report
+
+
+HISTORY_METHOD = "chatz.chatz.doctype.chatz_history.chatz_history"
+CONFIG_METHOD = "chatz.api.config"
+
+
+class OperationFailed(Exception):
+	"""Raised when a benchmarked call returns an error payload"""
+
+
+class SimulatedUser:
+	"""One logged-in Desk user driving the Chatz endpoints over HTTP"""
+
+	def __init__(self, site_url, email, password, histograms, rng, timeout=60):
+		self.site_url = site_url.rstrip("/")
+		self.email = email
+		self.password = password
+		self.histograms = histograms
+		self.rng = rng
+		self.timeout = timeout
+		self.session = requests.Session()
+
+	def timed(self, operation, fn, *args, **kwargs):
+		"""Run fn and record its latency (or failure) under operation"""
+		histogram = self.histograms.setdefault(operation, LatencyHistogram())
+		start = time.perf_counter()
+		try:
+			result = fn(*args, **kwargs)
+		except Exception:
+			histogram.record_error()
+			return None
+		histogram.record((time.perf_counter() - start) * 1000)
+		return result
+
+	def call(self, method, http_method="GET", **params):
+		url = f"{self.site_url}/api/method/{method}"
+		if http_method == "GET":
+			response = self.session.get(url, params=params, timeout=self.timeout)
+		else:
+			response = self.session.post(url, data=params, timeout=self.timeout)
+
+		if response.status_code != 200:
+			raise OperationFailed(f"{method}: HTTP {response.status_code}")
+
+		message = response.json().get("message")
+		if isinstance(message, dict) and message.get("status") == "error":
+			raise OperationFailed(f"{method}: {message.get('message')}")
+		return message
+
+	def login(self):
+		response = self.session.post(
+			f"{self.site_url}/api/method/login",
+			data={"usr": self.email, "pwd": self.password},
+			timeout=self.timeout
+		)
+		if response.status_code != 200:
+			raise OperationFailed(f"Login failed for {self.email}: HTTP {response.status_code}")
+
+	def run_turn(self):
+		"""Simulate one chat turn the way the widget performs it"""
+		config = self.timed("get_user_config", self.call, f"{CONFIG_METHOD}.get_user_config")
+		if not config:
+			return
+
+		listing = self.timed(
+			"list_conversations", self.call, f"{HISTORY_METHOD}.list_conversations",
+			limit=20
+		)
+		conversations = (listing or {}).get("conversations") or []
+
+		if conversations and self.rng.random() < 0.8:
+			conversation_id = self.rng.choice(conversations)["conversation_id"]
+		else:
+			conversation_id = f"bench_live_{int(time.time() * 1000)}_{self.rng.randint(0, 10 ** 6)}"
+
+		history = self.timed(
+			"get_conversation_history", self.call, f"{HISTORY_METHOD}.get_conversation_history",
+			conversation_id=conversation_id, limit=10
+		)
+		messages = (history or {}).get("messages") or []
+
+		prompt = "Benchmark question %d: summarise the current document" % self.rng.randint(1, 10 ** 6)
+		context = json.dumps({"doctype": "", "docname": "", "list_filter": "", "page_url": "/app", "page_title": "Bench"})
+
+		self.timed(
+			"save_message", self.call, f"{HISTORY_METHOD}.save_message", "POST",
+			user=self.email, conversation_id=conversation_id, message_type="user",
+			message_content=prompt, document_context=context, api_used=config.get("api_config_name")
+		)
+
+		response_text = self.stream(config, messages, prompt)
+		if response_text:
+			self.timed(
+				"save_message", self.call, f"{HISTORY_METHOD}.save_message", "POST",
+				user=self.email, conversation_id=conversation_id, message_type="assistant",
+				message_content=response_text, document_context=context,
+				api_used=config.get("api_config_name")
+			)
+
+	def stream(self, config, history, prompt):
+		"""Stream a completion from the configured endpoint, recording TTFT and total time"""
+		ttft_histogram = self.histograms.setdefault("stream_ttft", LatencyHistogram())
+		total_histogram = self.histograms.setdefault("stream_total", LatencyHistogram())
+
+		messages = [{"role": "system", "content": config.get("system_prompt") or "You are a helpful assistant."}]
+		for msg in history:
+			messages.append({
+				"role": "user" if msg.get("message_type") == "user" else "assistant",
+				"content": msg.get("message_content") or ""
+			})
+		messages.append({"role": "user", "content": prompt})
+
+		url = config["api_endpoint"].rstrip("/") + "/chat/completions"
+		start = time.perf_counter()
+		first_token_at = None
+		chunks = []
+
+		try:
+			with requests.post(
+				url,
+				json={"model": config.get("model_name"), "messages": messages, "stream": True},
+				headers={"Authorization": f"Bearer {config.get('api_key')}"},
+				stream=True,
+				timeout=self.timeout
+			) as response:
+				if response.status_code != 200:
+					raise OperationFailed(f"Stream: HTTP {response.status_code}")
+
+				for line in response.iter_lines():
+					if not line or not line.startswith(b"data: "):
+						continue
+					data = line[6:]
+					if data == b"[DONE]":
+						break
+					delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+					if delta:
+						if first_token_at is None:
+							first_token_at = time.perf_counter()
+						chunks.append(delta)
+		except Exception:
+			ttft_histogram.record_error()
+			total_histogram.record_error()
+			return None
+
+		end = time.perf_counter()
+		if first_token_at is not None:
+			ttft_histogram.record((first_token_at - start) * 1000)
+		total_histogram.record((end - start) * 1000)
+		return "".join(chunks)
+
+
+def run_benchmark(site_url, users=20, turns=5, concurrency=None, password=DEFAULT_PASSWORD,
+				  think_time=0.0, seed=42, timeout=60):
+	"""
+	Drive simulated users through the Chatz endpoints and streaming
+
+	Users are the bench users created by chatz.benchmarks.seed.seed_data.
+
+	Args:
+		site_url (str): Base URL of the site under test
+		users (int): Number of simulated users
+		turns (int): Chat turns per user
+		concurrency (int): Users running at once (defaults to users)
+		password (str): Password of the bench users
+		think_time (float): Seconds each user pauses between turns
+		seed (int): Random seed for reproducible conversation choice
+		timeout (int): Per-request timeout in seconds
+
+	Returns:
+		dict: Report in the chatz-bench format
+	"""
+	concurrency = concurrency or users
+	histograms = {}
+	login_histogram = LatencyHistogram()
+
+	def simulate(index):
+		user = SimulatedUser(
+			site_url, bench_user_email(index), password, histograms,
+			random.Random(seed + index), timeout=timeout
+		)
+		start = time.perf_counter()
+		try:
+			user.login()
+		except Exception:
+			login_histogram.record_error()
+			return
+		login_histogram.record((time.perf_counter() - start) * 1000)
+
+		for _ in range(turns):
+			user.run_turn()
+			if think_time:
+				time.sleep(think_time)
+
+	# Pre-create histograms so worker threads never race on dict insertion
+	for operation in ("get_user_config", "list_conversations", "get_conversation_history",
+					  "save_message", "stream_ttft", "stream_total"):
+		histograms[operation] = LatencyHistogram()
+
+	start = time.perf_counter()
+	with ThreadPoolExecutor(max_workers=concurrency) as executor:
+		list(executor.map(simulate, range(users)))
+	elapsed = time.perf_counter() - start
+
+	report = build_report(
+		"chatz-endpoints",
+		{
+			"site_url": site_url,
+			"users": users,
+			"turns": turns,
+			"concurrency": concurrency,
+			"think_time": think_time,
+			"seed": seed
+		},
+		histograms,
+		elapsed,
+		extra={"login": login_histogram.summary()}
+	)
+	return report
@@ -0,0 +1,208 @@
+import json
+import random
+from datetime import timedelta
+
+import frappe
+from frappe.utils import now_datetime
+from frappe.utils.password import update_password
+
+
+BENCH_API_NAME = "Chatz Bench"
+BENCH_USER_PREFIX = "chatz-bench-"
+BENCH_USER_DOMAIN = "example.com"
+BENCH_CONVERSATION_PREFIX = "bench_"
+DEFAULT_PASSWORD = "chatz-bench-password"
+
+CONTEXT_DOCTYPES = ["Sales Invoice", "Customer", "Item", "Project", "Task", "Issue", "ToDo"]
+
+USER_PROMPTS = [
+	"Summarize this document for me",
+	"What is the outstanding amount on this invoice?",
+	"Draft a polite follow-up email to the customer",
+	"Which tasks are overdue in this project?",
+	"hi",
+	"Explain the difference between a quotation and a sales order",
+	"List the items with low stock and suggest reorder quantities",
+	"thanks!"
+]
+
+
+def bench_user_email(index):
+	return f"{BENCH_USER_PREFIX}{index:04d}@{BENCH_USER_DOMAIN}"
+
+
+def seed_data(users=50, conversations_per_user=20, messages_per_conversation=8,
+			  endpoint="http://127.0.0.1:8089/v1", model="fake-large", roles=None,
+			  password=DEFAULT_PASSWORD, days=90, seed=42):
+	"""
+	Seed synthetic Chatz data at realistic scale
+
+	Creates a "Chatz Bench" API pointing at the fake OpenAI server, bench users
+	with User Chatz Settings, and bulk-inserted Chatz History rows.
+
+	Args:
+		users (int): Number of bench users
+		conversations_per_user (int): Conversations per user
+		messages_per_conversation (int): Messages per conversation (alternating user/assistant)
+		endpoint (str): API endpoint for the bench Chatz API
+		model (str): Default model for the bench Chatz API
+		roles (list): Roles given to bench users
+		password (str): Password set for every bench user
+		days (int): Spread message timestamps over this many past days
+		seed (int): Random seed for reproducible data
+
+	Returns:
+		dict: Counts of created records
+	"""
+	rng = random.Random(seed)
+	roles = roles or ["Desk User"]
+
+	api_name = ensure_bench_api(endpoint, model)
+
+	emails = []
+	for index in range(users):
+		email = bench_user_email(index)
+		ensure_bench_user(email, roles, password)
+		ensure_user_settings(email, api_name)
+		emails.append(email)
+
+	frappe.db.commit()
+
+	fields = [
+		"name", "owner", "creation", "modified", "modified_by",
+		"user", "conversation_id", "message_type", "message_content",
+		"document_context", "api_used", "created_at"
+	]
+	now = now_datetime()
+	values = []
+	message_count = 0
+
+	for email in emails:
+		for conv_index in range(conversations_per_user):
+			conversation_id = f"{BENCH_CONVERSATION_PREFIX}{email.split('@')[0]}_{conv_index:04d}"
+			started = now - timedelta(seconds=rng.randint(0, days * 86400))
+			context = json.dumps({
+				"doctype": rng.choice(CONTEXT_DOCTYPES),
+				"docname": f"BENCH-{rng.randint(1, 99999):05d}",
+				"list_filter": "",
+				"page_url": "/app",
+				"page_title": "Bench"
+			})
+
+			for msg_index in range(messages_per_conversation):
+				timestamp = started + timedelta(seconds=msg_index * rng.randint(5, 90))
+				message_type = "user" if msg_index % 2 == 0 else "assistant"
+				values.append((
+					frappe.generate_hash(length=10), email, timestamp, timestamp, email,
+					email, conversation_id, message_type,
+					make_message(rng, message_type), context, api_name, timestamp
+				))
+				message_count += 1
+
+			if len(values) >= 5000:
+				frappe.db.bulk_insert("Chatz History", fields, values)
+				frappe.db.commit()
+				values = []
+
+	if values:
+		frappe.db.bulk_insert("Chatz History", fields, values)
+		frappe.db.commit()
+
+	return {
+		"api": api_name,
+		"users": len(emails),
+		"conversations": len(emails) * conversations_per_user,
+		"messages": message_count
+	}
+
+
+def make_message(rng, message_type):
+	if message_type == "user":
+		return rng.choice(USER_PROMPTS)
+
+	# Assistant answers vary from one line to several paragraphs
+	paragraphs = []
+	for _ in range(rng.randint(1, 5)):
+		sentence_count = rng.randint(2, 8)
+		paragraphs.append(" ".join(
+			"This is a synthetic assistant sentence number %d." % rng.randint(1, 1000)
+			for _ in range(sentence_count)
+		))
+	return "\n\n".join(paragraphs)
+
+
+def ensure_bench_api(endpoint, model):
+	"""Create or update the Chatz API used by bench users"""
+	if frappe.db.exists("Chatz API", BENCH_API_NAME):
+		doc = frappe.get_doc("Chatz API", BENCH_API_NAME)
+	else:
+		doc = frappe.new_doc("Chatz API")
+		doc.api_name = BENCH_API_NAME
+
+	doc.api_endpoint = endpoint
+	doc.api_key = "chatz-bench-key"
+	doc.model_name = model
+	doc.enabled = 1
+	doc.system_prompt = "You are a helpful assistant used for load testing."
+	doc.save(ignore_permissions=True)
+	return doc.name
+
+
+def ensure_bench_user(email, roles, password):
+	if not frappe.db.exists("User", email):
+		user = frappe.new_doc("User")
+		user.email = email
+		user.first_name = email.split("@")[0]
+		user.send_welcome_email = 0
+		user.user_type = "System User"
+		user.insert(ignore_permissions=True)
+		user.add_roles(*[role for role in roles if frappe.db.exists("Role", role)])
+
+	update_password(email, password)
+
+
+def ensure_user_settings(email, api_name):
+	if frappe.db.exists("User Chatz Settings", {"assignment_type": "User", "user": email}):
+		return
+
+	settings = frappe.new_doc("User Chatz Settings")
+	settings.assignment_type = "User"
+	settings.user = email
+	settings.chatz_enabled = 1
+	settings.chatz_api_config = api_name
+	settings.insert(ignore_permissions=True)
+
+
+def clear_seed_data():
+	"""
+	Remove everything created by seed_data
+
+	Returns:
+		dict: Counts of removed records
+	"""
+	user_pattern = f"{BENCH_USER_PREFIX}%@{BENCH_USER_DOMAIN}"
+	history = frappe.db.count("Chatz History", {"user": ["like", user_pattern]})
+	frappe.db.delete("Chatz History", {"user": ["like", user_pattern]})
+
+	settings = frappe.get_all(
+		"User Chatz Settings",
+		filters={"user": ["like", user_pattern]},
+		pluck="name"
+	)
+	for name in settings:
+		frappe.delete_doc("User Chatz Settings", name, ignore_permissions=True, force=True)
+
+	users = frappe.get_all("User", filters={"name": ["like", user_pattern]}, pluck="name")
+	for name in users:
+		frappe.delete_doc("User", name, ignore_permissions=True, force=True)
+
+	if frappe.db.exists("Chatz API", BENCH_API_NAME):
+		frappe.delete_doc("Chatz API", BENCH_API_NAME, ignore_permissions=True, force=True)
+
+	frappe.db.commit()
+
+	return {
+		"messages": history,
+		"settings": len(settings),
+		"users": len(users)
+	}
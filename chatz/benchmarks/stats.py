@@ -0,0 +1,179 @@
+import json
+import math
+import threading
+
+
+REPORT_SCHEMA = "chatz-bench/1"
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open ended
+BUCKET_BOUNDS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+
+class LatencyHistogram:
+	"""Thread-safe latency recorder with fixed buckets and exact percentiles"""
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.samples = []
+		self.errors = 0
+
+	def record(self, latency_ms):
+		"""Record a successful sample in milliseconds"""
+		with self.lock:
+			self.samples.append(float(latency_ms))
+
+	def record_error(self):
+		"""Record a failed operation"""
+		with self.lock:
+			self.errors += 1
+
+	def summary(self, elapsed_seconds=None):
+		"""
+		Summarise recorded samples
+
+		Args:
+			elapsed_seconds (float): Wall-clock duration of the run, used for throughput
+
+		Returns:
+			dict: Counts, percentiles, bucket counts and throughput
+		"""
+		with self.lock:
+			samples = sorted(self.samples)
+			errors = self.errors
+
+		count = len(samples)
+		total = count + errors
+		result = {
+			"count": count,
+			"errors": errors,
+			"error_rate": round(errors / total, 4) if total else 0.0,
+			"min_ms": round(samples[0], 3) if samples else None,
+			"max_ms": round(samples[-1], 3) if samples else None,
+			"mean_ms": round(sum(samples) / count, 3) if samples else None,
+			"p50_ms": percentile(samples, 50),
+			"p90_ms": percentile(samples, 90),
+			"p95_ms": percentile(samples, 95),
+			"p99_ms": percentile(samples, 99),
+			"buckets": bucket_counts(samples)
+		}
+
+		if elapsed_seconds:
+			result["throughput_per_sec"] = round(count / elapsed_seconds, 3)
+
+		return result
+
+
+def percentile(sorted_samples, pct):
+	"""Nearest-rank percentile of already sorted samples"""
+	if not sorted_samples:
+		return None
+	rank = max(1, math.ceil(pct / 100.0 * len(sorted_samples)))
+	return round(sorted_samples[rank - 1], 3)
+
+
+def bucket_counts(samples):
+	"""Count samples per histogram bucket, keyed by upper bound ("le_inf" for the last)"""
+	labels = [f"le_{bound}" for bound in BUCKET_BOUNDS_MS] + ["le_inf"]
+	counts = dict.fromkeys(labels, 0)
+	for sample in samples:
+		for bound, label in zip(BUCKET_BOUNDS_MS, labels):
+			if sample <= bound:
+				counts[label] += 1
+				break
+		else:
+			counts["le_inf"] += 1
+	return counts
+
+
+def build_report(name, params, histograms, elapsed_seconds, extra=None):
+	"""
+	Build a benchmark report in the comparable Chatz format
+
+	Args:
+		name (str): Benchmark name
+		params (dict): Parameters the run was started with
+		histograms (dict): Operation name -> LatencyHistogram
+		elapsed_seconds (float): Wall-clock duration of the run
+		extra (dict): Additional benchmark-specific metrics
+
+	Returns:
+		dict: Report
+	"""
+	operations = {
+		operation: histogram.summary(elapsed_seconds)
+		for operation, histogram in sorted(histograms.items())
+	}
+	total_ops = sum(op["count"] for op in operations.values())
+
+	report = {
+		"schema": REPORT_SCHEMA,
+		"benchmark": name,
+		"params": params,
+		"elapsed_seconds": round(elapsed_seconds, 3),
+		"total_operations": total_ops,
+		"throughput_per_sec": round(total_ops / elapsed_seconds, 3) if elapsed_seconds else None,
+		"operations": operations
+	}
+
+	if extra:
+		report["extra"] = extra
+
+	return report
+
+
+def compare_reports(baseline, current, threshold=0.10, metric="p95_ms"):
+	"""
+	Compare two reports operation by operation
+
+	Args:
+		baseline (dict): Earlier report
+		current (dict): New report
+		threshold (float): Relative slowdown tolerated before flagging a regression
+		metric (str): Latency metric to compare
+
+	Returns:
+		dict: Per-operation deltas and the list of regressed operations
+	"""
+	rows = {}
+	regressions = []
+
+	for operation, current_stats in current.get("operations", {}).items():
+		base_stats = baseline.get("operations", {}).get(operation)
+		if not base_stats or base_stats.get(metric) is None or current_stats.get(metric) is None:
+			continue
+
+		base_value = base_stats[metric]
+		new_value = current_stats[metric]
+		change = (new_value - base_value) / base_value if base_value else 0.0
+		error_change = current_stats.get("error_rate", 0) - base_stats.get("error_rate", 0)
+
+		rows[operation] = {
+			"baseline": base_value,
+			"current": new_value,
+			"change": round(change, 4),
+			"error_rate_change": round(error_change, 4)
+		}
+
+		if change > threshold or error_change > 0.01:
+			regressions.append(operation)
+
+	return {
+		"metric": metric,
+		"threshold": threshold,
+		"operations": rows,
+		"regressions": regressions
+	}
+
+
+def write_report(report, path=None):
+	"""Write a report to a file, or return it as a JSON string when no path is given"""
+	text = json.dumps(report, indent=2, sort_keys=True, default=str)
+	if path:
+		with open(path, "w") as f:
+			f.write(text + "\n")
+	return text
+
+
+def load_report(path):
+	with open(path) as f:
+		return json.load(f)
@@ -0,0 +1,193 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from chatz.benchmarks.batch import run_batch_benchmark
+from chatz.benchmarks.fake_openai import FakeOpenAIServer
+from chatz.benchmarks.guest import run_guest_benchmark
+from chatz.benchmarks.prefix_cache import run_prefix_cache_benchmark
+from chatz.benchmarks.replay import make_target, run_replay
+from chatz.benchmarks.stats import LatencyHistogram, build_report, compare_reports
+
+
+def post_json(url, payload):
+	request = urllib.request.Request(
+		url,
+		data=json.dumps(payload).encode(),
+		headers={"Content-Type": "application/json"},
+		method="POST"
+	)
+	return urllib.request.urlopen(request, timeout=10)
+
+
+class TestLatencyHistogram(unittest.TestCase):
+	def test_percentiles_and_buckets(self):
+		histogram = LatencyHistogram()
+		for value in range(1, 101):
+			histogram.record(value)
+		histogram.record_error()
+
+		summary = histogram.summary(elapsed_seconds=10)
+		self.assertEqual(summary["count"], 100)
+		self.assertEqual(summary["p50_ms"], 50)
+		self.assertEqual(summary["p99_ms"], 99)
+		self.assertEqual(summary["throughput_per_sec"], 10)
+		self.assertEqual(summary["buckets"]["le_100"], 50)
+		self.assertAlmostEqual(summary["error_rate"], 1 / 101, places=4)
+
+	def test_compare_flags_regressions(self):
+		fast, slow = LatencyHistogram(), LatencyHistogram()
+		for _ in range(20):
+			fast.record(10)
+			slow.record(15)
+
+		baseline = build_report("x", {}, {"op": fast}, 1.0)
+		current = build_report("x", {}, {"op": slow}, 1.0)
+
+		self.assertEqual(compare_reports(baseline, current)["regressions"], ["op"])
+		self.assertEqual(compare_reports(current, baseline)["regressions"], [])
+
+
+class TestFakeOpenAIServer(unittest.TestCase):
+	def test_models_and_streaming(self):
+		with FakeOpenAIServer(ttft=0, tokens_per_second=0, response_tokens=5, models=["a", "b"]) as server:
+			with urllib.request.urlopen(server.base_url + "/models", timeout=10) as response:
+				models = [m["id"] for m in json.load(response)["data"]]
+			self.assertEqual(models, ["a", "b"])
+
+			with post_json(server.base_url + "/chat/completions", {
+				"model": "a",
+				"messages": [{"role": "user", "content": "hello"}],
+				"stream": True
+			}) as response:
+				events = [line for line in response.read().decode().split("\n\n") if line]
+
+			self.assertEqual(events[-1], "data: [DONE]")
+			deltas = [json.loads(e[6:])["choices"][0]["delta"].get("content") for e in events[:-1]]
+			self.assertEqual(len([d for d in deltas if d]), 5)
+			self.assertEqual(server.stats["completed_streams"], 1)
+
+	def test_error_injection(self):
+		with FakeOpenAIServer(ttft=0, error_rate=1.0) as server:
+			with self.assertRaises(urllib.error.HTTPError) as ctx:
+				post_json(server.base_url + "/chat/completions", {"messages": []})
+			self.assertEqual(ctx.exception.code, 500)
+			self.assertEqual(server.stats["errors"], 1)
+
+
+class TestPrefixCacheBenchmark(unittest.TestCase):
+	def test_prefix_cached_layout_hits_more(self):
+		with FakeOpenAIServer(ttft=0, tokens_per_second=0, response_tokens=10) as server:
+			report = run_prefix_cache_benchmark(server.base_url, "fake-large", conversations=3, turns=4)
+
+		rates = report["extra"]["prefix_cache"]
+		self.assertEqual(rates["Standard"]["requests"], 12)
+		self.assertGreater(rates["Prefix Cached"]["hit_rate"], rates["Standard"]["hit_rate"])
+		self.assertGreater(rates["Prefix Cached"]["hit_rate"], 0.5)
+
+
+class TestBatchBenchmark(unittest.TestCase):
+	def test_concurrency_raises_throughput(self):
+		with FakeOpenAIServer(ttft=0.05, tokens_per_second=0, response_tokens=5) as server:
+			report = run_batch_benchmark(server.base_url, "fake-small", records=16, concurrency_levels=[1, 8])
+
+		batch = report["extra"]["batch"]
+		self.assertEqual(batch["8"]["done"], 16)
+		self.assertGreater(batch["8"]["speedup"], 3)
+
+	def test_retries_injected_errors(self):
+		with FakeOpenAIServer(ttft=0, tokens_per_second=0, response_tokens=5, error_rate=0.3, seed=1) as server:
+			report = run_batch_benchmark(
+				server.base_url, "fake-small", records=20, concurrency_levels=[4], max_retries=5, retry_delay=0.001
+			)
+
+		totals = report["extra"]["batch"]["4"]
+		self.assertEqual(totals["done"], 20)
+		self.assertGreater(totals["retries"], 0)
+
+
+class FakeGuestSite(BaseHTTPRequestHandler):
+	"""Answers the guest config endpoints like Frappe: POST always 200, GET 304 on a matching ETag"""
+
+	def do_POST(self):
+		self.respond(200, {"ETag": None})
+
+	def do_GET(self):
+		if self.headers.get("If-None-Match") == '"v1"':
+			self.respond(304, {"ETag": '"v1"'})
+		else:
+			self.respond(200, {"ETag": '"v1"', "Cache-Control": "public, max-age=60"})
+
+	def respond(self, status, headers):
+		body = b"" if status == 304 else b'{"message": {"status": "success"}}'
+		self.send_response(status)
+		for name, value in headers.items():
+			if value:
+				self.send_header(name, value)
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+class TestGuestBenchmark(unittest.TestCase):
+	def test_modes(self):
+		server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGuestSite)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		try:
+			report = run_guest_benchmark(f"http://127.0.0.1:{server.server_port}", page_loads=10, concurrency=2)
+		finally:
+			server.shutdown()
+			server.server_close()
+
+		guest = report["extra"]["guest"]
+		self.assertEqual(report["extra"]["etag"], '"v1"')
+		self.assertEqual(guest["uncached"]["statuses"], {"200": 10})
+		self.assertEqual(guest["first visit"]["statuses"], {"200": 10})
+		self.assertEqual(guest["revalidated"]["statuses"], {"304": 10})
+		self.assertEqual(guest["uncached"]["speedup"], 1)
+
+
+class TestReplay(unittest.TestCase):
+	def test_compares_targets_on_the_same_cases(self):
+		cases = [
+			{
+				"case": f"{index:04d}",
+				"history": [
+					{"message_type": "user", "message_content": "What is this?"},
+					{"message_type": "assistant", "message_content": "A sales invoice."}
+				],
+				"question": f"Question {index}",
+				"context": {"doctype": "Sales Invoice", "docname": f"ACC-SINV-{index}"}
+			}
+			for index in range(6)
+		]
+
+		with FakeOpenAIServer(ttft=0, tokens_per_second=0) as fast, \
+				FakeOpenAIServer(ttft=0.05, tokens_per_second=0) as slow, \
+				FakeOpenAIServer(ttft=0, error_rate=1.0) as broken:
+			report = run_replay(cases, [
+				make_target("fast", fast.base_url, "fake-small"),
+				make_target("slow", slow.base_url, "fake-large"),
+				make_target("broken", broken.base_url, "fake-small")
+			], concurrency=3, max_tokens=8)
+
+		replay = report["extra"]["replay"]
+		self.assertEqual(replay["fast"]["requests"], 6)
+		self.assertEqual(replay["fast"]["errors"], 0)
+		self.assertEqual(replay["fast"]["completion_tokens_mean"], 8)
+		self.assertEqual(replay["broken"]["error_rate"], 1.0)
+		self.assertEqual(replay["broken"]["error_types"], {"API Error: 500": 6})
+
+		comparison = {row["target"]: row for row in report["extra"]["comparison"]}
+		self.assertGreater(comparison["slow"]["ttft_p50_ms"], 50)
+		self.assertGreater(comparison["slow"]["ttft_p50_ms_vs_first"], 1)
+		self.assertEqual(report["operations"]["fast ttft"]["count"], 6)
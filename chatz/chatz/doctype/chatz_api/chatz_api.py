@@ -3,6 +3,11 @@ import requests
 import json
 from frappe.model.document import Document
 
+from chatz.api.config import clear_guest_payload
+from chatz.utils.attachments import clear_attachments_enabled
+from chatz.utils.profiling import phase, profiled
+from chatz.utils.prompt_builder import count_tokens, html_to_prompt_text
+
 
 class ChatzAPI(Document):
 	"""DocType for storing OpenAI-compatible API configurations"""
@@ -15,6 +20,24 @@ class ChatzAPI(Document):
 			frappe.throw("API Key is required")
 		if not self.model_name:
 			frappe.throw("Default Model is required")
+		if self.enable_model_router:
+			self.validate_router()
+
+		self.compile_system_prompt()
+
+	def validate_router(self):
+		"""The Fast Model must be set, and be one of the Available Models once they are fetched"""
+		if not self.router_fast_model:
+			frappe.throw("Fast Model is required for the Model Router")
+
+		available = json.loads(self.available_models) if self.available_models else []
+		if available and self.router_fast_model not in available:
+			frappe.throw(f"Fast Model {self.router_fast_model} is not one of the Available Models")
+
+	def compile_system_prompt(self):
+		"""Store the system prompt as clean text with its token count"""
+		self.system_prompt_text = html_to_prompt_text(self.system_prompt)
+		self.system_prompt_tokens = count_tokens(self.system_prompt_text)
 
 	def before_save(self):
 		"""Ensure only one guest default configuration"""
@@ -31,8 +54,21 @@ class ChatzAPI(Document):
 					"Please disable it first."
 				)
 
+	def on_update(self):
+		"""Guests get the new configuration on their next revalidation"""
+		clear_guest_payload()
+		clear_attachments_enabled()
+
+	def on_trash(self):
+		clear_guest_payload()
+		clear_attachments_enabled()
+
+	def after_rename(self, old, new, merge=False):
+		clear_guest_payload()
+
 
 @frappe.whitelist()
+@profiled
 def fetch_available_models(api_name):
 	"""
 	Fetch available models from OpenAI-compatible API endpoint
@@ -64,11 +100,12 @@ def fetch_available_models(api_name):
 		models_url = f"{endpoint}/models"
 		
 		# Make request to fetch models
-		response = requests.get(
-			models_url,
-			headers=headers,
-			timeout=10
-		)
+		with phase("upstream"):
+			response = requests.get(
+				models_url,
+				headers=headers,
+				timeout=10
+			)
 		
 		if response.status_code != 200:
 			frappe.log_error(
@@ -96,8 +133,9 @@ def fetch_available_models(api_name):
 			}
 		
 		# Update the Chatz API document with available models
-		api_config.available_models = json.dumps(models)
-		api_config.save(ignore_permissions=True)
+		with phase("save"):
+			api_config.available_models = json.dumps(models)
+			api_config.save(ignore_permissions=True)
 		
 		return {
 			"status": "success",
@@ -0,0 +1,45 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from chatz.api.config import clear_guest_payload, get_available_apis, get_guest_payload, user_can_use_api, with_guest_key
+
+
+class TestChatzAPI(FrappeTestCase):
+	def setUp(self):
+		frappe.db.set_value("Chatz API", {"is_guest_default": 1}, "is_guest_default", 0)
+		self.api = frappe.get_doc({
+			"doctype": "Chatz API",
+			"api_name": "_Test Guest Chatz API",
+			"api_endpoint": "http://127.0.0.1:8089/v1",
+			"api_key": "test",
+			"model_name": "fake-large",
+			"is_guest_default": 1,
+			"use_server_proxy": 1,
+			"enabled": 1
+		}).insert()
+		clear_guest_payload()
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		clear_guest_payload()
+
+	def test_guest_can_use_guest_default(self):
+		frappe.set_user("Guest")
+
+		self.assertEqual(get_available_apis()["default_api"], self.api.name)
+		self.assertTrue(user_can_use_api(self.api.name))
+		self.assertFalse(user_can_use_api("_Test Other Chatz API"))
+
+	def test_guest_key_never_cached(self):
+		self.api.use_server_proxy = 0
+		self.api.save()
+		clear_guest_payload()
+
+		payload = get_guest_payload()
+		self.assertEqual(payload["config"]["api_key"], "")
+		self.assertTrue(payload["private"])
+		# Added per response for the browser that calls the API directly
+		self.assertEqual(with_guest_key(payload)["api_key"], "test")
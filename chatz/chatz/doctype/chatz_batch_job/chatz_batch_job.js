@@ -0,0 +1,51 @@
+// Registered once; follows whichever batch job form is open
+let listening = false;
+
+frappe.ui.form.on('Chatz Batch Job', {
+	onload: function() {
+		if (listening) return;
+		listening = true;
+
+		frappe.realtime.on('chatz_batch_progress', function(progress) {
+			const frm = cur_frm;
+			if (!frm || frm.doctype !== 'Chatz Batch Job' || frm.doc.name !== progress.job) {
+				return;
+			}
+
+			if (['Queued', 'Running'].includes(progress.status)) {
+				// Reloading hundreds of result rows every second is wasteful,
+				// so show the counts and reload once the batch is done
+				frm.dashboard.set_headline(__('{0} of {1} answered, {2} failed', [
+					progress.completed, progress.total, progress.failed
+				]));
+			} else {
+				frm.reload_doc();
+			}
+		});
+	},
+
+	refresh: function(frm) {
+		if (['Queued', 'Running'].includes(frm.doc.status)) {
+			frm.add_custom_button(__('Cancel Batch'), function() {
+				cancel_batch(frm);
+			});
+		}
+	}
+});
+
+function cancel_batch(frm) {
+	frappe.call({
+		method: 'chatz.api.batch.cancel_batch',
+		args: {
+			job_name: frm.doc.name
+		},
+		callback: function(r) {
+			if (r.message) {
+				frappe.show_alert({
+					message: r.message.message,
+					indicator: r.message.status === 'success' ? 'orange' : 'red'
+				});
+			}
+		}
+	});
+}
@@ -0,0 +1,200 @@
+import time
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now_datetime
+
+from chatz.api.config import build_config
+from chatz.utils.batch import run_batch
+from chatz.utils.openai_client import chat_completion, message_content
+from chatz.utils.prompt_builder import build_messages
+
+
+MAX_BATCH_RECORDS = 500
+MAX_CONCURRENCY = 16
+MAX_RETRIES = 5
+
+# Realtime event the widget follows, published to the job owner
+PROGRESS_EVENT = "chatz_batch_progress"
+# Seconds between progress commits and events while running
+PROGRESS_INTERVAL = 1.0
+
+CANCEL_KEY_PREFIX = "chatz_batch_cancel:"
+CANCEL_FLAG_TTL = 24 * 60 * 60
+
+# Per request; a slow answer is retried rather than holding a worker slot forever
+REQUEST_TIMEOUT = 120
+BATCH_JOB_TIMEOUT = 4 * 60 * 60
+
+# Fieldtypes an answer may be written back to
+TEXT_FIELDTYPES = ("Data", "Small Text", "Text", "Long Text", "Text Editor", "Markdown Editor")
+
+
+class ChatzBatchJob(Document):
+	"""The same question asked for each of a set of records, answered by run_batch_job"""
+
+	def validate(self):
+		if not 1 <= (self.concurrency or 0) <= MAX_CONCURRENCY:
+			frappe.throw(f"Concurrency must be between 1 and {MAX_CONCURRENCY}")
+		if not 0 <= (self.max_retries or 0) <= MAX_RETRIES:
+			frappe.throw(f"Max Retries must be between 0 and {MAX_RETRIES}")
+		if len(self.results) > MAX_BATCH_RECORDS:
+			frappe.throw(f"A batch can have at most {MAX_BATCH_RECORDS} records")
+
+		self.total_records = len(self.results)
+
+	def progress(self):
+		"""Progress payload of the realtime event and get_batch_status"""
+		return {
+			"job": self.name,
+			"status": self.status,
+			"reference_doctype": self.reference_doctype,
+			"total": self.total_records,
+			"completed": self.completed_records or 0,
+			"failed": self.failed_records or 0
+		}
+
+	def publish_progress(self):
+		frappe.publish_realtime(PROGRESS_EVENT, self.progress(), user=self.owner)
+
+
+def run_batch_job(job_name):
+	"""
+	Answer a batch job's pending records (background job, "long" queue)
+
+	Records are loaded and results written in this thread while the API
+	calls run in a bounded pool (see chatz.utils.batch.run_batch). Progress
+	is committed and published at most once per PROGRESS_INTERVAL, so the
+	widget follows along without a commit per record.
+
+	Args:
+		job_name (str): Chatz Batch Job name
+	"""
+	job = frappe.get_doc("Chatz Batch Job", job_name)
+	if job.status not in ("Queued", "Running"):
+		return
+
+	if frappe.cache().get_value(CANCEL_KEY_PREFIX + job.name):
+		job.db_set({"status": "Cancelled", "finished_at": now_datetime()}, commit=True)
+		job.publish_progress()
+		return
+
+	try:
+		api_config = frappe.get_doc("Chatz API", job.chatz_api)
+		config = build_config(api_config, job.owner)
+		model = job.model or api_config.model_name
+		pending = {row.reference_name: row.name for row in job.results if row.status == "Pending"}
+		counts = {"completed": job.completed_records or 0, "failed": job.failed_records or 0}
+
+		job.db_set({"status": "Running", "started_at": job.started_at or now_datetime()}, commit=True)
+		job.publish_progress()
+
+		def record_result(reference_name, status, answer=None, error=None, attempts=0, duration=0):
+			frappe.db.set_value("Chatz Batch Result", pending[reference_name], {
+				"status": status,
+				"answer": answer,
+				"error": error,
+				"attempts": attempts,
+				"duration": round(duration, 2)
+			}, update_modified=False)
+
+			if status == "Done":
+				counts["completed"] += 1
+				if job.target_field:
+					frappe.db.set_value(job.reference_doctype, reference_name, job.target_field, answer)
+			else:
+				counts["failed"] += 1
+
+		def items():
+			for reference_name in pending:
+				try:
+					messages = build_record_messages(job, config, reference_name)
+				except Exception as e:
+					record_result(reference_name, "Failed", error=str(e))
+					continue
+				yield reference_name, messages
+
+		def call(messages):
+			result = chat_completion(
+				api_config.api_endpoint,
+				api_config.api_key,
+				{"model": model, "messages": messages},
+				timeout=REQUEST_TIMEOUT
+			)
+			return message_content(result).strip()
+
+		def should_stop():
+			return bool(frappe.cache().get_value(CANCEL_KEY_PREFIX + job.name))
+
+		started = time.monotonic()
+		last_progress = started
+
+		for result in run_batch(items(), call, job.concurrency, job.max_retries, should_stop=should_stop):
+			record_result(
+				result["key"],
+				result["status"],
+				answer=result["output"],
+				error=result["error"],
+				attempts=result["attempts"],
+				duration=result["duration"]
+			)
+
+			if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+				last_progress = time.monotonic()
+				job.db_set({"completed_records": counts["completed"], "failed_records": counts["failed"]}, commit=True)
+				job.publish_progress()
+
+		stopped = should_stop()
+		elapsed = time.monotonic() - started
+		processed = counts["completed"] + counts["failed"]
+
+		if stopped and processed < job.total_records:
+			status = "Cancelled"
+		elif counts["failed"]:
+			status = "Completed with Errors"
+		else:
+			status = "Completed"
+
+		job.db_set({
+			"status": status,
+			"completed_records": counts["completed"],
+			"failed_records": counts["failed"],
+			"finished_at": now_datetime(),
+			"records_per_minute": round(processed / elapsed * 60, 1) if elapsed else 0
+		}, commit=True)
+		job.publish_progress()
+
+	except Exception as e:
+		frappe.db.rollback()
+		frappe.log_error(
+			"Error Running Chatz Batch Job",
+			f"Batch job {job_name} failed: {str(e)}"
+		)
+		job.db_set({"status": "Failed", "finished_at": now_datetime()}, commit=True)
+		job.publish_progress()
+
+
+def build_record_messages(job, config, reference_name):
+	"""
+	Chat messages asking the job's prompt about one record
+
+	The record is read as the job owner (background jobs run as the user who
+	queued them), so only records they may read are ever sent to the API.
+
+	Args:
+		job (Document): Chatz Batch Job
+		config (dict): Config of the job's Chatz API (build_config)
+		reference_name (str): Record name
+
+	Returns:
+		list: Messages for /chat/completions
+	"""
+	doc = frappe.get_doc(job.reference_doctype, reference_name)
+	doc.check_permission("read")
+
+	context = {
+		"doctype": job.reference_doctype,
+		"docname": reference_name,
+		"document_data": doc.as_dict()
+	}
+	return build_messages(config, [], job.prompt, context)
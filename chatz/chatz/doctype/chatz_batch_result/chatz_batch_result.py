@@ -0,0 +1,7 @@
+from frappe.model.document import Document
+
+
+class ChatzBatchResult(Document):
+	"""Answer for one record of a Chatz Batch Job, written by the batch runner"""
+
+	pass
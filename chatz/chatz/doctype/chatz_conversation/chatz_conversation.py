@@ -0,0 +1,14 @@
+import frappe
+from frappe.model.document import Document
+
+
+class ChatzConversation(Document):
+	"""Per-conversation summary of Chatz History (see chatz.utils.history_backends)"""
+
+	pass
+
+
+def on_doctype_update():
+	"""Index the conversation list and the title job"""
+	frappe.db.add_index("Chatz Conversation", ["user", "last_message_at"])
+	frappe.db.add_index("Chatz Conversation", ["title", "last_message_at"])
@@ -0,0 +1,15 @@
+import frappe
+from frappe.model.document import Document
+
+
+class ChatzConversationLog(Document):
+	"""A conversation stored as one append-only log (see chatz.utils.history_backends)"""
+
+	pass
+
+
+def on_doctype_update():
+	"""Index the conversation list, the per-user delta sync query and the title job"""
+	frappe.db.add_index("Chatz Conversation Log", ["user", "last_message_at"])
+	frappe.db.add_index("Chatz Conversation Log", ["user", "modified"])
+	frappe.db.add_index("Chatz Conversation Log", ["title", "last_message_at"])
@@ -0,0 +1,129 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, getdate, now_datetime
+
+from chatz.benchmarks.replay_cases import load_replay_cases
+from chatz.chatz.doctype.chatz_usage_daily.chatz_usage_daily import rebuild_day
+from chatz.utils.history_backends import BACKEND_CONFIG_KEY, LOG_DOCTYPE, conversation_key, get_history_backend
+from chatz.utils.history_export import end_watermark, iter_history_batches
+
+
+USER = "Administrator"
+CONTEXT = '{"doctype": "ToDo", "docname": "TEST-0001"}'
+
+
+class TestChatzConversationLog(FrappeTestCase):
+	"""History readers outside the chat (export, usage rollups, replay) with the log backend"""
+
+	def setUp(self):
+		self.previous_backend = frappe.conf.get(BACKEND_CONFIG_KEY)
+		frappe.conf[BACKEND_CONFIG_KEY] = "log"
+		frappe.db.delete(LOG_DOCTYPE)
+
+		backend = get_history_backend()
+		self.assertEqual(backend.name, "log")
+		for conversation_id in ("_test_log_1", "_test_log_2"):
+			backend.append(USER, conversation_id, {
+				"message_type": "user",
+				"message_content": "Who is this assigned to?",
+				"document_context": CONTEXT,
+				"api_used": "_Test API"
+			})
+			backend.append(USER, conversation_id, {
+				"message_type": "assistant",
+				"message_content": "To you.",
+				"api_used": "_Test API",
+				"model_route": "fast",
+				"ttft_ms": 100,
+				"response_ms": 300
+			})
+
+	def tearDown(self):
+		frappe.conf[BACKEND_CONFIG_KEY] = self.previous_backend
+
+	def test_export(self):
+		cutoff = add_to_date(now_datetime(), seconds=1)
+		rows = [row for batch in iter_history_batches(cutoff=cutoff, batch_size=3) for row in batch]
+
+		self.assertEqual(len(rows), 4)
+		self.assertEqual({row["conversation_id"] for row in rows}, {"_test_log_1", "_test_log_2"})
+		self.assertTrue(all(row["user"] == USER for row in rows))
+		# Contexts stored once per change are filled in
+		self.assertTrue(all(row["document_context"] == CONTEXT for row in rows))
+
+		self.assertEqual(list(iter_history_batches(cutoff=cutoff, api_used=["_Test Other API"])), [])
+
+	def test_usage_rollups(self):
+		backend = get_history_backend()
+		self.assertEqual(backend.usage_days(add_to_date(now_datetime(), seconds=1)), [getdate()])
+		self.assertEqual(backend.usage_days(add_to_date(now_datetime(), seconds=1), since=str(now_datetime())), [])
+		self.assertEqual(rebuild_day(getdate()), 2)
+
+		rollups = frappe.get_all(
+			"Chatz Usage Daily",
+			filters={"date": getdate(), "chatz_api": "_Test API"},
+			fields=["model_route", "messages", "conversations", "timed_responses", "ttft_responses", "avg_response_ms"],
+			order_by="model_route asc"
+		)
+		self.assertEqual([r.model_route for r in rollups], [None, "fast"])
+		self.assertEqual(rollups[0].messages, 2)
+		self.assertEqual(rollups[1].conversations, 2)
+		self.assertEqual(rollups[1].timed_responses, 2)
+		self.assertEqual(rollups[1].ttft_responses, 2)
+		self.assertEqual(rollups[1].avg_response_ms, 300)
+
+	def test_replay_cases(self):
+		cases = load_replay_cases(conversations=5, api="_Test API")
+
+		self.assertEqual(len(cases), 2)
+		self.assertEqual(cases[0]["question"], "Who is this assigned to?")
+		self.assertEqual(cases[0]["context"]["docname"], "TEST-0001")
+		self.assertEqual(load_replay_cases(api="_Test Other API"), [])
+
+	def test_deletions_of_other_users_not_synced(self):
+		backend = get_history_backend()
+		since = str(add_to_date(now_datetime(), seconds=-1))
+		backend.append("Guest", "_test_log_other", {"message_type": "user", "message_content": "Hi"})
+
+		for conversation_id, user in (("_test_log_1", USER), ("_test_log_other", "Guest")):
+			frappe.delete_doc(LOG_DOCTYPE, conversation_key(user, conversation_id), ignore_permissions=True)
+
+		_, deleted, _, _, _ = backend.changes_since(USER, since, "", add_to_date(now_datetime(), seconds=1), 100)
+		log_name = conversation_key(USER, "_test_log_1")
+		self.assertEqual(deleted, [f"{log_name}:1", f"{log_name}:2"])
+
+	def test_incremental_export_and_sync_cover_every_message(self):
+		backend = get_history_backend()
+		start = str(add_to_date(now_datetime(), seconds=-10))
+		cutoff = now_datetime()
+		# Appended after the cutoff to a log that also holds earlier messages
+		backend.append(USER, "_test_log_1", {"message_type": "user", "message_content": "And now?"})
+		later = add_to_date(now_datetime(), seconds=1)
+
+		first = [row["name"] for batch in iter_history_batches(cutoff=cutoff) for row in batch]
+		second = [
+			row["name"]
+			for batch in iter_history_batches(since=end_watermark(cutoff), cutoff=later)
+			for row in batch
+		]
+		self.assertEqual(len(first), 4)
+		self.assertEqual(len(second), 1)
+		self.assertFalse(set(first) & set(second))
+
+		messages, _, _, cursor, has_more = backend.changes_since(USER, start, "", cutoff, 100)
+		self.assertEqual(len(messages), 4)
+		self.assertFalse(has_more)
+		since_modified, _, since_name = cursor.partition("|")
+		messages, _, _, _, _ = backend.changes_since(USER, since_modified, since_name, later, 100)
+		self.assertEqual([m.message_content for m in messages], ["And now?"])
+
+		# Paged: the cursor stops at the last message sent
+		messages, _, _, cursor, has_more = backend.changes_since(USER, start, "", later, 3)
+		self.assertTrue(has_more)
+		since_modified, _, since_name = cursor.partition("|")
+		rest, _, _, _, has_more = backend.changes_since(USER, since_modified, since_name, later, 3)
+		self.assertFalse(has_more)
+		self.assertEqual(len({m.name for m in messages + rest}), 5)
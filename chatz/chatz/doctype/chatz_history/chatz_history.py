@@ -1,7 +1,16 @@
 import frappe
+import json
 from frappe.model.document import Document
+from frappe.utils import get_url
 from datetime import datetime
 
+from chatz.utils.history_backends import GENERATION_FIELDS, get_history_backend, get_reasoning, save_reasoning
+from chatz.utils.markdown import RENDERER_VERSION, render_markdown, split_reasoning
+from chatz.utils.prompt_builder import count_tokens
+from chatz.utils.profiling import phase, profiled
+from chatz.utils.settle import settled_before
+
+
 
 class ChatzHistory(Document):
 	"""DocType for storing chat conversation history"""
@@ -22,13 +31,33 @@ class ChatzHistory(Document):
 		if not self.message_content:
 			frappe.throw("Message Content is required")
 
+		if self.message_type == "assistant":
+			# Rendered once here instead of on every load
+			self.rendered_html = render_markdown(self.message_content, get_url())
+			self.renderer_version = RENDERER_VERSION
+
+
+def on_doctype_update():
+	"""Index the per-user delta sync query and the usage rollup job"""
+	frappe.db.add_index("Chatz History", ["user", "modified"])
+	# The rollup job finds new messages by creation and re-aggregates by day
+	frappe.db.add_index("Chatz History", ["creation"])
+	frappe.db.add_index("Chatz History", ["created_at"])
+
 
 @frappe.whitelist()
+@profiled
 def save_message(user, conversation_id, message_type, message_content,
-				 document_context=None, api_used=None):
+				 document_context=None, api_used=None, client_message_id=None, generation_status=None,
+				 compare_group=None, reasoning=None, generation=None):
 	"""
 	Save a chat message to history
 
+	The thoughts of an assistant message ("*Thinking:" lines, and reasoning
+	streamed apart from the answer) are stored in Chatz Reasoning instead of
+	the message, so they are neither loaded with the history nor sent back
+	to the model; get_message_reasoning returns them on request.
+
 	Args:
 		user (str): Username
 		conversation_id (str): Unique conversation identifier
@@ -36,6 +65,12 @@ def save_message(user, conversation_id, message_type, message_content,
 		message_content (str): The message text
 		document_context (str): JSON string with document context
 		api_used (str): Name of the Chatz API configuration used
+		client_message_id (str): Client-generated ID, makes retried saves idempotent
+		generation_status (str): "Stopped" for a partial response the user stopped
+		compare_group (str): Links a compare mode prompt to the responses of each API
+		reasoning (str): Reasoning streamed apart from the answer (reasoning_content)
+		generation (str): JSON object with how a response was generated: model_used,
+			model_route and route_reason (model router), ttft_ms and response_ms
 
 	Returns:
 		dict: Response with status and message ID
@@ -83,24 +118,53 @@ def save_message(user, conversation_id, message_type, message_content,
 				"message": "You can only save messages for your own user"
 			}
 
-		# Create new Chatz History document
-		doc = frappe.new_doc("Chatz History")
-		doc.user = user
-		doc.conversation_id = conversation_id
-		doc.message_type = message_type
-		doc.message_content = message_content
+		backend = get_history_backend()
+
+		# A queued write may be retried after the first attempt already succeeded
+		if client_message_id:
+			with phase("dedupe"):
+				existing = backend.find_message(user, conversation_id, client_message_id)
+			if existing:
+				return {
+					"status": "success",
+					"message_id": existing,
+					"message": "Message already saved"
+				}
 
-		if document_context:
-			doc.document_context = document_context
+		reasoning_tokens = None
+		if message_type == "assistant":
+			answer, thoughts = split_reasoning(message_content)
+			if answer:
+				# A response of thoughts only (stopped early) is kept as it is
+				message_content = answer
+				reasoning = "\n".join(part for part in (reasoning, thoughts) if part)
+			reasoning_tokens = count_tokens(reasoning) if reasoning else None
+
+		message = {
+			"message_type": message_type,
+			"message_content": message_content,
+			"document_context": document_context,
+			"api_used": api_used,
+			"client_message_id": client_message_id,
+			"generation_status": generation_status,
+			"compare_group": compare_group,
+			"reasoning_tokens": reasoning_tokens
+		}
+		if generation and message_type == "assistant":
+			if isinstance(generation, str):
+				generation = json.loads(generation)
+			message.update({field: generation.get(field) for field in GENERATION_FIELDS})
 
-		if api_used:
-			doc.api_used = api_used
+		with phase("insert"):
+			message_id = backend.append(user, conversation_id, message)
 
-		doc.insert(ignore_permissions=True)
+		if reasoning_tokens:
+			with phase("reasoning"):
+				save_reasoning(message_id, user, conversation_id, reasoning, reasoning_tokens)
 
 		return {
 			"status": "success",
-			"message_id": doc.name,
+			"message_id": message_id,
 			"message": "Message saved successfully"
 		}
 
@@ -116,30 +180,60 @@ def save_message(user, conversation_id, message_type, message_content,
 
 
 @frappe.whitelist()
+@profiled
+def get_message_reasoning(message_id):
+	"""
+	Thoughts of an assistant message, loaded when its thought block is expanded
+
+	Args:
+		message_id (str): Message name
+
+	Returns:
+		dict: Response with status and reasoning
+	"""
+	try:
+		reasoning = get_reasoning(frappe.session.user, message_id)
+		if reasoning is None:
+			return {
+				"status": "error",
+				"message": "Reasoning not found"
+			}
+
+		return {
+			"status": "success",
+			"reasoning": reasoning
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Loading Reasoning",
+			f"Failed to load reasoning of message {message_id}: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to load reasoning: {str(e)}"
+		}
+
+
+@frappe.whitelist()
+@profiled
 def get_conversation_history(conversation_id, limit=50):
 	"""
-	Retrieve messages for a specific conversation
+	Retrieve the latest messages of a specific conversation
+
+	Assistant messages carry rendered_html (with renderer_version), so the
+	widget can show them without rendering markdown.
 	
 	Args:
 		conversation_id (str): Unique conversation identifier
 		limit (int): Maximum number of messages to retrieve
 		
 	Returns:
-		list: List of message documents
+		list: List of message documents, oldest first
 	"""
 	try:
-		# Get messages for the conversation, ordered by creation time
-		messages = frappe.get_list(
-			"Chatz History",
-			filters={
-				"conversation_id": conversation_id,
-				"user": frappe.session.user
-			},
-			fields=["name", "message_type", "message_content", "document_context", "created_at"],
-			order_by="created_at asc",
-			limit_page_length=limit
-		)
-		
+		messages = get_history_backend().get_messages(frappe.session.user, conversation_id, int(limit or 50))
+
 		return {
 			"status": "success",
 			"messages": messages
@@ -157,6 +251,65 @@ def get_conversation_history(conversation_id, limit=50):
 
 
 @frappe.whitelist()
+@profiled
+def get_changes_since(since=None, limit=500):
+	"""
+	Get the current user's messages added or changed after a sync cursor
+
+	Called without a cursor, returns a fresh cursor only; the client then
+	loads its initial state through list_conversations/get_conversation_history.
+
+	Args:
+		since (str): Cursor returned by a previous call ("<modified>|<name>")
+		limit (int): Maximum number of messages to return
+
+	Returns:
+		dict: Changed messages, deleted message names, newly generated
+			conversation titles, next cursor and has_more
+	"""
+	try:
+		limit = min(int(limit) if limit else 500, 1000)
+		user = frappe.session.user
+		settled = settled_before()
+
+		if not since:
+			return {
+				"status": "success",
+				"messages": [],
+				"deleted": [],
+				"titles": [],
+				"cursor": f"{settled}|",
+				"has_more": False
+			}
+
+		since_modified, _, since_name = since.partition("|")
+		messages, deleted, titles, cursor, has_more = get_history_backend().changes_since(
+			user, since_modified, since_name, settled, limit
+		)
+		cursor = cursor or since
+
+		return {
+			"status": "success",
+			"messages": messages,
+			"deleted": deleted,
+			"titles": titles,
+			"cursor": cursor,
+			"has_more": has_more
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Getting Changes",
+			f"Failed to get history changes: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to get changes: {str(e)}"
+		}
+
+
+@frappe.whitelist()
+@profiled
 def list_conversations(limit=20, api_filter=None):
 	"""
 	Get list of conversations for current user
@@ -172,40 +325,7 @@ def list_conversations(limit=20, api_filter=None):
 		# Ensure limit is an integer
 		limit = int(limit) if limit else 20
 
-		# Build SQL query with optional API filter
-		if api_filter:
-			conversations = frappe.db.sql("""
-				SELECT DISTINCT conversation_id, api_used, MAX(created_at) as last_message_at
-				FROM `tabChatz History`
-				WHERE user = %s AND api_used = %s
-				GROUP BY conversation_id, api_used
-				ORDER BY last_message_at DESC
-				LIMIT {0}
-			""".format(limit), (frappe.session.user, api_filter), as_dict=True)
-		else:
-			conversations = frappe.db.sql("""
-				SELECT DISTINCT conversation_id, api_used, MAX(created_at) as last_message_at
-				FROM `tabChatz History`
-				WHERE user = %s
-				GROUP BY conversation_id, api_used
-				ORDER BY last_message_at DESC
-				LIMIT {0}
-			""".format(limit), (frappe.session.user,), as_dict=True)
-
-		# Enrich with first message content for preview
-		for conv in conversations:
-			first_msg = frappe.db.get_value(
-				"Chatz History",
-				{
-					"conversation_id": conv["conversation_id"],
-					"user": frappe.session.user,
-					"message_type": "user"
-				},
-				"message_content",
-				order_by="created_at asc"
-			)
-			conv["first_message"] = first_msg if first_msg else "No preview"
-			conv["created_at"] = conv["last_message_at"]
+		conversations = get_history_backend().list_conversations(frappe.session.user, limit, api_filter)
 
 		return {
 			"status": "success",
@@ -0,0 +1,13 @@
+import frappe
+from frappe.model.document import Document
+
+
+class ChatzIndexChunk(Document):
+	"""Indexed text of a record, maintained by chatz.utils.retrieval"""
+
+	pass
+
+
+def on_doctype_update():
+	"""Index lookups of a record's chunks"""
+	frappe.db.add_index("Chatz Index Chunk", ["source_doctype", "source_name"])
@@ -0,0 +1,27 @@
+frappe.ui.form.on('Chatz Index Source', {
+	refresh: function(frm) {
+		if (!frm.is_new()) {
+			frm.add_custom_button(__('Rebuild Index'), function() {
+				rebuild_index(frm);
+			}, __('Actions'));
+		}
+	}
+});
+
+function rebuild_index(frm) {
+	frappe.call({
+		method: 'chatz.chatz.doctype.chatz_index_source.chatz_index_source.rebuild_index',
+		args: {
+			source_doctype: frm.doc.name
+		},
+		callback: function(r) {
+			if (r.message) {
+				frappe.msgprint({
+					title: r.message.status === 'success' ? __('Success') : __('Error'),
+					indicator: r.message.status === 'success' ? 'green' : 'red',
+					message: r.message.message
+				});
+			}
+		}
+	});
+}
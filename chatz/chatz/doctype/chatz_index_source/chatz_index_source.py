@@ -0,0 +1,77 @@
+import frappe
+from frappe.model.document import Document
+
+from chatz.utils.profiling import profiled
+from chatz.utils.retrieval import clear_index_cache, parse_fieldnames
+
+
+class ChatzIndexSource(Document):
+	"""DocType selecting a DocType and fields for the retrieval index"""
+
+	def validate(self):
+		"""Check the indexed fields exist"""
+		meta = frappe.get_meta(self.source_doctype)
+		if meta.istable or meta.issingle:
+			frappe.throw("Child tables and single DocTypes cannot be indexed")
+
+		fieldnames = parse_fieldnames(self.fields_to_index)
+		if not fieldnames:
+			frappe.throw("Select at least one field to index")
+
+		unknown = [f for f in fieldnames if f != "name" and not meta.get_field(f)]
+		if unknown:
+			frappe.throw(f"Unknown fields for {self.source_doctype}: {', '.join(unknown)}")
+
+		if self.title_field and not meta.get_field(self.title_field):
+			frappe.throw(f"Unknown title field for {self.source_doctype}: {self.title_field}")
+
+	def on_update(self):
+		clear_index_cache()
+
+	def on_trash(self):
+		clear_index_cache()
+		frappe.enqueue(
+			"chatz.utils.retrieval.remove_source",
+			queue="long",
+			enqueue_after_commit=True,
+			doctype=self.source_doctype
+		)
+
+
+@frappe.whitelist()
+@profiled
+def rebuild_index(source_doctype):
+	"""
+	Queue a full rebuild of a DocType's index
+
+	Args:
+		source_doctype (str): Chatz Index Source name
+
+	Returns:
+		dict: Response with status and message
+	"""
+	frappe.only_for("System Manager")
+
+	try:
+		frappe.enqueue(
+			"chatz.utils.retrieval.rebuild_source",
+			queue="long",
+			timeout=3600,
+			job_id=f"chatz_index_rebuild:{source_doctype}",
+			deduplicate=True,
+			source_doctype=source_doctype
+		)
+		return {
+			"status": "success",
+			"message": f"Rebuilding the index of {source_doctype} in the background"
+		}
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Queueing Index Rebuild",
+			f"Failed to queue index rebuild for {source_doctype}: {str(e)}"
+		)
+		return {
+			"status": "error",
+			"message": f"Failed to queue rebuild: {str(e)}"
+		}
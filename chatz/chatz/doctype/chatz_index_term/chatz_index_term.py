@@ -0,0 +1,13 @@
+import frappe
+from frappe.model.document import Document
+
+
+class ChatzIndexTerm(Document):
+	"""Inverted index posting, maintained by chatz.utils.retrieval"""
+
+	pass
+
+
+def on_doctype_update():
+	"""Index each term's postings by frequency, as search reads them"""
+	frappe.db.add_index("Chatz Index Term", ["term", "frequency"])
@@ -0,0 +1,7 @@
+from frappe.model.document import Document
+
+
+class ChatzReasoning(Document):
+	"""Reasoning of an assistant message (see chatz.utils.history_backends)"""
+
+	pass
@@ -0,0 +1,111 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import getdate, now_datetime
+
+from chatz.utils.history_backends import get_history_backend
+from chatz.utils.settle import settled_before
+
+
+# Time up to which saved messages are counted in the rollups
+ROLLUP_WATERMARK_KEY = "chatz_usage_rollup_watermark"
+
+# Settle window of the rollups (see chatz.utils.settle): runs are minutes
+# apart, so waiting longer costs nothing
+ROLLUP_SETTLE_SECONDS = 60
+
+ROLLUP_FIELDS = [
+	"date", "user", "chatz_api", "context_doctype", "messages", "user_messages",
+	"assistant_messages", "conversations", "response_chars", "model_route",
+	"timed_responses", "ttft_responses", "avg_ttft_ms", "avg_response_ms"
+]
+
+
+class ChatzUsageDaily(Document):
+	"""Daily usage aggregate per user, Chatz API, context DocType and model route"""
+
+	pass
+
+
+def on_doctype_update():
+	"""Index the report's usual filters"""
+	frappe.db.add_index("Chatz Usage Daily", ["date", "chatz_api"])
+
+
+def update_rollups():
+	"""
+	Bring the daily rollups up to date (scheduled)
+
+	Finds the days that received messages since the watermark and re-aggregates
+	only those days, so each run reads a few index ranges of the history
+	rather than all of it.
+
+	Returns:
+		dict: Rebuilt days and the new watermark
+	"""
+	watermark = frappe.db.get_global(ROLLUP_WATERMARK_KEY)
+	cutoff = settled_before(ROLLUP_SETTLE_SECONDS)
+
+	# Every day on the first run (a backfill)
+	days = get_history_backend().usage_days(cutoff, since=watermark or None)
+
+	for day in days:
+		rebuild_day(day)
+		frappe.db.commit()
+
+	frappe.db.set_global(ROLLUP_WATERMARK_KEY, str(cutoff))
+	frappe.db.commit()
+
+	return {
+		"days": [str(d) for d in days],
+		"watermark": str(cutoff)
+	}
+
+
+def rebuild_day(day):
+	"""
+	Replace the rollup rows of one day with fresh aggregates
+
+	Args:
+		day (date): Day to aggregate
+
+	Returns:
+		int: Number of rollup rows written
+	"""
+	day = getdate(day)
+	groups = get_history_backend().daily_usage(day)
+
+	frappe.db.delete("Chatz Usage Daily", {"date": day})
+
+	if not groups:
+		return 0
+
+	now = now_datetime()
+	fields = ["name", "creation", "modified", "owner", "modified_by"] + ROLLUP_FIELDS
+	values = [
+		(
+			frappe.generate_hash(length=10), now, now, "Administrator", "Administrator",
+			day, row.user, row.chatz_api, row.context_doctype, row.messages,
+			row.user_messages or 0, row.assistant_messages or 0, row.conversations,
+			row.response_chars or 0, row.model_route, row.timed_responses or 0,
+			row.ttft_responses or 0, row.avg_ttft_ms, row.avg_response_ms
+		)
+		for row in groups
+	]
+	frappe.db.bulk_insert("Chatz Usage Daily", fields, values)
+	return len(values)
+
+
+def rebuild_rollups():
+	"""
+	Drop all rollups and the watermark, then rebuild from scratch
+
+	Needed after back-dated imports (e.g. seeded benchmark data), which the
+	incremental job cannot see because their creation is before the watermark.
+
+	Returns:
+		dict: Rebuilt days and the new watermark
+	"""
+	frappe.db.delete("Chatz Usage Daily")
+	frappe.db.set_global(ROLLUP_WATERMARK_KEY, "")
+	frappe.db.commit()
+	return update_rollups()
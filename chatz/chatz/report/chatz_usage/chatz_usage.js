@@ -0,0 +1,38 @@
+frappe.query_reports["Chatz Usage"] = {
+	filters: [
+		{
+			fieldname: "from_date",
+			label: __("From Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.add_days(frappe.datetime.get_today(), -30),
+			reqd: 1
+		},
+		{
+			fieldname: "to_date",
+			label: __("To Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.get_today(),
+			reqd: 1
+		},
+		{
+			fieldname: "group_by",
+			label: __("Group By"),
+			fieldtype: "Select",
+			options: "Day\nUser\nRole\nChatz API\nContext DocType\nModel Route",
+			default: "Day",
+			reqd: 1
+		},
+		{
+			fieldname: "chatz_api",
+			label: __("Chatz API"),
+			fieldtype: "Link",
+			options: "Chatz API"
+		},
+		{
+			fieldname: "user",
+			label: __("User"),
+			fieldtype: "Link",
+			options: "User"
+		}
+	]
+};
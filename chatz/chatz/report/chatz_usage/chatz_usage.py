@@ -0,0 +1,112 @@
+import frappe
+from frappe.utils import add_days, getdate, today
+
+
+# Report column per "Group By" option
+GROUP_COLUMNS = {
+	"Day": ("u.date", "Date", None),
+	"User": ("u.user", "Link", "User"),
+	"Role": ("hr.role", "Link", "Role"),
+	"Chatz API": ("u.chatz_api", "Link", "Chatz API"),
+	"Context DocType": ("u.context_doctype", "Link", "DocType"),
+	"Model Route": ("u.model_route", "Data", None)
+}
+
+# Roles every user has, which say nothing about usage
+IGNORED_ROLES = ("All", "Guest", "Desk User")
+
+
+def execute(filters=None):
+	"""
+	Chat usage from the Chatz Usage Daily rollups
+
+	Never reads Chatz History, so it does not compete with live chat traffic.
+	Conversations are counted per rollup group, so a conversation that spans
+	several Chatz APIs or DocTypes is counted once in each.
+	Latencies are averaged over the responses that recorded them; group by
+	Model Route to compare the fast model with the default.
+	"""
+	filters = frappe._dict(filters or {})
+	group_by = filters.group_by or "Day"
+	if group_by not in GROUP_COLUMNS:
+		frappe.throw(f"Cannot group by {group_by}")
+
+	columns = get_columns(group_by)
+	data = get_data(filters, group_by)
+	chart = get_chart(data, group_by)
+
+	return columns, data, None, chart
+
+
+def get_columns(group_by):
+	_, fieldtype, options = GROUP_COLUMNS[group_by]
+	return [
+		{"fieldname": "group_value", "label": group_by, "fieldtype": fieldtype, "options": options, "width": 200},
+		{"fieldname": "messages", "label": "Messages", "fieldtype": "Int", "width": 110},
+		{"fieldname": "user_messages", "label": "User Messages", "fieldtype": "Int", "width": 120},
+		{"fieldname": "assistant_messages", "label": "Assistant Messages", "fieldtype": "Int", "width": 140},
+		{"fieldname": "conversations", "label": "Conversations", "fieldtype": "Int", "width": 120},
+		{"fieldname": "users", "label": "Users", "fieldtype": "Int", "width": 90},
+		{"fieldname": "avg_response_length", "label": "Avg Response Length", "fieldtype": "Float", "precision": 0, "width": 160},
+		{"fieldname": "avg_ttft_ms", "label": "Avg Time to First Token (ms)", "fieldtype": "Float", "precision": 0, "width": 190},
+		{"fieldname": "avg_response_ms", "label": "Avg Response Time (ms)", "fieldtype": "Float", "precision": 0, "width": 170}
+	]
+
+
+def get_data(filters, group_by):
+	column = GROUP_COLUMNS[group_by][0]
+	values = {
+		"from_date": getdate(filters.from_date or add_days(today(), -30)),
+		"to_date": getdate(filters.to_date or today()),
+		"ignored_roles": IGNORED_ROLES
+	}
+
+	conditions = ["u.date BETWEEN %(from_date)s AND %(to_date)s"]
+	if filters.chatz_api:
+		conditions.append("u.chatz_api = %(chatz_api)s")
+		values["chatz_api"] = filters.chatz_api
+	if filters.user:
+		conditions.append("u.user = %(user)s")
+		values["user"] = filters.user
+
+	join = ""
+	if group_by == "Role":
+		join = """
+			INNER JOIN `tabHas Role` hr
+				ON hr.parent = u.user AND hr.parenttype = 'User' AND hr.role NOT IN %(ignored_roles)s
+		"""
+
+	order = "group_value ASC" if group_by == "Day" else "messages DESC"
+
+	return frappe.db.sql(f"""
+		SELECT
+			{column} AS group_value,
+			SUM(u.messages) AS messages,
+			SUM(u.user_messages) AS user_messages,
+			SUM(u.assistant_messages) AS assistant_messages,
+			SUM(u.conversations) AS conversations,
+			COUNT(DISTINCT u.user) AS users,
+			SUM(u.response_chars) / NULLIF(SUM(u.assistant_messages), 0) AS avg_response_length,
+			SUM(u.avg_ttft_ms * u.ttft_responses) / NULLIF(SUM(u.ttft_responses), 0) AS avg_ttft_ms,
+			SUM(u.avg_response_ms * u.timed_responses) / NULLIF(SUM(u.timed_responses), 0) AS avg_response_ms
+		FROM `tabChatz Usage Daily` u
+		{join}
+		WHERE {" AND ".join(conditions)}
+		GROUP BY group_value
+		ORDER BY {order}
+	""", values, as_dict=True)
+
+
+def get_chart(data, group_by):
+	if not data:
+		return None
+
+	# Top 10 for categorical groupings
+	rows = data if group_by == "Day" else data[:10]
+	return {
+		"data": {
+			"labels": [str(row.group_value or "Not Set") for row in rows],
+			"datasets": [{"name": "Messages", "values": [row.messages for row in rows]}]
+		},
+		"type": "line" if group_by == "Day" else "bar"
+	}
@@ -0,0 +1,338 @@
+import json
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("chatz-fake-openai")
+@click.option("--host", default="127.0.0.1", help="Interface to bind")
+@click.option("--port", default=8089, type=int, help="Port to bind")
+@click.option("--ttft", default=0.2, type=float, help="Seconds before the first token")
+@click.option("--tokens-per-second", default=50.0, type=float, help="Token rate after the first token (0 = unthrottled)")
+@click.option("--response-tokens", default=120, type=int, help="Tokens per response")
+@click.option("--error-rate", default=0.0, type=float, help="Probability (0-1) of a 500 response")
+@click.option("--models", default="fake-small,fake-large", help="Comma separated model IDs for /models")
+@click.option("--seed", default=None, type=int, help="Random seed")
+def fake_openai(host, port, ttft, tokens_per_second, response_tokens, error_rate, models, seed):
+	"""Run a local fake OpenAI-compatible server for benchmarks"""
+	from chatz.benchmarks.fake_openai import FakeOpenAIServer
+
+	server = FakeOpenAIServer(
+		host=host,
+		port=port,
+		ttft=ttft,
+		tokens_per_second=tokens_per_second,
+		response_tokens=response_tokens,
+		error_rate=error_rate,
+		models=[m.strip() for m in models.split(",") if m.strip()],
+		seed=seed
+	)
+	click.echo(f"Fake OpenAI server listening on {server.base_url}")
+	server.serve_forever()
+
+
+@click.command("chatz-seed")
+@click.option("--users", default=50, type=int, help="Number of bench users")
+@click.option("--conversations", default=20, type=int, help="Conversations per user")
+@click.option("--messages", default=8, type=int, help="Messages per conversation")
+@click.option("--endpoint", default="http://127.0.0.1:8089/v1", help="API endpoint of the bench Chatz API")
+@click.option("--model", default="fake-large", help="Default model of the bench Chatz API")
+@click.option("--days", default=90, type=int, help="Spread messages over this many past days")
+@click.option("--seed", default=42, type=int, help="Random seed")
+@click.option("--clear", is_flag=True, default=False, help="Remove previously seeded data instead")
+@pass_context
+def seed(context, users, conversations, messages, endpoint, model, days, seed, clear):
+	"""Seed synthetic Chatz History and User Chatz Settings"""
+	from chatz.benchmarks.seed import clear_seed_data, seed_data
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		if clear:
+			result = clear_seed_data()
+		else:
+			result = seed_data(
+				users=users,
+				conversations_per_user=conversations,
+				messages_per_conversation=messages,
+				endpoint=endpoint,
+				model=model,
+				days=days,
+				seed=seed
+			)
+		click.echo(json.dumps(result, indent=2))
+	finally:
+		frappe.destroy()
+
+
+@click.command("chatz-bench")
+@click.option("--url", default=None, help="Site URL (defaults to the site's configured URL)")
+@click.option("--users", default=20, type=int, help="Simulated users")
+@click.option("--turns", default=5, type=int, help="Chat turns per user")
+@click.option("--concurrency", default=None, type=int, help="Users running at once (defaults to --users)")
+@click.option("--think-time", default=0.0, type=float, help="Seconds between turns")
+@click.option("--seed", default=42, type=int, help="Random seed")
+@click.option("--output", default=None, help="Write the JSON report to this file")
+@pass_context
+def bench(context, url, users, turns, concurrency, think_time, seed, output):
+	"""Load test the Chatz endpoints with concurrent simulated users"""
+	from chatz.benchmarks.runner import run_benchmark
+	from chatz.benchmarks.stats import write_report
+
+	if not url:
+		site = get_site(context)
+		frappe.init(site=site)
+		try:
+			url = frappe.utils.get_url()
+		finally:
+			frappe.destroy()
+
+	report = run_benchmark(
+		url,
+		users=users,
+		turns=turns,
+		concurrency=concurrency,
+		think_time=think_time,
+		seed=seed
+	)
+	click.echo(write_report(report, output))
+
+
+@click.command("chatz-bench-guest")
+@click.option("--url", default=None, help="Site or reverse proxy URL (defaults to the site's configured URL)")
+@click.option("--page-loads", default=500, type=int, help="Anonymous page views per mode")
+@click.option("--concurrency", default=16, type=int, help="Page views in flight")
+@click.option("--output", default=None, help="Write the JSON report to this file")
+@pass_context
+def bench_guest(context, url, page_loads, concurrency, output):
+	"""Measure anonymous page-load throughput of the guest config (uncached vs cacheable)"""
+	from chatz.benchmarks.guest import run_guest_benchmark
+	from chatz.benchmarks.stats import write_report
+
+	if not url:
+		site = get_site(context)
+		frappe.init(site=site)
+		try:
+			url = frappe.utils.get_url()
+		finally:
+			frappe.destroy()
+
+	report = run_guest_benchmark(url, page_loads=page_loads, concurrency=concurrency)
+	click.echo(write_report(report, output))
+
+
+@click.command("chatz-bench-compare")
+@click.argument("baseline")
+@click.argument("current")
+@click.option("--threshold", default=0.10, type=float, help="Relative slowdown tolerated")
+@click.option("--metric", default="p95_ms", help="Latency metric to compare")
+def bench_compare(baseline, current, threshold, metric):
+	"""Compare two chatz-bench reports and fail on regressions"""
+	from chatz.benchmarks.stats import compare_reports, load_report
+
+	result = compare_reports(load_report(baseline), load_report(current), threshold, metric)
+	click.echo(json.dumps(result, indent=2))
+	if result["regressions"]:
+		raise SystemExit(1)
+
+
+@click.command("chatz-bench-prefix")
+@click.option("--url", default="http://127.0.0.1:8089/v1", help="OpenAI-compatible base URL (vLLM, llama.cpp or chatz-fake-openai)")
+@click.option("--model", default="fake-large", help="Model to request")
+@click.option("--api-key", default="", help="Bearer token")
+@click.option("--conversations", default=20, type=int, help="Interleaved conversations")
+@click.option("--turns", default=6, type=int, help="User turns per conversation")
+@click.option("--max-tokens", default=60, type=int, help="Response length")
+@click.option("--seed", default=42, type=int, help="Random seed")
+@click.option("--output", default=None, help="Write the JSON report to this file")
+def bench_prefix(url, model, api_key, conversations, turns, max_tokens, seed, output):
+	"""Compare the prefix-cache hit rate of the Standard and Prefix Cached prompt layouts"""
+	from chatz.benchmarks.prefix_cache import run_prefix_cache_benchmark
+	from chatz.benchmarks.stats import write_report
+
+	report = run_prefix_cache_benchmark(
+		url,
+		model,
+		conversations=conversations,
+		turns=turns,
+		api_key=api_key,
+		max_tokens=max_tokens,
+		seed=seed
+	)
+	click.echo(write_report(report, output))
+
+
+@click.command("chatz-bench-batch")
+@click.option("--url", default="http://127.0.0.1:8089/v1", help="OpenAI-compatible base URL (vLLM, llama.cpp or chatz-fake-openai)")
+@click.option("--model", default="fake-large", help="Model to request")
+@click.option("--api-key", default="", help="Bearer token")
+@click.option("--records", default=100, type=int, help="Records answered per concurrency level")
+@click.option("--concurrency", default="1,4,8,16", help="Comma separated concurrency levels")
+@click.option("--max-tokens", default=60, type=int, help="Response length")
+@click.option("--max-retries", default=2, type=int, help="Retries per record")
+@click.option("--seed", default=42, type=int, help="Random seed")
+@click.option("--output", default=None, help="Write the JSON report to this file")
+def bench_batch(url, model, api_key, records, concurrency, max_tokens, max_retries, seed, output):
+	"""Measure batch ("ask each selected record") throughput per concurrency level"""
+	from chatz.benchmarks.batch import run_batch_benchmark
+	from chatz.benchmarks.stats import write_report
+
+	report = run_batch_benchmark(
+		url,
+		model,
+		records=records,
+		concurrency_levels=[int(c) for c in concurrency.split(",") if c.strip()],
+		api_key=api_key,
+		max_tokens=max_tokens,
+		max_retries=max_retries,
+		seed=seed
+	)
+	click.echo(write_report(report, output))
+
+
+@click.command("chatz-bench-history")
+@click.option("--conversations", default=100, type=int, help="Conversations written per backend")
+@click.option("--messages", default=10, type=int, help="Messages per conversation")
+@click.option("--window", default=10, type=int, help="Messages read per conversation")
+@click.option("--seed", default=42, type=int, help="Random seed")
+@click.option("--output", default=None, help="Write the JSON report to this file")
+@pass_context
+def bench_history(context, conversations, messages, window, seed, output):
+	"""Compare write and read throughput of the history storage backends"""
+	from chatz.benchmarks.history_backends import run_history_benchmark
+	from chatz.benchmarks.stats import write_report
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		report = run_history_benchmark(
+			conversations=conversations,
+			messages_per_conversation=messages,
+			window=window,
+			seed=seed
+		)
+		click.echo(write_report(report, output))
+	finally:
+		frappe.destroy()
+
+
+@click.command("chatz-replay")
+@click.option("--target", "targets", multiple=True, required=True, help="Chatz API name, \"<Chatz API>@<model>\" or \"<base URL>@<model>\" (repeatable; the first is the baseline)")
+@click.option("--conversations", default=50, type=int, help="Conversations sampled from Chatz History (one turn each)")
+@click.option("--api", default=None, help="Only conversations sent through this Chatz API")
+@click.option("--from-date", default=None, help="Only conversations with messages on or after this date")
+@click.option("--to-date", default=None, help="Only conversations with messages on or before this date")
+@click.option("--concurrency", default=4, type=int, help="Requests in flight per target")
+@click.option("--max-tokens", default=256, type=int, help="Response length limit")
+@click.option("--seed", default=42, type=int, help="Random seed for sampling and requests")
+@click.option("--output", default=None, help="Write the JSON report to this file")
+@pass_context
+def replay(context, targets, conversations, api, from_date, to_date, concurrency, max_tokens, seed, output):
+	"""Replay sampled real conversation turns against models and endpoints and compare them"""
+	from chatz.benchmarks.replay import run_replay
+	from chatz.benchmarks.replay_cases import load_replay_cases, resolve_targets
+	from chatz.benchmarks.stats import write_report
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		cases = load_replay_cases(conversations, seed, api=api, from_date=from_date, to_date=to_date)
+		if not cases:
+			raise click.ClickException("No conversations to replay")
+		report = run_replay(cases, resolve_targets(targets), concurrency=concurrency, max_tokens=max_tokens, seed=seed)
+		click.echo(write_report(report, output))
+	finally:
+		frappe.destroy()
+
+
+@click.command("chatz-asset-report")
+@pass_context
+def asset_report(context):
+	"""Report the size of Chatz assets loaded eagerly vs on first open"""
+	from chatz.benchmarks.assets import asset_report as build_asset_report
+
+	site = get_site(context)
+	frappe.init(site=site)
+	try:
+		click.echo(json.dumps(build_asset_report(), indent=2))
+	finally:
+		frappe.destroy()
+
+
+@click.command("chatz-export")
+@click.option("--output", required=True, help="Output file")
+@click.option("--format", "export_format", default="jsonl", type=click.Choice(["jsonl", "csv", "parquet"]), help="Output format")
+@click.option("--from-date", default=None, help="Only messages created on or after this date")
+@click.option("--to-date", default=None, help="Only messages created on or before this date")
+@click.option("--user", "users", multiple=True, help="Only messages of this user (repeatable)")
+@click.option("--api", "apis", multiple=True, help="Only messages sent through this Chatz API (repeatable)")
+@click.option("--since", default=None, help="Watermark of a previous export")
+@click.option("--watermark-file", default=None, help="Read --since from this file and store the new watermark in it")
+@click.option("--batch-size", default=1000, type=int, help="Rows per query")
+@click.option("--no-compress", is_flag=True, default=False, help="Write uncompressed output")
+@pass_context
+def export(context, output, export_format, from_date, to_date, users, apis, since, watermark_file, batch_size, no_compress):
+	"""Export Chatz History to JSONL/CSV/Parquet in constant memory"""
+	import os
+
+	from chatz.utils.history_export import end_watermark, export_cutoff, iter_export, write_parquet
+
+	if watermark_file and not since and os.path.exists(watermark_file):
+		with open(watermark_file) as f:
+			since = f.read().strip() or None
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		cutoff = export_cutoff()
+		filters = {
+			"from_date": from_date,
+			"to_date": to_date,
+			"users": list(users),
+			"api_used": list(apis),
+			"since": since,
+			"cutoff": cutoff,
+			"batch_size": batch_size
+		}
+
+		if export_format == "parquet":
+			write_parquet(output, compress=not no_compress, **filters)
+		else:
+			with open(output, "wb") as f:
+				for chunk in iter_export(export_format, compress=not no_compress, **filters):
+					f.write(chunk)
+
+		# Only advance the watermark once the whole export was written
+		watermark = end_watermark(cutoff)
+		if watermark_file:
+			with open(watermark_file, "w") as f:
+				f.write(watermark)
+
+		click.echo(json.dumps({"output": output, "since": since, "watermark": watermark}, indent=2))
+	finally:
+		frappe.destroy()
+
+
+@click.command("chatz-rollup")
+@click.option("--rebuild", is_flag=True, default=False, help="Drop all rollups and rebuild from scratch")
+@pass_context
+def rollup(context, rebuild):
+	"""Update the Chatz Usage Daily rollups now"""
+	from chatz.chatz.doctype.chatz_usage_daily.chatz_usage_daily import rebuild_rollups, update_rollups
+
+	site = get_site(context)
+	frappe.init(site=site)
+	frappe.connect()
+	try:
+		result = rebuild_rollups() if rebuild else update_rollups()
+		click.echo(json.dumps(result, indent=2))
+	finally:
+		frappe.destroy()
+
+
+commands = [fake_openai, seed, bench, bench_guest, bench_compare, bench_prefix, bench_batch, bench_history, replay, asset_report, export, rollup]
@@ -25,24 +25,14 @@ app_license = "mit"
 # ------------------
 
 # include js, css files in header of desk.html
-app_include_css = "/assets/chatz/css/chatz_widget.css"
-app_include_js = [
-	"/assets/chatz/js/chatz_context.js",
-	"/assets/chatz/js/chatz_api_client.js",
-	"/assets/chatz/js/chatz_history_manager.js",
-	"/assets/chatz/js/chatz_widget.js",
-	"/assets/chatz/js/chatz_init.js"
-]
+# Only the small launcher is loaded on every page; the full widget
+# (chatz_widget.bundle.js/.css) is loaded by the launcher on first open
+app_include_css = "chatz_launcher.bundle.css"
+app_include_js = "chatz_launcher.bundle.js"
 
 # include js, css files in header of web template
-# web_include_css = "/assets/chatz/css/chatz_widget.css"
-# web_include_js = [
-# 	"/assets/chatz/js/chatz_context.js",
-# 	"/assets/chatz/js/chatz_api_client.js",
-# 	"/assets/chatz/js/chatz_history_manager.js",
-# 	"/assets/chatz/js/chatz_widget.js",
-# 	"/assets/chatz/js/chatz_init.js"
-# ]
+# web_include_css = "chatz_launcher.bundle.css"
+# web_include_js = "chatz_launcher.bundle.js"
 
 # include custom scss in every website theme (without file extension ".scss")
 # website_theme_scss = "chatz/public/scss/website"
@@ -149,6 +139,21 @@ app_include_js = [
 # ---------------
 # Hook on document methods and events
 
+# Keep the retrieval index current (a cached DocType check for non-indexed DocTypes)
+doc_events = {
+	"*": {
+		"on_update": "chatz.utils.retrieval.on_doc_change",
+		"on_submit": "chatz.utils.retrieval.on_doc_change",
+		"on_cancel": "chatz.utils.retrieval.on_doc_change",
+		"on_update_after_submit": "chatz.utils.retrieval.on_doc_change",
+		"on_trash": "chatz.utils.retrieval.on_doc_trash",
+		"after_rename": "chatz.utils.retrieval.on_doc_rename"
+	},
+	"File": {
+		"after_insert": "chatz.utils.attachments.on_file_upload"
+	}
+}
+
 # doc_events = {
 # 	"*": {
 # 		"on_update": "method",
@@ -160,6 +165,17 @@ app_include_js = [
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"cron": {
+		"*/10 * * * *": [
+			"chatz.utils.conversation_titles.generate_titles"
+		]
+	},
+	"hourly_long": [
+		"chatz.chatz.doctype.chatz_usage_daily.chatz_usage_daily.update_rollups"
+	]
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"chatz.tasks.all"
@@ -209,7 +225,8 @@ app_include_js = [
 # Request Events
 # ----------------
 # before_request = ["chatz.utils.before_request"]
-# after_request = ["chatz.utils.after_request"]
+# Server-Timing header for profiled Chatz endpoints
+after_request = ["chatz.utils.profiling.add_server_timing"]
 
 # Job Events
 # ----------
@@ -0,0 +1,41 @@
+import frappe
+
+from chatz.utils.history_backends import PREVIEW_CHARS
+
+
+def execute():
+	"""Build a Chatz Conversation summary for every existing Chatz History conversation"""
+	now = frappe.utils.now_datetime()
+
+	# Same name as chatz.utils.history_backends.conversation_key
+	frappe.db.sql("""
+		INSERT IGNORE INTO `tabChatz Conversation`
+			(name, user, conversation_id, message_count, last_message_at, api_used, first_message,
+			title_attempts, owner, modified_by, creation, modified)
+		SELECT
+			LEFT(SHA1(CONCAT(h.user, '\\n', h.conversation_id)), 20),
+			h.user,
+			h.conversation_id,
+			COUNT(*),
+			MAX(h.created_at),
+			(
+				SELECT latest.api_used FROM `tabChatz History` latest
+				WHERE latest.user = h.user AND latest.conversation_id = h.conversation_id
+				ORDER BY latest.created_at DESC
+				LIMIT 1
+			),
+			(
+				SELECT LEFT(first.message_content, %(preview)s) FROM `tabChatz History` first
+				WHERE first.user = h.user AND first.conversation_id = h.conversation_id
+					AND first.message_type = 'user'
+				ORDER BY first.created_at ASC
+				LIMIT 1
+			),
+			0,
+			h.user,
+			h.user,
+			%(now)s,
+			%(now)s
+		FROM `tabChatz History` h
+		GROUP BY h.user, h.conversation_id
+	""", {"preview": PREVIEW_CHARS, "now": now})
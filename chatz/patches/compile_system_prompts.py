@@ -0,0 +1,15 @@
+import frappe
+
+from chatz.utils.prompt_builder import count_tokens, html_to_prompt_text
+
+
+def execute():
+	"""Compile the system prompt of existing Chatz APIs to plain text"""
+	for api in frappe.get_all("Chatz API", fields=["name", "system_prompt"]):
+		text = html_to_prompt_text(api.system_prompt)
+		frappe.db.set_value(
+			"Chatz API",
+			api.name,
+			{"system_prompt_text": text, "system_prompt_tokens": count_tokens(text)},
+			update_modified=False
+		)
@@ -0,0 +1,16 @@
+import frappe
+
+from chatz.chatz.doctype.chatz_usage_daily.chatz_usage_daily import rebuild_day
+
+
+def execute():
+	"""Re-aggregate the rollup days with timings, to count their TTFT responses"""
+	days = frappe.get_all(
+		"Chatz Usage Daily",
+		filters={"timed_responses": [">", 0]},
+		pluck="date",
+		distinct=True
+	)
+	for day in sorted(set(days)):
+		rebuild_day(day)
+		frappe.db.commit()
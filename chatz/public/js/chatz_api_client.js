@@ -3,42 +3,97 @@
  * Handles OpenAI-compatible API calls with streaming support
  */
 
-const ChatzAPIClient = {
+import { ChatzMarkdown } from "./chatz_markdown";
+
+const PROXY_METHOD = "chatz.api.config";
+const TURN_METHOD = "chatz.api.turn.stream_turn";
+
+// Fields a save changes without changing the document's content (left out of diffs)
+const VERSION_FIELDS = ["modified", "modified_by"];
+
+export const ChatzAPIClient = {
 	/**
 	 * Call OpenAI-compatible API with streaming
+	 *
+	 * Aborting options.signal stops the stream: the fetch is aborted (which
+	 * closes the connection to the API or to the server proxy) and onComplete
+	 * is called with { stopped: true }. For proxied APIs, also call
+	 * cancelStream with the same streamId.
+	 *
+	 * The proxy may not use the requested model (see resolve_model); the one
+	 * it used is passed to onComplete as `model` (null when not proxied).
+	 *
+	 * Reasoning models may stream their thoughts apart from the answer
+	 * (reasoning_content, or reasoning with some servers); those deltas go
+	 * to options.onReasoning instead of onChunk.
+	 *
+	 * With options.turn (proxied APIs only) messages is not used: the turn is
+	 * sent to chatz.api.turn.stream_turn, which builds the prompt and saves
+	 * both messages, and options.onSaved receives their IDs.
+	 *
 	 * @param {Object} config - API configuration
 	 * @param {Array} messages - Message history
 	 * @param {Function} onChunk - Callback for each streamed chunk
-	 * @param {Function} onComplete - Callback when complete
+	 * @param {Function} onComplete - Callback when complete, receives { stopped, model }
 	 * @param {Function} onError - Callback on error
+	 * @param {Object} options - { signal: AbortSignal, streamId: String, onReasoning: Function,
+	 *     turn: Object (ChatzHistoryManager.startServerTurn), onSaved: Function } (optional)
 	 */
-	callStreamingAPI: async function(config, messages, onChunk, onComplete, onError) {
+	callStreamingAPI: async function(config, messages, onChunk, onComplete, onError, options = {}) {
+		let model = null;
 		try {
-			const endpoint = config.api_endpoint.replace(/\/$/, "");
-			const url = `${endpoint}/chat/completions`;
-
-			const payload = {
-				model: config.model_name,
-				messages: messages,
-				stream: true,
-				temperature: 1.0
-			};
-
-			// Build headers
+			let url;
+			let payload;
 			const headers = {
-				"Content-Type": "application/json",
-				"Authorization": `Bearer ${config.api_key}`
+				"Content-Type": "application/json"
 			};
 
-			// Add CSRF token if enabled - use frappe.csrf_token directly
-			if (config.include_csrf_token && frappe.csrf_token) {
+			if (config.use_server_proxy && options.turn) {
+				const turn = options.turn;
+				url = `/api/method/${TURN_METHOD}`;
+				payload = {
+					api_config_name: config.api_config_name,
+					conversation_id: turn.conversationId,
+					message: turn.message,
+					context: JSON.stringify(turn.context),
+					model: config.model_name,
+					stream_id: options.streamId,
+					client_message_id: turn.clientMessageId,
+					response_message_id: turn.responseMessageId
+				};
 				headers["X-Frappe-CSRF-Token"] = frappe.csrf_token;
+			} else if (config.use_server_proxy) {
+				// Relayed by the Frappe server, which holds the API key
+				url = `/api/method/${PROXY_METHOD}.call_streaming_api`;
+				payload = {
+					api_config_name: config.api_config_name,
+					messages: JSON.stringify(messages),
+					model: config.model_name,
+					stream_id: options.streamId
+				};
+				headers["X-Frappe-CSRF-Token"] = frappe.csrf_token;
+			} else {
+				const endpoint = config.api_endpoint.replace(/\/$/, "");
+				url = `${endpoint}/chat/completions`;
+				payload = {
+					model: config.model_name,
+					messages: messages,
+					stream: true,
+					temperature: 1.0
+				};
+				headers["Authorization"] = `Bearer ${config.api_key}`;
+
+				// Add CSRF token if enabled - use frappe.csrf_token directly
+				if (config.include_csrf_token && frappe.csrf_token) {
+					headers["X-Frappe-CSRF-Token"] = frappe.csrf_token;
+				}
 			}
 
 			const response = await fetch(url, {
 				method: "POST",
 				headers: headers,
-				body: JSON.stringify(payload)
+				body: JSON.stringify(payload),
+				signal: options.signal
 			});
 
 			if (!response.ok) {
@@ -51,6 +106,16 @@ const ChatzAPIClient = {
 				return;
 			}
 
+			// The proxy answers with a JSON error dict when the request is refused
+			if ((response.headers.get("Content-Type") || "").includes("application/json")) {
+				const result = await response.json();
+				const error = result.message || {};
+				onError(`API Error: ${error.message || "Unexpected response"}${error.error ? " - " + error.error : ""}`);
+				return;
+			}
+
+			model = response.headers.get("X-Chatz-Model");
+
 			const reader = response.body.getReader();
 			const decoder = new TextDecoder();
 			let buffer = "";
@@ -69,12 +134,22 @@ const ChatzAPIClient = {
 					if (line.startsWith("data: ")) {
 						const data = line.slice(6);
 						if (data === "[DONE]") {
-							onComplete();
+							onComplete({ stopped: false, model: model });
 							return;
 						}
 						try {
 							const json = JSON.parse(data);
-							const chunk = json.choices?.[0]?.delta?.content;
+							if (json.chatz) {
+								// IDs of the messages a server turn saved
+								if (options.onSaved) options.onSaved(json.chatz);
+								continue;
+							}
+							const delta = json.choices?.[0]?.delta;
+							const thought = delta?.reasoning_content || delta?.reasoning;
+							if (thought && options.onReasoning) {
+								options.onReasoning(thought);
+							}
+							const chunk = delta?.content;
 							if (chunk) {
 								chunkCount++;
 								onChunk(chunk);
@@ -89,59 +164,177 @@ const ChatzAPIClient = {
 				buffer = lines[lines.length - 1];
 			}
 
-			onComplete();
+			onComplete({ stopped: false, model: model });
 		} catch (error) {
+			if (error.name === "AbortError") {
+				onComplete({ stopped: true, model: model });
+				return;
+			}
 			onError(`Network error: ${error.message}`);
 		}
 	},
 
+	/**
+	 * Ask the server proxy to stop a stream
+	 *
+	 * Aborting the fetch already closes the connection to Frappe; this also
+	 * covers reverse proxies that keep reading after the browser went away.
+	 *
+	 * @param {Object} config - API configuration
+	 * @param {String} streamId - ID passed to callStreamingAPI
+	 */
+	cancelStream: function(config, streamId) {
+		if (!config.use_server_proxy || !streamId) return;
+
+		frappe.call({
+			method: `${PROXY_METHOD}.cancel_stream`,
+			args: { stream_id: streamId },
+			error: () => {
+				// The stream is already closed from the browser side
+			}
+		});
+	},
+
+	/**
+	 * Generate an ID for a stream (used to cancel it on the server)
+	 * @returns {String} Stream ID
+	 */
+	generateStreamId: function() {
+		return "stream_" + Date.now() + "_" + Math.random().toString(36).substr(2, 9);
+	},
+
 	/**
 	 * Build messages array for API call
+	 *
+	 * With the "Prefix Cached" layout the system message is the Chatz API's
+	 * precompiled system prompt only, identical for every user and turn, and
+	 * the volatile context (time to the hour, user, document) is prepended to
+	 * the final user message, so backends with prefix caching can reuse
+	 * everything before the last turn. Mirrored in chatz/utils/prompt_builder.py.
+	 *
+	 * The open document is sent once per version: replayed user turns carry
+	 * the document data saved with them (in full the first time, then only
+	 * its changes), and the current turn adds nothing when the document is
+	 * unchanged since, or a field-level diff when it was edited.
+	 *
 	 * @param {Object} config - API configuration
 	 * @param {Array} history - Previous messages
 	 * @param {String} userMessage - Current user message
 	 * @param {Object} context - Current context (optional)
+	 * @param {Array} retrieved - Indexed snippets from search_context (optional)
+	 * @param {Array} attachments - Attachment excerpts from get_attachment_context (optional)
 	 * @returns {Array} Messages array for API
 	 */
-	buildMessagesArray: function(config, history, userMessage, context) {
+	buildMessagesArray: function(config, history, userMessage, context, retrieved, attachments) {
 		const messages = [];
+		const prefixCached = config.prompt_layout === "Prefix Cached";
+		const now = new Date();
 
-		// Build system prompt with context
-		let systemPrompt = config.system_prompt || "You are a helpful assistant.";
+		// Document versions sent with earlier turns, by doctype and name
+		const sent = {};
+		const historyMessages = (history || []).map(msg => {
+			if (msg.message_type === "user") {
+				const documentBlock = this.replayDocument(msg, sent, prefixCached);
+				return {
+					role: "user",
+					content: documentBlock ? `${documentBlock}\n---\n\n${msg.message_content}` : msg.message_content
+				};
+			}
+			return {
+				role: "assistant",
+				// Thoughts are not sent back (older messages stored them inline)
+				content: ChatzMarkdown.splitReasoning(msg.message_content).content
+			};
+		});
+		const previous = context ? sent[`${context.doctype}\n${context.docname}`] : undefined;
 
-		// Add user and time information
-		let contextInfo = "\n\nCurrent Information:\n";
+		if (prefixCached) {
+			messages.push({
+				role: "system",
+				content: config.system_prompt_text || config.system_prompt || "You are a helpful assistant."
+			});
+		} else {
+			// Build system prompt with context
+			const dateTimeStr = now.toLocaleString('en-US', {
+				weekday: 'long',
+				year: 'numeric',
+				month: 'long',
+				day: 'numeric',
+				hour: '2-digit',
+				minute: '2-digit',
+				second: '2-digit',
+				timeZoneName: 'short'
+			});
+			const systemPrompt = (config.system_prompt || "You are a helpful assistant.")
+				+ "\n\n" + this.formatContextInfo(config, context, dateTimeStr, false, retrieved, attachments, previous);
 
-		// Add current date and time
-		const now = new Date();
-		const dateTimeStr = now.toLocaleString('en-US', {
-			weekday: 'long',
-			year: 'numeric',
-			month: 'long',
-			day: 'numeric',
-			hour: '2-digit',
-			minute: '2-digit',
-			second: '2-digit',
-			timeZoneName: 'short'
-		});
-		contextInfo += `- Current Date & Time: ${dateTimeStr}\n`;
+			messages.push({
+				role: "system",
+				content: systemPrompt
+			});
+		}
+
+		// Add conversation history
+		messages.push(...historyMessages);
+
+		// Add current user message
+		if (prefixCached) {
+			const hourStr = now.toLocaleDateString('en-US', {
+				weekday: 'long',
+				year: 'numeric',
+				month: 'long',
+				day: 'numeric'
+			}) + `, ${String(now.getHours()).padStart(2, "0")}:00`;
+
+			messages.push({
+				role: "user",
+				content: `${this.formatContextInfo(config, context, hourStr, true, retrieved, attachments, previous)}\n---\n\n${userMessage}`
+			});
+		} else {
+			messages.push({
+				role: "user",
+				content: userMessage
+			});
+		}
+
+		return messages;
+	},
+
+	/**
+	 * Format the "Current Information" block (time, user, Desk context and attachments)
+	 * @param {Object} config - API configuration
+	 * @param {Object} context - Current context (optional)
+	 * @param {String} timeLabel - Formatted current time
+	 * @param {Boolean} compact - Serialize document data without indentation
+	 * @param {Array} retrieved - Indexed snippets (optional)
+	 * @param {Array} attachments - Attachment excerpts (optional)
+	 * @param {Object} previous - Version of the open document sent earlier in the conversation (optional)
+	 * @returns {String} Context block
+	 */
+	formatContextInfo: function(config, context, timeLabel, compact, retrieved, attachments, previous) {
+		let contextInfo = "Current Information:\n";
+		contextInfo += `- Current Date & Time: ${timeLabel}\n`;
 
 		// Add user name if available
 		if (config.user) {
 			contextInfo += `- User: ${config.user}\n`;
 		}
 
-		// Add context information to system prompt
 		if (context) {
 			if (context.doctype && context.docname) {
 				contextInfo += `- Document: ${context.doctype} (${context.docname})\n`;
 
 				// Include document data if available
 				if (context.document_data) {
-					contextInfo += "\nDocument Data:\n";
-					contextInfo += "```json\n";
-					contextInfo += JSON.stringify(context.document_data, null, 2);
-					contextInfo += "\n```\n";
+					contextInfo += this.formatDocumentData(context.document_data, previous, compact);
+				}
+				if (attachments && attachments.length) {
+					contextInfo += "\nAttachments:\n";
+					attachments.forEach(attachment => {
+						contextInfo += attachment.pending
+							? `[${attachment.file_name}] (still being read, not available yet)\n`
+							: `[${attachment.file_name}]\n${attachment.content}\n`;
+					});
 				}
 			} else if (context.doctype) {
 				contextInfo += `- List View: ${context.doctype}\n`;
@@ -154,30 +347,238 @@ const ChatzAPIClient = {
 			}
 		}
 
-		systemPrompt += contextInfo;
+		if (retrieved && retrieved.length) {
+			contextInfo += "\nRelevant Records:\n";
+			retrieved.forEach(snippet => {
+				contextInfo += `- ${snippet.doctype} ${snippet.name} (${snippet.title}): ${snippet.content}\n`;
+			});
+		}
+
+		return contextInfo;
+	},
+
+	/**
+	 * Format the document data of a turn
+	 * @param {Object} data - Document (frappe.client.get)
+	 * @param {Object} previous - Version sent earlier in the conversation (optional)
+	 * @param {Boolean} compact - Serialize the whole document without indentation
+	 * @returns {String} The whole document, a one-line note when it is unchanged
+	 *     since previous, or only its changes (documentDiff, always compact)
+	 */
+	formatDocumentData: function(data, previous, compact) {
+		if (!previous) {
+			const serialized = compact ? JSON.stringify(data) : JSON.stringify(data, null, 2);
+			return `\nDocument Data:\n\`\`\`json\n${serialized}\n\`\`\`\n`;
+		}
+
+		const changes = this.documentDiff(previous, data);
+		if (!Object.keys(changes).length) {
+			return "\nDocument Data: unchanged since it was sent earlier in this conversation\n";
+		}
+		return `\nDocument Changes (since it was sent earlier in this conversation):\n\`\`\`json\n${JSON.stringify(changes)}\n\`\`\`\n`;
+	},
+
+	/**
+	 * Document block of a replayed user turn, recording its version in sent
+	 * @param {Object} message - History message with its saved document_context
+	 * @param {Object} sent - "doctype\nname" -> document sent with an earlier turn
+	 * @param {Boolean} compact - Serialize a whole document without indentation
+	 * @returns {String} Block to put ahead of the message, or "" if it sent nothing new
+	 */
+	replayDocument: function(message, sent, compact) {
+		const context = this.messageContext(message);
+		if (!(context.doctype && context.docname)) {
+			return "";
+		}
+
+		const key = `${context.doctype}\n${context.docname}`;
+		const previous = sent[key];
+		const data = this.restoreDocument(context, previous);
+		if (!data) {
+			return "";
+		}
+		sent[key] = data;
+		if (previous && !Object.keys(this.documentDiff(previous, data)).length) {
+			return "";
+		}
+		return `- Document: ${context.doctype} (${context.docname})\n` + this.formatDocumentData(data, previous, compact);
+	},
+
+	/**
+	 * Latest version of a document sent with the turns in history
+	 * @returns {Object|undefined} Document data, or undefined if no turn in history sent it
+	 */
+	lastSentDocument: function(history, doctype, docname) {
+		const sent = {};
+		(history || []).forEach(msg => {
+			if (msg.message_type === "user") {
+				this.replayDocument(msg, sent, false);
+			}
+		});
+		return sent[`${doctype}\n${docname}`];
+	},
+
+	/**
+	 * Desk context of a turn as it is saved with its messages
+	 *
+	 * Mirrors stored_context in chatz/utils/prompt_builder.py: a document sent
+	 * earlier in the conversation is stored as its changes since then and its
+	 * VERSION_FIELDS, not whole again with every turn.
+	 *
+	 * @param {Object} context - Desk context, optionally with document_data
+	 * @param {Object} previous - Version of the document sent earlier (optional)
+	 * @returns {Object} Context to save as document_context
+	 */
+	storedContext: function(context, previous) {
+		const data = context && context.document_data;
+		if (!previous || !data || typeof data !== "object" || Array.isArray(data)) {
+			return context;
+		}
+		const stored = Object.assign({}, context);
+		delete stored.document_data;
+		stored.document_changes = this.documentDiff(previous, data);
+		stored.document_version = {};
+		VERSION_FIELDS.forEach(field => {
+			if (field in data) {
+				stored.document_version[field] = data[field];
+			}
+		});
+		return stored;
+	},
+
+	/**
+	 * Document data saved with a turn (see storedContext)
+	 * @param {Object} context - Saved document_context
+	 * @param {Object} previous - Version of the document sent with an earlier turn (optional)
+	 * @returns {Object|null} Document data, or null if the turn sent none, or
+	 *     only changes to a version that is not known (sent before the history window)
+	 */
+	restoreDocument: function(context, previous) {
+		const isObject = value => Boolean(value) && typeof value === "object" && !Array.isArray(value);
+		if (isObject(context.document_data)) {
+			return context.document_data;
+		}
+		if (!previous || !isObject(context.document_changes)) {
+			return null;
+		}
+		return Object.assign(this.applyDiff(previous, context.document_changes), context.document_version || {});
+	},
 
-		messages.push({
-			role: "system",
-			content: systemPrompt
+	/**
+	 * Version of a document with changes applied (the inverse of documentDiff)
+	 */
+	applyDiff: function(before, diff) {
+		const after = Object.assign({}, before);
+		Object.keys(diff).forEach(field => {
+			const value = diff[field];
+			if (this.isTable(before[field]) && value && typeof value === "object" && !Array.isArray(value)) {
+				after[field] = this.applyTableDiff(before[field], value);
+			} else {
+				after[field] = value;
+			}
 		});
+		return after;
+	},
 
-		// Add conversation history
-		if (history && Array.isArray(history)) {
-			history.forEach(msg => {
-				messages.push({
-					role: msg.message_type === "user" ? "user" : "assistant",
-					content: msg.message_content
-				});
-			});
+	/**
+	 * Rows of a child table with row-level changes applied (see tableDiff)
+	 */
+	applyTableDiff: function(rows, diff) {
+		const changed = diff.changed || {};
+		const removed = new Set(diff.removed || []);
+		return rows
+			.filter(row => !removed.has(row.name))
+			.map(row => changed[row.name] ? this.applyDiff(row, changed[row.name]) : row)
+			.concat(diff.added || []);
+	},
+
+	/**
+	 * Saved document_context of a history message as an object
+	 * @param {Object} message - History message
+	 * @returns {Object} Context, empty if missing or invalid
+	 */
+	messageContext: function(message) {
+		let context = message.document_context;
+		if (typeof context === "string") {
+			try {
+				context = JSON.parse(context);
+			} catch (e) {
+				return {};
+			}
 		}
+		return context && typeof context === "object" ? context : {};
+	},
 
-		// Add current user message
-		messages.push({
-			role: "user",
-			content: userMessage
+	/**
+	 * Field-level changes between two versions of a document
+	 *
+	 * Mirrors document_diff in chatz/utils/prompt_builder.py. VERSION_FIELDS
+	 * are ignored. Child tables are compared row by row, by row name.
+	 *
+	 * @param {Object} before - Earlier version
+	 * @param {Object} after - Current version
+	 * @returns {Object} Changed fields with their new value (null when removed);
+	 *     a changed child table maps to { added, changed, removed }. Empty when nothing changed.
+	 */
+	documentDiff: function(before, after) {
+		const diff = {};
+		const fields = Object.keys(after).concat(Object.keys(before).filter(field => !(field in after)));
+		fields.forEach(field => {
+			if (VERSION_FIELDS.includes(field)) {
+				return;
+			}
+			const old = field in before ? before[field] : null;
+			const value = field in after ? after[field] : null;
+			if (this.isTable(old) && this.isTable(value)) {
+				const changes = this.tableDiff(old, value);
+				if (Object.keys(changes).length) {
+					diff[field] = changes;
+				}
+			} else if (JSON.stringify(old) !== JSON.stringify(value)) {
+				diff[field] = value;
+			}
 		});
+		return diff;
+	},
 
-		return messages;
+	isTable: function(value) {
+		return Array.isArray(value) && value.every(row => row && typeof row === "object" && !Array.isArray(row));
+	},
+
+	/**
+	 * Row-level changes of a child table (see documentDiff)
+	 * @returns {Object} { added: [rows], changed: {row name: changes}, removed: [row names] }, without empty parts
+	 */
+	tableDiff: function(oldRows, newRows) {
+		const oldByName = new Map(oldRows.map(row => [row.name, row]));
+		const newNames = new Set(newRows.map(row => row.name));
+
+		const added = [];
+		const changed = {};
+		newRows.forEach(row => {
+			const previous = oldByName.get(row.name);
+			if (!previous) {
+				added.push(row);
+				return;
+			}
+			const changes = this.documentDiff(previous, row);
+			if (Object.keys(changes).length) {
+				changed[row.name] = changes;
+			}
+		});
+
+		const diff = {};
+		if (added.length) {
+			diff.added = added;
+		}
+		if (Object.keys(changed).length) {
+			diff.changed = changed;
+		}
+		const removed = oldRows.filter(row => !newNames.has(row.name)).map(row => row.name);
+		if (removed.length) {
+			diff.removed = removed;
+		}
+		return diff;
 	},
 
 	/**
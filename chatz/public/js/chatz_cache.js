@@ -0,0 +1,301 @@
+/**
+ * Chatz Cache Module
+ * IndexedDB store of conversations, messages and queued writes for the current user
+ */
+
+const DB_VERSION = 1;
+
+/**
+ * Wrap an IDBRequest in a Promise
+ * @param {IDBRequest} request - IndexedDB request
+ * @returns {Promise} Resolves with the request result
+ */
+function promisify(request) {
+	return new Promise((resolve, reject) => {
+		request.onsuccess = () => resolve(request.result);
+		request.onerror = () => reject(request.error);
+	});
+}
+
+export const ChatzCache = {
+	dbPromise: null,
+
+	/**
+	 * Whether IndexedDB can be used in this browser
+	 * @returns {Boolean} True if available
+	 */
+	isAvailable: function() {
+		return typeof indexedDB !== "undefined" && Boolean(frappe.session && frappe.session.user)
+			&& frappe.session.user !== "Guest";
+	},
+
+	/**
+	 * Open (and create/upgrade) the per-user database
+	 * @returns {Promise<IDBDatabase|null>} Database, or null if unavailable
+	 */
+	open: function() {
+		if (!this.isAvailable()) {
+			return Promise.resolve(null);
+		}
+		if (this.dbPromise) {
+			return this.dbPromise;
+		}
+
+		this.dbPromise = new Promise((resolve) => {
+			const request = indexedDB.open(`chatz_${frappe.session.user}`, DB_VERSION);
+
+			request.onupgradeneeded = () => {
+				const db = request.result;
+				if (!db.objectStoreNames.contains("conversations")) {
+					db.createObjectStore("conversations", { keyPath: "conversation_id" });
+				}
+				if (!db.objectStoreNames.contains("messages")) {
+					const messages = db.createObjectStore("messages", { keyPath: "name" });
+					messages.createIndex("conversation_id", "conversation_id");
+				}
+				if (!db.objectStoreNames.contains("meta")) {
+					db.createObjectStore("meta", { keyPath: "key" });
+				}
+				if (!db.objectStoreNames.contains("outbox")) {
+					db.createObjectStore("outbox", { keyPath: "client_message_id" });
+				}
+			};
+
+			request.onsuccess = () => resolve(request.result);
+			request.onerror = () => {
+				console.error("Chatz: Could not open IndexedDB cache", request.error);
+				resolve(null);
+			};
+			request.onblocked = () => resolve(null);
+		});
+
+		return this.dbPromise;
+	},
+
+	/**
+	 * Run a callback against object stores inside one transaction
+	 * @param {Array} storeNames - Stores to open
+	 * @param {String} mode - "readonly" or "readwrite"
+	 * @param {Function} fn - Receives an object of stores, may return a Promise
+	 * @returns {Promise} Resolves with fn's result once the transaction completes
+	 */
+	withStores: async function(storeNames, mode, fn) {
+		const db = await this.open();
+		if (!db) return null;
+
+		const tx = db.transaction(storeNames, mode);
+		const stores = {};
+		storeNames.forEach(name => { stores[name] = tx.objectStore(name); });
+
+		const done = new Promise((resolve, reject) => {
+			tx.oncomplete = resolve;
+			tx.onerror = () => reject(tx.error);
+			tx.onabort = () => reject(tx.error);
+		});
+
+		const result = await fn(stores);
+		await done;
+		return result;
+	},
+
+	/**
+	 * Read a metadata value
+	 * @param {String} key - Metadata key
+	 * @returns {Promise} Stored value or null
+	 */
+	getMeta: async function(key) {
+		const record = await this.withStores(["meta"], "readonly", (s) => promisify(s.meta.get(key)));
+		return record ? record.value : null;
+	},
+
+	/**
+	 * Write a metadata value
+	 * @param {String} key - Metadata key
+	 * @param {*} value - Value to store
+	 */
+	setMeta: function(key, value) {
+		return this.withStores(["meta"], "readwrite", (s) => promisify(s.meta.put({ key: key, value: value })));
+	},
+
+	/**
+	 * List cached conversations, newest first
+	 * @param {Number} limit - Maximum conversations
+	 * @param {String} apiFilter - Optional API name filter
+	 * @returns {Promise<Array>} Conversations in the list_conversations format
+	 */
+	getConversations: async function(limit, apiFilter) {
+		const all = await this.withStores(["conversations"], "readonly", (s) => promisify(s.conversations.getAll()));
+		return (all || [])
+			.filter(conv => !apiFilter || conv.api_used === apiFilter)
+			.sort((a, b) => (b.last_message_at || "").localeCompare(a.last_message_at || ""))
+			.slice(0, limit || 20);
+	},
+
+	/**
+	 * Store conversations from the server listing
+	 * @param {Array} conversations - list_conversations rows
+	 */
+	putConversations: function(conversations) {
+		return this.withStores(["conversations"], "readwrite", async (s) => {
+			for (const conv of conversations) {
+				const existing = await promisify(s.conversations.get(conv.conversation_id));
+				s.conversations.put(Object.assign({}, existing || {}, conv, {
+					complete: existing ? existing.complete : false
+				}));
+			}
+		});
+	},
+
+	/**
+	 * Get cached messages of a conversation if the cache holds all of them
+	 * @param {String} conversationId - Conversation ID
+	 * @param {Number} limit - Return only the latest N messages
+	 * @returns {Promise<Array|null>} Messages oldest first, or null if not fully cached
+	 */
+	getMessages: async function(conversationId, limit) {
+		return this.withStores(["conversations", "messages"], "readonly", async (s) => {
+			const conv = await promisify(s.conversations.get(conversationId));
+			if (!conv || !conv.complete) return null;
+
+			const messages = await promisify(s.messages.index("conversation_id").getAll(conversationId));
+			messages.sort((a, b) => (a.created_at || "").localeCompare(b.created_at || ""));
+			return limit ? messages.slice(-limit) : messages;
+		});
+	},
+
+	/**
+	 * Store the messages of a conversation
+	 * @param {String} conversationId - Conversation ID
+	 * @param {Array} messages - get_conversation_history rows
+	 * @param {Boolean} complete - True if these are all of the conversation's messages
+	 */
+	putMessages: function(conversationId, messages, complete) {
+		return this.withStores(["conversations", "messages"], "readwrite", async (s) => {
+			messages.forEach(msg => {
+				s.messages.put(Object.assign({ conversation_id: conversationId }, msg));
+			});
+
+			const conv = await promisify(s.conversations.get(conversationId));
+			if (conv) {
+				conv.complete = conv.complete || complete;
+				s.conversations.put(conv);
+			} else if (complete) {
+				s.conversations.put(this.conversationFromMessages(conversationId, messages, true));
+			}
+		});
+	},
+
+	/**
+	 * Add or replace a single message (optimistic writes and confirmed saves)
+	 * @param {Object} message - Message row, must include name and conversation_id
+	 * @param {String} replaces - Name of a local placeholder to remove
+	 * @param {Boolean} isNewConversation - True if the conversation was started in this browser
+	 */
+	putMessage: function(message, replaces, isNewConversation) {
+		return this.applyChanges({
+			messages: [message],
+			deleted: replaces ? [replaces] : [],
+			new_conversations: isNewConversation ? [message.conversation_id] : []
+		});
+	},
+
+	/**
+	 * Apply a delta from get_changes_since
+	 * @param {Object} changes - { messages: [...], deleted: [...], titles: [...], new_conversations: [...] }
+	 * @returns {Promise<Set>} IDs of conversations that changed
+	 */
+	applyChanges: function(changes) {
+		const touched = new Set();
+
+		return this.withStores(["conversations", "messages"], "readwrite", async (s) => {
+			for (const name of changes.deleted || []) {
+				const existing = await promisify(s.messages.get(name));
+				if (existing) {
+					s.messages.delete(name);
+					touched.add(existing.conversation_id);
+				}
+			}
+
+			for (const msg of changes.messages || []) {
+				// A confirmed message replaces its optimistic local copy
+				if (msg.client_message_id) {
+					s.messages.delete(`local:${msg.client_message_id}`);
+				}
+				s.messages.put(msg);
+				touched.add(msg.conversation_id);
+
+				let conv = await promisify(s.conversations.get(msg.conversation_id));
+				if (!conv) {
+					// Unknown conversation: unless it was started here, older messages may
+					// exist, so it is loaded from the server on first open
+					const isNew = (changes.new_conversations || []).includes(msg.conversation_id);
+					conv = this.conversationFromMessages(msg.conversation_id, [], isNew);
+				}
+				if (!conv.last_message_at || (msg.created_at || "") > conv.last_message_at) {
+					conv.last_message_at = msg.created_at;
+					conv.created_at = msg.created_at;
+				}
+				if (!conv.api_used && msg.api_used) {
+					conv.api_used = msg.api_used;
+				}
+				if ((!conv.first_message || conv.first_message === "No preview") && msg.message_type === "user") {
+					conv.first_message = msg.message_content;
+				}
+				s.conversations.put(conv);
+			}
+
+			// Titles are generated in the background after the conversation settled
+			for (const item of changes.titles || []) {
+				const conv = await promisify(s.conversations.get(item.conversation_id));
+				if (conv && conv.title !== item.title) {
+					conv.title = item.title;
+					s.conversations.put(conv);
+					touched.add(item.conversation_id);
+				}
+			}
+
+			return touched;
+		});
+	},
+
+	/**
+	 * Build a conversation record from its messages
+	 */
+	conversationFromMessages: function(conversationId, messages, complete) {
+		const firstUser = messages.find(msg => msg.message_type === "user");
+		const last = messages[messages.length - 1];
+		return {
+			conversation_id: conversationId,
+			api_used: last ? last.api_used : null,
+			first_message: firstUser ? firstUser.message_content : "No preview",
+			last_message_at: last ? last.created_at : null,
+			created_at: last ? last.created_at : null,
+			complete: complete
+		};
+	},
+
+	/**
+	 * Queue a write that could not reach the server
+	 * @param {Object} entry - save_message arguments including client_message_id
+	 */
+	queueWrite: function(entry) {
+		return this.withStores(["outbox"], "readwrite", (s) => promisify(s.outbox.put(entry)));
+	},
+
+	/**
+	 * Get queued writes, oldest first
+	 * @returns {Promise<Array>} Queued save_message arguments
+	 */
+	getQueuedWrites: async function() {
+		const entries = await this.withStores(["outbox"], "readonly", (s) => promisify(s.outbox.getAll()));
+		return (entries || []).sort((a, b) => a.queued_at - b.queued_at);
+	},
+
+	/**
+	 * Remove a write from the queue once the server accepted it
+	 * @param {String} clientMessageId - Queue key
+	 */
+	removeQueuedWrite: function(clientMessageId) {
+		return this.withStores(["outbox"], "readwrite", (s) => promisify(s.outbox.delete(clientMessageId)));
+	}
+};
@@ -0,0 +1,159 @@
+/**
+ * Chatz Compare Module
+ * Sends one prompt to several Chatz APIs at once and measures each stream
+ *
+ * The streams run concurrently through ChatzAPIClient; each one gets a meter
+ * recording time to first token and stream chunks (about one token each with
+ * OpenAI-compatible servers), from which the live readouts are computed.
+ */
+
+import { ChatzAPIClient } from "./chatz_api_client";
+import { ChatzMarkdown } from "./chatz_markdown";
+
+export const ChatzCompare = {
+	// APIs compared at once
+	MIN_APIS: 2,
+	MAX_APIS: 4,
+
+	/**
+	 * Generate the ID linking a prompt to the responses of each API
+	 * @returns {String} Compare group ID
+	 */
+	newGroupId: function() {
+		return "cmp_" + Date.now() + "_" + Math.random().toString(36).substr(2, 9);
+	},
+
+	/**
+	 * Start measuring a stream
+	 * @param {Number} now - Start time (performance.now())
+	 * @returns {Object} Meter
+	 */
+	createMeter: function(now) {
+		return { started: now, firstChunkAt: null, endedAt: null, chunks: 0, chars: 0 };
+	},
+
+	/**
+	 * Count a streamed chunk
+	 */
+	recordChunk: function(meter, chunk, now) {
+		if (meter.firstChunkAt === null) {
+			meter.firstChunkAt = now;
+		}
+		meter.chunks++;
+		meter.chars += chunk.length;
+	},
+
+	/**
+	 * Current numbers of a stream
+	 * @param {Object} meter - Meter from createMeter
+	 * @param {Number} now - Current time, for streams still running
+	 * @returns {Object} { ttftMs, tokensPerSec, elapsedMs, tokens }
+	 */
+	readout: function(meter, now) {
+		const end = meter.endedAt !== null ? meter.endedAt : now;
+		const generating = meter.firstChunkAt !== null ? (end - meter.firstChunkAt) / 1000 : 0;
+		return {
+			ttftMs: meter.firstChunkAt !== null ? meter.firstChunkAt - meter.started : null,
+			// Rate after the first token, so it does not include the TTFT
+			tokensPerSec: generating > 0 && meter.chunks > 1 ? (meter.chunks - 1) / generating : null,
+			elapsedMs: end - meter.started,
+			tokens: meter.chunks
+		};
+	},
+
+	/**
+	 * Format a readout for a column header
+	 * @param {Object} readout - From readout()
+	 * @returns {String} e.g. "TTFT 420 ms · 38 tok/s · 6.2 s"
+	 */
+	formatReadout: function(readout) {
+		const parts = [
+			readout.ttftMs !== null ? `TTFT ${Math.round(readout.ttftMs)} ms` : "Waiting…"
+		];
+		if (readout.tokensPerSec !== null) {
+			parts.push(`${readout.tokensPerSec.toFixed(readout.tokensPerSec < 10 ? 1 : 0)} tok/s`);
+		}
+		parts.push(`${(readout.elapsedMs / 1000).toFixed(1)} s`);
+		return parts.join(" · ");
+	},
+
+	/**
+	 * The history one compared API should see: the prompts, and of the
+	 * responses only its own (and those of regular turns)
+	 * @param {Array} history - Conversation messages, oldest first
+	 * @param {String} apiName - Chatz API of the column
+	 * @returns {Array} Messages
+	 */
+	historyFor: function(history, apiName) {
+		return history.filter(msg =>
+			msg.message_type === "user" || !msg.compare_group || msg.api_used === apiName
+		);
+	},
+
+	/**
+	 * Stream one prompt from several APIs concurrently
+	 *
+	 * @param {Array} configs - get_api_config payloads, one per column
+	 * @param {Function} buildMessages - Receives a config, returns its messages
+	 * Streamed reasoning counts as generated tokens and is part of the content
+	 * handlers receive, as "*Thinking:" lines ahead of the answer.
+	 *
+	 * @param {Object} handlers - onChunk(config, chunk, content, meter),
+	 *     onComplete(config, content, stopped, meter), onError(config, error, meter),
+	 *     onAllDone() (each optional)
+	 * @param {AbortSignal} signal - Aborting stops every stream
+	 * @returns {Array} Targets { config, streamId, meter }, in column order
+	 */
+	run: function(configs, buildMessages, handlers, signal) {
+		let remaining = configs.length;
+		const settle = () => {
+			if (--remaining === 0 && handlers.onAllDone) {
+				handlers.onAllDone();
+			}
+		};
+
+		return configs.map(config => {
+			const streamId = ChatzAPIClient.generateStreamId();
+			const meter = this.createMeter(performance.now());
+			let answer = "";
+			let reasoning = "";
+			let content = "";
+			const received = (chunk) => {
+				this.recordChunk(meter, chunk, performance.now());
+				content = ChatzMarkdown.joinReasoning(reasoning, answer);
+				if (handlers.onChunk) handlers.onChunk(config, chunk, content, meter);
+			};
+
+			ChatzAPIClient.callStreamingAPI(
+				config,
+				buildMessages(config),
+				(chunk) => {
+					answer += chunk;
+					received(chunk);
+				},
+				(result) => {
+					meter.endedAt = performance.now();
+					// The model the proxy used, when it reports one
+					meter.model = (result && result.model) || null;
+					if (handlers.onComplete) handlers.onComplete(config, content, Boolean(result && result.stopped), meter);
+					settle();
+				},
+				(error) => {
+					meter.endedAt = performance.now();
+					if (handlers.onError) handlers.onError(config, error, meter);
+					settle();
+				},
+				{
+					signal: signal,
+					streamId: streamId,
+					onReasoning: (thought) => {
+						reasoning += thought;
+						received(thought);
+					}
+				}
+			);
+
+			return { config: config, streamId: streamId, meter: meter };
+		});
+	}
+};
@@ -3,7 +3,7 @@
  * Detects and captures context from current Frappe view
  */
 
-const ChatzContext = {
+export const ChatzContext = {
 	/**
 	 * Get current view context
 	 * @returns {Object} Context object with doctype, docname, etc.
@@ -13,6 +13,8 @@ const ChatzContext = {
 			doctype: "",
 			docname: "",
 			list_filter: "",
+			// Records checked in a list view (for batch questions)
+			selected_names: [],
 			page_url: window.location.href,
 			page_title: document.title
 		};
@@ -21,6 +23,9 @@ const ChatzContext = {
 		if (typeof cur_frm !== "undefined" && cur_frm) {
 			context.doctype = cur_frm.doctype;
 			context.docname = cur_frm.docname;
+			// Attachment excerpts are only requested for records that have files
+			const docinfo = cur_frm.get_docinfo ? cur_frm.get_docinfo() : null;
+			context.attachment_count = (docinfo && docinfo.attachments || []).length;
 			return context;
 		}
 
@@ -34,6 +39,10 @@ const ChatzContext = {
 				context.list_filter = JSON.stringify(filters);
 			}
 
+			if (cur_list.get_checked_items) {
+				context.selected_names = cur_list.get_checked_items(true);
+			}
+
 			return context;
 		}
 
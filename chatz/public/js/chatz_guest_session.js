@@ -0,0 +1,129 @@
+/**
+ * Chatz Guest Session Module
+ * Guest conversations are stored server-side (Redis, with a TTL and a length
+ * cap); the browser only keeps the anonymous session token, so every tab of
+ * the same browser shares one conversation.
+ */
+
+const GUEST_METHOD = "chatz.api.guest_session";
+const TOKEN_KEY = "chatz_guest_session";
+
+// Whole-conversation copy kept by earlier versions
+const LEGACY_STORAGE_KEY = "chatz_guest_conversation";
+
+export const ChatzGuestSession = {
+	tokenPromise: null,
+
+	/**
+	 * Get the stored session token
+	 * @returns {String|null} Token
+	 */
+	getToken: function() {
+		try {
+			return localStorage.getItem(TOKEN_KEY);
+		} catch (e) {
+			return this.memoryToken || null;
+		}
+	},
+
+	/**
+	 * Store the session token
+	 * @param {String|null} token - Token, or null to forget it
+	 */
+	setToken: function(token) {
+		this.memoryToken = token;
+		try {
+			if (token) {
+				localStorage.setItem(TOKEN_KEY, token);
+			} else {
+				localStorage.removeItem(TOKEN_KEY);
+			}
+			localStorage.removeItem(LEGACY_STORAGE_KEY);
+		} catch (e) {
+			// Keep the token in memory if localStorage is not available
+		}
+	},
+
+	/**
+	 * Get the session token, starting a session if there is none
+	 * @returns {Promise<String|null>} Token
+	 */
+	ensureToken: function() {
+		const token = this.getToken();
+		if (token) {
+			return Promise.resolve(token);
+		}
+		if (!this.tokenPromise) {
+			this.tokenPromise = this.call("start_guest_session", {}).then(result => {
+				this.tokenPromise = null;
+				if (result && result.status === "success") {
+					this.setToken(result.session_token);
+					return result.session_token;
+				}
+				return null;
+			});
+		}
+		return this.tokenPromise;
+	},
+
+	/**
+	 * Load the messages of the current session
+	 * @param {Number} limit - Maximum (latest) messages
+	 * @returns {Promise<Array>} Messages ({role, content, timestamp}), oldest first
+	 */
+	getHistory: async function(limit) {
+		const token = this.getToken();
+		if (!token) return [];
+
+		const result = await this.call("get_guest_history", { session_token: token, limit: limit });
+		return result && result.status === "success" ? result.messages : [];
+	},
+
+	/**
+	 * Append a message to the session
+	 * For user messages the result includes the preceding history window.
+	 * @param {String} role - "user" or "assistant"
+	 * @param {String} content - Message text
+	 * @param {Number} historyLimit - History window size (user messages)
+	 * @returns {Promise<Object>} Result with status and history
+	 */
+	addMessage: async function(role, content, historyLimit) {
+		const token = await this.ensureToken();
+		if (!token) {
+			return { status: "error", message: "Guest chat is not available", history: [] };
+		}
+
+		const result = await this.call("add_guest_message", {
+			session_token: token,
+			role: role,
+			content: content,
+			history_limit: historyLimit
+		});
+		return result || { status: "error", message: "Failed to save guest message", history: [] };
+	},
+
+	/**
+	 * Delete the current session and forget its token
+	 * @returns {Promise} Resolves when the session was cleared
+	 */
+	clear: function() {
+		const token = this.getToken();
+		this.setToken(null);
+		if (!token) return Promise.resolve();
+		return this.call("clear_guest_session", { session_token: token });
+	},
+
+	/**
+	 * Call a guest session method and resolve with its message
+	 */
+	call: function(method, args) {
+		return new Promise((resolve) => {
+			frappe.call({
+				method: `${GUEST_METHOD}.${method}`,
+				args: args,
+				callback: (r) => resolve(r.message),
+				error: () => resolve(null)
+			});
+		});
+	}
+};
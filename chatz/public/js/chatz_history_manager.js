@@ -1,9 +1,34 @@
 /**
  * Chatz History Manager Module
  * Handles conversation history storage and retrieval
+ *
+ * Conversations and messages are cached in IndexedDB (ChatzCache) and kept
+ * current with get_changes_since deltas; saves that fail on the network are
+ * queued locally and retried.
+ *
+ * With several Desk tabs open only the leader tab (ChatzTabs) syncs; the
+ * cache is shared, and the other tabs are told which conversations changed.
  */
 
-const ChatzHistoryManager = {
+import { ChatzCache } from "./chatz_cache";
+import { ChatzTabs } from "./chatz_tabs";
+
+const HISTORY_METHOD = "chatz.chatz.doctype.chatz_history.chatz_history";
+
+// Conversations loaded into the cache when it is first created
+const BOOTSTRAP_CONVERSATIONS = 100;
+
+// Queued saves are dropped after this many failed retries
+const MAX_SAVE_ATTEMPTS = 20;
+
+// How long a follower tab waits for the leader to sync before syncing itself
+const SYNC_REQUEST_TIMEOUT = 10000;
+
+export const ChatzHistoryManager = {
+	syncPromise: null,
+	localConversations: new Set(),
+	onlineListenerAttached: false,
+
 	/**
 	 * Save a message to history
 	 * @param {String} conversationId - Unique conversation ID
@@ -12,8 +37,11 @@ const ChatzHistoryManager = {
 	 * @param {Object} context - Document context
 	 * @param {String} apiUsed - API configuration name
 	 * @param {Function} callback - Callback function
+	 * @param {String} generationStatus - "Stopped" for a partial response (optional)
+	 * @param {String} compareGroup - Compare mode group of the message (optional)
+	 * @param {Object} generation - Model, route and latency of a response (optional)
 	 */
-	saveMessage: function(conversationId, messageType, messageContent, context, apiUsed, callback) {
+	saveMessage: function(conversationId, messageType, messageContent, context, apiUsed, callback, generationStatus, compareGroup, generation) {
 		// Validate that we have a valid user session
 		if (!frappe.session || !frappe.session.user || frappe.session.user === "None") {
 			console.error("Chatz: Cannot save message - no valid user session");
@@ -23,58 +51,366 @@ const ChatzHistoryManager = {
 			return;
 		}
 
-		frappe.call({
-			method: "chatz.chatz.doctype.chatz_history.chatz_history.save_message",
-			args: {
-				user: frappe.session.user,
-				conversation_id: conversationId,
-				message_type: messageType,
-				message_content: messageContent,
-				document_context: JSON.stringify(context),
-				api_used: apiUsed
-			},
-			callback: function(r) {
+		const args = {
+			user: frappe.session.user,
+			conversation_id: conversationId,
+			message_type: messageType,
+			message_content: messageContent,
+			document_context: JSON.stringify(context),
+			api_used: apiUsed,
+			client_message_id: this.generateClientMessageId()
+		};
+
+		if (generationStatus) {
+			args.generation_status = generationStatus;
+		}
+		if (compareGroup) {
+			args.compare_group = compareGroup;
+		}
+		if (generation) {
+			args.generation = JSON.stringify(generation);
+		}
+
+		// Show the message in the local cache straight away
+		this.cacheLocalMessage(args);
+
+		this.sendSave(args, (result, networkError) => {
+			if (networkError) {
+				this.queueSave(args);
 				if (callback) {
-					callback(r.message);
+					callback({ status: "queued", message: "Saved locally, will retry when online" });
 				}
+				return;
+			}
+			if (callback) {
+				callback(result);
+			}
+		});
+	},
+
+	/**
+	 * Prepare a turn that the server saves (chatz.api.turn.stream_turn)
+	 * Both messages get client IDs, and the user message is cached straight away.
+	 * @param {String} conversationId - Unique conversation ID
+	 * @param {String} message - User message
+	 * @param {Object} context - Document context
+	 * @param {String} apiUsed - API configuration name
+	 * @returns {Object} Turn, for ChatzAPIClient.callStreamingAPI (options.turn)
+	 */
+	startServerTurn: function(conversationId, message, context, apiUsed) {
+		const turn = {
+			conversationId: conversationId,
+			message: message,
+			context: context,
+			apiUsed: apiUsed,
+			clientMessageId: this.generateClientMessageId(),
+			responseMessageId: this.generateClientMessageId()
+		};
+		this.cacheLocalMessage(this.turnMessage(turn, "user", message));
+		return turn;
+	},
+
+	/**
+	 * Put the messages a server turn saved in the cache
+	 * Messages whose IDs never arrived (e.g. the stream was stopped) are
+	 * picked up by the next sync.
+	 * @param {Object} turn - From startServerTurn
+	 * @param {Object} saved - { user_message_id, response_message_id } sent by the server
+	 * @param {String} content - Response text
+	 * @param {String} generationStatus - "Stopped" for a partial response (optional)
+	 */
+	finishServerTurn: function(turn, saved, content, generationStatus) {
+		if (saved.user_message_id) {
+			this.confirmLocalMessage(this.turnMessage(turn, "user", turn.message), saved.user_message_id);
+		}
+		if (saved.response_message_id) {
+			this.confirmLocalMessage(
+				this.turnMessage(turn, "assistant", content, generationStatus),
+				saved.response_message_id
+			);
+		}
+	},
+
+	/**
+	 * save_message arguments describing a message of a server turn
+	 */
+	turnMessage: function(turn, messageType, content, generationStatus) {
+		return {
+			conversation_id: turn.conversationId,
+			message_type: messageType,
+			message_content: content,
+			document_context: JSON.stringify(turn.context),
+			api_used: turn.apiUsed,
+			client_message_id: messageType === "user" ? turn.clientMessageId : turn.responseMessageId,
+			generation_status: generationStatus || null
+		};
+	},
+
+	/**
+	 * Send a save_message request
+	 * @param {Object} args - save_message arguments
+	 * @param {Function} callback - Receives (result, networkError)
+	 */
+	sendSave: function(args, callback) {
+		frappe.call({
+			method: `${HISTORY_METHOD}.save_message`,
+			args: args,
+			callback: (r) => {
+				const result = r.message;
+				if (result && result.status === "success") {
+					this.confirmLocalMessage(args, result.message_id);
+				}
+				callback(result, false);
 			},
-			error: function(r) {
+			error: (r) => {
 				console.error("Chatz: Error saving message:", r);
-				if (callback) {
-					callback({ status: "error", message: "Failed to save message" });
-				}
+				// An empty response means the request never reached the server
+				const networkError = !navigator.onLine || !r || Object.keys(r).length === 0;
+				callback({ status: "error", message: "Failed to save message" }, networkError);
 			}
 		});
 	},
 
+	/**
+	 * Put an optimistic copy of a message in the cache
+	 * @param {Object} args - save_message arguments
+	 */
+	cacheLocalMessage: function(args) {
+		ChatzCache.putMessage(
+			this.cachedMessage(args, `local:${args.client_message_id}`),
+			null,
+			this.localConversations.has(args.conversation_id)
+		).catch(() => {});
+	},
+
+	/**
+	 * Replace the optimistic copy once the server assigned a name
+	 * @param {Object} args - save_message arguments
+	 * @param {String} messageId - Saved Chatz History name
+	 */
+	confirmLocalMessage: function(args, messageId) {
+		ChatzCache.putMessage(
+			this.cachedMessage(args, messageId),
+			`local:${args.client_message_id}`
+		).then(() => {
+			ChatzTabs.post("history-changed", { conversations: [args.conversation_id] });
+		}).catch(() => {});
+	},
+
+	/**
+	 * Build a cache row from save_message arguments
+	 */
+	cachedMessage: function(args, name) {
+		return {
+			name: name,
+			conversation_id: args.conversation_id,
+			message_type: args.message_type,
+			message_content: args.message_content,
+			document_context: args.document_context,
+			api_used: args.api_used,
+			client_message_id: args.client_message_id,
+			generation_status: args.generation_status || null,
+			created_at: args.created_at || frappe.datetime.now_datetime()
+		};
+	},
+
+	/**
+	 * Queue a save for retry and flush when the browser is back online
+	 * @param {Object} args - save_message arguments
+	 */
+	queueSave: function(args) {
+		ChatzCache.queueWrite(Object.assign({ queued_at: Date.now() }, args)).catch(() => {});
+
+		if (!this.onlineListenerAttached) {
+			this.onlineListenerAttached = true;
+			window.addEventListener("online", () => this.flushQueue());
+		}
+	},
+
+	/**
+	 * Retry queued saves in order, stopping at the first network failure
+	 * @returns {Promise} Resolves when the queue was processed
+	 */
+	flushQueue: async function() {
+		const entries = await ChatzCache.getQueuedWrites().catch(() => []);
+
+		for (const entry of entries || []) {
+			const args = Object.assign({}, entry);
+			delete args.queued_at;
+			delete args.attempts;
+
+			if ((entry.attempts || 0) >= MAX_SAVE_ATTEMPTS) {
+				console.error("Chatz: Dropping queued message after repeated failures", entry.client_message_id);
+				await ChatzCache.removeQueuedWrite(entry.client_message_id).catch(() => {});
+				continue;
+			}
+
+			const networkError = await new Promise((resolve) => {
+				this.sendSave(args, (result, isNetworkError) => resolve(isNetworkError));
+			});
+			if (networkError) {
+				entry.attempts = (entry.attempts || 0) + 1;
+				await ChatzCache.queueWrite(entry).catch(() => {});
+				return;
+			}
+			// Saved, or rejected by the server (retrying would not help)
+			await ChatzCache.removeQueuedWrite(entry.client_message_id).catch(() => {});
+		}
+	},
+
+	/**
+	 * Bring the cache up to date (one sync at a time)
+	 * Follower tabs ask the leader tab to sync, and sync themselves only if
+	 * it does not answer.
+	 * @returns {Promise<Set>} IDs of conversations that changed
+	 */
+	sync: function() {
+		if (this.syncPromise) {
+			return this.syncPromise;
+		}
+
+		if (ChatzTabs.isShared() && !ChatzTabs.isLeader) {
+			this.syncPromise = ChatzTabs.request("history-sync", null, SYNC_REQUEST_TIMEOUT)
+				.then(touched => touched ? new Set(touched) : this.syncCache())
+				.finally(() => {
+					this.syncPromise = null;
+				});
+			return this.syncPromise;
+		}
+
+		this.syncPromise = this.syncCache().then((touched) => {
+			this.syncPromise = null;
+			if (touched.size) {
+				ChatzTabs.post("history-changed", { conversations: [...touched] });
+			}
+			return touched;
+		});
+		return this.syncPromise;
+	},
+
+	/**
+	 * Fetch and apply changes since the stored cursor
+	 * @returns {Promise<Set>} IDs of conversations that changed
+	 */
+	syncCache: async function() {
+		const touched = new Set();
+		try {
+			await this.flushQueue();
+
+			let cursor = await ChatzCache.getMeta("cursor");
+			for (let page = 0; page < 20; page++) {
+				const result = await this.callMethod("get_changes_since", { since: cursor });
+				if (!result || result.status !== "success") break;
+
+				const changed = await ChatzCache.applyChanges(result);
+				(changed || []).forEach(id => touched.add(id));
+
+				cursor = result.cursor;
+				await ChatzCache.setMeta("cursor", cursor);
+				if (!result.has_more) break;
+			}
+		} catch (e) {
+			console.error("Chatz: History sync failed", e);
+		}
+		return touched;
+	},
+
+	/**
+	 * Create the cache on first use: take a cursor, then load recent conversations
+	 * @returns {Promise<Boolean>} True if the cache can be served from
+	 */
+	ensureBootstrapped: async function() {
+		const db = await ChatzCache.open();
+		if (!db) return false;
+
+		if (await ChatzCache.getMeta("cursor")) {
+			return true;
+		}
+
+		// Take the cursor first so nothing written during the bootstrap is missed
+		const start = await this.callMethod("get_changes_since", {});
+		if (!start || start.status !== "success") return false;
+
+		const listing = await this.callMethod("list_conversations", { limit: BOOTSTRAP_CONVERSATIONS });
+		if (!listing || listing.status !== "success") return false;
+
+		await ChatzCache.putConversations(listing.conversations || []);
+		await ChatzCache.setMeta("cursor", start.cursor);
+		return true;
+	},
+
+	/**
+	 * Call a Chatz History method and resolve with its message
+	 * @param {String} method - Method name in chatz_history.py
+	 * @param {Object} args - Arguments
+	 * @returns {Promise<Object|null>} Response message, or null on failure
+	 */
+	callMethod: function(method, args) {
+		return new Promise((resolve) => {
+			frappe.call({
+				method: `${HISTORY_METHOD}.${method}`,
+				args: args,
+				callback: (r) => resolve(r.message),
+				error: () => resolve(null)
+			});
+		});
+	},
+
 	/**
 	 * Get conversation history
+	 * Served from the cache when the whole conversation is cached, otherwise
+	 * fetched and cached. The callback is called exactly once.
 	 * @param {String} conversationId - Unique conversation ID
-	 * @param {Number} limit - Maximum messages to retrieve
+	 * @param {Number} limit - Maximum messages to retrieve (latest N)
 	 * @param {Function} callback - Callback function
 	 */
 	getConversationHistory: function(conversationId, limit, callback) {
-		frappe.call({
-			method: "chatz.chatz.doctype.chatz_history.chatz_history.get_conversation_history",
-			args: {
+		limit = limit || 50;
+
+		(async () => {
+			const cached = await this.getCachedHistory(conversationId, limit);
+			if (cached) {
+				// Bring the cache up to date for next time
+				this.sync();
+				return { status: "success", messages: cached, from_cache: true };
+			}
+
+			const result = await this.callMethod("get_conversation_history", {
 				conversation_id: conversationId,
-				limit: limit || 50
-			},
-			callback: function(r) {
-				if (callback) {
-					callback(r.message);
-				}
-			},
-			error: function(r) {
-				if (callback) {
-					callback({ status: "error", messages: [] });
-				}
+				limit: limit
+			});
+			if (!result) {
+				return { status: "error", messages: [] };
+			}
+			if (result.status === "success") {
+				const messages = result.messages || [];
+				ChatzCache.putMessages(conversationId, messages, messages.length < limit).catch(() => {});
+			}
+			return result;
+		})().then(result => {
+			if (callback) {
+				callback(result);
 			}
 		});
 	},
 
+	/**
+	 * Read a conversation from the cache
+	 * @returns {Promise<Array|null>} Messages, or null if not fully cached
+	 */
+	getCachedHistory: async function(conversationId, limit) {
+		try {
+			if (!(await this.ensureBootstrapped())) return null;
+			return await ChatzCache.getMessages(conversationId, limit);
+		} catch (e) {
+			return null;
+		}
+	},
+
 	/**
 	 * List all conversations for current user
+	 * With a warm cache the callback is called immediately from local data and
+	 * again (with refreshed: true) if the delta sync changed anything.
 	 * @param {Number} limit - Maximum conversations to retrieve
 	 * @param {String} apiFilter - Optional API name to filter conversations
 	 * @param {Function} callback - Callback function
@@ -85,24 +421,31 @@ const ChatzHistoryManager = {
 			callback = apiFilter;
 			apiFilter = null;
 		}
+		limit = limit || 20;
 
-		frappe.call({
-			method: "chatz.chatz.doctype.chatz_history.chatz_history.list_conversations",
-			args: {
-				limit: limit || 20,
-				api_filter: apiFilter
-			},
-			callback: function(r) {
-				if (callback) {
-					callback(r.message);
-				}
-			},
-			error: function(r) {
-				if (callback) {
-					callback({ status: "error", conversations: [] });
-				}
+		(async () => {
+			let cacheReady = false;
+			try {
+				cacheReady = await this.ensureBootstrapped();
+			} catch (e) {
+				cacheReady = false;
 			}
-		});
+
+			if (!cacheReady) {
+				const result = await this.callMethod("list_conversations", { limit: limit, api_filter: apiFilter });
+				callback && callback(result || { status: "error", conversations: [] });
+				return;
+			}
+
+			const conversations = await ChatzCache.getConversations(limit, apiFilter);
+			callback && callback({ status: "success", conversations: conversations, from_cache: true });
+
+			const touched = await this.sync();
+			if (touched.size) {
+				const refreshed = await ChatzCache.getConversations(limit, apiFilter);
+				callback && callback({ status: "success", conversations: refreshed, from_cache: true, refreshed: true });
+			}
+		})();
 	},
 
 	/**
@@ -110,7 +453,16 @@ const ChatzHistoryManager = {
 	 * @returns {String} Unique conversation ID
 	 */
 	generateConversationId: function() {
-		return "conv_" + Date.now() + "_" + Math.random().toString(36).substr(2, 9);
+		const conversationId = "conv_" + Date.now() + "_" + Math.random().toString(36).substr(2, 9);
+		this.localConversations.add(conversationId);
+		return conversationId;
+	},
+
+	/**
+	 * Generate an ID used to de-duplicate retried saves
+	 * @returns {String} Client message ID
+	 */
+	generateClientMessageId: function() {
+		return "msg_" + Date.now() + "_" + Math.random().toString(36).substr(2, 9);
 	}
 };
-
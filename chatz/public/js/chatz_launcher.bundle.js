@@ -0,0 +1,214 @@
+/**
+ * Chatz Launcher Module
+ * Always-loaded stub: renders only the launcher button and loads the full
+ * widget bundle (chatz_widget.bundle.js/.css) the first time it is opened
+ */
+
+import { ChatzTabs } from "./chatz_tabs";
+
+const WIDGET_ASSETS = ["chatz_widget.bundle.css", "chatz_widget.bundle.js"];
+
+// How long to wait for another open tab to share its configuration
+const CONFIG_REQUEST_TIMEOUT = 150;
+
+// Configuration older than this is fetched again instead of shared
+const CONFIG_MAX_AGE_MS = 10 * 60 * 1000;
+
+// Public, HTTP-cacheable guest configuration (revalidated by ETag)
+const GUEST_CONFIG_URL = "/api/method/chatz.api.config.get_public_guest_config";
+
+const DEFAULT_ICON = `<svg width="24" height="24" viewBox="0 0 24 24" fill="none" stroke="currentColor">
+	<path d="M21 15a2 2 0 0 1-2 2H7l-4 4V5a2 2 0 0 1 2-2h14a2 2 0 0 1 2 2z"></path>
+</svg>`;
+
+const ChatzLauncher = {
+	config: null,
+	configFetchedAt: 0,
+	initialized: false,
+	loading: false,
+	loaded: false,
+
+	/**
+	 * Get the user's configuration and render the launcher (runs once)
+	 * Another open tab shares its configuration if it has a recent one, so
+	 * opening more Desk tabs does not fetch it again.
+	 */
+	init: function() {
+		if (this.initialized || typeof frappe === "undefined") return;
+		this.initialized = true;
+		this.mark("chatz:launcher-init");
+
+		ChatzTabs.init(frappe.session.user);
+		ChatzTabs.answer("config", () => this.sharedConfig());
+
+		ChatzTabs.request("config", null, CONFIG_REQUEST_TIMEOUT).then((shared) => {
+			if (shared && this.isConfigValid(shared.config)) {
+				this.mark("chatz:config-shared");
+				this.setConfig(shared.config, shared.fetched_at);
+				return;
+			}
+
+			this.fetchConfig().then((config) => {
+				if (config && config.status === "success" && this.isConfigValid(config)) {
+					this.setConfig(config, Date.now());
+				}
+			});
+		});
+	},
+
+	/**
+	 * Fetch the configuration from the server
+	 * Guests use a plain GET that the browser and a reverse proxy cache, so
+	 * most anonymous page views never reach Frappe.
+	 * @returns {Promise<Object|null>} Configuration, or null if it could not be fetched
+	 */
+	fetchConfig: function() {
+		if (frappe.session.user === "Guest") {
+			return fetch(GUEST_CONFIG_URL, { credentials: "same-origin" })
+				.then((response) => response.ok ? response.json() : null)
+				.then((json) => json && json.message ? json.message.config : null)
+				.catch(() => null);
+		}
+
+		return new Promise((resolve) => {
+			frappe.call({
+				method: "chatz.api.config.get_user_config",
+				callback: (r) => resolve(r.message || null),
+				error: () => resolve(null)
+			});
+		});
+	},
+
+	/**
+	 * Keep the configuration and render the launcher
+	 * @param {Object} config - API configuration
+	 * @param {Number} fetchedAt - When it was fetched from the server (ms)
+	 */
+	setConfig: function(config, fetchedAt) {
+		this.config = config;
+		this.configFetchedAt = fetchedAt;
+		this.render();
+	},
+
+	/**
+	 * Configuration to share with a new tab, if still recent
+	 * @returns {Object|null} { config, fetched_at }
+	 */
+	sharedConfig: function() {
+		if (!this.config || Date.now() - this.configFetchedAt > CONFIG_MAX_AGE_MS) {
+			return null;
+		}
+		return { config: this.config, fetched_at: this.configFetchedAt };
+	},
+
+	/**
+	 * Minimal config check, mirrors ChatzAPIClient.validateConfig without loading it
+	 * @param {Object} config - API configuration
+	 * @returns {Boolean} True if the widget can be started
+	 */
+	isConfigValid: function(config) {
+		return Boolean(config.api_endpoint && config.model_name);
+	},
+
+	/**
+	 * Render the launcher button with the configured colors and icon
+	 */
+	render: function() {
+		if (document.getElementById("chatz-launcher")) return;
+
+		const root = document.documentElement.style;
+		root.setProperty("--chatz-primary-color", this.config.primary_color || "#667eea");
+		root.setProperty("--chatz-secondary-color", this.config.secondary_color || "#764ba2");
+
+		let iconSVG = DEFAULT_ICON;
+		if (this.config.widget_icon && frappe.utils && frappe.utils.icon) {
+			iconSVG = frappe.utils.icon(this.config.widget_icon, "md");
+		}
+
+		document.body.insertAdjacentHTML("beforeend", `
+			<div id="chatz-launcher">
+				<button class="chatz-toggle-btn" id="chatz-launcher-btn" title="${frappe.utils.escape_html(this.config.widget_title || "Chatz")}">
+					${iconSVG}
+				</button>
+			</div>
+		`);
+
+		document.getElementById("chatz-launcher-btn").addEventListener("click", () => this.open());
+		this.mark("chatz:launcher-ready");
+	},
+
+	/**
+	 * Load the widget bundle (first time only) and open the chat
+	 */
+	open: function() {
+		if (this.loaded) {
+			ChatzWidget.toggleWidget();
+			return;
+		}
+		if (this.loading) return;
+		this.loading = true;
+
+		const button = document.getElementById("chatz-launcher-btn");
+		if (button) button.classList.add("chatz-launcher-loading");
+
+		this.mark("chatz:bundle-requested");
+		frappe.require(WIDGET_ASSETS, () => {
+			this.loading = false;
+			this.loaded = true;
+			this.mark("chatz:bundle-loaded");
+
+			const launcher = document.getElementById("chatz-launcher");
+			if (launcher) launcher.remove();
+
+			ChatzWidget.init(this.config);
+			ChatzWidget.toggleWidget();
+			this.mark("chatz:widget-open");
+		});
+	},
+
+	/**
+	 * Record a performance mark so startup cost can be measured in DevTools
+	 * @param {String} name - Mark name
+	 */
+	mark: function(name) {
+		if (window.performance && performance.mark) {
+			performance.mark(name);
+		}
+	},
+
+	/**
+	 * Collect launcher timings (milliseconds since navigation start)
+	 * @returns {Object} Mark name to start time
+	 */
+	getTimings: function() {
+		const timings = {};
+		if (window.performance && performance.getEntriesByType) {
+			performance.getEntriesByType("mark")
+				.filter(entry => entry.name.startsWith("chatz:"))
+				.forEach(entry => {
+					timings[entry.name] = Math.round(entry.startTime);
+				});
+		}
+		return timings;
+	}
+};
+
+window.ChatzLauncher = ChatzLauncher;
+
+/**
+ * Initialize once, when the browser is idle after the page has loaded
+ */
+function scheduleLauncher() {
+	const run = () => ChatzLauncher.init();
+	if ("requestIdleCallback" in window) {
+		requestIdleCallback(run, { timeout: 2000 });
+	} else {
+		setTimeout(run, 200);
+	}
+}
+
+if (document.readyState === "loading") {
+	document.addEventListener("DOMContentLoaded", scheduleLauncher, { once: true });
+} else {
+	scheduleLauncher();
+}
@@ -0,0 +1,288 @@
+/**
+ * Chatz Markdown Module
+ * Renders assistant markdown to sanitized HTML
+ *
+ * Pure string processing without DOM or frappe access, so the same code runs
+ * in the markdown Web Worker and, as a fallback, on the main thread.
+ */
+
+const THOUGHT_ICON = `<svg class="chatz-thought-icon" width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><circle cx="12" cy="12" r="3"></circle><path d="M12 2v4m0 12v4M4.93 4.93l2.83 2.83m8.48 8.48l2.83 2.83M2 12h4m12 0h4M4.93 19.07l2.83-2.83m8.48-8.48l2.83-2.83"></path></svg>`;
+
+const LIST_ICON = `<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><line x1="8" y1="6" x2="21" y2="6"></line><line x1="8" y1="12" x2="21" y2="12"></line><line x1="8" y1="18" x2="21" y2="18"></line><line x1="3" y1="6" x2="3.01" y2="6"></line><line x1="3" y1="12" x2="3.01" y2="12"></line><line x1="3" y1="18" x2="3.01" y2="18"></line></svg>`;
+
+const DOCUMENT_ICON = `<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M14 2H6a2 2 0 0 0-2 2v16a2 2 0 0 0 2 2h12a2 2 0 0 0 2-2V8z"></path><polyline points="14 2 14 8 20 8"></polyline></svg>`;
+
+// Link targets that may be rendered (anything else, e.g. javascript:, stays text)
+const SAFE_URL = /^(https?:\/\/|mailto:|\/(?!\/)|#)/i;
+
+let thoughtCounter = 0;
+
+export const ChatzMarkdown = {
+	// Bump when the output changes; must match RENDERER_VERSION in
+	// chatz/utils/markdown.py. Stored HTML of another version is re-rendered.
+	VERSION: 1,
+
+	/**
+	 * Render markdown content to HTML
+	 *
+	 * Groups consecutive "*Thinking:" lines into a collapsible block, turns
+	 * links into buttons (internal) or anchors (external) and applies code,
+	 * bold and italic formatting. All other text is escaped.
+	 *
+	 * @param {String} content - Markdown content
+	 * @param {Object} options - { origin: page origin, used to tell internal links apart }
+	 * @returns {String} HTML content
+	 */
+	render: function(content, options = {}) {
+		// Trim leading/trailing whitespace to avoid extra line breaks
+		content = (content || "").trim();
+
+		// Store URLs temporarily to avoid escaping them
+		const urlPlaceholders = [];
+
+		// Store thoughts containers temporarily
+		const thoughtsPlaceholders = [];
+
+		// Group consecutive *Thinking: lines together (ignoring empty lines between them)
+		const lines = content.split("\n");
+		const processedLines = [];
+		let currentThoughtGroup = [];
+		let pendingEmptyLines = [];
+
+		const closeThoughtGroup = () => {
+			const placeholder = `___THOUGHTS_PLACEHOLDER_${thoughtsPlaceholders.length}___`;
+			thoughtsPlaceholders.push({
+				placeholder: placeholder,
+				html: this.renderThoughts(currentThoughtGroup)
+			});
+			processedLines.push(placeholder);
+			currentThoughtGroup = [];
+		};
+
+		for (const line of lines) {
+			const thinkingMatch = line.match(/^\*Thinking:(.*)$/);
+
+			if (thinkingMatch) {
+				// This is a thinking line - add to current group
+				const thought = thinkingMatch[1].trim();
+				if (thought) {
+					currentThoughtGroup.push(thought);
+				}
+				// Clear pending empty lines since we're still in a thought group
+				pendingEmptyLines = [];
+			} else if (line.trim() === "") {
+				// Empty line - might be between thoughts or after thoughts
+				pendingEmptyLines.push(line);
+			} else {
+				if (currentThoughtGroup.length > 0) {
+					// The thought group provides visual separation
+					closeThoughtGroup();
+				} else {
+					processedLines.push(...pendingEmptyLines);
+				}
+				pendingEmptyLines = [];
+
+				// Add the content line
+				processedLines.push(line);
+			}
+		}
+
+		// Handle any remaining thoughts at the end
+		if (currentThoughtGroup.length > 0) {
+			closeThoughtGroup();
+		}
+
+		// Rejoin the processed lines and clean up excessive empty lines
+		content = processedLines.join("\n").replace(/\n{3,}/g, "\n\n");
+
+		// Extract and replace markdown links BEFORE escaping: [text](url)
+		content = content.replace(/\[([^\]]+)\]\(([^)]+)\)/g, (match, text, url) => {
+			const placeholder = `___URL_PLACEHOLDER_${urlPlaceholders.length}___`;
+			urlPlaceholders.push({
+				placeholder: placeholder,
+				html: this.renderLink(url, text, options.origin)
+			});
+			return placeholder;
+		});
+
+		// Extract and replace plain URLs BEFORE escaping
+		content = content.replace(/(https?:\/\/[^\s<)\]]+)/g, (match, url) => {
+			const placeholder = `___URL_PLACEHOLDER_${urlPlaceholders.length}___`;
+			urlPlaceholders.push({
+				placeholder: placeholder,
+				html: this.renderLink(url, url, options.origin)
+			});
+			return placeholder;
+		});
+
+		let html = this.formatInline(this.escapeHtml(content));
+
+		// Restore placeholders
+		urlPlaceholders.forEach(item => {
+			html = html.replace(item.placeholder, item.html);
+		});
+		thoughtsPlaceholders.forEach(item => {
+			html = html.replace(item.placeholder, item.html);
+		});
+
+		// Line breaks
+		return html.replace(/\n/g, "<br>");
+	},
+
+	/**
+	 * Separate the thoughts of a response from its answer
+	 *
+	 * Mirrors split_reasoning in chatz/utils/markdown.py. Thoughts are the
+	 * "*Thinking:" lines render() shows as thought blocks.
+	 *
+	 * @param {String} content - Assistant message
+	 * @returns {Object} { content: answer without the thinking lines, reasoning: thoughts one per line }
+	 */
+	splitReasoning: function(content) {
+		const answer = [];
+		const thoughts = [];
+		for (const line of (content || "").split("\n")) {
+			const thinkingMatch = line.match(/^\*Thinking:(.*)$/);
+			if (thinkingMatch) {
+				const thought = thinkingMatch[1].trim();
+				if (thought) {
+					thoughts.push(thought);
+				}
+			} else {
+				answer.push(line);
+			}
+		}
+
+		return {
+			content: answer.join("\n").replace(/\n{3,}/g, "\n\n").trim(),
+			reasoning: thoughts.join("\n")
+		};
+	},
+
+	/**
+	 * Combine streamed reasoning (reasoning_content deltas) with the answer,
+	 * as "*Thinking:" lines ahead of it, so it renders as a thought block
+	 * @param {String} reasoning - Reasoning text
+	 * @param {String} content - Answer
+	 * @returns {String} Markdown content
+	 */
+	joinReasoning: function(reasoning, content) {
+		const thoughts = (reasoning || "").split("\n")
+			.filter(line => line.trim())
+			.map(line => `*Thinking: ${line.trim()}`);
+		return thoughts.length ? `${thoughts.join("\n")}\n\n${content || ""}` : (content || "");
+	},
+
+	/**
+	 * Render the collapsed thought block of a stored message, whose reasoning
+	 * is loaded when it is expanded (ChatzWidget.toggleStoredThoughts)
+	 * @param {Number} tokens - Reasoning tokens
+	 * @returns {String} HTML
+	 */
+	renderStoredThoughts: function(tokens) {
+		return `<div class="chatz-thought-container chatz-thought-stored"><div class="chatz-thought-header" onclick="ChatzWidget.toggleStoredThoughts(this)">${THOUGHT_ICON}<span>Thoughts (~${tokens} tokens)</span></div><div class="chatz-thought-list" style="display: none;"></div></div>`;
+	},
+
+	/**
+	 * Render markdown without thoughts or links (thought items)
+	 * @param {String} content - Markdown content
+	 * @returns {String} HTML content
+	 */
+	renderSimple: function(content) {
+		return this.formatInline(this.escapeHtml(content)).replace(/\n/g, "<br>");
+	},
+
+	/**
+	 * Apply code, bold and italic formatting to escaped text
+	 * @param {String} html - Escaped text
+	 * @returns {String} HTML
+	 */
+	formatInline: function(html) {
+		return html
+			// Code blocks
+			.replace(/```([\s\S]*?)```/g, "<pre><code>$1</code></pre>")
+			// Inline code
+			.replace(/`([^`]+)`/g, "<code>$1</code>")
+			// Bold
+			.replace(/\*\*([^*]+)\*\*/g, "<strong>$1</strong>")
+			// Italic
+			.replace(/\*([^*]+)\*/g, "<em>$1</em>");
+	},
+
+	/**
+	 * Render a collapsible group of thoughts
+	 * @param {Array} thoughts - Thought texts
+	 * @returns {String} HTML
+	 */
+	renderThoughts: function(thoughts) {
+		const containerId = `thought-${Date.now()}-${thoughtCounter++}`;
+		const items = thoughts.map(thought =>
+			`<div class="chatz-thought-item">${this.renderSimple(thought)}</div>`
+		).join("");
+		const label = thoughts.length === 1 ? "Thought" : `Thoughts (${thoughts.length})`;
+
+		return `<div class="chatz-thought-container"><div class="chatz-thought-header" onclick="ChatzWidget.toggleThought('${containerId}')">${THOUGHT_ICON}<span>${label}</span></div><div class="chatz-thought-list" id="${containerId}" style="display: block;">${items}</div></div>`;
+	},
+
+	/**
+	 * Render a link as button (internal) or regular link (external)
+	 *
+	 * Internal link buttons carry their target in data-chatz-url; the widget
+	 * handles their clicks with one delegated listener.
+	 *
+	 * @param {String} url - URL
+	 * @param {String} text - Link text (unescaped)
+	 * @param {String} origin - Page origin
+	 * @returns {String} HTML for link
+	 */
+	renderLink: function(url, text, origin) {
+		const displayText = this.escapeHtml(text);
+		if (!SAFE_URL.test(url.trim())) {
+			return displayText;
+		}
+
+		const safeUrl = this.escapeHtml(url);
+		if (this.isInternalUrl(url, origin)) {
+			// Determine icon based on URL
+			const icon = url.toLowerCase().includes("list") ? LIST_ICON : DOCUMENT_ICON;
+			return `<button class="chatz-internal-link-btn" data-chatz-url="${safeUrl}" title="${safeUrl}">${icon}<span>${displayText}</span></button>`;
+		}
+
+		return `<a href="${safeUrl}" target="_blank" rel="noopener noreferrer" class="chatz-external-link">${displayText}</a>`;
+	},
+
+	/**
+	 * Check if URL is internal (same site)
+	 * @param {String} url - URL to check
+	 * @param {String} origin - Page origin
+	 * @returns {Boolean} True if internal
+	 */
+	isInternalUrl: function(url, origin) {
+		// Relative URLs are always internal
+		if (url.startsWith("/")) {
+			return true;
+		}
+		if (!origin) {
+			return false;
+		}
+		try {
+			return new URL(url, origin).hostname === new URL(origin).hostname;
+		} catch (e) {
+			return false;
+		}
+	},
+
+	/**
+	 * Escape text for HTML
+	 * @param {String} text - Text
+	 * @returns {String} Escaped text
+	 */
+	escapeHtml: function(text) {
+		return String(text)
+			.replace(/&/g, "&amp;")
+			.replace(/</g, "&lt;")
+			.replace(/>/g, "&gt;")
+			.replace(/"/g, "&quot;")
+			.replace(/'/g, "&#39;");
+	}
+};
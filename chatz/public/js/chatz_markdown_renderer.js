@@ -0,0 +1,309 @@
+/**
+ * Chatz Markdown Renderer Module
+ * Runs markdown rendering in a Web Worker, with a main-thread fallback
+ *
+ * Streams send only the new text of each chunk to the worker, which
+ * coalesces bursts into one render; the main thread just assigns the HTML.
+ * Where workers are unavailable (or fail to load) rendering happens on the
+ * main thread, at most once per animation frame while streaming.
+ */
+
+import { ChatzMarkdown } from "./chatz_markdown";
+
+const WORKER_BUNDLE = "chatz_markdown_worker.bundle.js";
+
+export const ChatzMarkdownRenderer = {
+	worker: null,
+	workerFailed: false,
+	nextId: 1,
+	// Render id -> { content, resolve }
+	pending: new Map(),
+	// Stream key -> { text, onHtml, frame, finished }
+	streams: new Map(),
+
+	/**
+	 * Get the markdown worker, starting it on first use
+	 * @returns {Worker|null} Worker, or null when rendering on the main thread
+	 */
+	getWorker: function() {
+		if (this.worker || this.workerFailed) {
+			return this.worker;
+		}
+
+		try {
+			if (typeof Worker === "undefined" || !frappe.assets || !frappe.assets.bundled_asset) {
+				throw new Error("Web Workers are not available");
+			}
+			// Bundles are fingerprinted, so resolve the file through the asset map
+			this.worker = new Worker(frappe.assets.bundled_asset(WORKER_BUNDLE));
+			this.worker.onmessage = (event) => this.handleMessage(event.data);
+			this.worker.onerror = (event) => this.disableWorker(event.message || event);
+			this.worker.postMessage({ type: "init", origin: window.location.origin });
+		} catch (e) {
+			this.disableWorker(e);
+		}
+
+		return this.worker;
+	},
+
+	/**
+	 * Fall back to main-thread rendering, completing anything in flight
+	 * @param {*} reason - Error or message for the console
+	 */
+	disableWorker: function(reason) {
+		if (this.worker) {
+			console.warn("Chatz: Markdown worker unavailable, rendering on the main thread", reason);
+			this.worker.terminate();
+		}
+		this.worker = null;
+		this.workerFailed = true;
+
+		this.pending.forEach(item => item.resolve(this.renderSync(item.content)));
+		this.pending.clear();
+		this.streams.forEach((stream, key) => {
+			if (stream.finished) {
+				this.streams.delete(key);
+				stream.onHtml(this.renderSync(stream.text), true);
+			} else {
+				this.scheduleFrame(key);
+			}
+		});
+	},
+
+	/**
+	 * Handle a reply from the worker
+	 * @param {Object} message - Worker message
+	 */
+	handleMessage: function(message) {
+		if (message.type === "rendered") {
+			const item = this.pending.get(message.id);
+			if (item) {
+				this.pending.delete(message.id);
+				item.resolve(message.html);
+			}
+		} else if (message.type === "stream") {
+			const stream = this.streams.get(message.stream);
+			if (!stream) return;
+			if (message.final) {
+				this.streams.delete(message.stream);
+			}
+			stream.onHtml(message.html, message.final);
+		}
+	},
+
+	/**
+	 * Render markdown on the main thread
+	 * @param {String} content - Markdown content
+	 * @returns {String} HTML
+	 */
+	renderSync: function(content) {
+		return ChatzMarkdown.render(content, { origin: window.location.origin });
+	},
+
+	/**
+	 * Render a complete message
+	 * @param {String} content - Markdown content
+	 * @returns {Promise<String>} HTML
+	 */
+	render: function(content) {
+		const worker = this.getWorker();
+		if (!worker) {
+			return Promise.resolve(this.renderSync(content));
+		}
+
+		return new Promise((resolve) => {
+			const id = this.nextId++;
+			this.pending.set(id, { content: content, resolve: resolve });
+			worker.postMessage({ type: "render", id: id, content: content });
+		});
+	},
+
+	/**
+	 * Get a key for a new stream
+	 * @returns {String} Stream key
+	 */
+	newStreamKey: function() {
+		return `md-${this.nextId++}`;
+	},
+
+	/**
+	 * Update a streaming message
+	 *
+	 * Only the text added since the last update crosses to the worker.
+	 *
+	 * @param {String} key - Stream key
+	 * @param {String} content - Full text so far
+	 * @param {Function} onHtml - Receives (html, final) for the latest render
+	 */
+	update: function(key, content, onHtml) {
+		let stream = this.streams.get(key);
+		if (!stream) {
+			stream = { text: "", onHtml: onHtml, frame: null, finished: false };
+			this.streams.set(key, stream);
+		}
+		stream.onHtml = onHtml;
+
+		const worker = this.getWorker();
+		if (worker) {
+			if (content.startsWith(stream.text)) {
+				const delta = content.slice(stream.text.length);
+				if (delta) {
+					worker.postMessage({ type: "append", stream: key, delta: delta });
+				}
+			} else {
+				worker.postMessage({ type: "set", stream: key, content: content });
+			}
+			stream.text = content;
+		} else {
+			stream.text = content;
+			this.scheduleFrame(key);
+		}
+	},
+
+	/**
+	 * Render a stream's final text and forget the stream
+	 * @param {String} key - Stream key
+	 * @param {String} content - Complete text
+	 * @param {Function} onHtml - Receives (html, true)
+	 */
+	finish: function(key, content, onHtml) {
+		this.update(key, content, onHtml);
+
+		const worker = this.getWorker();
+		if (worker) {
+			this.streams.get(key).finished = true;
+			worker.postMessage({ type: "finish", stream: key });
+			return;
+		}
+
+		const stream = this.streams.get(key);
+		if (stream.frame) {
+			cancelAnimationFrame(stream.frame);
+		}
+		this.streams.delete(key);
+		onHtml(this.renderSync(content), true);
+	},
+
+	/**
+	 * Forget a stream without rendering it (e.g. its message was removed)
+	 * @param {String} key - Stream key
+	 */
+	discard: function(key) {
+		const stream = this.streams.get(key);
+		if (!stream) return;
+
+		if (stream.frame) {
+			cancelAnimationFrame(stream.frame);
+		}
+		this.streams.delete(key);
+		if (this.worker) {
+			this.worker.postMessage({ type: "discard", stream: key });
+		}
+	},
+
+	/**
+	 * Main-thread fallback: render a stream once per animation frame
+	 * @param {String} key - Stream key
+	 */
+	scheduleFrame: function(key) {
+		const stream = this.streams.get(key);
+		if (!stream || stream.frame) return;
+
+		stream.frame = requestAnimationFrame(() => {
+			stream.frame = null;
+			if (this.streams.get(key) === stream) {
+				stream.onHtml(this.renderSync(stream.text), false);
+			}
+		});
+	},
+
+	/**
+	 * Measure main-thread time spent rendering a streamed response
+	 *
+	 * Replays a synthetic response in small chunks, first rendering every
+	 * chunk on the main thread (the previous behaviour), then through the
+	 * worker. Both include assigning the HTML to an element. Run from the
+	 * browser console: `await ChatzMarkdownRenderer.benchmark()`.
+	 *
+	 * @param {Object} options - { paragraphs: 40, chunkChars: 8 }
+	 * @returns {Promise<Object>} Total and longest main-thread block (ms) before and after
+	 */
+	benchmark: async function(options = {}) {
+		const text = this.sampleResponse(options.paragraphs || 40);
+		const chunkChars = options.chunkChars || 8;
+		const target = document.createElement("div");
+		const chunks = Math.ceil(text.length / chunkChars);
+
+		const before = { total_ms: 0, max_ms: 0, renders: 0 };
+		for (let end = chunkChars; end < text.length + chunkChars; end += chunkChars) {
+			const started = performance.now();
+			target.innerHTML = this.renderSync(text.slice(0, end));
+			this.recordBlock(before, performance.now() - started);
+			before.renders++;
+		}
+
+		if (!this.getWorker()) {
+			return { chunks: chunks, characters: text.length, worker: false, before: before };
+		}
+
+		const after = { total_ms: 0, max_ms: 0, renders: 0 };
+		const key = this.newStreamKey();
+		await new Promise((resolve) => {
+			const apply = (html, final) => {
+				const started = performance.now();
+				target.innerHTML = html;
+				this.recordBlock(after, performance.now() - started);
+				after.renders++;
+				if (final) resolve();
+			};
+
+			// One chunk per task, as chunks arrive from the network
+			let end = 0;
+			const feed = () => {
+				const started = performance.now();
+				end += chunkChars;
+				if (end >= text.length) {
+					this.finish(key, text, apply);
+				} else {
+					this.update(key, text.slice(0, end), apply);
+					setTimeout(feed, 0);
+				}
+				this.recordBlock(after, performance.now() - started);
+			};
+			feed();
+		});
+
+		[before, after].forEach(result => {
+			result.total_ms = Math.round(result.total_ms * 10) / 10;
+			result.max_ms = Math.round(result.max_ms * 10) / 10;
+		});
+
+		return { chunks: chunks, characters: text.length, worker: true, before: before, after: after };
+	},
+
+	recordBlock: function(result, ms) {
+		result.total_ms += ms;
+		result.max_ms = Math.max(result.max_ms, ms);
+	},
+
+	/**
+	 * Synthetic assistant response using every supported construct
+	 * @param {Number} paragraphs - Number of paragraphs
+	 * @returns {String} Markdown
+	 */
+	sampleResponse: function(paragraphs) {
+		const parts = ["*Thinking: Look up the invoice", "*Thinking: Check the payment terms", ""];
+		for (let i = 0; i < paragraphs; i++) {
+			parts.push(
+				`Invoice **ACC-SINV-2026-${String(i).padStart(5, "0")}** is *overdue* by ${i + 3} days. ` +
+				`Open [the invoice](/app/sales-invoice/ACC-SINV-2026-${i}) or see https://docs.example.com/payments/${i} ` +
+				"and run `reconcile_payments` before the end of the month.",
+				""
+			);
+			if (i % 10 === 0) {
+				parts.push("```\nfrappe.get_doc(\"Sales Invoice\", name).submit()\n```", "");
+			}
+		}
+		return parts.join("\n");
+	}
+};
@@ -0,0 +1,97 @@
+/**
+ * Chatz Markdown Worker
+ * Renders assistant markdown off the main thread
+ *
+ * Protocol (main thread -> worker):
+ *   { type: "init", origin }                    page origin for internal links
+ *   { type: "render", id, content }             render a complete message
+ *   { type: "append", stream, delta }           add streamed text to a stream
+ *   { type: "set", stream, content }            replace a stream's text
+ *   { type: "finish", stream }                  final render, then forget the stream
+ *   { type: "discard", stream }                 forget a stream without rendering
+ *
+ * Replies (worker -> main thread):
+ *   { type: "rendered", id, html }              for "render"
+ *   { type: "stream", stream, html, final }     latest render of a stream
+ *
+ * Appends arriving while a stream render is pending are coalesced, so a burst
+ * of chunks costs one render.
+ */
+
+import { ChatzMarkdown } from "./chatz_markdown";
+
+const streams = new Map();
+let origin = "";
+
+function renderStream(key, final) {
+	const stream = streams.get(key);
+	if (!stream) return;
+
+	if (stream.timer) {
+		clearTimeout(stream.timer);
+		stream.timer = null;
+	}
+
+	self.postMessage({
+		type: "stream",
+		stream: key,
+		html: ChatzMarkdown.render(stream.text, { origin: origin }),
+		final: final
+	});
+
+	if (final) {
+		streams.delete(key);
+	}
+}
+
+function scheduleRender(key) {
+	const stream = streams.get(key);
+	if (!stream.timer) {
+		stream.timer = setTimeout(() => renderStream(key, false), 0);
+	}
+}
+
+self.onmessage = (event) => {
+	const message = event.data;
+
+	switch (message.type) {
+		case "init":
+			origin = message.origin || "";
+			break;
+
+		case "render":
+			self.postMessage({
+				type: "rendered",
+				id: message.id,
+				html: ChatzMarkdown.render(message.content, { origin: origin })
+			});
+			break;
+
+		case "append":
+		case "set": {
+			if (!streams.has(message.stream)) {
+				streams.set(message.stream, { text: "", timer: null });
+			}
+			const stream = streams.get(message.stream);
+			stream.text = message.type === "append" ? stream.text + message.delta : message.content;
+			scheduleRender(message.stream);
+			break;
+		}
+
+		case "finish":
+			if (!streams.has(message.stream)) {
+				streams.set(message.stream, { text: "", timer: null });
+			}
+			renderStream(message.stream, true);
+			break;
+
+		case "discard": {
+			const stream = streams.get(message.stream);
+			if (stream && stream.timer) {
+				clearTimeout(stream.timer);
+			}
+			streams.delete(message.stream);
+			break;
+		}
+	}
+};
@@ -0,0 +1,92 @@
+/**
+ * Chatz Prefetch Module
+ * Speculative fetches of turn context, started while the user is typing
+ *
+ * Entries are promises keyed by what they fetch, so a fetch started on focus
+ * is shared with the send that follows it. Entries expire after a minute and
+ * fetches that failed (resolved null) are dropped, so a send never waits on
+ * stale or broken data.
+ */
+
+// Entries older than this are fetched again
+const MAX_AGE_MS = 60 * 1000;
+
+export const ChatzPrefetch = {
+	// key -> { promise, at }
+	entries: new Map(),
+
+	/**
+	 * Key of a document fetch
+	 */
+	documentKey: function(doctype, docname) {
+		return `doc:${doctype}:${docname}`;
+	},
+
+	/**
+	 * Key of a conversation history fetch
+	 */
+	historyKey: function(conversationId, limit) {
+		return `history:${conversationId}:${limit}`;
+	},
+
+	/**
+	 * Start a fetch unless a fresh one is already cached
+	 * @param {String} key - Entry key
+	 * @param {Function} load - Returns a Promise resolving the value, or null on failure
+	 * @returns {Promise} Cached or new fetch
+	 */
+	get: function(key, load) {
+		const entry = this.entries.get(key);
+		if (entry && Date.now() - entry.at < MAX_AGE_MS) {
+			return entry.promise;
+		}
+
+		const promise = load();
+		this.entries.set(key, { promise: promise, at: Date.now() });
+		promise.then((value) => {
+			if (value == null) {
+				this.drop(key, promise);
+			}
+		}, () => this.drop(key, promise));
+		return promise;
+	},
+
+	/**
+	 * Use a fetch once: the cached one if fresh, otherwise a new one
+	 * For data the caller is about to change (the history a send extends).
+	 */
+	take: function(key, load) {
+		const promise = this.get(key, load);
+		this.entries.delete(key);
+		return promise;
+	},
+
+	/**
+	 * Drop every entry whose key starts with a prefix
+	 * @param {String} prefix - e.g. documentKey(doctype, docname) or "history:"
+	 */
+	invalidate: function(prefix) {
+		for (const key of [...this.entries.keys()]) {
+			if (key.startsWith(prefix)) {
+				this.entries.delete(key);
+			}
+		}
+	},
+
+	/**
+	 * Drop all entries
+	 */
+	clear: function() {
+		this.entries.clear();
+	},
+
+	/**
+	 * Drop an entry if it still holds the given fetch
+	 */
+	drop: function(key, promise) {
+		const entry = this.entries.get(key);
+		if (entry && entry.promise === promise) {
+			this.entries.delete(key);
+		}
+	}
+};
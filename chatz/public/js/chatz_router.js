@@ -0,0 +1,56 @@
+/**
+ * Chatz Router Module
+ * Picks the model for a turn when the Chatz API has a model router
+ *
+ * A port of chatz/utils/model_router.py (used for server turns); the
+ * heuristics must stay the same.
+ */
+
+// Turns asking for work rather than a quick answer; must match COMPLEX_TURN
+// in chatz/utils/model_router.py
+const COMPLEX_TURN = /```|\b(?:explain|analy[sz]e|compare|summari[sz]e|why|step by step|write|draft|rewrite|translate|code|script|calculate|plan|list all|pros and cons)\b/i;
+
+const DEFAULT_MAX_WORDS = 20;
+
+export const ChatzRouter = {
+	ROUTE_FAST: "Fast",
+	ROUTE_DEFAULT: "Default",
+
+	/**
+	 * Decide whether a turn is simple enough for the fast model
+	 * @param {String} message - User message
+	 * @param {Number} maxWords - Longest simple turn
+	 * @returns {Object} { route, reason: "short", "long" or "complex" }
+	 */
+	classify: function(message, maxWords) {
+		const text = (message || "").trim();
+		if (COMPLEX_TURN.test(text)) {
+			return { route: this.ROUTE_DEFAULT, reason: "complex" };
+		}
+		const words = text.split(/\s+/).filter(Boolean).length;
+		if (words > (maxWords || DEFAULT_MAX_WORDS)) {
+			return { route: this.ROUTE_DEFAULT, reason: "long" };
+		}
+		return { route: this.ROUTE_FAST, reason: "short" };
+	},
+
+	/**
+	 * Model for a turn, as chosen by the Chatz API's model router
+	 * @param {Object} config - API configuration (routes only with config.model_router)
+	 * @param {String} message - User message
+	 * @returns {Object|null} { model, route, reason }, or null without a router
+	 */
+	route: function(config, message) {
+		const router = config.model_router;
+		if (!router) {
+			return null;
+		}
+
+		const decision = this.classify(message, router.max_words);
+		return {
+			model: decision.route === this.ROUTE_FAST ? router.fast_model : config.model_name,
+			route: decision.route,
+			reason: decision.reason
+		};
+	}
+};
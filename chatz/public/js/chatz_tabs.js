@@ -0,0 +1,176 @@
+/**
+ * Chatz Tabs Module
+ * Coordinates the Desk tabs of one user over a BroadcastChannel
+ *
+ * One tab with the widget loaded is elected leader (through a Web Lock, so
+ * leadership moves on when that tab closes) and runs the history sync for
+ * everyone: the IndexedDB cache is shared, so the other tabs only need to
+ * know when it changed. Tabs also share the launcher configuration and
+ * mirror each other's streamed responses.
+ *
+ * Without BroadcastChannel or Web Locks every tab works on its own, as before.
+ */
+
+const CHANNEL_PREFIX = "chatz:";
+const LEADER_LOCK_PREFIX = "chatz-leader:";
+
+// Shared by the launcher and widget bundles: the first one loaded creates it
+export const ChatzTabs = window.ChatzTabs || {
+	tabId: Math.random().toString(36).substr(2, 9),
+	channel: null,
+	user: null,
+	isLeader: false,
+	electing: false,
+	listeners: {},
+	answerers: {},
+	pending: {},
+
+	/**
+	 * Open the channel for a user (runs once)
+	 * @param {String} user - Session user
+	 * @returns {Boolean} True if tabs can talk to each other
+	 */
+	init: function(user) {
+		if (this.channel || this.user) {
+			return Boolean(this.channel);
+		}
+		this.user = user;
+
+		if (typeof BroadcastChannel === "undefined") {
+			this.isLeader = true;
+			return false;
+		}
+
+		this.channel = new BroadcastChannel(CHANNEL_PREFIX + user);
+		this.channel.onmessage = (e) => this.receive(e.data);
+		return true;
+	},
+
+	/**
+	 * Whether other tabs can be reached
+	 */
+	isShared: function() {
+		return Boolean(this.channel);
+	},
+
+	/**
+	 * Ask to become the leader; granted when no other tab holds the lock
+	 * Held until this tab closes. Without Web Locks each tab leads itself.
+	 */
+	electLeader: function() {
+		if (this.isLeader || this.electing) return;
+
+		if (!this.channel || !navigator.locks) {
+			this.isLeader = true;
+			return;
+		}
+
+		this.electing = true;
+		navigator.locks.request(LEADER_LOCK_PREFIX + this.user, () => {
+			this.isLeader = true;
+			this.emit("leader", {});
+			return new Promise(() => {});
+		});
+	},
+
+	/**
+	 * Send an event to the other tabs
+	 * @param {String} type - Event type
+	 * @param {Object} data - Payload (structured-cloneable)
+	 */
+	post: function(type, data) {
+		if (!this.channel) return;
+		try {
+			this.channel.postMessage({ type: type, from: this.tabId, data: data });
+		} catch (e) {
+			console.error("Chatz: Could not post to other tabs", e);
+		}
+	},
+
+	/**
+	 * Listen for events from other tabs
+	 * @param {String} type - Event type
+	 * @param {Function} handler - Receives the payload
+	 */
+	on: function(type, handler) {
+		(this.listeners[type] = this.listeners[type] || []).push(handler);
+	},
+
+	/**
+	 * Answer requests of a kind from other tabs
+	 * @param {String} kind - Request kind
+	 * @param {Function} handler - Returns the answer (or a Promise); null leaves it to another tab
+	 */
+	answer: function(kind, handler) {
+		this.answerers[kind] = handler;
+	},
+
+	/**
+	 * Ask the other tabs; resolves with the first answer
+	 * @param {String} kind - Request kind
+	 * @param {Object} data - Request payload
+	 * @param {Number} timeout - Milliseconds to wait for an answer
+	 * @returns {Promise} Answer, or null if no tab answered in time
+	 */
+	request: function(kind, data, timeout) {
+		if (!this.channel) {
+			return Promise.resolve(null);
+		}
+
+		const id = `${this.tabId}:${Math.random().toString(36).substr(2, 9)}`;
+		return new Promise((resolve) => {
+			const timer = setTimeout(() => {
+				delete this.pending[id];
+				resolve(null);
+			}, timeout);
+			this.pending[id] = (result) => {
+				clearTimeout(timer);
+				delete this.pending[id];
+				resolve(result);
+			};
+			this.post("request", { id: id, kind: kind, data: data });
+		});
+	},
+
+	/**
+	 * Dispatch a message from another tab
+	 */
+	receive: function(message) {
+		if (!message || message.from === this.tabId) return;
+		const data = message.data || {};
+
+		if (message.type === "request") {
+			const handler = this.answerers[data.kind];
+			if (!handler) return;
+			Promise.resolve(handler(data.data)).then((result) => {
+				if (result != null) {
+					this.post("reply", { id: data.id, result: result });
+				}
+			}).catch(() => {});
+			return;
+		}
+
+		if (message.type === "reply") {
+			const resolve = this.pending[data.id];
+			if (resolve) resolve(data.result);
+			return;
+		}
+
+		this.emit(message.type, data);
+	},
+
+	/**
+	 * Call the listeners of an event
+	 */
+	emit: function(type, data) {
+		(this.listeners[type] || []).forEach((handler) => {
+			try {
+				handler(data);
+			} catch (e) {
+				console.error(`Chatz: Error handling ${type} from another tab`, e);
+			}
+		});
+	}
+};
+
+window.ChatzTabs = ChatzTabs;
@@ -0,0 +1,20 @@
+/**
+ * Chatz Widget Bundle
+ * Full widget, loaded on demand by the launcher the first time the chat is opened
+ */
+
+import { ChatzContext } from "./chatz_context";
+import { ChatzAPIClient } from "./chatz_api_client";
+import { ChatzHistoryManager } from "./chatz_history_manager";
+import { ChatzGuestSession } from "./chatz_guest_session";
+import { ChatzMarkdownRenderer } from "./chatz_markdown_renderer";
+import { ChatzWidget } from "./chatz_widget";
+
+// Inline handlers in rendered messages (e.g. thought toggles) and the launcher
+// reference these by name, so expose them globally
+window.ChatzContext = ChatzContext;
+window.ChatzAPIClient = ChatzAPIClient;
+window.ChatzHistoryManager = ChatzHistoryManager;
+window.ChatzGuestSession = ChatzGuestSession;
+window.ChatzMarkdownRenderer = ChatzMarkdownRenderer;
+window.ChatzWidget = ChatzWidget;
@@ -3,11 +3,43 @@
  * Main floating chat widget for Frappe Desk
  */
 
-const ChatzWidget = {
+import { ChatzContext } from "./chatz_context";
+import { ChatzAPIClient } from "./chatz_api_client";
+import { ChatzCompare } from "./chatz_compare";
+import { ChatzHistoryManager } from "./chatz_history_manager";
+import { ChatzGuestSession } from "./chatz_guest_session";
+import { ChatzMarkdown } from "./chatz_markdown";
+import { ChatzMarkdownRenderer } from "./chatz_markdown_renderer";
+import { ChatzPrefetch } from "./chatz_prefetch";
+import { ChatzRouter } from "./chatz_router";
+import { ChatzTabs } from "./chatz_tabs";
+
+// Previous messages sent with each prompt
+const HISTORY_WINDOW = 10;
+
+// Messages shown when a conversation is opened
+const CONVERSATION_PAGE = 50;
+
+// A response mirrored from another tab is given up after this long without chunks
+const MIRROR_IDLE_MS = 60 * 1000;
+
+export const ChatzWidget = {
 	config: null,
 	conversationId: null,
 	isOpen: false,
 	isLoading: false,
+	// Stream being received: { controller, streamId, detached }
+	activeStream: null,
+	// Batch jobs shown in the chat, by job name: { element, timer }
+	batches: {},
+	// History saves in flight, by conversation ID
+	pendingSaves: {},
+	// Document last sent with a turn, by conversation ID
+	sentDocuments: {},
+	// Response streamed by another tab into this conversation: { streamId, content, started, timer }
+	mirroredTurn: null,
+	// Compare mode: { configs: [get_api_config payloads] }, one column each
+	compare: null,
 
 	/**
 	 * Scroll chat to bottom with multiple attempts to handle animations
@@ -39,6 +71,7 @@ const ChatzWidget = {
 
 		this.createWidget();
 		this.attachEventListeners();
+		this.connectTabs();
 
 		// Update all icons to match current API
 		this.updateChatTabIcon();
@@ -54,22 +87,7 @@ const ChatzWidget = {
 		if (!this.isGuest) {
 			this.loadLastConversation();
 		} else {
-			// For guests, load from localStorage
-			const guestHistory = this.loadGuestHistory();
-			if (guestHistory && guestHistory.length > 0) {
-				// Restore conversation from localStorage
-				guestHistory.forEach(msg => {
-					this.addMessageToDisplay(msg.role, msg.content, msg.timestamp);
-				});
-
-				// Scroll to bottom after loading history
-				this.scrollToBottom();
-			} else {
-				// No history, show greeting
-				if (this.config.greeting_message) {
-					this.addMessageToDisplay("assistant", this.config.greeting_message, new Date().toISOString());
-				}
-			}
+			this.loadGuestHistory();
 		}
 	},
 
@@ -169,6 +187,10 @@ const ChatzWidget = {
 						<div class="chatz-view chatz-view-active" id="chatz-view-chat">
 							<div class="chatz-messages" id="chatz-messages"></div>
 							<div class="chatz-input-wrapper">
+								<label class="chatz-batch-toggle" id="chatz-batch-toggle" style="display: none;">
+									<input type="checkbox" id="chatz-batch-mode">
+									<span id="chatz-batch-label"></span>
+								</label>
 								<div class="chatz-input-container">
 									<div class="chatz-input-icon">
 										${iconSVG}
@@ -300,7 +322,17 @@ const ChatzWidget = {
 
 		toggleBtn.addEventListener("click", () => this.toggleWidget());
 		closeBtn.addEventListener("click", () => this.toggleWidget());
-		sendBtn.addEventListener("click", () => this.sendMessage());
+		sendBtn.addEventListener("click", () => {
+			// While a response streams the send button stops it
+			if (this.activeStream) {
+				this.stopGeneration();
+			} else if (this.mirroredTurn) {
+				// Streamed by another tab: ask that tab to stop it
+				ChatzTabs.post("turn-stop", { streamId: this.mirroredTurn.streamId });
+			} else {
+				this.sendMessage();
+			}
+		});
 		refreshBtn.addEventListener("click", () => this.startNewChat());
 		maximizeBtn.addEventListener("click", () => this.toggleMaximize());
 
@@ -322,6 +354,16 @@ const ChatzWidget = {
 			tabDropdown.addEventListener("change", (e) => this.switchTab(e.target.value));
 		}
 
+		// The list selection may have changed since the widget was opened
+		input.addEventListener("focus", () => {
+			this.updateBatchToggle();
+			this.prefetchTurnContext();
+		});
+
+		// Fetch what the next send needs while the user is still typing
+		input.addEventListener("input", () => this.prefetchTurnContext());
+		this.attachPrefetchInvalidation();
+
 		// Send on Enter (Shift+Enter for new line)
 		input.addEventListener("keydown", (e) => {
 			if (e.key === "Enter" && !e.shiftKey) {
@@ -329,6 +371,19 @@ const ChatzWidget = {
 				this.sendMessage();
 			}
 		});
+
+		// Internal link buttons in rendered messages (rendered as HTML strings)
+		document.getElementById("chatz-messages").addEventListener("click", (e) => {
+			const linkBtn = e.target.closest(".chatz-internal-link-btn");
+			if (linkBtn && linkBtn.dataset.chatzUrl) {
+				this.navigateToUrl(linkBtn.dataset.chatzUrl);
+			}
+
+			const cancelBtn = e.target.closest(".chatz-batch-cancel");
+			if (cancelBtn) {
+				this.cancelBatch(cancelBtn.dataset.chatzBatch);
+			}
+		});
 	},
 
 	/**
@@ -377,7 +432,11 @@ const ChatzWidget = {
 
 		// Scroll to bottom when opening the widget
 		if (this.isOpen) {
+			this.updateBatchToggle();
 			this.scrollToBottom();
+		} else {
+			// Nobody is reading the response any more
+			this.stopGeneration();
 		}
 	},
 
@@ -419,142 +478,969 @@ const ChatzWidget = {
 		// Get context
 		const context = ChatzContext.getCurrentContext();
 
-		// Save user message to history
-		if (!this.isGuest) {
-			// Logged-in users: save to backend
-			ChatzHistoryManager.saveMessage(
-				this.conversationId,
-				"user",
-				message,
-				context,
-				this.config.api_config_name,
-				(result) => {
-					if (result && result.status === "error") {
-						console.error("Chatz: Failed to save user message:", result.message);
-						// Don't show error to user for message saving - it's not critical
-					}
-				}
-			);
-		} else {
-			// Guests: save to localStorage
-			this.saveGuestMessage("user", message);
+		const batchMode = document.getElementById("chatz-batch-mode");
+		if (batchMode && batchMode.checked && context.selected_names.length) {
+			this.startBatch(context, message);
+			return;
 		}
 
-		// Get conversation history
 		this.isLoading = true;
 
-		// If viewing a document, fetch its data to include in context
-		if (context.doctype && context.docname) {
+		if (this.usesServerTurns()) {
+			// The server gathers the rest of the context itself
+			this.proceedWithMessage(context, message, [], [], true);
+			return;
+		}
+
+		// Fetch the open document (usually prefetched while typing, and not
+		// at all if the version sent last is unchanged), indexed snippets and
+		// attachment excerpts in parallel
+		const conversationId = this.conversationId;
+		const unchanged = this.unchangedSentDocument(context.doctype, context.docname);
+		const documentData = unchanged
+			? Promise.resolve(unchanged)
+			: (context.doctype && context.docname)
+				? this.prefetchDocument(context.doctype, context.docname)
+				: Promise.resolve(null);
+		const retrieved = this.config.enable_retrieval
+			? this.searchContext(message)
+			: Promise.resolve([]);
+		const attachments = (this.config.include_attachments && context.attachment_count)
+			? this.fetchAttachmentContext(context, message)
+			: Promise.resolve([]);
+
+		Promise.all([documentData, retrieved, attachments]).then(([doc, snippets, excerpts]) => {
+			if (doc) {
+				context.document_data = doc;
+				this.sentDocuments[conversationId] = doc;
+			}
+			// Now get conversation history
+			if (this.compare) {
+				this.proceedWithCompare(context, message, snippets, excerpts);
+			} else {
+				this.proceedWithMessage(context, message, snippets, excerpts);
+			}
+		});
+	},
+
+	/**
+	 * Speculatively fetch the open document and the current conversation's
+	 * history window, so a send only has to wait for the LLM
+	 *
+	 * Cheap to call repeatedly: fetches already cached are reused. History is
+	 * not prefetched while a turn is in progress, since it is about to change.
+	 */
+	prefetchTurnContext: function() {
+		const context = ChatzContext.getCurrentContext();
+		if (context.doctype && context.docname && !this.unchangedSentDocument(context.doctype, context.docname)) {
+			this.prefetchDocument(context.doctype, context.docname);
+		}
+		if (!this.isGuest && !this.isLoading) {
+			this.prefetchHistory(this.conversationId, HISTORY_WINDOW);
+		}
+	},
+
+	/**
+	 * The document as sent with the current conversation's last turn, if the
+	 * form's copy shows it is unchanged since (same modified timestamp)
+	 *
+	 * Such a turn needs no fetch: the prompt only notes that the document is
+	 * unchanged (see ChatzAPIClient.buildMessagesArray).
+	 *
+	 * @returns {Object|null} Document, or null if it has to be fetched
+	 */
+	unchangedSentDocument: function(doctype, docname) {
+		const sent = this.sentDocuments[this.conversationId];
+		if (!sent || !doctype || !docname || sent.doctype !== doctype || sent.name !== docname) {
+			return null;
+		}
+		const local = frappe.get_doc ? frappe.get_doc(doctype, docname) : null;
+		return local && local.modified === sent.modified ? sent : null;
+	},
+
+	/**
+	 * Get a document from the prefetch cache, fetching it if needed
+	 * @returns {Promise<Object|null>} Document, or null if it could not be read
+	 */
+	prefetchDocument: function(doctype, docname) {
+		return ChatzPrefetch.get(
+			ChatzPrefetch.documentKey(doctype, docname),
+			() => this.fetchDocument(doctype, docname)
+		);
+	},
+
+	/**
+	 * Start fetching a conversation's latest messages into the prefetch cache
+	 * Skipped while messages of that conversation are being saved.
+	 */
+	prefetchHistory: function(conversationId, limit) {
+		if (this.pendingSaves[conversationId]) return;
+		ChatzPrefetch.get(
+			ChatzPrefetch.historyKey(conversationId, limit),
+			() => this.fetchHistory(conversationId, limit)
+		);
+	},
+
+	/**
+	 * Use a conversation's prefetched messages, or fetch them
+	 * The entry is used once: the caller is about to extend the conversation.
+	 * @returns {Promise<Object|null>} get_conversation_history result, or null on failure
+	 */
+	takeHistory: function(conversationId, limit) {
+		return ChatzPrefetch.take(
+			ChatzPrefetch.historyKey(conversationId, limit),
+			() => this.fetchHistory(conversationId, limit)
+		);
+	},
+
+	/**
+	 * Fetch a conversation's latest messages
+	 * @returns {Promise<Object|null>} get_conversation_history result, or null on failure
+	 */
+	fetchHistory: function(conversationId, limit) {
+		return new Promise((resolve) => {
+			ChatzHistoryManager.getConversationHistory(conversationId, limit, (result) => {
+				resolve(result && result.status === "success" ? result : null);
+			});
+		});
+	},
+
+	/**
+	 * Save a message to history, keeping prefetched history of its
+	 * conversation from going stale
+	 * @param {Object} link - { api_used, compare_group } for compare mode, and
+	 *     generation: { model_used, model_route, route_reason, ttft_ms, response_ms } (optional)
+	 */
+	saveToHistory: function(conversationId, messageType, content, context, callback, generationStatus, link) {
+		const historyPrefix = ChatzPrefetch.historyKey(conversationId, "");
+		this.pendingSaves[conversationId] = (this.pendingSaves[conversationId] || 0) + 1;
+		ChatzPrefetch.invalidate(historyPrefix);
+
+		ChatzHistoryManager.saveMessage(
+			conversationId,
+			messageType,
+			content,
+			context,
+			(link && link.api_used) || this.config.api_config_name,
+			(result) => {
+				if (--this.pendingSaves[conversationId] <= 0) {
+					delete this.pendingSaves[conversationId];
+				}
+				// Anything prefetched while the save was in flight may miss it
+				ChatzPrefetch.invalidate(historyPrefix);
+				if (callback) {
+					callback(result);
+				}
+			},
+			generationStatus,
+			link && link.compare_group,
+			link && link.generation
+		);
+	},
+
+	/**
+	 * Drop prefetched data that saves and navigation make stale
+	 */
+	attachPrefetchInvalidation: function() {
+		// Saved in this tab (Frappe triggers "save" on the document after a form save)
+		if (window.jQuery) {
+			$(document).on("save", (e, doc) => {
+				if (doc && doc.doctype && doc.name) {
+					ChatzPrefetch.invalidate(ChatzPrefetch.documentKey(doc.doctype, doc.name));
+				}
+			});
+		}
+
+		// Saved elsewhere, for documents open in a form
+		if (frappe.realtime && frappe.realtime.on) {
+			frappe.realtime.on("doc_update", (data) => {
+				if (data && data.doctype && data.name) {
+					ChatzPrefetch.invalidate(ChatzPrefetch.documentKey(data.doctype, data.name));
+				}
+			});
+		}
+
+		// Desk only: a new route means a new context
+		if (frappe.router && frappe.router.on) {
+			frappe.router.on("change", () => ChatzPrefetch.clear());
+		}
+	},
+
+	/**
+	 * Fetch a document to include in the prompt
+	 * @returns {Promise<Object|null>} Document, or null if it could not be read
+	 */
+	fetchDocument: function(doctype, docname) {
+		return new Promise((resolve) => {
 			frappe.call({
 				method: "frappe.client.get",
 				args: {
-					doctype: context.doctype,
-					name: context.docname
+					doctype: doctype,
+					name: docname
 				},
-				callback: (r) => {
-					if (r.message) {
-						context.document_data = r.message;
-					}
-					// Now get conversation history
-					this.proceedWithMessage(context, message);
+				callback: (r) => resolve(r.message || null),
+				// If fetch fails, proceed without document data
+				error: () => resolve(null)
+			});
+		});
+	},
+
+	/**
+	 * Get indexed records relevant to the message (permission filtered)
+	 * @returns {Promise<Array>} Snippets, empty on failure
+	 */
+	searchContext: function(message) {
+		return new Promise((resolve) => {
+			frappe.call({
+				method: "chatz.api.retrieval.search_context",
+				args: {
+					query: message,
+					api_name: this.config.api_config_name
 				},
-				error: () => {
-					// If fetch fails, proceed without document data
-					this.proceedWithMessage(context, message);
-				}
+				callback: (r) => resolve((r.message && r.message.snippets) || []),
+				error: () => resolve([])
 			});
-		} else {
-			// No document context, proceed directly
-			this.proceedWithMessage(context, message);
-		}
+		});
+	},
+
+	/**
+	 * Get the parts of the open record's attachments relevant to the message
+	 * @returns {Promise<Array>} Excerpts ({file_name, content} or {file_name, pending}), empty on failure
+	 */
+	fetchAttachmentContext: function(context, message) {
+		return new Promise((resolve) => {
+			frappe.call({
+				method: "chatz.api.attachments.get_attachment_context",
+				args: {
+					doctype: context.doctype,
+					docname: context.docname,
+					query: message,
+					api_name: this.config.api_config_name
+				},
+				callback: (r) => resolve((r.message && r.message.attachments) || []),
+				error: () => resolve([])
+			});
+		});
 	},
 
 	/**
 	 * Proceed with sending message after context is ready
+	 * @param {Boolean} serverTurn - Send as a server turn (see usesServerTurns)
 	 */
-	proceedWithMessage: function(context, message) {
-		// For guests, skip history retrieval and just send the message
-		const processMessage = (history) => {
-			const messages = ChatzAPIClient.buildMessagesArray(
+	proceedWithMessage: function(context, message, retrieved, attachments, serverTurn) {
+		// With turn (server turns) the server builds the prompt and saves both messages
+		const processMessage = (history, turn, savedContext) => {
+			const messages = turn ? null : ChatzAPIClient.buildMessagesArray(
 				this.config,
 				history,
 				message,
-				context
+				context,
+				retrieved,
+				attachments
 			);
 
 			// Show thinking bubble
 			this.showThinkingBubble();
 
-			// Call API
+			// The conversation the response belongs to, even if the user moves on
+			const conversationId = this.conversationId;
+			const stream = {
+				controller: new AbortController(),
+				streamId: ChatzAPIClient.generateStreamId(),
+				detached: false
+			};
+			this.activeStream = stream;
+			this.setSendButtonMode(true);
+
+			// Other tabs showing this conversation mirror the response
+			ChatzTabs.post("turn-start", {
+				conversationId: conversationId,
+				streamId: stream.streamId,
+				message: message
+			});
+
+			// The Chatz API's model router may pick a faster model (server turns
+			// are routed by the server)
+			const route = turn ? null : ChatzRouter.route(this.config, message);
+			const config = route ? Object.assign({}, this.config, { model_name: route.model }) : this.config;
+			const started = performance.now();
+			let firstTokenAt = null;
+
+			// Call API. Streamed reasoning is shown (and saved, which splits it
+			// off again) as "*Thinking:" lines ahead of the answer
+			let answer = "";
+			let reasoning = "";
 			let fullResponse = "";
 			let firstChunk = true;
+			let saved = null;
+			const showChunk = () => {
+				fullResponse = ChatzMarkdown.joinReasoning(reasoning, answer);
+				if (firstChunk) {
+					firstTokenAt = performance.now();
+					// Remove thinking bubble and add actual message on first chunk
+					this.removeThinkingBubble();
+					this.addMessageToDisplay("assistant", "");
+					firstChunk = false;
+				}
+				this.updateLastMessage(fullResponse, true); // Still streaming
+			};
 			ChatzAPIClient.callStreamingAPI(
-				this.config,
+				config,
 				messages,
 				(chunk) => {
-					fullResponse += chunk;
-					if (firstChunk) {
-						// Remove thinking bubble and add actual message on first chunk
-						this.removeThinkingBubble();
-						this.addMessageToDisplay("assistant", "");
-						firstChunk = false;
-					}
-					this.updateLastMessage(fullResponse, true); // Still streaming
+					answer += chunk;
+					ChatzTabs.post("turn-chunk", { conversationId: conversationId, streamId: stream.streamId, chunk: chunk });
+					showChunk();
 				},
-				() => {
-					this.isLoading = false;
-					this.updateLastMessage(fullResponse, false); // Streaming complete
+				(result) => {
+					const stopped = result && result.stopped;
+					this.finishStream(stream);
+
+					if (!stream.detached) {
+						if (firstChunk) {
+							this.removeThinkingBubble();
+						} else {
+							this.updateLastMessage(fullResponse, false); // Streaming complete
+							if (stopped) {
+								this.markLastMessageStopped();
+							}
+						}
+					}
+
+					ChatzTabs.post("turn-end", {
+						conversationId: conversationId,
+						streamId: stream.streamId,
+						content: fullResponse,
+						stopped: Boolean(stopped)
+					});
+
+					if (turn) {
+						// Saved by the server; confirm the cached copies
+						ChatzHistoryManager.finishServerTurn(turn, saved || {}, fullResponse, stopped ? "Stopped" : null);
+						ChatzPrefetch.invalidate(ChatzPrefetch.historyKey(conversationId, ""));
+						return;
+					}
+
+					// Nothing to keep if the response was stopped before it started
+					if (!fullResponse) return;
+
+					// The proxy falls back to the default model for one it does not allow
+					const usedModel = (result && result.model) || config.model_name;
+					const routed = Boolean(route) && usedModel === route.model;
+
 					// Save assistant response to history
 					if (!this.isGuest) {
 						// Logged-in users: save to backend
-						ChatzHistoryManager.saveMessage(
-							this.conversationId,
+						this.saveToHistory(
+							conversationId,
 							"assistant",
 							fullResponse,
-							context,
-							this.config.api_config_name,
+							savedContext || context,
 							(result) => {
 								if (result && result.status === "error") {
 									console.error("Chatz: Failed to save assistant message:", result.message);
 									// Don't show error to user for message saving - it's not critical
 								}
+							},
+							stopped ? "Stopped" : null,
+							{
+								generation: {
+									model_used: usedModel,
+									model_route: routed ? route.route : null,
+									route_reason: routed ? route.reason : null,
+									ttft_ms: firstTokenAt !== null ? Math.round(firstTokenAt - started) : null,
+									response_ms: Math.round(performance.now() - started)
+								}
 							}
 						);
-					} else {
-						// Guests: save to localStorage
+					} else if (!stream.detached) {
 						this.saveGuestMessage("assistant", fullResponse);
 					}
 				},
 				(error) => {
-					this.isLoading = false;
-					this.addMessageToDisplay("error", error);
+					this.finishStream(stream);
+					ChatzTabs.post("turn-end", { conversationId: conversationId, streamId: stream.streamId, error: error });
+					if (!stream.detached) {
+						this.removeThinkingBubble();
+						this.addMessageToDisplay("error", error);
+					}
+				},
+				{
+					signal: stream.controller.signal,
+					streamId: stream.streamId,
+					turn: turn,
+					onReasoning: (thought) => {
+						reasoning += thought;
+						ChatzTabs.post("turn-chunk", { conversationId: conversationId, streamId: stream.streamId, reasoning: thought });
+						showChunk();
+					},
+					onSaved: (ids) => {
+						saved = ids;
+					}
 				}
 			);
 		};
 
-		// Get conversation history
+		if (serverTurn) {
+			ChatzPrefetch.invalidate(ChatzPrefetch.historyKey(this.conversationId, ""));
+			processMessage(null, ChatzHistoryManager.startServerTurn(
+				this.conversationId,
+				message,
+				context,
+				this.config.api_config_name
+			));
+			return;
+		}
+
+		// Get conversation history, then save the user message (so the history
+		// window never contains the message being sent)
 		if (!this.isGuest) {
-			// Logged-in users: get from backend
-			ChatzHistoryManager.getConversationHistory(this.conversationId, 10, (result) => {
-				if (result && result.status === "success") {
+			// Logged-in users: prefetched while typing, or fetched from the backend
+			const conversationId = this.conversationId;
+			this.takeHistory(conversationId, HISTORY_WINDOW).then((result) => {
+				if (result) {
 					const history = result.messages || [];
-					processMessage(history);
+					const savedContext = this.storedTurnContext(context, history);
+					this.saveToHistory(
+						conversationId,
+						"user",
+						message,
+						savedContext,
+						(saveResult) => {
+							if (saveResult && saveResult.status === "error") {
+								console.error("Chatz: Failed to save user message:", saveResult.message);
+								// Don't show error to user for message saving - it's not critical
+							}
+						}
+					);
+					processMessage(history, null, savedContext);
 				} else {
 					this.isLoading = false;
-					const errorMsg = result ? result.message : "Failed to get conversation history";
-					this.addMessageToDisplay("error", "Error: " + errorMsg);
+					this.addMessageToDisplay("error", "Error: Failed to get conversation history");
+				}
+			});
+		} else {
+			// Guests: one request stores the message and returns the preceding window
+			ChatzGuestSession.addMessage("user", message, HISTORY_WINDOW).then((result) => {
+				if (result.status !== "success") {
+					console.error("Chatz: Failed to save guest message:", result.message);
+				}
+				// Convert guest history format to match backend format
+				const history = (result.history || []).map(msg => ({
+					message_type: msg.role,
+					message_content: msg.content
+				}));
+				processMessage(history);
+			});
+		}
+	},
+
+	/**
+	 * Context to save with the messages of a turn: a document sent earlier in
+	 * the history window is stored as its changes (ChatzAPIClient.storedContext)
+	 * @param {Object} context - Desk context of the turn
+	 * @param {Array} history - History window the prompt is built from
+	 * @returns {Object} Context for saveToHistory
+	 */
+	storedTurnContext: function(context, history) {
+		const previous = ChatzAPIClient.lastSentDocument(history, context.doctype, context.docname);
+		return ChatzAPIClient.storedContext(context, previous);
+	},
+
+	/**
+	 * How a compared response was generated, for Chatz History
+	 * @param {Object} config - Config of the column
+	 * @param {Object} meter - ChatzCompare meter of its stream
+	 * @returns {Object} { model_used, ttft_ms, response_ms }
+	 */
+	meterGeneration: function(config, meter) {
+		const readout = ChatzCompare.readout(meter, performance.now());
+		return {
+			model_used: meter.model || config.model_name,
+			ttft_ms: readout.ttftMs !== null ? Math.round(readout.ttftMs) : null,
+			response_ms: Math.round(readout.elapsedMs)
+		};
+	},
+
+	/**
+	 * Whether turns go through chatz.api.turn.stream_turn: the server builds
+	 * the prompt and saves the user message and the response, so neither the
+	 * history window nor the response is uploaded (proxied APIs, logged-in
+	 * users, outside compare mode)
+	 * @returns {Boolean}
+	 */
+	usesServerTurns: function() {
+		return !this.isGuest && !this.compare && Boolean(this.config.use_server_proxy);
+	},
+
+	/**
+	 * Send a message to every compared API at once (compare mode)
+	 *
+	 * The responses stream side by side into one column per API, each with
+	 * live TTFT and throughput. The prompt and each response are saved with
+	 * the same compare group, each response under its own API, and every API
+	 * only sees its own earlier responses in the history window.
+	 */
+	proceedWithCompare: function(context, message, retrieved, attachments) {
+		const configs = this.compare.configs;
+		const conversationId = this.conversationId;
+		const group = ChatzCompare.newGroupId();
+
+		// Responses of every column are in the history, so fetch enough of it
+		this.takeHistory(conversationId, HISTORY_WINDOW * configs.length).then((result) => {
+			if (!result) {
+				this.isLoading = false;
+				this.addMessageToDisplay("error", "Error: Failed to get conversation history");
+				return;
+			}
+			const history = result.messages || [];
+			const savedContext = this.storedTurnContext(context, history);
+
+			this.saveToHistory(conversationId, "user", message, savedContext, (saveResult) => {
+				if (saveResult && saveResult.status === "error") {
+					console.error("Chatz: Failed to save user message:", saveResult.message);
 				}
+			}, null, { compare_group: group });
+
+			const columns = this.addCompareRow(group, configs.map(config => config.api_config_name));
+			const stream = {
+				controller: new AbortController(),
+				streamId: null,
+				targets: [],
+				detached: false
+			};
+			this.activeStream = stream;
+			this.setSendButtonMode(true);
+
+			const showReadouts = () => {
+				const now = performance.now();
+				stream.targets.forEach(target => {
+					const column = columns[target.config.api_config_name];
+					column.stats.textContent = ChatzCompare.formatReadout(ChatzCompare.readout(target.meter, now));
+				});
+			};
+			// Keeps the clocks moving while a column waits for its first token
+			const ticker = setInterval(showReadouts, 250);
+
+			stream.targets = ChatzCompare.run(
+				configs,
+				(config) => ChatzAPIClient.buildMessagesArray(
+					config,
+					ChatzCompare.historyFor(history, config.api_config_name).slice(-HISTORY_WINDOW),
+					message,
+					context,
+					retrieved,
+					attachments
+				),
+				{
+					onChunk: (config, chunk, content) => {
+						this.renderStreamInto(columns[config.api_config_name].content, content, true);
+					},
+					onComplete: (config, content, stopped, meter) => {
+						const column = columns[config.api_config_name];
+						if (content) {
+							this.renderStreamInto(column.content, content, false);
+						}
+						if (stopped) {
+							column.element.appendChild(this.createStoppedLabel());
+						}
+						if (!content) return;
+
+						this.saveToHistory(conversationId, "assistant", content, savedContext, (saveResult) => {
+							if (saveResult && saveResult.status === "error") {
+								console.error("Chatz: Failed to save compared response:", saveResult.message);
+							}
+						}, stopped ? "Stopped" : null, {
+							api_used: config.api_config_name,
+							compare_group: group,
+							generation: this.meterGeneration(config, meter)
+						});
+					},
+					onError: (config, error) => {
+						const column = columns[config.api_config_name];
+						column.element.classList.add("chatz-compare-column-error");
+						column.content.textContent = error;
+					},
+					onAllDone: () => {
+						clearInterval(ticker);
+						showReadouts();
+						this.finishStream(stream);
+					}
+				},
+				stream.controller.signal
+			);
+			showReadouts();
+		});
+	},
+
+	/**
+	 * Join the other Desk tabs of this user (ChatzTabs)
+	 *
+	 * The leader tab syncs the shared history cache for everyone; responses
+	 * streamed in one tab are mirrored by the tabs showing the same
+	 * conversation, which can also stop them.
+	 */
+	connectTabs: function() {
+		ChatzTabs.init(frappe.session.user);
+		ChatzTabs.electLeader();
+
+		ChatzTabs.answer("history-sync", () => {
+			if (!ChatzTabs.isLeader) return null;
+			return ChatzHistoryManager.sync().then(touched => [...touched]);
+		});
+
+		ChatzTabs.on("history-changed", (data) => {
+			(data.conversations || []).forEach(id => {
+				ChatzPrefetch.invalidate(ChatzPrefetch.historyKey(id, ""));
 			});
+			const historyView = document.getElementById("chatz-view-history");
+			if (this.isOpen && historyView && historyView.style.display === "flex") {
+				this.loadConversationHistory();
+			}
+		});
+
+		ChatzTabs.on("turn-start", (data) => this.mirrorTurnStart(data));
+		ChatzTabs.on("turn-chunk", (data) => this.mirrorTurnChunk(data));
+		ChatzTabs.on("turn-end", (data) => this.mirrorTurnEnd(data));
+		ChatzTabs.on("turn-stop", (data) => {
+			if (this.activeStream && this.activeStream.streamId === data.streamId) {
+				this.stopGeneration();
+			}
+		});
+	},
+
+	/**
+	 * Another tab started a response: show it if it is in this conversation
+	 */
+	mirrorTurnStart: function(data) {
+		// The conversation is about to grow, prefetched history is stale
+		ChatzPrefetch.invalidate(ChatzPrefetch.historyKey(data.conversationId, ""));
+		if (data.conversationId !== this.conversationId || this.activeStream || this.mirroredTurn) return;
+
+		this.mirroredTurn = { streamId: data.streamId, answer: "", reasoning: "", content: "", started: false, timer: null };
+		this.isLoading = true;
+		this.setSendButtonMode(true);
+		this.addMessageToDisplay("user", data.message);
+		this.showThinkingBubble();
+		this.touchMirroredTurn();
+	},
+
+	/**
+	 * A chunk of a response streamed by another tab
+	 */
+	mirrorTurnChunk: function(data) {
+		const turn = this.mirroredTurn;
+		if (!turn || turn.streamId !== data.streamId) return;
+
+		if (!turn.started) {
+			this.removeThinkingBubble();
+			this.addMessageToDisplay("assistant", "");
+			turn.started = true;
+		}
+		turn.answer += data.chunk || "";
+		turn.reasoning += data.reasoning || "";
+		turn.content = ChatzMarkdown.joinReasoning(turn.reasoning, turn.answer);
+		this.updateLastMessage(turn.content, true);
+		this.touchMirroredTurn();
+	},
+
+	/**
+	 * A response streamed by another tab ended (completed, stopped or failed)
+	 */
+	mirrorTurnEnd: function(data) {
+		ChatzPrefetch.invalidate(ChatzPrefetch.historyKey(data.conversationId, ""));
+		const turn = this.mirroredTurn;
+		if (!turn || turn.streamId !== data.streamId) return;
+
+		if (data.error) {
+			this.removeThinkingBubble();
+			this.addMessageToDisplay("error", data.error);
+		} else if (data.content) {
+			if (!turn.started) {
+				this.removeThinkingBubble();
+				this.addMessageToDisplay("assistant", "");
+			}
+			this.updateLastMessage(data.content, false);
+			if (data.stopped) {
+				this.markLastMessageStopped();
+			}
+		} else {
+			this.removeThinkingBubble();
+		}
+		this.endMirroredTurn();
+	},
+
+	/**
+	 * Give up on a mirrored response if its tab goes quiet (e.g. was closed)
+	 */
+	touchMirroredTurn: function() {
+		const turn = this.mirroredTurn;
+		clearTimeout(turn.timer);
+		turn.timer = setTimeout(() => {
+			if (turn.started) {
+				this.updateLastMessage(turn.content, false);
+			} else {
+				this.removeThinkingBubble();
+			}
+			this.endMirroredTurn();
+		}, MIRROR_IDLE_MS);
+	},
+
+	/**
+	 * Stop mirroring another tab's response
+	 */
+	endMirroredTurn: function() {
+		const turn = this.mirroredTurn;
+		if (!turn) return;
+
+		clearTimeout(turn.timer);
+		this.mirroredTurn = null;
+		this.isLoading = false;
+		this.setSendButtonMode(false);
+	},
+
+	/**
+	 * Stop the response being streamed
+	 *
+	 * Aborts the fetch (closing the connection to the API or the server
+	 * proxy, which stops the generation upstream) and, for proxied APIs, asks
+	 * the server to cancel as well. The partial response is saved as stopped.
+	 *
+	 * @param {Boolean} detach - The chat view is being replaced, don't touch it
+	 */
+	stopGeneration: function(detach = false) {
+		const stream = this.activeStream;
+		if (!stream) return;
+
+		stream.detached = detach;
+		stream.controller.abort();
+		if (stream.targets) {
+			// Compare mode: one stream per compared API
+			stream.targets.forEach(target => ChatzAPIClient.cancelStream(target.config, target.streamId));
 		} else {
-			// Guests: get from localStorage
-			const guestHistory = this.loadGuestHistory();
-			// Convert guest history format to match backend format
-			const history = guestHistory.map(msg => ({
-				message_type: msg.role,
-				message_content: msg.content
-			}));
-			processMessage(history);
+			ChatzAPIClient.cancelStream(this.config, stream.streamId);
+		}
+		this.finishStream(stream);
+	},
+
+	/**
+	 * Reset the loading state once a stream has ended
+	 * @param {Object} stream - Stream that ended
+	 */
+	finishStream: function(stream) {
+		if (this.activeStream !== stream) return;
+
+		this.activeStream = null;
+		this.isLoading = false;
+		this.setSendButtonMode(false);
+	},
+
+	/**
+	 * Switch the send button between send and stop
+	 * @param {Boolean} streaming - A response is streaming
+	 */
+	setSendButtonMode: function(streaming) {
+		const sendBtn = document.getElementById("chatz-send");
+		if (!sendBtn) return;
+
+		sendBtn.classList.toggle("chatz-send-btn-stop", streaming);
+		sendBtn.title = streaming ? "Stop" : "Send";
+		sendBtn.innerHTML = streaming
+			? `<svg width="20" height="20" viewBox="0 0 24 24" fill="currentColor"><rect x="6" y="6" width="12" height="12" rx="2"></rect></svg>`
+			: `<svg width="20" height="20" viewBox="0 0 24 24" fill="currentColor"><path d="M2.01 21L23 12 2.01 3 2 10l15 2-15 2z"></path></svg>`;
+	},
+
+	/**
+	 * Label the last assistant message as stopped
+	 */
+	markLastMessageStopped: function() {
+		const messagesDiv = document.getElementById("chatz-messages");
+		const lastMessage = messagesDiv.querySelector(".chatz-message-assistant:last-of-type");
+		const wrapper = lastMessage && lastMessage.querySelector(".chatz-message-wrapper");
+		if (wrapper) {
+			wrapper.appendChild(this.createStoppedLabel());
+		}
+	},
+
+	/**
+	 * Create the "Stopped" label shown under a partial response
+	 * @returns {HTMLElement} Label element
+	 */
+	createStoppedLabel: function() {
+		const label = document.createElement("div");
+		label.className = "chatz-message-stopped";
+		label.textContent = "Stopped";
+		return label;
+	},
+
+	/**
+	 * Offer batch mode while records are checked in a list view
+	 */
+	updateBatchToggle: function() {
+		const toggle = document.getElementById("chatz-batch-toggle");
+		if (!toggle) return;
+
+		const context = ChatzContext.getCurrentContext();
+		const count = this.isGuest ? 0 : context.selected_names.length;
+		toggle.style.display = count ? "flex" : "none";
+		if (!count) {
+			document.getElementById("chatz-batch-mode").checked = false;
+			return;
 		}
+		document.getElementById("chatz-batch-label").textContent =
+			`Ask each of the ${count} selected ${context.doctype} records`;
+	},
+
+	/**
+	 * Ask the message about each checked record in a background job
+	 *
+	 * Answers are stored in a Chatz Batch Job rather than the conversation;
+	 * the chat shows a progress card that follows the job.
+	 *
+	 * @param {Object} context - Current context with doctype and selected_names
+	 * @param {String} message - Question to ask per record
+	 */
+	startBatch: function(context, message) {
+		document.getElementById("chatz-batch-mode").checked = false;
+
+		frappe.call({
+			method: "chatz.api.batch.start_batch",
+			args: {
+				api_config_name: this.config.api_config_name,
+				doctype: context.doctype,
+				names: JSON.stringify(context.selected_names),
+				prompt: message,
+				model: this.config.model_name
+			},
+			callback: (r) => {
+				const result = r.message || {};
+				if (result.status !== "success") {
+					this.addMessageToDisplay("error", result.message || "Failed to start batch");
+					return;
+				}
+				this.showBatchProgress({
+					job: result.job,
+					status: "Queued",
+					reference_doctype: context.doctype,
+					total: result.total,
+					completed: 0,
+					failed: 0
+				});
+			},
+			error: () => this.addMessageToDisplay("error", "Failed to start batch")
+		});
+	},
+
+	/**
+	 * Show or update a batch job's progress card
+	 *
+	 * Updates arrive as chatz_batch_progress realtime events; a slow poll
+	 * covers sites without a running socket.io server.
+	 *
+	 * @param {Object} progress - { job, status, reference_doctype, total, completed, failed }
+	 */
+	showBatchProgress: function(progress) {
+		let batch = this.batches[progress.job];
+		if (!batch) {
+			const messageEl = document.createElement("div");
+			messageEl.className = "chatz-message chatz-message-assistant chatz-batch";
+			messageEl.innerHTML = `
+				<div class="chatz-message-wrapper">
+					<div class="chatz-message-content">
+						<div class="chatz-batch-title"></div>
+						<div class="chatz-batch-bar"><div class="chatz-batch-bar-fill"></div></div>
+						<div class="chatz-batch-meta">
+							<span class="chatz-batch-counts"></span>
+							<button class="chatz-batch-cancel" data-chatz-batch="${frappe.utils.escape_html(progress.job)}">Stop</button>
+						</div>
+						<button class="chatz-internal-link-btn" data-chatz-url="/app/chatz-batch-job/${encodeURIComponent(progress.job)}"><span>Open results</span></button>
+					</div>
+				</div>
+			`;
+			document.getElementById("chatz-messages").appendChild(messageEl);
+			this.scrollToBottom();
+
+			batch = this.batches[progress.job] = { element: messageEl, timer: null };
+			this.listenForBatchProgress();
+			batch.timer = setInterval(() => this.pollBatch(progress.job), 10000);
+		}
+
+		const done = progress.completed + progress.failed;
+		const finished = !["Queued", "Running"].includes(progress.status);
+		const element = batch.element;
+
+		element.querySelector(".chatz-batch-title").textContent =
+			`${progress.reference_doctype}: ${progress.status}`;
+		element.querySelector(".chatz-batch-bar-fill").style.width =
+			`${progress.total ? Math.round(done / progress.total * 100) : 0}%`;
+		element.querySelector(".chatz-batch-counts").textContent =
+			`${progress.completed} of ${progress.total} answered` + (progress.failed ? `, ${progress.failed} failed` : "");
+		element.querySelector(".chatz-batch-cancel").style.display = finished ? "none" : "";
+
+		if (finished && batch.timer) {
+			clearInterval(batch.timer);
+			batch.timer = null;
+		}
+	},
+
+	/**
+	 * Subscribe to batch progress events (once)
+	 */
+	listenForBatchProgress: function() {
+		if (this.batchListener) return;
+
+		this.batchListener = (progress) => {
+			if (this.batches[progress.job]) {
+				this.showBatchProgress(progress);
+			}
+		};
+		frappe.realtime.on("chatz_batch_progress", this.batchListener);
+	},
+
+	/**
+	 * Fetch a batch job's progress (fallback for missed realtime events)
+	 * @param {String} jobName - Chatz Batch Job name
+	 */
+	pollBatch: function(jobName) {
+		frappe.call({
+			method: "chatz.api.batch.get_batch_status",
+			args: { job_name: jobName },
+			callback: (r) => {
+				if (r.message && r.message.status === "success") {
+					this.showBatchProgress(r.message.progress);
+				}
+			}
+		});
+	},
+
+	/**
+	 * Stop following batch jobs whose cards are being cleared (the jobs keep running)
+	 */
+	forgetBatches: function() {
+		Object.values(this.batches).forEach(batch => {
+			if (batch.timer) {
+				clearInterval(batch.timer);
+			}
+		});
+		this.batches = {};
+	},
+
+	/**
+	 * Stop a batch job (records already sent are still answered)
+	 * @param {String} jobName - Chatz Batch Job name
+	 */
+	cancelBatch: function(jobName) {
+		frappe.call({
+			method: "chatz.api.batch.cancel_batch",
+			args: { job_name: jobName },
+			callback: (r) => {
+				if (r.message && r.message.status === "error") {
+					this.addMessageToDisplay("error", r.message.message);
+				} else {
+					this.pollBatch(jobName);
+				}
+			}
+		});
 	},
 
 	/**
@@ -598,8 +1484,10 @@ const ChatzWidget = {
 	 * @param {String} type - "user", "assistant", or "error"
 	 * @param {String} content - Message content
 	 * @param {String} timestamp - Optional timestamp (ISO format or Date object)
+	 * @param {String} generationStatus - "Stopped" for a partial response (optional)
+	 * @param {String} renderedHtml - HTML rendered by the server (optional, assistant only)
 	 */
-	addMessageToDisplay: function(type, content, timestamp) {
+	addMessageToDisplay: function(type, content, timestamp, generationStatus, renderedHtml) {
 		const messagesDiv = document.getElementById("chatz-messages");
 		const messageEl = document.createElement("div");
 		messageEl.className = `chatz-message chatz-message-${type}`;
@@ -612,9 +1500,16 @@ const ChatzWidget = {
 		const contentEl = document.createElement("div");
 		contentEl.className = "chatz-message-content";
 
-		if (type === "assistant") {
-			// Render markdown for assistant messages
-			contentEl.innerHTML = this.renderMarkdown(content);
+		if (type === "assistant" && renderedHtml) {
+			contentEl.innerHTML = renderedHtml;
+		} else if (type === "assistant") {
+			// Render markdown for assistant messages (off the main thread)
+			contentEl.textContent = content;
+			if (content) {
+				ChatzMarkdownRenderer.render(content).then(html => {
+					contentEl.innerHTML = html;
+				});
+			}
 		} else if (type === "error") {
 			contentEl.textContent = content;
 		} else {
@@ -623,6 +1518,10 @@ const ChatzWidget = {
 
 		wrapper.appendChild(contentEl);
 
+		if (generationStatus === "Stopped") {
+			wrapper.appendChild(this.createStoppedLabel());
+		}
+
 		// Add timestamp if provided
 		if (timestamp) {
 			const timeEl = document.createElement("div");
@@ -638,6 +1537,148 @@ const ChatzWidget = {
 		this.scrollToBottom();
 	},
 
+	/**
+	 * Add a message loaded from Chatz History
+	 * Assistant messages use the HTML stored with them when it came from the
+	 * current renderer, so loading a conversation renders nothing.
+	 * @param {Object} msg - get_conversation_history row
+	 */
+	addStoredMessage: function(msg) {
+		const renderedHtml = msg.renderer_version === ChatzMarkdown.VERSION ? msg.rendered_html : null;
+		this.addMessageToDisplay(msg.message_type, msg.message_content, msg.created_at, msg.generation_status, renderedHtml);
+		const messageEl = document.getElementById("chatz-messages").lastElementChild;
+		this.addStoredThoughts(messageEl.querySelector(".chatz-message-content"), msg);
+	},
+
+	/**
+	 * Add the collapsed thought block of a stored message whose thoughts were
+	 * saved apart from it (Chatz Reasoning)
+	 * @param {HTMLElement} contentEl - Content element of the message
+	 * @param {Object} msg - get_conversation_history row
+	 */
+	addStoredThoughts: function(contentEl, msg) {
+		if (!msg.reasoning_tokens) return;
+
+		const holder = document.createElement("div");
+		holder.innerHTML = ChatzMarkdown.renderStoredThoughts(msg.reasoning_tokens);
+		const block = holder.firstElementChild;
+		block.dataset.messageId = msg.name;
+		contentEl.parentNode.insertBefore(block, contentEl);
+	},
+
+	/**
+	 * Expand or collapse the thoughts of a stored message, loading them the
+	 * first time
+	 * @param {HTMLElement} header - Clicked thought header
+	 */
+	toggleStoredThoughts: function(header) {
+		const block = header.parentNode;
+		const list = block.querySelector(".chatz-thought-list");
+		const expanded = list.style.display === "block";
+		list.style.display = expanded ? "none" : "block";
+		if (expanded || block.dataset.loaded) return;
+
+		block.dataset.loaded = "1";
+		list.innerHTML = `<div class="chatz-thought-item">Loading…</div>`;
+		const failed = () => {
+			// Loaded again on the next expand
+			delete block.dataset.loaded;
+			list.innerHTML = `<div class="chatz-thought-item">Could not load the thoughts</div>`;
+		};
+
+		frappe.call({
+			method: "chatz.chatz.doctype.chatz_history.chatz_history.get_message_reasoning",
+			args: { message_id: block.dataset.messageId },
+			callback: (r) => {
+				if (!r.message || r.message.status !== "success") {
+					failed();
+					return;
+				}
+				list.innerHTML = r.message.reasoning.split("\n")
+					.filter(line => line.trim())
+					.map(line => `<div class="chatz-thought-item">${ChatzMarkdown.renderSimple(line.trim())}</div>`)
+					.join("");
+			},
+			error: failed
+		});
+	},
+
+	/**
+	 * Add messages loaded from Chatz History, with compared responses side by side
+	 * @param {Array} messages - get_conversation_history rows, oldest first
+	 */
+	addStoredMessages: function(messages) {
+		const rows = {};
+		messages.forEach(msg => {
+			if (msg.message_type !== "assistant" || !msg.compare_group) {
+				this.addStoredMessage(msg);
+				return;
+			}
+
+			rows[msg.compare_group] = rows[msg.compare_group] || this.addCompareRow(msg.compare_group, []);
+			const column = this.addCompareColumn(rows[msg.compare_group], msg.api_used);
+			if (msg.renderer_version === ChatzMarkdown.VERSION && msg.rendered_html) {
+				column.content.innerHTML = msg.rendered_html;
+			} else {
+				column.content.textContent = msg.message_content;
+				ChatzMarkdownRenderer.render(msg.message_content).then(html => {
+					column.content.innerHTML = html;
+				});
+			}
+			this.addStoredThoughts(column.content, msg);
+			if (msg.generation_status === "Stopped") {
+				column.element.appendChild(this.createStoppedLabel());
+			}
+		});
+	},
+
+	/**
+	 * Add a row of side-by-side response columns (compare mode)
+	 * @param {String} group - Compare group ID
+	 * @param {Array} apiNames - Chatz APIs, one column each
+	 * @returns {Object} Columns by API name ({ element, content, stats }); the row is under .row
+	 */
+	addCompareRow: function(group, apiNames) {
+		const messagesDiv = document.getElementById("chatz-messages");
+		const row = document.createElement("div");
+		row.className = "chatz-message chatz-compare-row";
+		row.dataset.compareGroup = group;
+		messagesDiv.appendChild(row);
+
+		const columns = { row: row };
+		apiNames.forEach(name => this.addCompareColumn(columns, name));
+		this.scrollToBottom();
+		return columns;
+	},
+
+	/**
+	 * Add one API's column to a compare row
+	 * @param {Object} columns - Returned by addCompareRow
+	 * @param {String} apiName - Chatz API of the column
+	 * @returns {Object} { element, content, stats }
+	 */
+	addCompareColumn: function(columns, apiName) {
+		const element = document.createElement("div");
+		element.className = "chatz-compare-column";
+		element.innerHTML = `
+			<div class="chatz-compare-header">
+				<span class="chatz-compare-name"></span>
+				<span class="chatz-compare-stats"></span>
+			</div>
+			<div class="chatz-message-content"></div>
+		`;
+		element.querySelector(".chatz-compare-name").textContent = this.apiTitle(apiName);
+		columns.row.appendChild(element);
+
+		const column = {
+			element: element,
+			content: element.querySelector(".chatz-message-content"),
+			stats: element.querySelector(".chatz-compare-stats")
+		};
+		columns[apiName] = column;
+		return column;
+	},
+
 	/**
 	 * Format timestamp for display
 	 * @param {String|Date} timestamp - Timestamp to format
@@ -682,201 +1723,55 @@ const ChatzWidget = {
 			return;
 		}
 
-		// Update the content inside the wrapper
-		const contentEl = lastMessage.querySelector(".chatz-message-content");
-		if (contentEl) {
-			// Add streaming cursor if still streaming
-			const cursor = isStreaming ? '<span class="chatz-streaming-cursor"></span>' : '';
-			contentEl.innerHTML = this.renderMarkdown(content) + cursor;
-		} else {
-			// Fallback if wrapper structure is missing
-			const cursor = isStreaming ? '<span class="chatz-streaming-cursor"></span>' : '';
-			lastMessage.innerHTML = this.renderMarkdown(content) + cursor;
-		}
-
-		// Scroll to bottom with multiple attempts
-		this.scrollToBottom();
+		// Update the content inside the wrapper (or the message if it is missing)
+		this.renderStreamInto(lastMessage.querySelector(".chatz-message-content") || lastMessage, content, isStreaming);
 	},
 
 	/**
-	 * Render markdown content with URL detection
-	 * @param {String} content - Markdown content
-	 * @returns {String} HTML content
+	 * Render streamed markdown into an element (off the main thread)
+	 * @param {HTMLElement} target - Element showing the response
+	 * @param {String} content - Response so far
+	 * @param {Boolean} isStreaming - Whether still streaming
 	 */
-	renderMarkdown: function(content) {
-		// Trim leading/trailing whitespace to avoid extra line breaks
-		content = content.trim();
-
-		// Store URLs temporarily to avoid escaping them
-		const urlPlaceholders = [];
-		let placeholderIndex = 0;
-
-		// Store thoughts container temporarily
-		const thoughtsPlaceholders = [];
-		let thoughtsIndex = 0;
-
-		// Group consecutive *Thinking: lines together (ignoring empty lines between them)
-		const lines = content.split('\n');
-		const processedLines = [];
-		let currentThoughtGroup = [];
-		let pendingEmptyLines = [];
-
-		for (let i = 0; i < lines.length; i++) {
-			const line = lines[i];
-			const thinkingMatch = line.match(/^\*Thinking:(.*)$/);
-
-			if (thinkingMatch) {
-				// This is a thinking line - add to current group
-				const thought = thinkingMatch[1].trim();
-				if (thought) {
-					currentThoughtGroup.push(thought);
-				}
-				// Clear pending empty lines since we're still in a thought group
-				pendingEmptyLines = [];
-			} else if (line.trim() === '') {
-				// Empty line - might be between thoughts or after thoughts
-				// Store it temporarily
-				pendingEmptyLines.push(line);
-			} else {
-				// Non-empty, non-thinking line - this is actual content
-				// Close current thought group if exists
-				if (currentThoughtGroup.length > 0) {
-					// Create placeholder for this thought group
-					const containerId = `thought-${Date.now()}-${thoughtsIndex}`;
-					const placeholder = `___THOUGHTS_PLACEHOLDER_${thoughtsIndex}___`;
-
-					const thoughtsList = currentThoughtGroup.map(thought =>
-						`<div class="chatz-thought-item">${this.renderMarkdownSimple(thought)}</div>`
-					).join('');
-
-					const label = currentThoughtGroup.length === 1 ? 'Thought' : `Thoughts (${currentThoughtGroup.length})`;
-
-					thoughtsPlaceholders.push({
-						placeholder: placeholder,
-						html: `<div class="chatz-thought-container"><div class="chatz-thought-header" onclick="ChatzWidget.toggleThought('${containerId}')"><svg class="chatz-thought-icon" width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><circle cx="12" cy="12" r="3"></circle><path d="M12 2v4m0 12v4M4.93 4.93l2.83 2.83m8.48 8.48l2.83 2.83M2 12h4m12 0h4M4.93 19.07l2.83-2.83m8.48-8.48l2.83-2.83"></path></svg><span>${label}</span></div><div class="chatz-thought-list" id="${containerId}" style="display: block;">${thoughtsList}</div></div>`
-					});
-					thoughtsIndex++;
-
-					processedLines.push(placeholder);
-					currentThoughtGroup = [];
-
-					// Clear pending empty lines - thought group provides visual separation
-					pendingEmptyLines = [];
-				} else {
-					// No thought group - add any pending empty lines before the content
-					processedLines.push(...pendingEmptyLines);
-					pendingEmptyLines = [];
-				}
-
-				// Add the content line
-				processedLines.push(line);
-			}
+	renderStreamInto: function(target, content, isStreaming) {
+		if (!target.dataset.chatzStream) {
+			target.dataset.chatzStream = ChatzMarkdownRenderer.newStreamKey();
 		}
+		const key = target.dataset.chatzStream;
 
-		// Handle any remaining thoughts at the end
-		if (currentThoughtGroup.length > 0) {
-			const containerId = `thought-${Date.now()}-${thoughtsIndex}`;
-			const placeholder = `___THOUGHTS_PLACEHOLDER_${thoughtsIndex}___`;
-
-			const thoughtsList = currentThoughtGroup.map(thought =>
-				`<div class="chatz-thought-item">${this.renderMarkdownSimple(thought)}</div>`
-			).join('');
-
-			const label = currentThoughtGroup.length === 1 ? 'Thought' : `Thoughts (${currentThoughtGroup.length})`;
+		const apply = (html, final) => {
+			if (!target.isConnected) {
+				// The chat was cleared while streaming
+				ChatzMarkdownRenderer.discard(key);
+				return;
+			}
+			// Add streaming cursor if still streaming
+			const cursor = final ? '' : '<span class="chatz-streaming-cursor"></span>';
+			target.innerHTML = html + cursor;
 
-			thoughtsPlaceholders.push({
-				placeholder: placeholder,
-				html: `<div class="chatz-thought-container"><div class="chatz-thought-header" onclick="ChatzWidget.toggleThought('${containerId}')"><svg class="chatz-thought-icon" width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><circle cx="12" cy="12" r="3"></circle><path d="M12 2v4m0 12v4M4.93 4.93l2.83 2.83m8.48 8.48l2.83 2.83M2 12h4m12 0h4M4.93 19.07l2.83-2.83m8.48-8.48l2.83-2.83"></path></svg><span>${label}</span></div><div class="chatz-thought-list" id="${containerId}" style="display: block;">${thoughtsList}</div></div>`
-			});
-			thoughtsIndex++;
+			// Scroll to bottom with multiple attempts
+			this.scrollToBottom();
+		};
 
-			processedLines.push(placeholder);
+		if (isStreaming) {
+			ChatzMarkdownRenderer.update(key, content, apply);
+		} else {
+			delete target.dataset.chatzStream;
+			ChatzMarkdownRenderer.finish(key, content, apply);
 		}
-
-		// Rejoin the processed lines
-		content = processedLines.join('\n');
-
-		// Clean up excessive empty lines (more than 2 consecutive newlines)
-		content = content.replace(/\n{3,}/g, '\n\n');
-
-		// Extract and replace markdown links BEFORE escaping: [text](url)
-		content = content.replace(/\[([^\]]+)\]\(([^)]+)\)/g, (match, text, url) => {
-			const placeholder = `___URL_PLACEHOLDER_${placeholderIndex}___`;
-			urlPlaceholders.push({
-				placeholder: placeholder,
-				html: this.renderLink(url, text, true)
-			});
-			placeholderIndex++;
-			return placeholder;
-		});
-
-		// Extract and replace plain URLs BEFORE escaping
-		content = content.replace(/(https?:\/\/[^\s<)\]]+)/g, (match, url) => {
-			const placeholder = `___URL_PLACEHOLDER_${placeholderIndex}___`;
-			urlPlaceholders.push({
-				placeholder: placeholder,
-				html: this.renderLink(url, url, true)
-			});
-			placeholderIndex++;
-			return placeholder;
-		});
-
-		// Now escape HTML
-		let html = frappe.utils.escape_html(content);
-
-		// Code blocks
-		html = html.replace(/```([\s\S]*?)```/g, "<pre><code>$1</code></pre>");
-
-		// Inline code
-		html = html.replace(/`([^`]+)`/g, "<code>$1</code>");
-
-		// Bold
-		html = html.replace(/\*\*([^*]+)\*\*/g, "<strong>$1</strong>");
-
-		// Italic
-		html = html.replace(/\*([^*]+)\*/g, "<em>$1</em>");
-
-		// Restore URL placeholders
-		urlPlaceholders.forEach(item => {
-			html = html.replace(item.placeholder, item.html);
-		});
-
-		// Restore thoughts placeholders
-		thoughtsPlaceholders.forEach(item => {
-			html = html.replace(item.placeholder, item.html);
-		});
-
-		// Line breaks
-		html = html.replace(/\n/g, "<br>");
-
-		return html;
 	},
 
 	/**
-	 * Render markdown content without thoughts blocks (for recursive processing)
+	 * Render markdown content with URL detection on the main thread
+	 *
+	 * Messages are rendered through ChatzMarkdownRenderer (in a Web Worker);
+	 * this synchronous variant is kept for callers that need the HTML at once.
+	 *
 	 * @param {String} content - Markdown content
 	 * @returns {String} HTML content
 	 */
-	renderMarkdownSimple: function(content) {
-		// Escape HTML
-		let html = frappe.utils.escape_html(content);
-
-		// Code blocks
-		html = html.replace(/```([\s\S]*?)```/g, "<pre><code>$1</code></pre>");
-
-		// Inline code
-		html = html.replace(/`([^`]+)`/g, "<code>$1</code>");
-
-		// Bold
-		html = html.replace(/\*\*([^*]+)\*\*/g, "<strong>$1</strong>");
-
-		// Italic
-		html = html.replace(/\*([^*]+)\*/g, "<em>$1</em>");
-
-		// Line breaks
-		html = html.replace(/\n/g, "<br>");
-
-		return html;
+	renderMarkdown: function(content) {
+		return ChatzMarkdownRenderer.renderSync(content);
 	},
 
 	/**
@@ -902,71 +1797,6 @@ const ChatzWidget = {
 		}
 	},
 
-	/**
-	 * Check if URL is internal (same site)
-	 * @param {String} url - URL to check
-	 * @returns {Boolean} True if internal
-	 */
-	isInternalUrl: function(url) {
-		try {
-			// Relative URLs are always internal
-			if (url.startsWith('/')) {
-				return true;
-			}
-
-			// Parse the URL
-			const urlObj = new URL(url, window.location.origin);
-
-			// Check if same hostname
-			return urlObj.hostname === window.location.hostname;
-		} catch (e) {
-			return false;
-		}
-	},
-
-	/**
-	 * Render a link as button (internal) or regular link (external)
-	 * @param {String} url - URL
-	 * @param {String} text - Link text
-	 * @param {Boolean} escapeText - Whether to escape the text (default: false, already escaped)
-	 * @returns {String} HTML for link
-	 */
-	renderLink: function(url, text, escapeText = false) {
-		// Escape text if needed
-		const displayText = escapeText ? frappe.utils.escape_html(text) : text;
-
-		if (this.isInternalUrl(url)) {
-			// Internal link - render as button
-			const linkId = 'chatz-link-' + Math.random().toString(36).substr(2, 9);
-
-			// Determine icon based on URL
-			let icon = '';
-			if (url.includes('/list') || url.toLowerCase().includes('list')) {
-				// List icon
-				icon = `<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><line x1="8" y1="6" x2="21" y2="6"></line><line x1="8" y1="12" x2="21" y2="12"></line><line x1="8" y1="18" x2="21" y2="18"></line><line x1="3" y1="6" x2="3.01" y2="6"></line><line x1="3" y1="12" x2="3.01" y2="12"></line><line x1="3" y1="18" x2="3.01" y2="18"></line></svg>`;
-			} else {
-				// Document/file icon
-				icon = `<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M14 2H6a2 2 0 0 0-2 2v16a2 2 0 0 0 2 2h12a2 2 0 0 0 2-2V8z"></path><polyline points="14 2 14 8 20 8"></polyline></svg>`;
-			}
-
-			// Store the URL for later navigation
-			setTimeout(() => {
-				const btn = document.getElementById(linkId);
-				if (btn) {
-					btn.addEventListener('click', () => this.navigateToUrl(url));
-				}
-			}, 100);
-
-			return `<button id="${linkId}" class="chatz-internal-link-btn" title="${frappe.utils.escape_html(url)}">
-				${icon}
-				<span>${displayText}</span>
-			</button>`;
-		} else {
-			// External link - render as regular link
-			return `<a href="${frappe.utils.escape_html(url)}" target="_blank" rel="noopener noreferrer" class="chatz-external-link">${displayText}</a>`;
-		}
-	},
-
 	/**
 	 * Navigate to internal URL
 	 * @param {String} url - URL to navigate to
@@ -1040,8 +1870,11 @@ const ChatzWidget = {
 					const item = document.createElement("div");
 					item.className = "chatz-history-item";
 
-					// Get first message as preview
-					const preview = conv.first_message ? conv.first_message.substring(0, 50) + "..." : "Empty conversation";
+					// Generated title, or the first message until it has one
+					let preview = conv.title;
+					if (!preview) {
+						preview = conv.first_message ? conv.first_message.substring(0, 50) + "..." : "Empty conversation";
+					}
 					const date = new Date(conv.created_at).toLocaleDateString();
 					const apiName = conv.api_used || "Unknown";
 
@@ -1055,6 +1888,8 @@ const ChatzWidget = {
 						</div>
 					`;
 
+					// Start loading the messages before the click lands
+					item.addEventListener("mouseenter", () => this.prefetchHistory(conv.conversation_id, CONVERSATION_PAGE));
 					item.addEventListener("click", () => this.loadConversation(conv.conversation_id, conv.api_used));
 					historyList.appendChild(item);
 				});
@@ -1089,17 +1924,18 @@ const ChatzWidget = {
 	 * Load conversation messages
 	 */
 	loadConversationMessages: function(conversationId) {
+		this.stopGeneration(true);
+		this.forgetBatches();
+		this.endMirroredTurn();
 		const messagesDiv = document.getElementById("chatz-messages");
 
 		// Clear messages
 		messagesDiv.innerHTML = "";
 
-		// Load conversation history
-		ChatzHistoryManager.getConversationHistory(conversationId, 50, (result) => {
-			if (result && result.status === "success" && result.messages) {
-				result.messages.forEach(msg => {
-					this.addMessageToDisplay(msg.message_type, msg.message_content, msg.created_at);
-				});
+		// Load conversation history (usually prefetched on hover)
+		this.takeHistory(conversationId, CONVERSATION_PAGE).then((result) => {
+			if (result && result.messages) {
+				this.addStoredMessages(result.messages);
 				// Scroll to bottom after loading
 				this.scrollToBottom();
 			}
@@ -1120,6 +1956,8 @@ const ChatzWidget = {
 			return;
 		}
 
+		this.forgetBatches();
+		this.endMirroredTurn();
 		messagesDiv.innerHTML = "";
 		if (historyPanel) historyPanel.style.display = "none";
 		if (modelsPanel) modelsPanel.style.display = "none";
@@ -1129,6 +1967,9 @@ const ChatzWidget = {
 		const apiFilter = this.config.api_config_name;
 
 		ChatzHistoryManager.listConversations(1, apiFilter, (result) => {
+			// Only the first answer decides which conversation to resume
+			if (result && result.refreshed) return;
+
 			if (result && result.status === "success" && result.conversations && result.conversations.length > 0) {
 				const lastConv = result.conversations[0];
 				this.conversationId = lastConv.conversation_id;
@@ -1136,9 +1977,7 @@ const ChatzWidget = {
 				// Load conversation history
 				ChatzHistoryManager.getConversationHistory(lastConv.conversation_id, 50, (histResult) => {
 					if (histResult && histResult.status === "success" && histResult.messages) {
-						histResult.messages.forEach(msg => {
-							this.addMessageToDisplay(msg.message_type, msg.message_content, msg.created_at);
-						});
+						this.addStoredMessages(histResult.messages);
 						// Scroll to bottom after loading
 						this.scrollToBottom();
 					}
@@ -1158,13 +1997,16 @@ const ChatzWidget = {
 	 * Start a new chat
 	 */
 	startNewChat: function() {
+		this.stopGeneration(true);
+		this.forgetBatches();
+		this.endMirroredTurn();
 		this.conversationId = ChatzHistoryManager.generateConversationId();
 		const messagesDiv = document.getElementById("chatz-messages");
 
 		// Clear messages
 		messagesDiv.innerHTML = "";
 
-		// Clear guest history from localStorage if guest
+		// Guests start a fresh server-side session
 		if (this.isGuest) {
 			this.clearGuestHistory();
 		}
@@ -1233,66 +2075,49 @@ const ChatzWidget = {
 	},
 
 	/**
-	 * Save guest message to localStorage
+	 * Save a guest message to the server-side guest session
 	 */
 	saveGuestMessage: function(role, content) {
 		if (!this.isGuest) return;
 
-		try {
-			const storageKey = 'chatz_guest_conversation';
-			let messages = [];
-
-			// Load existing messages
-			const existing = localStorage.getItem(storageKey);
-			if (existing) {
-				messages = JSON.parse(existing);
+		ChatzGuestSession.addMessage(role, content).then((result) => {
+			if (result.status !== "success") {
+				console.error("Chatz: Failed to save guest message:", result.message);
 			}
-
-			// Add new message
-			messages.push({
-				role: role,
-				content: content,
-				timestamp: new Date().toISOString()
-			});
-
-			// Save back to localStorage
-			localStorage.setItem(storageKey, JSON.stringify(messages));
-		} catch (e) {
-			// Silently fail if localStorage is not available
-		}
+		});
 	},
 
 	/**
-	 * Load guest conversation history from localStorage
+	 * Restore the guest conversation, or show the greeting if there is none
 	 */
 	loadGuestHistory: function() {
-		if (!this.isGuest) return [];
+		if (!this.isGuest) return;
 
-		try {
-			const storageKey = 'chatz_guest_conversation';
-			const existing = localStorage.getItem(storageKey);
-			if (existing) {
-				const messages = JSON.parse(existing);
-				return messages;
+		ChatzGuestSession.getHistory().then((messages) => {
+			const messagesDiv = document.getElementById("chatz-messages");
+			// Don't overwrite a conversation started while loading
+			if (!messagesDiv || messagesDiv.children.length > 0) return;
+
+			if (messages.length > 0) {
+				messages.forEach(msg => {
+					this.addMessageToDisplay(msg.role, msg.content, msg.timestamp);
+				});
+
+				// Scroll to bottom after loading history
+				this.scrollToBottom();
+			} else if (this.config.greeting_message) {
+				this.addMessageToDisplay("assistant", this.config.greeting_message, new Date().toISOString());
 			}
-		} catch (e) {
-			// Silently fail if localStorage is not available
-		}
-		return [];
+		});
 	},
 
 	/**
-	 * Clear guest conversation history from localStorage
+	 * Delete the guest session; the next message starts a new one
 	 */
 	clearGuestHistory: function() {
 		if (!this.isGuest) return;
 
-		try {
-			const storageKey = 'chatz_guest_conversation';
-			localStorage.removeItem(storageKey);
-		} catch (e) {
-			// Silently fail if localStorage is not available
-		}
+		ChatzGuestSession.clear();
 	},
 
 	/**
@@ -1368,6 +2193,7 @@ const ChatzWidget = {
 			if (!isActive) {
 				modelItem.style.cursor = "pointer";
 				modelItem.addEventListener("click", () => {
+					this.endCompare();
 					// Switch to chat tab first
 					this.switchTab("chat");
 					// Then switch API
@@ -1379,6 +2205,135 @@ const ChatzWidget = {
 
 			listDiv.appendChild(modelItem);
 		});
+
+		this.renderComparePicker(listDiv);
+	},
+
+	/**
+	 * Offer compare mode below the models list (System Managers, 2 or more APIs)
+	 * @param {HTMLElement} listDiv - Models list
+	 */
+	renderComparePicker: function(listDiv) {
+		const canCompare = frappe.user && frappe.user.has_role && frappe.user.has_role("System Manager");
+		if (!canCompare || this.availableAPIs.length < ChatzCompare.MIN_APIS) return;
+
+		const current = this.compare ? this.compare.configs.map(config => config.api_config_name) : [];
+		const picker = document.createElement("div");
+		picker.className = "chatz-compare-picker";
+		picker.innerHTML = `
+			<div class="chatz-compare-title">Compare side by side</div>
+			<div class="chatz-compare-hint">Send each message to ${ChatzCompare.MIN_APIS}–${ChatzCompare.MAX_APIS} assistants at once</div>
+			<div class="chatz-compare-options"></div>
+			<button class="chatz-compare-start" disabled>Compare</button>
+		`;
+
+		const options = picker.querySelector(".chatz-compare-options");
+		const startBtn = picker.querySelector(".chatz-compare-start");
+		const selected = () => Array.from(options.querySelectorAll("input:checked")).map(input => input.value);
+		const updateButton = () => {
+			const count = selected().length;
+			startBtn.disabled = count < ChatzCompare.MIN_APIS || count > ChatzCompare.MAX_APIS;
+			startBtn.textContent = count ? `Compare ${count}` : "Compare";
+		};
+
+		this.availableAPIs.forEach(api => {
+			const label = document.createElement("label");
+			label.className = "chatz-compare-option";
+			const input = document.createElement("input");
+			input.type = "checkbox";
+			input.value = api.name;
+			input.checked = current.includes(api.name);
+			input.addEventListener("change", updateButton);
+			const title = document.createElement("span");
+			title.textContent = api.widget_title || api.name;
+			label.appendChild(input);
+			label.appendChild(title);
+			options.appendChild(label);
+		});
+
+		startBtn.addEventListener("click", () => this.startCompare(selected()));
+		updateButton();
+		listDiv.appendChild(picker);
+	},
+
+	/**
+	 * Enter compare mode with a new chat
+	 * @param {Array} apiNames - Chatz APIs to compare
+	 */
+	startCompare: function(apiNames) {
+		Promise.all(apiNames.map(name => this.fetchAPIConfig(name))).then(configs => {
+			if (configs.some(config => !config)) {
+				frappe.show_alert({ message: "Could not load every assistant to compare", indicator: "red" });
+				return;
+			}
+			this.compare = { configs: configs };
+			this.startNewChat();
+			this.showCompareBar();
+			this.renderModelsList();
+		});
+	},
+
+	/**
+	 * Leave compare mode (the conversation stays in history)
+	 */
+	endCompare: function() {
+		if (!this.compare) return;
+
+		this.compare = null;
+		const bar = document.getElementById("chatz-compare-bar");
+		if (bar) bar.remove();
+		this.renderModelsList();
+	},
+
+	/**
+	 * Show which APIs are compared, with a way out, above the messages
+	 */
+	showCompareBar: function() {
+		let bar = document.getElementById("chatz-compare-bar");
+		if (!bar) {
+			bar = document.createElement("div");
+			bar.id = "chatz-compare-bar";
+			bar.className = "chatz-compare-bar";
+			const messagesDiv = document.getElementById("chatz-messages");
+			messagesDiv.parentNode.insertBefore(bar, messagesDiv);
+		}
+
+		const names = this.compare.configs.map(config => this.apiTitle(config.api_config_name));
+		bar.innerHTML = `<span class="chatz-compare-bar-label"></span><button class="chatz-compare-exit">Exit compare</button>`;
+		bar.querySelector(".chatz-compare-bar-label").textContent = "Comparing " + names.join(" · ");
+		bar.querySelector(".chatz-compare-exit").addEventListener("click", () => {
+			this.endCompare();
+			this.startNewChat();
+		});
+	},
+
+	/**
+	 * Display name of a Chatz API (its widget title, as in the models list)
+	 * @param {String} apiName - Chatz API name
+	 * @returns {String} Title
+	 */
+	apiTitle: function(apiName) {
+		const api = (this.availableAPIs || []).find(item => item.name === apiName);
+		return (api && api.widget_title) || apiName || "Unknown";
+	},
+
+	/**
+	 * Get the config of a Chatz API without switching to it
+	 * @param {String} apiName - Chatz API name
+	 * @returns {Promise<Object|null>} get_api_config payload, or null on failure
+	 */
+	fetchAPIConfig: function(apiName) {
+		if (apiName === this.config.api_config_name) {
+			return Promise.resolve(this.config);
+		}
+		return new Promise((resolve) => {
+			frappe.call({
+				method: "chatz.api.config.get_api_config",
+				args: { api_name: apiName },
+				callback: (r) => resolve(r.message && r.message.status === "success" ? r.message : null),
+				error: () => resolve(null)
+			});
+		});
 	},
 
 	/**
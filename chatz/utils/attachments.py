@@ -0,0 +1,153 @@
+import frappe
+
+from chatz.utils.excerpts import build_excerpt_index, select_excerpts
+from chatz.utils.text_extract import content_hash, extract_text, is_supported
+
+
+ATTACHMENT_KEY_PREFIX = "chatz_attachment:"
+ATTACHMENT_TTL = 7 * 24 * 60 * 60
+FAILED_EXTRACT_TTL = 60 * 60
+
+# Larger files are extracted by a background job the first time they are
+# asked about, so a chat turn never waits for a big PDF to be parsed
+INLINE_EXTRACT_BYTES = 2 * 1024 * 1024
+MAX_ATTACHMENT_BYTES = 100 * 1024 * 1024
+MAX_ATTACHMENTS = 10
+
+DEFAULT_BUDGET_CHARS = 6000
+
+# Redis key: whether any enabled Chatz API includes attachments
+ATTACHMENTS_ENABLED_KEY = "chatz_attachments_enabled"
+
+
+def get_attachment_excerpts(doctype, docname, query, budget=DEFAULT_BUDGET_CHARS):
+	"""
+	Excerpts of a record's attachments relevant to a question
+
+	Extracted text is cached by file content hash (the same file attached to
+	several records is read once). Attachments not extracted yet are queued
+	and reported as pending.
+
+	Args:
+		doctype (str): Record DocType
+		docname (str): Record name
+		query (str): User message
+		budget (int): Characters of excerpt text to include
+
+	Returns:
+		list: {file_name, content} or {file_name, pending: True} per attachment
+	"""
+	files = frappe.get_all(
+		"File",
+		filters={"attached_to_doctype": doctype, "attached_to_name": docname, "is_folder": 0},
+		fields=["name", "file_name", "file_url", "file_size", "content_hash"],
+		order_by="creation desc",
+		limit=MAX_ATTACHMENTS
+	)
+
+	indexed = []
+	pending = []
+	for file in files:
+		if not is_supported(file.file_name) or not (file.file_url or "").startswith("/"):
+			continue
+		if (file.file_size or 0) > MAX_ATTACHMENT_BYTES:
+			continue
+
+		excerpt_index = get_cached_index(file)
+		if excerpt_index is None:
+			if (file.file_size or 0) > INLINE_EXTRACT_BYTES:
+				queue_extraction(file.name)
+				pending.append({"file_name": file.file_name, "pending": True})
+				continue
+			excerpt_index = extract_file(file.name)
+		if excerpt_index:
+			indexed.append((file.file_name, excerpt_index))
+
+	return select_excerpts(indexed, query, budget) + pending
+
+
+def get_cached_index(file):
+	"""Cached excerpt index of a File (None if it was not extracted yet)"""
+	if not file.content_hash:
+		return None
+	return frappe.cache().get_value(ATTACHMENT_KEY_PREFIX + file.content_hash)
+
+
+def extract_file(file_name):
+	"""
+	Extract, chunk and cache the text of a File
+
+	Runs inline for small files and as a background job for large ones.
+
+	Args:
+		file_name (str): File document name
+
+	Returns:
+		dict: Excerpt index, or None if the file could not be read
+	"""
+	file = frappe.get_doc("File", file_name)
+	cache_key = None
+	try:
+		path = file.get_full_path()
+		file_hash = file.content_hash or content_hash(path)
+		cache_key = ATTACHMENT_KEY_PREFIX + file_hash
+
+		excerpt_index = frappe.cache().get_value(cache_key)
+		if excerpt_index is None:
+			text, truncated = extract_text(path, file.file_name)
+			excerpt_index = build_excerpt_index(text)
+			excerpt_index["truncated"] = truncated
+			frappe.cache().set_value(cache_key, excerpt_index, expires_in_sec=ATTACHMENT_TTL)
+
+		if not file.content_hash:
+			# Lets later lookups hit the cache without hashing the file
+			file.db_set("content_hash", file_hash, update_modified=False)
+
+		return excerpt_index
+
+	except Exception as e:
+		frappe.log_error(
+			"Error Extracting Attachment Text",
+			f"Failed to extract text from {file.file_name}: {str(e)}"
+		)
+		if cache_key:
+			# Don't retry a broken file on every question
+			frappe.cache().set_value(cache_key, build_excerpt_index(""), expires_in_sec=FAILED_EXTRACT_TTL)
+		return None
+
+
+def queue_extraction(file_name, after_commit=False):
+	frappe.enqueue(
+		"chatz.utils.attachments.extract_file",
+		queue="long",
+		job_id=f"chatz_attachment:{file_name}",
+		deduplicate=True,
+		enqueue_after_commit=after_commit,
+		file_name=file_name
+	)
+
+
+def on_file_upload(doc, method=None):
+	"""doc_events hook: pre-extract large attachments so the first question is fast"""
+	if (
+		doc.attached_to_doctype
+		and not doc.is_folder
+		and is_supported(doc.file_name)
+		and INLINE_EXTRACT_BYTES < (doc.file_size or 0) <= MAX_ATTACHMENT_BYTES
+		and (doc.file_url or "").startswith("/")
+		and attachments_enabled()
+	):
+		queue_extraction(doc.name, after_commit=True)
+
+
+def attachments_enabled():
+	"""Whether any enabled Chatz API includes attachments (cached until a Chatz API changes)"""
+	enabled = frappe.cache().get_value(ATTACHMENTS_ENABLED_KEY)
+	if enabled is None:
+		enabled = bool(frappe.db.exists("Chatz API", {"enabled": 1, "include_attachments": 1}))
+		frappe.cache().set_value(ATTACHMENTS_ENABLED_KEY, enabled)
+	return enabled
+
+
+def clear_attachments_enabled():
+	frappe.cache().delete_value(ATTACHMENTS_ENABLED_KEY)
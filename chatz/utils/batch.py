@@ -0,0 +1,101 @@
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from http.client import HTTPException
+
+from chatz.utils.openai_client import UpstreamError
+
+
+# Upstream statuses worth retrying: timed out, rate limited or temporarily failing
+RETRY_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+def run_batch(items, call, concurrency=4, max_retries=2, retry_delay=1.0, should_stop=None):
+	"""
+	Run call(payload) for each (key, payload) item with bounded concurrency
+
+	Items are read and results yielded in the calling thread, so both sides
+	may use the database; only `call` runs in the worker threads. At most
+	`concurrency` calls are in flight and no more items than that are read
+	ahead, so a batch of thousands of records never loads them all at once.
+	Transient failures (see is_retryable) are retried with exponential
+	backoff and jitter, inside the worker, without blocking other items.
+
+	Args:
+		items (iterable): (key, payload) pairs
+		call (callable): Receives a payload and returns its output; runs in a worker thread
+		concurrency (int): Calls in flight at once
+		max_retries (int): Retries per item after the first attempt
+		retry_delay (float): Seconds before the first retry, doubled for every further one
+		should_stop (callable): Checked after every result; once it returns True no
+			more items are read (calls already in flight still finish and are yielded)
+
+	Yields:
+		dict: {key, status ("Done" or "Failed"), output, error, attempts, duration}, in completion order
+	"""
+	items = iter(items)
+	concurrency = max(1, int(concurrency))
+
+	with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="chatz-batch") as executor:
+		in_flight = {}
+		exhausted = False
+
+		while True:
+			while not exhausted and len(in_flight) < concurrency:
+				try:
+					key, payload = next(items)
+				except StopIteration:
+					exhausted = True
+					break
+				future = executor.submit(_call_with_retries, call, payload, max_retries, retry_delay)
+				in_flight[future] = key
+
+			if not in_flight:
+				return
+
+			done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+			for future in done:
+				result = future.result()
+				result["key"] = in_flight.pop(future)
+				yield result
+
+			if not exhausted and should_stop and should_stop():
+				exhausted = True
+
+
+def is_retryable(error):
+	"""Whether a failed call may succeed if repeated (rate limits, 5xx, connection errors)"""
+	if isinstance(error, UpstreamError):
+		return error.status in RETRY_STATUSES
+	# Refused or reset connections and timeouts
+	return isinstance(error, (OSError, HTTPException))
+
+
+def _call_with_retries(call, payload, max_retries, retry_delay):
+	started = time.monotonic()
+	attempts = 0
+
+	while True:
+		attempts += 1
+		try:
+			output = call(payload)
+		except Exception as e:
+			if attempts > max_retries or not is_retryable(e):
+				return {
+					"status": "Failed",
+					"output": None,
+					"error": str(e),
+					"attempts": attempts,
+					"duration": time.monotonic() - started
+				}
+			# Jitter keeps parallel retries from hitting a rate limit together again
+			time.sleep(retry_delay * 2 ** (attempts - 1) * random.uniform(0.5, 1.5))
+			continue
+
+		return {
+			"status": "Done",
+			"output": output,
+			"error": None,
+			"attempts": attempts,
+			"duration": time.monotonic() - started
+		}
@@ -0,0 +1,115 @@
+import math
+import re
+from collections import Counter
+
+
+# BM25 parameters (the usual Okapi defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words per chunk and words repeated at the start of the next chunk
+CHUNK_WORDS = 200
+CHUNK_OVERLAP = 40
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def tokenize(text):
+	"""
+	Split text into lowercase index terms
+
+	Args:
+		text (str): Text to tokenize
+
+	Returns:
+		list: Terms, without stopwords and single characters
+	"""
+	return [
+		term for term in TOKEN_PATTERN.findall((text or "").lower())
+		if len(term) > 1 and term not in STOPWORDS
+	]
+
+
+def term_frequencies(text):
+	"""
+	Count the index terms of a chunk
+
+	Returns:
+		tuple: (Counter of term frequencies, number of terms)
+	"""
+	terms = tokenize(text)
+	return Counter(terms), len(terms)
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+	"""
+	Split text into overlapping chunks of roughly chunk_words words
+
+	Args:
+		text (str): Text to split
+		chunk_words (int): Words per chunk
+		overlap (int): Words shared by consecutive chunks
+
+	Returns:
+		list: Chunks (a short text is a single chunk)
+	"""
+	words = (text or "").split()
+	if not words:
+		return []
+	if len(words) <= chunk_words:
+		return [" ".join(words)]
+
+	step = max(1, chunk_words - overlap)
+	chunks = []
+	for start in range(0, len(words), step):
+		chunks.append(" ".join(words[start:start + chunk_words]))
+		if start + chunk_words >= len(words):
+			break
+	return chunks
+
+
+def idf(document_frequency, total_chunks):
+	"""BM25 inverse document frequency (never negative)"""
+	return math.log(1 + (total_chunks - document_frequency + 0.5) / (document_frequency + 0.5))
+
+
+def score_chunks(query_terms, postings, chunk_lengths, document_frequencies, total_chunks, average_length):
+	"""
+	Score chunks against a query with Okapi BM25
+
+	Args:
+		query_terms (list): Tokenized query
+		postings (list): (chunk, term, term frequency) rows for the query terms
+		chunk_lengths (dict): Chunk -> number of terms
+		document_frequencies (dict): Term -> number of chunks containing it
+		total_chunks (int): Chunks in the index
+		average_length (float): Average chunk length in terms
+
+	Returns:
+		list: (chunk, score) pairs, best first
+	"""
+	weights = Counter(query_terms)
+	average_length = average_length or 1
+	scores = Counter()
+
+	for chunk, term, frequency in postings:
+		if term not in weights:
+			continue
+		length = chunk_lengths.get(chunk) or average_length
+		norm = frequency * (BM25_K1 + 1) / (
+			frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+		)
+		scores[chunk] += weights[term] * idf(document_frequencies.get(term, 0), total_chunks) * norm
+
+	return scores.most_common()
+
+
+def cosine_similarity(a, b):
+	"""Cosine similarity of two vectors"""
+	dot = sum(x * y for x, y in zip(a, b))
+	norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+	return dot / norm if norm else 0.0
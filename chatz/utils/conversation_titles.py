@@ -0,0 +1,101 @@
+import frappe
+from frappe.utils import add_to_date, now_datetime
+
+from chatz.utils.batch import run_batch
+from chatz.utils.history_backends import get_history_backend
+from chatz.utils.openai_client import chat_completion, message_content
+from chatz.utils.titles import build_title_messages, parse_titles
+
+
+# Conversations titled per run, per titling request, and requests in flight
+TITLES_PER_RUN = 200
+TITLE_BATCH_SIZE = 20
+TITLE_CONCURRENCY = 4
+
+# Messages of a conversation shown to the titling model
+OPENING_MESSAGES = 4
+
+# Conversations are titled once they have been quiet this long
+SETTLE_MINUTES = 2
+
+REQUEST_TIMEOUT = 120
+
+
+def generate_titles():
+	"""
+	Title untitled conversations in batches (scheduled job)
+
+	Collects up to TITLES_PER_RUN settled conversations without a title and
+	asks their Chatz API (its Title Model, or its default model) for up to
+	TITLE_BATCH_SIZE titles per request, with TITLE_CONCURRENCY requests in
+	flight. Titles are stored on the conversation's summary row, so the
+	history list is served without reading messages; clients pick them up
+	through get_changes_since. Conversations that keep failing are given up
+	after MAX_TITLE_ATTEMPTS (chatz.utils.history_backends).
+	"""
+	backend = get_history_backend()
+	settled = add_to_date(now_datetime(), minutes=-SETTLE_MINUTES)
+	untitled = backend.untitled_conversations(settled, TITLES_PER_RUN)
+
+	by_api = {}
+	for conv in untitled:
+		by_api.setdefault(conv.api_used, []).append(conv)
+
+	for api_name, conversations in by_api.items():
+		if not api_name or not frappe.db.exists("Chatz API", api_name):
+			for conv in conversations:
+				backend.title_failed(conv.user, conv.conversation_id)
+			frappe.db.commit()
+			continue
+
+		try:
+			title_conversations(backend, frappe.get_doc("Chatz API", api_name), conversations)
+		except Exception as e:
+			frappe.db.rollback()
+			frappe.log_error(
+				"Error Generating Conversation Titles",
+				f"Failed to title conversations of {api_name}: {str(e)}"
+			)
+
+
+def title_conversations(backend, api_config, conversations):
+	"""
+	Title conversations of one Chatz API, TITLE_BATCH_SIZE per request
+
+	Args:
+		backend: History backend (get_history_backend)
+		api_config (Document): Chatz API
+		conversations (list): {user, conversation_id} rows
+	"""
+	model = api_config.title_model or api_config.model_name
+	batches = {
+		start: conversations[start:start + TITLE_BATCH_SIZE]
+		for start in range(0, len(conversations), TITLE_BATCH_SIZE)
+	}
+
+	def items():
+		for start, batch in batches.items():
+			openings = [
+				backend.opening_messages(conv.user, conv.conversation_id, OPENING_MESSAGES)
+				for conv in batch
+			]
+			yield start, build_title_messages(openings)
+
+	def call(messages):
+		result = chat_completion(
+			api_config.api_endpoint,
+			api_config.api_key,
+			{"model": model, "messages": messages, "temperature": 0},
+			timeout=REQUEST_TIMEOUT
+		)
+		return message_content(result)
+
+	for result in run_batch(items(), call, TITLE_CONCURRENCY):
+		batch = batches[result["key"]]
+		titles = parse_titles(result["output"], len(batch)) if result["status"] == "Done" else {}
+		for index, conv in enumerate(batch):
+			if titles.get(index):
+				backend.set_title(conv.user, conv.conversation_id, titles[index])
+			else:
+				backend.title_failed(conv.user, conv.conversation_id)
+		frappe.db.commit()
@@ -0,0 +1,107 @@
+from chatz.utils.bm25 import chunk_text, score_chunks, term_frequencies, tokenize
+
+
+# Words per excerpt; smaller than index chunks so a budget holds several
+EXCERPT_WORDS = 120
+EXCERPT_OVERLAP = 20
+
+
+def build_excerpt_index(text):
+	"""
+	Chunk extracted text and index the chunks for BM25
+
+	The index is what gets cached per attachment, so a question only has to
+	look up its own terms instead of re-tokenizing the whole file.
+
+	Args:
+		text (str): Extracted text
+
+	Returns:
+		dict: {chunks, lengths, postings: {term: [[chunk, frequency], ...]}}
+	"""
+	chunks = chunk_text(text, chunk_words=EXCERPT_WORDS, overlap=EXCERPT_OVERLAP)
+	lengths = []
+	postings = {}
+
+	for index, chunk in enumerate(chunks):
+		counts, length = term_frequencies(chunk)
+		lengths.append(length)
+		for term, frequency in counts.items():
+			postings.setdefault(term, []).append([index, frequency])
+
+	return {"chunks": chunks, "lengths": lengths, "postings": postings}
+
+
+def rank_excerpts(excerpt_index, query):
+	"""
+	Score an attachment's chunks against a question
+
+	Returns:
+		list: (chunk, score) pairs, best first (empty if no term matches)
+	"""
+	terms = list(dict.fromkeys(tokenize(query)))
+	chunks = excerpt_index["chunks"]
+	postings = excerpt_index["postings"]
+	if not terms or not chunks:
+		return []
+
+	rows = [
+		(chunk, term, frequency)
+		for term in terms
+		for chunk, frequency in postings.get(term, [])
+	]
+	lengths = dict(enumerate(excerpt_index["lengths"]))
+	return score_chunks(
+		terms,
+		rows,
+		lengths,
+		{term: len(postings.get(term, [])) for term in terms},
+		len(chunks),
+		sum(lengths.values()) / len(chunks)
+	)
+
+
+def select_excerpts(files, query, budget):
+	"""
+	Pick the chunks of several attachments most relevant to a question
+
+	Chunks of all files compete on their BM25 score and are taken best first
+	until the character budget is spent. Files without any matching chunk
+	(or every file, when nothing matches) contribute their opening chunk, so
+	the assistant always knows what each attachment is about.
+
+	Args:
+		files (list): (file_name, excerpt_index) pairs
+		query (str): User message
+		budget (int): Characters of excerpt text to include
+
+	Returns:
+		list: {file_name, content} per file with excerpts, content in file order
+	"""
+	candidates = []
+	for position, (file_name, excerpt_index) in enumerate(files):
+		ranked = rank_excerpts(excerpt_index, query)
+		if not ranked and excerpt_index["chunks"]:
+			ranked = [(0, 0.0)]
+		for chunk, score in ranked:
+			candidates.append((score, position, chunk))
+
+	# Best score first; opening chunks (score 0) last, in file order
+	candidates.sort(key=lambda c: (-c[0], c[1], c[2]))
+
+	selected = {}
+	remaining = budget
+	for _score, position, chunk in candidates:
+		text = files[position][1]["chunks"][chunk]
+		if len(text) > remaining:
+			continue
+		selected.setdefault(position, []).append(chunk)
+		remaining -= len(text)
+
+	return [
+		{
+			"file_name": files[position][0],
+			"content": "\n...\n".join(files[position][1]["chunks"][chunk] for chunk in sorted(chunks))
+		}
+		for position, chunks in sorted(selected.items())
+	]
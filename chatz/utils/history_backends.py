@@ -0,0 +1,844 @@
+import hashlib
+import heapq
+
+import frappe
+from frappe.utils import add_days, get_datetime, get_url, getdate, now_datetime
+
+from chatz.utils.history_log import first_messages, format_log_datetime, pack_message, parse_log_datetime, read_messages
+from chatz.utils.markdown import RENDERER_VERSION, render_markdown
+from chatz.utils.profiling import phase
+from chatz.utils.usage import aggregate_usage
+
+
+HISTORY_DOCTYPE = "Chatz History"
+CONVERSATION_DOCTYPE = "Chatz Conversation"
+LOG_DOCTYPE = "Chatz Conversation Log"
+REASONING_DOCTYPE = "Chatz Reasoning"
+
+# site_config.json key selecting the backend
+BACKEND_CONFIG_KEY = "chatz_history_backend"
+DEFAULT_BACKEND = "doctype"
+
+# Client message IDs remembered per log for de-duplicating retried saves
+RECENT_CLIENT_IDS = 20
+
+PREVIEW_CHARS = 140
+
+# Logs read per query when scanning all conversations (exports, rollups)
+LOG_SCAN_PAGE = 200
+
+# Conversations whose title failed this often are left untitled
+MAX_TITLE_ATTEMPTS = 3
+
+# How an assistant message was generated (model router decision and latency)
+GENERATION_FIELDS = ("model_used", "model_route", "route_reason", "ttft_ms", "response_ms")
+
+MESSAGE_FIELDS = [
+	"name", "message_type", "message_content", "document_context", "created_at", "modified",
+	"client_message_id", "generation_status", "rendered_html", "renderer_version", "api_used", "compare_group",
+	"reasoning_tokens"
+]
+
+
+def get_history_backend():
+	"""
+	The configured history storage backend
+
+	Set `chatz_history_backend` in site_config.json to "log" for the
+	append-only backend; the default is "doctype". Switching does not move
+	existing history between backends.
+	"""
+	backend = frappe.conf.get(BACKEND_CONFIG_KEY) or DEFAULT_BACKEND
+	if backend not in BACKENDS:
+		frappe.throw(f"Unknown {BACKEND_CONFIG_KEY}: {backend}")
+	return BACKENDS[backend]
+
+
+def conversation_key(user, conversation_id):
+	"""Name of a conversation's summary or log row; deterministic, so concurrent first saves meet on one row"""
+	return hashlib.sha1(f"{user}\n{conversation_id}".encode()).hexdigest()[:20]
+
+
+def with_rendered_html(messages):
+	"""
+	Render assistant messages saved before rendering on save, or by an older
+	renderer version, and store the result so it happens only once
+
+	Args:
+		messages (list): Chatz History rows with name, message_type,
+			message_content, rendered_html and renderer_version
+
+	Returns:
+		list: The same rows, with current rendered_html
+	"""
+	stale = [
+		msg for msg in messages
+		if msg.message_type == "assistant" and msg.renderer_version != RENDERER_VERSION
+	]
+	if not stale:
+		return messages
+
+	origin = get_url()
+	for msg in stale:
+		msg.rendered_html = render_markdown(msg.message_content, origin)
+		msg.renderer_version = RENDERER_VERSION
+		# Not a change to the message: keep it out of delta sync
+		frappe.db.set_value(
+			HISTORY_DOCTYPE,
+			msg.name,
+			{"rendered_html": msg.rendered_html, "renderer_version": RENDERER_VERSION},
+			update_modified=False
+		)
+	return messages
+
+
+def save_reasoning(message_id, user, conversation_id, reasoning, reasoning_tokens):
+	"""
+	Store the thoughts of an assistant message apart from it
+
+	Named after the message, so either backend's message names work and the
+	reasoning is read by name only when the UI asks for it (get_reasoning).
+	"""
+	doc = frappe.new_doc(REASONING_DOCTYPE)
+	doc.name = message_id
+	doc.user = user
+	doc.conversation_id = conversation_id
+	doc.reasoning = reasoning
+	doc.reasoning_tokens = reasoning_tokens
+	doc.owner = doc.modified_by = user
+	doc.creation = doc.modified = now_datetime()
+	doc.db_insert()
+
+
+def get_reasoning(user, message_id):
+	"""Thoughts of one of the user's messages, or None"""
+	return frappe.db.get_value(REASONING_DOCTYPE, {"name": message_id, "user": user}, "reasoning")
+
+
+def deleted_since(doctype, user, since, until, limit):
+	"""
+	A user's documents deleted in a delta sync window, oldest first
+
+	The user is matched in the deleted document's data: the Deleted Document
+	owner is whoever deleted it.
+
+	Args:
+		doctype (str): Deleted DocType (with a `user` field)
+		user (str): Owner of the deleted documents
+		since (str): Deleted at or after this time
+		until (datetime): Deleted at or before this time
+		limit (int): Maximum rows
+
+	Returns:
+		list: Rows (deleted_name, creation, and message_count of a deleted log)
+	"""
+	return frappe.db.sql("""
+		SELECT deleted_name, creation, JSON_EXTRACT(data, '$.message_count') AS message_count
+		FROM `tabDeleted Document`
+		WHERE deleted_doctype = %(doctype)s
+			AND creation >= %(since)s AND creation <= %(until)s
+			AND JSON_UNQUOTE(JSON_EXTRACT(data, '$.user')) = %(user)s
+		ORDER BY creation ASC, name ASC
+		LIMIT %(limit)s
+	""", {
+		"doctype": doctype,
+		"user": user,
+		"since": since,
+		"until": until,
+		"limit": limit
+	}, as_dict=True)
+
+
+class ConversationSummaries:
+	"""
+	Conversation list and titles, read from one row per conversation
+
+	Both backends keep a row per conversation (summary_doctype) with its
+	latest API, first user message, message count, last message time and
+	generated title, so listing conversations never reads messages.
+	"""
+
+	summary_doctype = None
+
+	def list_conversations(self, user, limit, api_filter=None):
+		"""Conversations with title, preview and latest message time, newest first"""
+		filters = {"user": user}
+		if api_filter:
+			filters["api_used"] = api_filter
+
+		with phase("conversations"):
+			conversations = frappe.get_all(
+				self.summary_doctype,
+				filters=filters,
+				fields=["conversation_id", "api_used", "last_message_at", "first_message", "title"],
+				order_by="last_message_at desc",
+				limit=limit
+			)
+
+		for conv in conversations:
+			conv["first_message"] = conv["first_message"] or "No preview"
+			conv["created_at"] = conv["last_message_at"]
+		return conversations
+
+	def untitled_conversations(self, settled, limit):
+		"""
+		Conversations of any user still waiting for a title
+
+		Args:
+			settled (datetime): Only conversations quiet since then (their
+				opening exchange is complete)
+			limit (int): Maximum conversations
+
+		Returns:
+			list: {user, conversation_id, api_used}, most recently active first
+		"""
+		return frappe.get_all(
+			self.summary_doctype,
+			filters={
+				"title": ["is", "not set"],
+				"title_attempts": ["<", MAX_TITLE_ATTEMPTS],
+				"message_count": [">=", 2],
+				"last_message_at": ["<=", settled]
+			},
+			fields=["user", "conversation_id", "api_used"],
+			order_by="last_message_at desc",
+			limit=limit
+		)
+
+	def set_title(self, user, conversation_id, title):
+		frappe.db.set_value(
+			self.summary_doctype,
+			conversation_key(user, conversation_id),
+			{"title": title, "titled_at": now_datetime()},
+			update_modified=False
+		)
+
+	def title_failed(self, user, conversation_id):
+		frappe.db.sql(f"""
+			UPDATE `tab{self.summary_doctype}`
+			SET title_attempts = COALESCE(title_attempts, 0) + 1
+			WHERE name = %s
+		""", conversation_key(user, conversation_id))
+
+	def titles_since(self, user, since_modified, settled):
+		"""Titles generated in a delta sync window: {conversation_id, title}"""
+		return frappe.get_all(
+			self.summary_doctype,
+			filters={
+				"user": user,
+				"titled_at": ["between", [since_modified, settled]]
+			},
+			fields=["conversation_id", "title"],
+			limit=1000
+		)
+
+	def ensure_summary(self, name, user, conversation_id, now):
+		if frappe.db.exists(self.summary_doctype, name):
+			return
+		doc = frappe.new_doc(self.summary_doctype)
+		doc.name = name
+		doc.user = user
+		doc.conversation_id = conversation_id
+		doc.message_count = 0
+		doc.owner = doc.modified_by = user
+		doc.creation = doc.modified = doc.last_message_at = now
+		# A concurrent first save may have created it meanwhile
+		doc.db_insert(ignore_if_duplicate=True)
+
+
+class DocTypeHistoryBackend(ConversationSummaries):
+	"""One Chatz History document per message (the default)"""
+
+	name = "doctype"
+	summary_doctype = CONVERSATION_DOCTYPE
+
+	def find_message(self, user, conversation_id, client_message_id):
+		"""Name of an already saved message with this client message ID, if any"""
+		return frappe.db.get_value(
+			HISTORY_DOCTYPE,
+			{"client_message_id": client_message_id, "user": user},
+			"name"
+		)
+
+	def append(self, user, conversation_id, message):
+		"""
+		Save a message
+
+		Args:
+			user (str): Owner of the conversation
+			conversation_id (str): Conversation ID
+			message (dict): message_type, message_content and optionally
+				document_context, api_used, client_message_id, generation_status, compare_group,
+				reasoning_tokens and GENERATION_FIELDS
+
+		Returns:
+			str: Message name
+		"""
+		doc = frappe.new_doc(HISTORY_DOCTYPE)
+		doc.user = user
+		doc.conversation_id = conversation_id
+		doc.update({key: value for key, value in message.items() if value})
+		doc.insert(ignore_permissions=True)
+
+		with phase("summary"):
+			self.update_summary(user, conversation_id, message, doc.created_at)
+		return doc.name
+
+	def update_summary(self, user, conversation_id, message, created_at):
+		"""Count a saved message in its conversation's Chatz Conversation row"""
+		name = conversation_key(user, conversation_id)
+		self.ensure_summary(name, user, conversation_id, created_at)
+
+		preview = None
+		if message.get("message_type") == "user":
+			preview = (message.get("message_content") or "")[:PREVIEW_CHARS]
+
+		frappe.db.sql("""
+			UPDATE `tabChatz Conversation`
+			SET message_count = message_count + 1,
+				api_used = COALESCE(%(api_used)s, api_used),
+				first_message = COALESCE(first_message, %(preview)s),
+				last_message_at = GREATEST(last_message_at, %(created_at)s),
+				modified = %(now)s
+			WHERE name = %(name)s
+		""", {
+			"api_used": message.get("api_used"),
+			"preview": preview,
+			"created_at": created_at,
+			"now": now_datetime(),
+			"name": name
+		})
+
+	def get_messages(self, user, conversation_id, limit):
+		"""Latest messages of a conversation, oldest first"""
+		# Take the most recent messages, then return them in chronological order
+		messages = frappe.get_list(
+			HISTORY_DOCTYPE,
+			filters={
+				"conversation_id": conversation_id,
+				"user": user
+			},
+			fields=MESSAGE_FIELDS,
+			order_by="created_at desc",
+			limit_page_length=limit
+		)
+		messages.reverse()
+
+		with phase("render"):
+			with_rendered_html(messages)
+		return messages
+
+	def opening_messages(self, user, conversation_id, count):
+		"""First messages of a conversation (message_type, message_content), oldest first"""
+		return frappe.get_all(
+			HISTORY_DOCTYPE,
+			filters={"user": user, "conversation_id": conversation_id},
+			fields=["message_type", "message_content"],
+			order_by="created_at asc",
+			limit=count
+		)
+
+	def changes_since(self, user, since_modified, since_name, settled, limit):
+		"""
+		Messages added or changed after a (modified, name) cursor
+
+		Returns:
+			tuple: (messages, deleted message names, new titles, next cursor, has_more)
+		"""
+		messages = frappe.db.sql("""
+			SELECT name, conversation_id, message_type, message_content, document_context,
+				api_used, created_at, modified, client_message_id, generation_status,
+				rendered_html, renderer_version, compare_group, reasoning_tokens
+			FROM `tabChatz History`
+			WHERE user = %(user)s
+				AND modified <= %(settled)s
+				AND (modified > %(modified)s OR (modified = %(modified)s AND name > %(name)s))
+			ORDER BY modified ASC, name ASC
+			LIMIT %(limit)s
+		""", {
+			"user": user,
+			"settled": settled,
+			"modified": since_modified,
+			"name": since_name,
+			"limit": limit
+		}, as_dict=True)
+
+		has_more = len(messages) == limit
+		cursor = f"{messages[-1].modified}|{messages[-1].name}" if messages else None
+
+		deletions = deleted_since(HISTORY_DOCTYPE, user, since_modified, messages[-1].modified if has_more else settled, limit)
+		if len(deletions) == limit:
+			# More deletions than fit a page: resume from the last one returned
+			# (messages after it are sent again, which the client ignores)
+			cursor, has_more = f"{deletions[-1].creation}|", True
+		deleted = [row.deleted_name for row in deletions]
+
+		with_rendered_html(messages)
+		titles = self.titles_since(user, since_modified, settled)
+		return messages, deleted, titles, cursor, has_more
+
+	def export_batches(self, fields, cutoff, since=None, created_from=None, created_before=None,
+					   users=None, api_used=None, batch_size=1000):
+		"""
+		Messages of all users in (modified, name) order, one batch at a time
+
+		Uses keyset pagination, so each query is an index range scan and memory
+		stays bounded by the batch size however large the table is.
+
+		Args:
+			fields (list): Message fields to return
+			cutoff (datetime): Only messages modified before this time
+			since (str): Cursor ("<modified>|<name>") to resume after
+			created_from (date): Only messages created on or after this
+			created_before (date): Only messages created before this
+			users (list): Only messages of these users
+			api_used (list): Only messages sent through these Chatz APIs
+			batch_size (int): Messages per query
+
+		Yields:
+			list: Messages (dicts with `fields`)
+		"""
+		conditions = ["modified < %(cutoff)s"]
+		values = {"cutoff": cutoff, "batch_size": int(batch_size)}
+
+		if created_from:
+			conditions.append("created_at >= %(created_from)s")
+			values["created_from"] = created_from
+		if created_before:
+			conditions.append("created_at < %(created_before)s")
+			values["created_before"] = created_before
+		if users:
+			conditions.append("user IN %(users)s")
+			values["users"] = tuple(users)
+		if api_used:
+			conditions.append("api_used IN %(api_used)s")
+			values["api_used"] = tuple(api_used)
+
+		last_modified, last_name = None, ""
+		if since:
+			last_modified, _, last_name = since.partition("|")
+
+		while True:
+			keyset = ""
+			if last_modified:
+				keyset = "AND (modified > %(last_modified)s OR (modified = %(last_modified)s AND name > %(last_name)s))"
+				values["last_modified"] = last_modified
+				values["last_name"] = last_name
+
+			rows = frappe.db.sql(f"""
+				SELECT {", ".join(fields)}
+				FROM `tabChatz History`
+				WHERE {" AND ".join(conditions)} {keyset}
+				ORDER BY modified ASC, name ASC
+				LIMIT %(batch_size)s
+			""", values, as_dict=True)
+
+			if not rows:
+				return
+
+			yield rows
+
+			if len(rows) < values["batch_size"]:
+				return
+			last_modified, last_name = rows[-1].modified, rows[-1].name
+
+	def usage_days(self, cutoff, since=None):
+		"""
+		Days with messages saved after `since` and up to `cutoff`
+
+		Args:
+			cutoff (datetime): Only messages saved up to this time
+			since (str): Only messages saved after this time (all when not set)
+
+		Returns:
+			list: Dates, sorted
+		"""
+		if since:
+			days = frappe.db.sql_list("""
+				SELECT DISTINCT DATE(created_at)
+				FROM `tabChatz History`
+				WHERE creation > %(since)s AND creation <= %(cutoff)s
+			""", {"since": since, "cutoff": cutoff})
+		else:
+			days = frappe.db.sql_list("""
+				SELECT DISTINCT DATE(created_at)
+				FROM `tabChatz History`
+				WHERE creation <= %(cutoff)s
+			""", {"cutoff": cutoff})
+		return sorted(d for d in days if d)
+
+	def daily_usage(self, day):
+		"""
+		Usage aggregates of one day, per user, Chatz API, context DocType and model route
+
+		Returns:
+			list: Groups (dicts with the Chatz Usage Daily aggregate fields)
+		"""
+		return frappe.db.sql("""
+			SELECT
+				user,
+				api_used AS chatz_api,
+				NULLIF(JSON_UNQUOTE(JSON_EXTRACT(document_context, '$.doctype')), '') AS context_doctype,
+				NULLIF(model_route, '') AS model_route,
+				COUNT(*) AS messages,
+				SUM(message_type = 'user') AS user_messages,
+				SUM(message_type = 'assistant') AS assistant_messages,
+				COUNT(DISTINCT conversation_id) AS conversations,
+				SUM(CASE WHEN message_type = 'assistant' THEN CHAR_LENGTH(message_content) ELSE 0 END) AS response_chars,
+				COUNT(response_ms) AS timed_responses,
+				COUNT(ttft_ms) AS ttft_responses,
+				AVG(ttft_ms) AS avg_ttft_ms,
+				AVG(response_ms) AS avg_response_ms
+			FROM `tabChatz History`
+			WHERE created_at >= %(start)s AND created_at < %(end)s
+			GROUP BY user, chatz_api, context_doctype, model_route
+		""", {"start": day, "end": add_days(day, 1)}, as_dict=True)
+
+	def conversations_with_turns(self, api=None, from_date=None, to_date=None):
+		"""
+		Conversations with user turns matching the filters, by user and conversation ID
+
+		Args:
+			api (str): Only turns sent through this Chatz API
+			from_date (str): Only turns created on or after this
+			to_date (str): Only turns created on or before this
+
+		Returns:
+			list: Conversations {user, conversation_id}
+		"""
+		filters = {"message_type": "user"}
+		if api:
+			filters["api_used"] = api
+		if from_date and to_date:
+			filters["created_at"] = ["between", [from_date, to_date]]
+		elif from_date:
+			filters["created_at"] = [">=", from_date]
+		elif to_date:
+			filters["created_at"] = ["<=", to_date]
+
+		return frappe.get_all(
+			HISTORY_DOCTYPE,
+			filters=filters,
+			fields=["user", "conversation_id"],
+			group_by="user, conversation_id",
+			order_by="user asc, conversation_id asc",
+			limit=100000
+		)
+
+	def all_messages(self, user, conversation_id):
+		"""Every message of a conversation (message_type, message_content, document_context, created_at), oldest first"""
+		return frappe.get_all(
+			HISTORY_DOCTYPE,
+			filters={"user": user, "conversation_id": conversation_id},
+			fields=["message_type", "message_content", "document_context", "created_at"],
+			order_by="created_at asc"
+		)
+
+
+class LogHistoryBackend(ConversationSummaries):
+	"""
+	One Chatz Conversation Log row per conversation, messages appended to it
+
+	A save is a locked read of a few small columns and one UPDATE appending a
+	packed line (see chatz.utils.history_log), instead of a full document
+	insert. A message stores its document context only when it changed, and
+	the conversation list is read from the log rows without touching
+	messages. Message names are "<log name>:<sequence>".
+	"""
+
+	name = "log"
+	summary_doctype = LOG_DOCTYPE
+
+	def find_message(self, user, conversation_id, client_message_id):
+		name = conversation_key(user, conversation_id)
+		recent = frappe.db.get_value(LOG_DOCTYPE, name, "recent_client_ids") or ""
+		for entry in recent.split():
+			client_id, _, seq = entry.rpartition(":")
+			if client_id == client_message_id:
+				return f"{name}:{seq}"
+		return None
+
+	def append(self, user, conversation_id, message):
+		name = conversation_key(user, conversation_id)
+		now = now_datetime()
+
+		with phase("log-row"):
+			self.ensure_summary(name, user, conversation_id, now)
+			row = frappe.db.sql("""
+				SELECT message_count, context_hash, recent_client_ids
+				FROM `tabChatz Conversation Log`
+				WHERE name = %s
+				FOR UPDATE
+			""", name, as_dict=True)[0]
+
+		seq = (row.message_count or 0) + 1
+		context = message.get("document_context")
+		context_hash = hashlib.md5(context.encode()).hexdigest() if context else row.context_hash
+
+		line = dict(message, seq=seq, created_at=format_log_datetime(now))
+		if context_hash == row.context_hash:
+			line["document_context"] = None
+		if message.get("message_type") == "assistant":
+			line["rendered_html"] = render_markdown(message.get("message_content"), get_url())
+			line["renderer_version"] = RENDERER_VERSION
+
+		recent = (row.recent_client_ids or "").split()
+		if message.get("client_message_id"):
+			recent = (recent + [f"{message['client_message_id']}:{seq}"])[-RECENT_CLIENT_IDS:]
+
+		preview = None
+		if message.get("message_type") == "user":
+			preview = (message.get("message_content") or "")[:PREVIEW_CHARS]
+
+		with phase("append"):
+			frappe.db.sql("""
+				UPDATE `tabChatz Conversation Log`
+				SET log = CONCAT(COALESCE(log, ''), %(line)s),
+					message_count = %(seq)s,
+					context_hash = %(context_hash)s,
+					recent_client_ids = %(recent)s,
+					api_used = COALESCE(%(api_used)s, api_used),
+					first_message = COALESCE(first_message, %(preview)s),
+					last_message_at = %(now)s,
+					modified = %(now)s
+				WHERE name = %(name)s
+			""", {
+				"line": pack_message(line),
+				"seq": seq,
+				"context_hash": context_hash,
+				"recent": " ".join(recent),
+				"api_used": message.get("api_used"),
+				"preview": preview,
+				"now": now,
+				"name": name
+			})
+
+		return f"{name}:{seq}"
+
+	def get_messages(self, user, conversation_id, limit):
+		name = conversation_key(user, conversation_id)
+		log = frappe.db.get_value(LOG_DOCTYPE, name, "log")
+		with phase("unpack"):
+			return [self.to_row(name, message) for message in read_messages(log, limit=limit)]
+
+	def opening_messages(self, user, conversation_id, count):
+		log = frappe.db.get_value(LOG_DOCTYPE, conversation_key(user, conversation_id), "log")
+		return first_messages(log, count)
+
+	def changes_since(self, user, since_modified, since_name, settled, limit):
+		# Logged messages never change, so the cursor is on messages
+		# ("<created_at>|<name>"): every message up to it has been sent. Messages
+		# saved after `settled` wait for a later call, but not the rest of their
+		# log, and the cursor never passes a message that was not sent.
+		since = parse_log_datetime(since_modified)
+
+		pending = []
+		for rows in self.iter_logs(["user = %(user)s", "modified >= %(since)s"], {"user": user, "since": since}):
+			for row in rows:
+				for message in read_messages(row.log, since=since, inclusive=True):
+					created = parse_log_datetime(message["created_at"])
+					name = f"{row.name}:{message['seq']}"
+					if created > settled or (created == since and name <= since_name):
+						continue
+					pending.append((created, name, row, message))
+			# Only the oldest page is kept, however many logs changed
+			pending = heapq.nsmallest(limit + 1, pending, key=lambda item: item[:2])
+
+		has_more = len(pending) > limit
+		pending = pending[:limit]
+		messages = []
+		for _, _, row, message in pending:
+			message = self.to_row(row.name, message)
+			message["conversation_id"] = row.conversation_id
+			messages.append(message)
+
+		cursor = f"{messages[-1].created_at}|{messages[-1].name}" if has_more else f"{settled}|"
+
+		deletions = deleted_since(LOG_DOCTYPE, user, since_modified, pending[-1][0] if has_more else settled, limit)
+		if len(deletions) == limit:
+			# More deletions than fit a page: resume from the last one returned
+			# (messages after it are sent again, which the client ignores)
+			cursor, has_more = f"{deletions[-1].creation}|", True
+
+		deleted = []
+		for log in deletions:
+			deleted.extend(f"{log.deleted_name}:{seq}" for seq in range(1, int(log.message_count or 0) + 1))
+
+		titles = self.titles_since(user, since_modified, settled)
+		return messages, deleted, titles, cursor, has_more
+
+	def export_batches(self, fields, cutoff, since=None, created_from=None, created_before=None,
+					   users=None, api_used=None, batch_size=1000):
+		# Logged messages never change: an export covers the messages created from
+		# the watermark's time up to the cutoff, whatever was appended to their logs since
+		since = parse_log_datetime(since.partition("|")[0]) if since else None
+
+		conditions = ["creation < %(cutoff)s"]
+		values = {"cutoff": cutoff}
+		if since:
+			conditions.append("modified >= %(since)s")
+			values["since"] = since
+		if created_from:
+			conditions.append("last_message_at >= %(created_from)s")
+			values["created_from"] = created_from
+		if created_before:
+			conditions.append("creation < %(created_before)s")
+			values["created_before"] = created_before
+		if users:
+			conditions.append("user IN %(users)s")
+			values["users"] = tuple(users)
+
+		created_from = get_datetime(created_from) if created_from else None
+		created_before = get_datetime(created_before) if created_before else None
+
+		batch = []
+		for rows in self.iter_logs(conditions, values):
+			for row in rows:
+				for message in read_messages(row.log, since=since, inclusive=True):
+					message = self.to_record(row, message)
+					if message.created_at >= cutoff:
+						continue
+					if created_from and message.created_at < created_from:
+						continue
+					if created_before and message.created_at >= created_before:
+						continue
+					if api_used and message.api_used not in api_used:
+						continue
+					batch.append({field: message.get(field) for field in fields})
+					if len(batch) >= batch_size:
+						yield batch
+						batch = []
+		if batch:
+			yield batch
+
+	def usage_days(self, cutoff, since=None):
+		conditions = ["creation <= %(cutoff)s"]
+		values = {"cutoff": cutoff}
+		if since:
+			conditions.append("modified > %(since)s")
+			values["since"] = since
+		since = parse_log_datetime(since) if since else None
+
+		days = set()
+		for rows in self.iter_logs(conditions, values):
+			for row in rows:
+				for message in read_messages(row.log, since=since):
+					created = parse_log_datetime(message["created_at"])
+					if created <= cutoff:
+						days.add(created.date())
+		return sorted(days)
+
+	def daily_usage(self, day):
+		start = get_datetime(getdate(day))
+		end = get_datetime(add_days(getdate(day), 1))
+
+		messages = []
+		for rows in self.iter_logs(
+			["last_message_at >= %(start)s", "creation < %(end)s"],
+			{"start": start, "end": end}
+		):
+			for row in rows:
+				for message in read_messages(row.log, since=start, inclusive=True):
+					message = self.to_record(row, message)
+					if message.created_at < end:
+						messages.append(message)
+
+		return [frappe._dict(group) for group in aggregate_usage(messages)]
+
+	def conversations_with_turns(self, api=None, from_date=None, to_date=None):
+		start = get_datetime(getdate(from_date)) if from_date else None
+		end = get_datetime(add_days(getdate(to_date), 1)) if to_date else None
+
+		conditions, values = [], {}
+		if start:
+			conditions.append("last_message_at >= %(start)s")
+			values["start"] = start
+		if end:
+			conditions.append("creation < %(end)s")
+			values["end"] = end
+
+		conversations = []
+		for rows in self.iter_logs(conditions, values):
+			for row in rows:
+				for message in read_messages(row.log, since=start, inclusive=True):
+					created = parse_log_datetime(message["created_at"])
+					if (
+						message["message_type"] == "user"
+						and (not api or message.get("api_used") == api)
+						and (not end or created < end)
+					):
+						conversations.append(frappe._dict(user=row.user, conversation_id=row.conversation_id))
+						break
+
+		conversations.sort(key=lambda conv: (conv.user, conv.conversation_id))
+		return conversations
+
+	def all_messages(self, user, conversation_id):
+		name = conversation_key(user, conversation_id)
+		row = frappe.db.get_value(LOG_DOCTYPE, name, ["name", "user", "conversation_id", "log"], as_dict=True)
+		if not row:
+			return []
+		return [self.to_record(row, message) for message in read_messages(row.log)]
+
+	def iter_logs(self, conditions, values, page_size=LOG_SCAN_PAGE):
+		"""
+		Logs matching the conditions in name order, a page at a time
+
+		Paged by name, which never changes, so a log appended to during the
+		scan is neither read twice nor skipped.
+
+		Args:
+			conditions (list): SQL conditions on Chatz Conversation Log
+			values (dict): Their values
+			page_size (int): Logs per query (each with its whole log)
+
+		Yields:
+			list: Rows (name, user, conversation_id, modified, log)
+		"""
+		values = dict(values, page_size=int(page_size), last_name="")
+		conditions = list(conditions) + ["name > %(last_name)s"]
+
+		while True:
+			rows = frappe.db.sql(f"""
+				SELECT name, user, conversation_id, modified, log
+				FROM `tabChatz Conversation Log`
+				WHERE {" AND ".join(conditions)}
+				ORDER BY name ASC
+				LIMIT %(page_size)s
+			""", values, as_dict=True)
+
+			if not rows:
+				return
+
+			yield rows
+
+			if len(rows) < values["page_size"]:
+				return
+			values["last_name"] = rows[-1].name
+
+	def to_record(self, row, message):
+		"""A logged message with its conversation, named and timed like a Chatz History row (no rendering)"""
+		record = frappe._dict(message)
+		record.name = f"{row.name}:{record.pop('seq')}"
+		record.user = row.user
+		record.conversation_id = row.conversation_id
+		record.created_at = record.modified = parse_log_datetime(record.created_at)
+		return record
+
+	def to_row(self, log_name, message):
+		"""A logged message in the shape of a Chatz History row"""
+		if message["message_type"] == "assistant" and message.get("renderer_version") != RENDERER_VERSION:
+			# Logs are append-only: render stale HTML on read without storing it
+			message["rendered_html"] = render_markdown(message["message_content"], get_url())
+			message["renderer_version"] = RENDERER_VERSION
+
+		row = frappe._dict(message)
+		row.name = f"{log_name}:{row.pop('seq')}"
+		row.modified = row.created_at
+		return row
+
+
+BACKENDS = {
+	backend.name: backend
+	for backend in (DocTypeHistoryBackend(), LogHistoryBackend())
+}
@@ -0,0 +1,179 @@
+import csv
+import io
+import json
+import zlib
+
+import frappe
+from frappe.utils import add_days, getdate, now_datetime
+
+from chatz.utils.history_backends import get_history_backend
+from chatz.utils.settle import settled_before
+
+
+EXPORT_FORMATS = ("jsonl", "csv", "parquet")
+EXPORT_FIELDS = [
+	"name", "user", "conversation_id", "message_type", "message_content",
+	"document_context", "api_used", "created_at", "modified", "client_message_id"
+]
+DEFAULT_BATCH_SIZE = 1000
+
+
+def parse_list(value):
+	"""Accept a list, a JSON list or a comma separated string"""
+	if not value:
+		return []
+	if isinstance(value, str):
+		value = value.strip()
+		if value.startswith("["):
+			value = json.loads(value)
+		else:
+			value = value.split(",")
+	return [v.strip() for v in value if v and v.strip()]
+
+
+def export_cutoff():
+	"""Upper bound (exclusive) of `modified` for an export started now"""
+	return settled_before()
+
+
+def end_watermark(cutoff):
+	"""Watermark to resume from once every row before the cutoff was exported"""
+	return f"{cutoff}|"
+
+
+def iter_history_batches(from_date=None, to_date=None, users=None, api_used=None,
+						 since=None, cutoff=None, batch_size=DEFAULT_BATCH_SIZE):
+	"""
+	Iterate chat history in (modified, name) order, one batch at a time
+
+	Reads through the configured history backend (see
+	chatz.utils.history_backends), with memory bounded by the batch size
+	however much history there is.
+
+	Args:
+		from_date (str): Only messages created on or after this date
+		to_date (str): Only messages created on or before this date
+		users (list): Only messages of these users
+		api_used (list): Only messages sent through these Chatz APIs
+		since (str): Watermark ("<modified>|<name>") of a previous export
+		cutoff (datetime): Only rows modified before this time
+		batch_size (int): Rows per batch
+
+	Yields:
+		list: Rows (dicts with EXPORT_FIELDS)
+	"""
+	yield from get_history_backend().export_batches(
+		EXPORT_FIELDS,
+		cutoff or export_cutoff(),
+		since=since,
+		created_from=getdate(from_date) if from_date else None,
+		created_before=add_days(getdate(to_date), 1) if to_date else None,
+		users=users,
+		api_used=api_used,
+		batch_size=int(batch_size)
+	)
+
+
+def serialize_row(row):
+	"""Convert datetimes to ISO strings"""
+	return {
+		field: value.isoformat() if hasattr(value, "isoformat") else value
+		for field, value in row.items()
+	}
+
+
+def encode_jsonl(batches):
+	for rows in batches:
+		yield "".join(
+			json.dumps(serialize_row(row), ensure_ascii=False, separators=(",", ":")) + "\n"
+			for row in rows
+		).encode()
+
+
+def encode_csv(batches):
+	buffer = io.StringIO()
+	writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+	writer.writeheader()
+
+	for rows in batches:
+		writer.writerows(serialize_row(row) for row in rows)
+		yield buffer.getvalue().encode()
+		buffer.seek(0)
+		buffer.truncate()
+
+	# Header only, for an empty export
+	if buffer.tell():
+		yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks):
+	"""Gzip a stream of byte chunks incrementally"""
+	compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+	for chunk in chunks:
+		data = compressor.compress(chunk)
+		if data:
+			yield data
+	yield compressor.flush()
+
+
+def iter_export(format="jsonl", compress=True, **filters):
+	"""
+	Stream an export as byte chunks
+
+	Args:
+		format (str): "jsonl" or "csv" (Parquet needs a file, see write_parquet)
+		compress (bool): Gzip the output
+		**filters: Arguments of iter_history_batches
+
+	Yields:
+		bytes: Output chunks
+	"""
+	encoders = {"jsonl": encode_jsonl, "csv": encode_csv}
+	if format not in encoders:
+		frappe.throw(f"Streaming is not supported for format '{format}'")
+
+	chunks = encoders[format](iter_history_batches(**filters))
+	if compress:
+		chunks = gzip_chunks(chunks)
+
+	yield from chunks
+
+
+def write_parquet(path, compress=True, **filters):
+	"""
+	Write an export to a Parquet file, one row group per batch
+
+	Args:
+		path (str): Output file
+		compress (bool): Use zstd compression (otherwise uncompressed)
+		**filters: Arguments of iter_history_batches
+
+	Returns:
+		int: Number of rows written
+	"""
+	try:
+		import pyarrow as pa
+		import pyarrow.parquet as pq
+	except ImportError:
+		frappe.throw("Parquet export requires pyarrow (bench pip install pyarrow)")
+
+	schema = pa.schema([(field, pa.string()) for field in EXPORT_FIELDS])
+	count = 0
+
+	with pq.ParquetWriter(path, schema, compression="zstd" if compress else "none") as writer:
+		for rows in iter_history_batches(**filters):
+			columns = {field: [] for field in EXPORT_FIELDS}
+			for row in rows:
+				for field, value in serialize_row(row).items():
+					columns[field].append(None if value is None else str(value))
+			writer.write_table(pa.table(columns, schema=schema))
+			count += len(rows)
+
+	return count
+
+
+def export_filename(format, compress):
+	name = f"chatz_history_{now_datetime().strftime('%Y%m%d_%H%M%S')}.{format}"
+	if compress and format != "parquet":
+		name += ".gz"
+	return name
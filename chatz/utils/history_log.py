@@ -0,0 +1,132 @@
+import json
+from datetime import datetime
+
+
+# Fields of a packed message, in line order; new fields are only ever added
+# at the end, so lines written before them still unpack
+LOG_FIELDS = (
+	"seq", "message_type", "message_content", "created_at", "api_used", "client_message_id",
+	"generation_status", "document_context", "rendered_html", "renderer_version", "compare_group",
+	"reasoning_tokens", "model_used", "model_route", "route_reason", "ttft_ms", "response_ms"
+)
+
+# Always with microseconds, so timestamps in a log sort as strings too
+LOG_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def pack_message(message):
+	"""
+	Pack a message into one log line
+
+	A compact JSON array in LOG_FIELDS order (no keys repeated per message),
+	newline terminated; newlines inside the content are escaped by JSON, so
+	lines and messages correspond one to one.
+
+	Args:
+		message (dict): Message with LOG_FIELDS keys (missing ones are stored as null)
+
+	Returns:
+		str: Log line
+	"""
+	values = [message.get(field) for field in LOG_FIELDS]
+	return json.dumps(values, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+
+
+def unpack_line(line):
+	values = json.loads(line)
+	return dict(zip(LOG_FIELDS, values + [None] * (len(LOG_FIELDS) - len(values))))
+
+
+def format_log_datetime(value):
+	return value.strftime(LOG_DATETIME_FORMAT)
+
+
+def parse_log_datetime(value):
+	return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def read_messages(log, limit=None, since=None, inclusive=False):
+	"""
+	Read the latest messages of a log, oldest first
+
+	Lines are parsed from the end and reading stops once `limit` messages are
+	collected or a message is not newer than `since`, so the cost depends on
+	what is returned rather than on the length of the conversation.
+
+	A message stores its document context only when it differs from the one
+	before; omitted contexts are filled in from the nearest earlier message.
+
+	Args:
+		log (str): Packed log
+		limit (int): Maximum messages to return
+		since (datetime): Only messages created after this
+		inclusive (bool): Also messages created exactly at `since`
+
+	Returns:
+		list: Message dicts, oldest first
+	"""
+	lines = _reversed_lines(log or "")
+	picked = []
+	earlier = None
+
+	for line in lines:
+		message = unpack_line(line)
+		if limit is not None and len(picked) >= limit:
+			earlier = message
+			break
+		if since is not None:
+			created = parse_log_datetime(message["created_at"])
+			if created < since or (created == since and not inclusive):
+				earlier = message
+				break
+		picked.append(message)
+
+	# The oldest picked message may rely on a context stored further back
+	context = None
+	if picked and picked[-1]["document_context"] is None:
+		while earlier is not None:
+			if earlier["document_context"] is not None:
+				context = earlier["document_context"]
+				break
+			line = next(lines, None)
+			earlier = unpack_line(line) if line else None
+
+	picked.reverse()
+	for message in picked:
+		if message["document_context"] is None:
+			message["document_context"] = context
+		else:
+			context = message["document_context"]
+
+	return picked
+
+
+def first_messages(log, count):
+	"""
+	The first messages of a log, oldest first, without reading the rest of it
+
+	Document contexts are left as stored (only set where they changed).
+	"""
+	messages = []
+	start = 0
+	log = log or ""
+	while len(messages) < count and start < len(log):
+		end = log.find("\n", start)
+		if end == -1:
+			end = len(log)
+		if end > start:
+			messages.append(unpack_line(log[start:end]))
+		start = end + 1
+	return messages
+
+
+def _reversed_lines(log):
+	"""Lines of a log from the last one back, without splitting all of it"""
+	end = len(log)
+	while end > 0:
+		if log[end - 1] == "\n":
+			end -= 1
+		start = log.rfind("\n", 0, end) + 1
+		if end > start:
+			yield log[start:end]
+		end = start
@@ -0,0 +1,181 @@
+import itertools
+import re
+import time
+from urllib.parse import urljoin, urlparse
+
+
+# Bump when the output changes; must match ChatzMarkdown.VERSION in
+# chatz/public/js/chatz_markdown.js. Stored HTML of another version is re-rendered.
+RENDERER_VERSION = 1
+
+THOUGHT_ICON = '<svg class="chatz-thought-icon" width="14" height="14" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><circle cx="12" cy="12" r="3"></circle><path d="M12 2v4m0 12v4M4.93 4.93l2.83 2.83m8.48 8.48l2.83 2.83M2 12h4m12 0h4M4.93 19.07l2.83-2.83m8.48-8.48l2.83-2.83"></path></svg>'
+
+LIST_ICON = '<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><line x1="8" y1="6" x2="21" y2="6"></line><line x1="8" y1="12" x2="21" y2="12"></line><line x1="8" y1="18" x2="21" y2="18"></line><line x1="3" y1="6" x2="3.01" y2="6"></line><line x1="3" y1="12" x2="3.01" y2="12"></line><line x1="3" y1="18" x2="3.01" y2="18"></line></svg>'
+
+DOCUMENT_ICON = '<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><path d="M14 2H6a2 2 0 0 0-2 2v16a2 2 0 0 0 2 2h12a2 2 0 0 0 2-2V8z"></path><polyline points="14 2 14 8 20 8"></polyline></svg>'
+
+# Link targets that may be rendered (anything else, e.g. javascript:, stays text)
+SAFE_URL = re.compile(r"^(https?://|mailto:|/(?!/)|#)", re.IGNORECASE)
+
+# JavaScript's "." does not match line terminators
+THINKING_LINE = re.compile(r"\*Thinking:([^\n\r\u2028\u2029]*)")
+MARKDOWN_LINK = re.compile(r"\[([^\]]+)\]\(([^)]+)\)")
+PLAIN_URL = re.compile(r"(https?://[^\s<)\]]+)")
+
+_thought_counter = itertools.count()
+
+
+def render_markdown(content, origin=None):
+	"""
+	Render assistant markdown to sanitized HTML
+
+	A port of ChatzMarkdown.render that produces the same HTML, so stored
+	messages can be rendered once on the server instead of on every load.
+
+	Args:
+		content (str): Markdown content
+		origin (str): Site URL, used to tell internal links apart
+
+	Returns:
+		str: HTML content
+	"""
+	content = (content or "").strip()
+
+	url_placeholders = []
+	thought_placeholders = []
+
+	# Group consecutive *Thinking: lines together (ignoring empty lines between them)
+	processed_lines = []
+	thought_group = []
+	pending_empty_lines = []
+
+	def close_thought_group():
+		placeholder = f"___THOUGHTS_PLACEHOLDER_{len(thought_placeholders)}___"
+		thought_placeholders.append((placeholder, render_thoughts(thought_group)))
+		processed_lines.append(placeholder)
+		thought_group.clear()
+
+	for line in content.split("\n"):
+		thinking = THINKING_LINE.fullmatch(line)
+		if thinking:
+			thought = thinking.group(1).strip()
+			if thought:
+				thought_group.append(thought)
+			pending_empty_lines = []
+		elif not line.strip():
+			pending_empty_lines.append(line)
+		else:
+			if thought_group:
+				# The thought group provides visual separation
+				close_thought_group()
+			else:
+				processed_lines.extend(pending_empty_lines)
+			pending_empty_lines = []
+			processed_lines.append(line)
+
+	if thought_group:
+		close_thought_group()
+
+	content = re.sub(r"\n{3,}", "\n\n", "\n".join(processed_lines))
+
+	# Links are replaced BEFORE escaping: [text](url), then plain URLs
+	def link_placeholder(url, text):
+		placeholder = f"___URL_PLACEHOLDER_{len(url_placeholders)}___"
+		url_placeholders.append((placeholder, render_link(url, text, origin)))
+		return placeholder
+
+	content = MARKDOWN_LINK.sub(lambda m: link_placeholder(m.group(2), m.group(1)), content)
+	content = PLAIN_URL.sub(lambda m: link_placeholder(m.group(1), m.group(1)), content)
+
+	html = format_inline(escape_html(content))
+
+	for placeholder, replacement in url_placeholders + thought_placeholders:
+		html = html.replace(placeholder, replacement, 1)
+
+	return html.replace("\n", "<br>")
+
+
+def split_reasoning(content):
+	"""
+	Separate the thoughts of a response from its answer
+
+	A port of ChatzMarkdown.splitReasoning. Thoughts are the "*Thinking:"
+	lines render_markdown shows as thought blocks.
+
+	Args:
+		content (str): Assistant message
+
+	Returns:
+		tuple: (answer without the thinking lines, thoughts one per line)
+	"""
+	answer = []
+	thoughts = []
+	for line in (content or "").split("\n"):
+		thinking = THINKING_LINE.fullmatch(line)
+		if thinking:
+			thought = thinking.group(1).strip()
+			if thought:
+				thoughts.append(thought)
+		else:
+			answer.append(line)
+
+	return re.sub(r"\n{3,}", "\n\n", "\n".join(answer)).strip(), "\n".join(thoughts)
+
+
+def render_simple(content):
+	"""Render markdown without thoughts or links (thought items)"""
+	return format_inline(escape_html(content)).replace("\n", "<br>")
+
+
+def format_inline(html):
+	"""Apply code, bold and italic formatting to escaped text"""
+	html = re.sub(r"```([\s\S]*?)```", r"<pre><code>\1</code></pre>", html)
+	html = re.sub(r"`([^`]+)`", r"<code>\1</code>", html)
+	html = re.sub(r"\*\*([^*]+)\*\*", r"<strong>\1</strong>", html)
+	return re.sub(r"\*([^*]+)\*", r"<em>\1</em>", html)
+
+
+def render_thoughts(thoughts):
+	"""Render a collapsible group of thoughts"""
+	container_id = f"thought-{int(time.time() * 1000)}-{next(_thought_counter)}"
+	items = "".join(f'<div class="chatz-thought-item">{render_simple(thought)}</div>' for thought in thoughts)
+	label = "Thought" if len(thoughts) == 1 else f"Thoughts ({len(thoughts)})"
+
+	return f'<div class="chatz-thought-container"><div class="chatz-thought-header" onclick="ChatzWidget.toggleThought(\'{container_id}\')">{THOUGHT_ICON}<span>{label}</span></div><div class="chatz-thought-list" id="{container_id}" style="display: block;">{items}</div></div>'
+
+
+def render_link(url, text, origin=None):
+	"""Render a link as button (internal) or regular link (external)"""
+	display_text = escape_html(text)
+	if not SAFE_URL.match(url.strip()):
+		return display_text
+
+	safe_url = escape_html(url)
+	if is_internal_url(url, origin):
+		icon = LIST_ICON if "list" in url.lower() else DOCUMENT_ICON
+		return f'<button class="chatz-internal-link-btn" data-chatz-url="{safe_url}" title="{safe_url}">{icon}<span>{display_text}</span></button>'
+
+	return f'<a href="{safe_url}" target="_blank" rel="noopener noreferrer" class="chatz-external-link">{display_text}</a>'
+
+
+def is_internal_url(url, origin=None):
+	"""Check if URL is internal (same site)"""
+	if url.startswith("/"):
+		return True
+	if not origin:
+		return False
+	try:
+		return urlparse(urljoin(origin, url)).hostname == urlparse(origin).hostname
+	except ValueError:
+		return False
+
+
+def escape_html(text):
+	return (
+		str(text)
+		.replace("&", "&amp;")
+		.replace("<", "&lt;")
+		.replace(">", "&gt;")
+		.replace('"', "&quot;")
+		.replace("'", "&#39;")
+	)
@@ -0,0 +1,64 @@
+import re
+
+
+# Routes recorded on assistant messages (Chatz History model_route)
+ROUTE_FAST = "Fast"
+ROUTE_DEFAULT = "Default"
+
+DEFAULT_MAX_WORDS = 20
+
+# Turns asking for work rather than a quick answer; must match
+# COMPLEX_TURN in chatz/public/js/chatz_router.js
+COMPLEX_TURN = re.compile(
+	r"```|\b(?:explain|analy[sz]e|compare|summari[sz]e|why|step by step|write|draft|rewrite|translate|code|script|calculate|plan|list all|pros and cons)\b",
+	re.IGNORECASE
+)
+
+
+def classify_turn(message, max_words=DEFAULT_MAX_WORDS):
+	"""
+	Decide whether a turn is simple enough for the fast model
+
+	Cheap local heuristics, run before every request: a turn is simple when
+	it is at most max_words words and asks for no work (COMPLEX_TURN), e.g.
+	"thanks", "what's today's date?" or "who approved this?".
+	Mirrors ChatzRouter.classify in chatz_router.js.
+
+	Args:
+		message (str): User message
+		max_words (int): Longest simple turn
+
+	Returns:
+		tuple: (ROUTE_FAST or ROUTE_DEFAULT, reason: "short", "long" or "complex")
+	"""
+	text = (message or "").strip()
+	if COMPLEX_TURN.search(text):
+		return ROUTE_DEFAULT, "complex"
+	if len(text.split()) > (max_words or DEFAULT_MAX_WORDS):
+		return ROUTE_DEFAULT, "long"
+	return ROUTE_FAST, "short"
+
+
+def route_model(config, message):
+	"""
+	Model for a turn, as chosen by the Chatz API's model router
+
+	Args:
+		config (dict): Widget config (build_config); routes only when it has
+			a model_router, i.e. the router is enabled and the user has no
+			model override
+		message (str): User message
+
+	Returns:
+		dict: {model, route, reason}, or None without a router
+	"""
+	router = config.get("model_router")
+	if not router:
+		return None
+
+	route, reason = classify_turn(message, router.get("max_words"))
+	return {
+		"model": router["fast_model"] if route == ROUTE_FAST else config["model_name"],
+		"route": route,
+		"reason": reason
+	}
@@ -0,0 +1,207 @@
+import json
+import time
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.parse import urlsplit
+
+
+class UpstreamError(Exception):
+	"""The API answered a chat completion request with an error status"""
+
+	def __init__(self, status, body):
+		super().__init__(f"API Error: {status} - {body}")
+		self.status = status
+		self.body = body
+
+
+class ChatCompletionStream:
+	"""
+	Streaming /chat/completions request to an OpenAI-compatible API
+
+	The request is sent and its status checked on construction; iterating
+	yields the parsed `data:` events until `[DONE]`. Closing the stream (or
+	leaving a `with` block, or closing a generator that iterates it) closes
+	the upstream socket immediately, which is how vLLM, llama.cpp and the
+	hosted APIs learn that a generation was cancelled and free its slot.
+
+	Uses http.client rather than requests so that reads are unbuffered line
+	by line and close() always drops the connection instead of returning it
+	to a pool.
+	"""
+
+	def __init__(self, endpoint, api_key, payload, headers=None, timeout=300):
+		"""
+		Args:
+			endpoint (str): API base URL (e.g. https://api.openai.com/v1)
+			api_key (str): Bearer token
+			payload (dict): Chat completion request (stream is forced on)
+			headers (dict): Extra request headers
+			timeout (int): Connect and read timeout in seconds
+
+		Raises:
+			UpstreamError: The API returned a non-200 status
+		"""
+		url = urlsplit(endpoint.rstrip("/") + "/chat/completions")
+		connection_class = HTTPSConnection if url.scheme == "https" else HTTPConnection
+		self.connection = connection_class(url.hostname, url.port, timeout=timeout)
+		self.response = None
+
+		request_headers = {
+			"Content-Type": "application/json",
+			"Accept": "text/event-stream",
+			"Authorization": f"Bearer {api_key}"
+		}
+		request_headers.update(headers or {})
+
+		path = url.path + (f"?{url.query}" if url.query else "")
+		try:
+			self.connection.request(
+				"POST",
+				path,
+				body=json.dumps(dict(payload, stream=True)).encode(),
+				headers=request_headers
+			)
+			self.response = self.connection.getresponse()
+			if self.response.status != 200:
+				raise UpstreamError(self.response.status, self.response.read(2000).decode("utf-8", "replace"))
+		except BaseException:
+			self.close()
+			raise
+
+	def __iter__(self):
+		try:
+			for raw_line in self.response:
+				line = raw_line.decode("utf-8", "replace").strip()
+				if not line.startswith("data:"):
+					continue
+				data = line[5:].strip()
+				if data == "[DONE]":
+					return
+				try:
+					yield json.loads(data)
+				except ValueError:
+					# Skip invalid JSON lines
+					continue
+		finally:
+			self.close()
+
+	def close(self):
+		"""Drop the upstream connection (safe to call more than once)"""
+		# The response owns the socket once the API asked for Connection: close
+		if self.response is not None:
+			self.response.close()
+		self.connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+
+def delta_content(event):
+	"""Text of a streamed chat.completion.chunk event ("" if it has none)"""
+	choices = event.get("choices") or [{}]
+	return (choices[0].get("delta") or {}).get("content") or ""
+
+
+def delta_reasoning(event):
+	"""Reasoning streamed apart from the content (reasoning_content, or reasoning with some servers)"""
+	choices = event.get("choices") or [{}]
+	delta = choices[0].get("delta") or {}
+	return delta.get("reasoning_content") or delta.get("reasoning") or ""
+
+
+class StreamedResponse:
+	"""
+	Collects a streamed response while it is relayed
+
+	`finished` is set once the API sent a finish_reason, so a response cut
+	short (cancelled, or the client went away) can be told apart.
+	"""
+
+	def __init__(self, started=None):
+		"""
+		Args:
+			started (float): time.monotonic() when the request was sent (defaults to now)
+		"""
+		self.content_parts = []
+		self.reasoning_parts = []
+		self.finished = False
+		self.started = started if started is not None else time.monotonic()
+		self.first_token_at = None
+
+	def add(self, event):
+		"""Collect one chat.completion.chunk event"""
+		content = delta_content(event)
+		reasoning = delta_reasoning(event)
+		if (content or reasoning) and self.first_token_at is None:
+			self.first_token_at = time.monotonic()
+		self.content_parts.append(content)
+		self.reasoning_parts.append(reasoning)
+		choices = event.get("choices") or [{}]
+		if choices[0].get("finish_reason"):
+			self.finished = True
+
+	def timings(self):
+		"""Time to first token and total time so far, in ms (TTFT None before the first token)"""
+		now = time.monotonic()
+		ttft = round((self.first_token_at - self.started) * 1000) if self.first_token_at is not None else None
+		return ttft, round((now - self.started) * 1000)
+
+	@property
+	def content(self):
+		return "".join(self.content_parts)
+
+	@property
+	def reasoning(self):
+		return "".join(self.reasoning_parts)
+
+
+def chat_completion(endpoint, api_key, payload, headers=None, timeout=120):
+	"""
+	Non-streaming /chat/completions request to an OpenAI-compatible API
+
+	Args:
+		endpoint (str): API base URL (e.g. https://api.openai.com/v1)
+		api_key (str): Bearer token
+		payload (dict): Chat completion request (stream is forced off)
+		headers (dict): Extra request headers
+		timeout (int): Connect and read timeout in seconds
+
+	Returns:
+		dict: Parsed chat.completion response
+
+	Raises:
+		UpstreamError: The API returned a non-200 status
+	"""
+	url = urlsplit(endpoint.rstrip("/") + "/chat/completions")
+	connection_class = HTTPSConnection if url.scheme == "https" else HTTPConnection
+	connection = connection_class(url.hostname, url.port, timeout=timeout)
+
+	request_headers = {
+		"Content-Type": "application/json",
+		"Authorization": f"Bearer {api_key}"
+	}
+	request_headers.update(headers or {})
+
+	path = url.path + (f"?{url.query}" if url.query else "")
+	try:
+		connection.request(
+			"POST",
+			path,
+			body=json.dumps(dict(payload, stream=False)).encode(),
+			headers=request_headers
+		)
+		response = connection.getresponse()
+		body = response.read()
+		if response.status != 200:
+			raise UpstreamError(response.status, body[:2000].decode("utf-8", "replace"))
+		return json.loads(body)
+	finally:
+		connection.close()
+
+
+def message_content(result):
+	"""Text of a chat.completion response ("" if it has none)"""
+	choices = result.get("choices") or [{}]
+	return (choices[0].get("message") or {}).get("content") or ""
@@ -0,0 +1,209 @@
+import functools
+import re
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import now_datetime
+
+from chatz.utils.sampler import StackSampler
+
+
+# Request header that turns on the sampling profiler (System Managers only)
+PROFILE_HEADER = "X-Chatz-Profile"
+PROFILE_ID_HEADER = "X-Chatz-Profile-Id"
+
+PROFILE_KEY_PREFIX = "chatz_profile:"
+PROFILE_INDEX_KEY = "chatz_profiles"
+PROFILE_TTL = 24 * 60 * 60
+MAX_STORED_PROFILES = 50
+
+SAMPLE_INTERVAL = 0.002
+
+
+class RequestProfile:
+	"""Timings of one whitelisted call: phases, database queries and optional stack samples"""
+
+	def __init__(self, method):
+		self.method = method
+		self.started = time.perf_counter()
+		self.duration = 0.0
+		self.phases = {}
+		self.db_queries = 0
+		self.db_time = 0.0
+		self.sampler = None
+		self.profile_id = None
+		self._db = None
+		self._original_sql = None
+
+	def start(self, sample=False):
+		self._patch_db()
+		if sample:
+			self.sampler = StackSampler(interval=SAMPLE_INTERVAL).start()
+
+	def finish(self):
+		self.duration = time.perf_counter() - self.started
+		self._restore_db()
+		if self.sampler:
+			self.sampler.stop()
+			self.profile_id = store_profile(self)
+
+	def add_phase(self, name, seconds):
+		self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+	def _patch_db(self):
+		# Count every query of the call, whichever API issued it (get_value,
+		# get_all and the query builder all end up in Database.sql)
+		db = frappe.db
+		if not db:
+			return
+
+		original = db.sql
+
+		def timed_sql(*args, **kwargs):
+			started = time.perf_counter()
+			try:
+				return original(*args, **kwargs)
+			finally:
+				self.db_queries += 1
+				self.db_time += time.perf_counter() - started
+
+		self._db = db
+		self._original_sql = vars(db).get("sql")
+		db.sql = timed_sql
+
+	def _restore_db(self):
+		if self._db is None:
+			return
+		if self._original_sql is None:
+			del self._db.sql
+		else:
+			self._db.sql = self._original_sql
+		self._db = None
+
+	def server_timing(self):
+		"""
+		Server-Timing header value
+
+		Returns:
+			str: e.g. `chatz;dur=12.4;desc="get_user_config", db;dur=3.1;desc="6 queries", roles;dur=2.2`
+		"""
+		entries = [
+			f'chatz;dur={self.duration * 1000:.1f};desc="{self.method}"',
+			f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"'
+		]
+		entries.extend(
+			f"{_metric_name(name)};dur={seconds * 1000:.1f}"
+			for name, seconds in self.phases.items()
+		)
+		return ", ".join(entries)
+
+
+def profiled(fn):
+	"""
+	Record Server-Timing metrics for a whitelisted method
+
+	Apply below @frappe.whitelist. Nested profiled calls (e.g. get_user_config
+	falling back to get_guest_config) are recorded as phases of the outer call.
+	A System Manager can send the `X-Chatz-Profile: 1` header to also sample
+	the call's stacks; the flamegraph-ready result is stored for a day and its
+	ID returned in `X-Chatz-Profile-Id`.
+	"""
+
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		if getattr(frappe.local, "chatz_profile", None):
+			with phase(fn.__name__):
+				return fn(*args, **kwargs)
+
+		profile = RequestProfile(fn.__name__)
+		frappe.local.chatz_profile = profile
+		try:
+			profile.start(sample=sampling_requested())
+			return fn(*args, **kwargs)
+		finally:
+			frappe.local.chatz_profile = None
+			profile.finish()
+			frappe.local.chatz_server_timing = profile
+
+	return wrapper
+
+
+@contextmanager
+def phase(name):
+	"""
+	Time a phase of the current profiled call (no-op outside one)
+
+	Args:
+		name (str): Phase name, reported as a Server-Timing metric
+	"""
+	profile = getattr(frappe.local, "chatz_profile", None)
+	if not profile:
+		yield
+		return
+
+	started = time.perf_counter()
+	try:
+		yield
+	finally:
+		profile.add_phase(name, time.perf_counter() - started)
+
+
+def sampling_requested():
+	"""Whether the request asks for stack sampling and the user may have it"""
+	request = getattr(frappe.local, "request", None)
+	if not request or request.headers.get(PROFILE_HEADER) != "1":
+		return False
+	return "System Manager" in frappe.get_roles()
+
+
+def add_server_timing(response=None, request=None):
+	"""after_request hook: attach the profiled call's Server-Timing header"""
+	profile = getattr(frappe.local, "chatz_server_timing", None)
+	if not profile or response is None:
+		return
+	# Per-request timings must not be stored and replayed by shared caches
+	if (response.headers.get("Cache-Control") or "").startswith("public"):
+		return
+
+	response.headers["Server-Timing"] = profile.server_timing()
+	if profile.profile_id:
+		response.headers[PROFILE_ID_HEADER] = profile.profile_id
+
+
+def store_profile(profile):
+	"""
+	Keep a sampled profile in the cache
+
+	Args:
+		profile (RequestProfile): Finished profile with a sampler
+
+	Returns:
+		str: Profile ID
+	"""
+	profile_id = frappe.generate_hash(length=12)
+	cache = frappe.cache()
+	cache.set_value(
+		PROFILE_KEY_PREFIX + profile_id,
+		{
+			"profile_id": profile_id,
+			"method": profile.method,
+			"user": frappe.session.user,
+			"created": str(now_datetime()),
+			"duration_ms": round(profile.duration * 1000, 1),
+			"db_queries": profile.db_queries,
+			"db_ms": round(profile.db_time * 1000, 1),
+			"phases": {name: round(seconds * 1000, 1) for name, seconds in profile.phases.items()},
+			"samples": profile.sampler.samples,
+			"folded": profile.sampler.folded()
+		},
+		expires_in_sec=PROFILE_TTL
+	)
+	cache.lpush(PROFILE_INDEX_KEY, profile_id)
+	cache.ltrim(PROFILE_INDEX_KEY, 0, MAX_STORED_PROFILES - 1)
+	return profile_id
+
+
+def _metric_name(name):
+	# Server-Timing metric names are HTTP tokens
+	return re.sub(r"[^A-Za-z0-9_.-]", "_", name)
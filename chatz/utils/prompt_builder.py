@@ -0,0 +1,426 @@
+import json
+import re
+from datetime import datetime
+from html import unescape
+from html.parser import HTMLParser
+
+from chatz.utils.markdown import split_reasoning
+
+
+# Prompt layouts of a Chatz API
+LAYOUT_STANDARD = "Standard"
+LAYOUT_PREFIX_CACHED = "Prefix Cached"
+
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+
+# Fields a save changes without changing the document's content (left out of diffs)
+VERSION_FIELDS = ("modified", "modified_by")
+
+BLOCK_TAGS = {
+	"p", "div", "section", "article", "blockquote", "pre", "table", "tr",
+	"ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6"
+}
+
+
+class _TextExtractor(HTMLParser):
+	"""Collects the text of Text Editor HTML, keeping paragraphs and list items"""
+
+	def __init__(self):
+		super().__init__(convert_charrefs=True)
+		self.parts = []
+
+	def handle_starttag(self, tag, attrs):
+		if tag == "br":
+			self.parts.append("\n")
+		elif tag == "li":
+			self.parts.append("\n- ")
+		elif tag in BLOCK_TAGS:
+			self.parts.append("\n\n")
+
+	def handle_endtag(self, tag):
+		if tag in BLOCK_TAGS:
+			self.parts.append("\n\n")
+		elif tag in ("td", "th"):
+			self.parts.append(" ")
+
+	def handle_data(self, data):
+		self.parts.append(data)
+
+
+def html_to_prompt_text(html):
+	"""
+	Convert Text Editor HTML to clean prompt text
+
+	Tags are dropped (paragraphs, line breaks and list items are kept as
+	plain-text structure), entities decoded and whitespace normalised, so the
+	result is stable for identical content.
+
+	Args:
+		html (str): System prompt as stored by the Text Editor
+
+	Returns:
+		str: Plain text
+	"""
+	if not html:
+		return ""
+
+	parser = _TextExtractor()
+	parser.feed(html)
+	parser.close()
+	text = unescape("".join(parser.parts)).replace("\xa0", " ")
+
+	lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.split("\n")]
+	text = "\n".join(lines)
+	return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def count_tokens(text):
+	"""
+	Count prompt tokens
+
+	Uses tiktoken's cl100k_base encoding when it is installed, otherwise the
+	usual estimate of four characters per token.
+
+	Args:
+		text (str): Text to measure
+
+	Returns:
+		int: Token count
+	"""
+	if not text:
+		return 0
+	try:
+		import tiktoken
+	except ImportError:
+		return max(1, round(len(text) / 4))
+	return len(tiktoken.get_encoding("cl100k_base").encode(text))
+
+
+def build_messages(config, history, user_message, context=None, now=None, retrieved=None, attachments=None):
+	"""
+	Build the chat completion messages for a turn
+
+	Mirrors ChatzAPIClient.buildMessagesArray in chatz_api_client.js.
+
+	With the "Prefix Cached" layout the system message is the precompiled
+	system prompt only, identical for every user and turn of a Chatz API, and
+	the volatile context (time to the hour, user, document) is prepended to
+	the final user message. Everything before the last turn is then a stable
+	prefix that backends with prefix caching (vLLM, llama.cpp) can reuse.
+
+	The open document is sent once per version: replayed user turns carry
+	the document data saved with them (in full the first time, then only its
+	changes), and the current turn adds nothing when the document is
+	unchanged since, or a field-level diff when it was edited.
+
+	Args:
+		config (dict): Chatz API config (get_user_config payload)
+		history (list): Previous messages ({message_type, message_content})
+		user_message (str): Current user message
+		context (dict): Current Desk context, optionally with document_data
+		now (datetime): Current time (defaults to now)
+		retrieved (list): Indexed snippets ({doctype, name, title, content})
+		attachments (list): Attachment excerpts ({file_name, content} or {file_name, pending})
+
+	Returns:
+		list: Messages for /chat/completions
+	"""
+	now = now or datetime.now()
+	layout = config.get("prompt_layout") or LAYOUT_STANDARD
+	compact = layout == LAYOUT_PREFIX_CACHED
+
+	# Document versions sent with earlier turns, by (doctype, docname)
+	sent = {}
+	history_messages = []
+	for msg in history or []:
+		if msg.get("message_type") == "user":
+			document_block = replay_document(msg, sent, compact)
+			history_messages.append({
+				"role": "user",
+				"content": f"{document_block}\n---\n\n{msg.get('message_content')}" if document_block
+					else msg.get("message_content")
+			})
+		else:
+			history_messages.append({
+				"role": "assistant",
+				# Thoughts are not sent back (older messages stored them inline)
+				"content": split_reasoning(msg.get("message_content"))[0]
+			})
+
+	context = context or {}
+	previous = sent.get((context.get("doctype"), context.get("docname")))
+
+	if layout == LAYOUT_PREFIX_CACHED:
+		system_prompt = config.get("system_prompt_text") or html_to_prompt_text(config.get("system_prompt")) \
+			or DEFAULT_SYSTEM_PROMPT
+		context_block = format_context(
+			config, context, now.strftime("%A, %B %d, %Y, %H:00"), True, retrieved, attachments, previous
+		)
+		return (
+			[{"role": "system", "content": system_prompt}]
+			+ history_messages
+			+ [{"role": "user", "content": f"{context_block}\n---\n\n{user_message}"}]
+		)
+
+	system_prompt = config.get("system_prompt") or DEFAULT_SYSTEM_PROMPT
+	system_prompt += "\n\n" + format_context(
+		config, context, now.strftime("%A, %B %d, %Y, %H:%M:%S"), False, retrieved, attachments, previous
+	)
+	return (
+		[{"role": "system", "content": system_prompt}]
+		+ history_messages
+		+ [{"role": "user", "content": user_message}]
+	)
+
+
+def format_context(config, context, time_label, compact=False, retrieved=None, attachments=None, previous=None):
+	"""
+	Format the "Current Information" block (time, user, Desk context, attachments and retrieved records)
+
+	previous is the version of the open document sent earlier in the
+	conversation, if any (see format_document_data).
+	"""
+	info = "Current Information:\n"
+	info += f"- Current Date & Time: {time_label}\n"
+
+	if config.get("user"):
+		info += f"- User: {config['user']}\n"
+
+	context = context or {}
+	if context.get("doctype") and context.get("docname"):
+		info += f"- Document: {context['doctype']} ({context['docname']})\n"
+		if context.get("document_data"):
+			info += format_document_data(context["document_data"], previous, compact)
+		if attachments:
+			info += "\nAttachments:\n"
+			for attachment in attachments:
+				if attachment.get("pending"):
+					info += f"[{attachment['file_name']}] (still being read, not available yet)\n"
+				else:
+					info += f"[{attachment['file_name']}]\n{attachment['content']}\n"
+	elif context.get("doctype"):
+		info += f"- List View: {context['doctype']}\n"
+		if context.get("list_filter"):
+			info += f"- Filters: {context['list_filter']}\n"
+	if context.get("page_title") and not context.get("doctype"):
+		info += f"- Page: {context['page_title']}\n"
+
+	if retrieved:
+		info += "\nRelevant Records:\n"
+		for snippet in retrieved:
+			info += f"- {snippet['doctype']} {snippet['name']} ({snippet['title']}): {snippet['content']}\n"
+
+	return info
+
+
+def format_document_data(data, previous=None, compact=False):
+	"""
+	Format the document data of a turn
+
+	Args:
+		data (dict): Document (frappe.client.get)
+		previous (dict): Version of the document sent earlier in the conversation
+		compact (bool): Serialize the whole document without indentation
+
+	Returns:
+		str: The whole document, a one-line note when it is unchanged since
+			previous, or only its changes (document_diff, always compact)
+	"""
+	if previous is None:
+		if compact:
+			serialized = json.dumps(data, separators=(",", ":"), default=str)
+		else:
+			serialized = json.dumps(data, indent=2, default=str)
+		return f"\nDocument Data:\n```json\n{serialized}\n```\n"
+
+	changes = document_diff(previous, data)
+	if not changes:
+		return "\nDocument Data: unchanged since it was sent earlier in this conversation\n"
+	serialized = json.dumps(changes, separators=(",", ":"), default=str)
+	return f"\nDocument Changes (since it was sent earlier in this conversation):\n```json\n{serialized}\n```\n"
+
+
+def replay_document(message, sent, compact=False):
+	"""
+	Document block of a replayed user turn, recording its version in sent
+
+	Args:
+		message (dict): History message with its saved document_context
+		sent (dict): (doctype, docname) -> document sent with an earlier turn
+		compact (bool): Serialize a whole document without indentation
+
+	Returns:
+		str: Block to put ahead of the message, or "" if it sent nothing new
+	"""
+	context = message_context(message)
+	if not (context.get("doctype") and context.get("docname")):
+		return ""
+
+	key = (context["doctype"], context["docname"])
+	previous = sent.get(key)
+	data = restore_document(context, previous)
+	if data is None:
+		return ""
+	sent[key] = data
+	if previous is not None and not document_diff(previous, data):
+		return ""
+	return f"- Document: {key[0]} ({key[1]})\n" + format_document_data(data, previous, compact)
+
+
+def last_sent_document(history, doctype, docname):
+	"""
+	Latest version of a document sent with the turns in history
+
+	Lets a turn skip fetching the document when its modified timestamp
+	shows it is unchanged.
+
+	Returns:
+		dict: Document data, or None if no turn in history sent it
+	"""
+	sent = {}
+	for message in history or []:
+		if message.get("message_type") == "user":
+			replay_document(message, sent)
+	return sent.get((doctype, docname))
+
+
+def stored_context(context, previous=None):
+	"""
+	Desk context of a turn as it is saved with its messages
+
+	The document is stored the way the prompt sent it: whole when no earlier
+	turn in the history window sent it, otherwise only its changes since
+	previous (empty when unchanged) and its VERSION_FIELDS, so a document is
+	not stored again with every turn. restore_document rebuilds it.
+	Mirrors ChatzAPIClient.storedContext in chatz_api_client.js.
+
+	Args:
+		context (dict): Desk context, optionally with document_data
+		previous (dict): Version of the document sent earlier in the conversation
+
+	Returns:
+		dict: Context to save as document_context
+	"""
+	data = (context or {}).get("document_data")
+	if previous is None or not isinstance(data, dict):
+		return context
+	stored = {field: value for field, value in context.items() if field != "document_data"}
+	stored["document_changes"] = document_diff(previous, data)
+	stored["document_version"] = {field: data[field] for field in VERSION_FIELDS if field in data}
+	return stored
+
+
+def restore_document(context, previous=None):
+	"""
+	Document data saved with a turn (see stored_context)
+
+	Args:
+		context (dict): Saved document_context
+		previous (dict): Version of the document sent with an earlier turn
+
+	Returns:
+		dict: Document data, or None if the turn sent none, or only changes
+			to a version that is not known (sent before the history window)
+	"""
+	data = context.get("document_data")
+	if isinstance(data, dict):
+		return data
+	changes = context.get("document_changes")
+	if previous is None or not isinstance(changes, dict):
+		return None
+	return dict(apply_diff(previous, changes), **(context.get("document_version") or {}))
+
+
+def message_context(message):
+	"""Saved document_context of a history message as a dict"""
+	context = message.get("document_context")
+	if isinstance(context, str):
+		try:
+			context = json.loads(context)
+		except ValueError:
+			return {}
+	return context if isinstance(context, dict) else {}
+
+
+def document_diff(old, new):
+	"""
+	Field-level changes between two versions of a document
+
+	Mirrors ChatzAPIClient.documentDiff in chatz_api_client.js. VERSION_FIELDS
+	are ignored. Child tables are compared row by row, by row name.
+
+	Args:
+		old (dict): Earlier version
+		new (dict): Current version
+
+	Returns:
+		dict: Changed fields with their new value (None when removed); a
+			changed child table maps to {added: [rows], changed: {row name:
+			changes}, removed: [row names]}. Empty when nothing changed.
+	"""
+	diff = {}
+	for field in list(new) + [field for field in old if field not in new]:
+		if field in VERSION_FIELDS:
+			continue
+		before, after = old.get(field), new.get(field)
+		if is_table(before) and is_table(after):
+			changes = table_diff(before, after)
+			if changes:
+				diff[field] = changes
+		elif before != after:
+			diff[field] = after
+	return diff
+
+
+def is_table(value):
+	return isinstance(value, list) and all(isinstance(row, dict) for row in value)
+
+
+def table_diff(old_rows, new_rows):
+	"""Row-level changes of a child table (see document_diff)"""
+	old_by_name = {row.get("name"): row for row in old_rows}
+	new_names = {row.get("name") for row in new_rows}
+
+	added = []
+	changed = {}
+	for row in new_rows:
+		previous = old_by_name.get(row.get("name"))
+		if previous is None:
+			added.append(row)
+			continue
+		changes = document_diff(previous, row)
+		if changes:
+			changed[row.get("name")] = changes
+
+	diff = {}
+	if added:
+		diff["added"] = added
+	if changed:
+		diff["changed"] = changed
+	removed = [row.get("name") for row in old_rows if row.get("name") not in new_names]
+	if removed:
+		diff["removed"] = removed
+	return diff
+
+
+def apply_diff(old, diff):
+	"""Version of a document with changes applied (the inverse of document_diff)"""
+	new = dict(old)
+	for field, value in diff.items():
+		if is_table(old.get(field)) and isinstance(value, dict):
+			new[field] = apply_table_diff(old[field], value)
+		else:
+			new[field] = value
+	return new
+
+
+def apply_table_diff(rows, diff):
+	"""Rows of a child table with row-level changes applied (see table_diff)"""
+	changed = diff.get("changed") or {}
+	removed = set(diff.get("removed") or [])
+	kept = [
+		apply_diff(row, changed[row.get("name")]) if row.get("name") in changed else row
+		for row in rows
+		if row.get("name") not in removed
+	]
+	return kept + list(diff.get("added") or [])
@@ -0,0 +1,421 @@
+import json
+
+import frappe
+from frappe.model import child_table_fields, default_fields
+from frappe.utils import cstr, now_datetime
+
+from chatz.utils.bm25 import chunk_text, cosine_similarity, score_chunks, term_frequencies, tokenize
+from chatz.utils.prompt_builder import html_to_prompt_text
+
+
+INDEXED_DOCTYPES_KEY = "chatz_indexed_doctypes"
+INDEX_STATS_KEY = "chatz_index_stats"
+INDEX_STATS_TTL = 300
+
+# Chunks scored by BM25 before permission filtering and re-ranking
+CANDIDATE_CHUNKS = 50
+# Upper bound on postings read per query (shared evenly by the query terms)
+MAX_POSTINGS = 50000
+# Terms in more than this share of chunks are skipped (unless nothing else is left)
+MAX_TERM_SHARE = 0.5
+
+MAX_SNIPPET_CHARS = 1200
+REBUILD_BATCH_SIZE = 200
+
+# Index passes per job over a record that keeps changing meanwhile
+MAX_INDEX_PASSES = 3
+
+# fastembed model used when a source enables embeddings (small, CPU friendly)
+EMBEDDING_MODEL = "BAAI/bge-small-en-v1.5"
+
+_embedding_model = None
+
+
+def get_indexed_doctypes():
+	"""
+	DocTypes with an enabled Chatz Index Source (cached, checked on every save)
+
+	Empty, and not cached, while the Chatz Index Source table does not exist
+	yet (saves during install or migrate).
+	"""
+	doctypes = frappe.cache().get_value(INDEXED_DOCTYPES_KEY)
+	if doctypes is None:
+		if not frappe.db.table_exists("Chatz Index Source"):
+			return []
+		doctypes = frappe.get_all("Chatz Index Source", filters={"enabled": 1}, pluck="source_doctype")
+		frappe.cache().set_value(INDEXED_DOCTYPES_KEY, doctypes)
+	return doctypes
+
+
+def clear_index_cache():
+	frappe.cache().delete_value(INDEXED_DOCTYPES_KEY)
+	frappe.cache().delete_value(INDEX_STATS_KEY)
+
+
+def on_doc_change(doc, method=None):
+	"""doc_events hook: re-index a record of an indexed DocType after commit"""
+	if doc.doctype not in get_indexed_doctypes():
+		return
+
+	frappe.enqueue(
+		"chatz.utils.retrieval.index_latest",
+		queue="short",
+		job_id=f"chatz_index:{doc.doctype}:{doc.name}",
+		deduplicate=True,
+		enqueue_after_commit=True,
+		doctype=doc.doctype,
+		name=doc.name
+	)
+
+
+def index_latest(doctype, name):
+	"""
+	Background job of on_doc_change: index a record until the latest save is indexed
+
+	The job is deduplicated, so a save committed while it runs enqueues
+	nothing. `modified` is read again after each pass (in a new transaction)
+	and the record re-indexed if it changed; a record still changing after
+	MAX_INDEX_PASSES is left to a new job.
+
+	Args:
+		doctype (str): Record DocType
+		name (str): Record name
+	"""
+	for _ in range(MAX_INDEX_PASSES):
+		modified = frappe.db.get_value(doctype, name, "modified")
+		index_document(doctype, name)
+		frappe.db.commit()
+		if frappe.db.get_value(doctype, name, "modified") == modified:
+			return
+
+	# Without the job ID, which still belongs to this running job
+	frappe.enqueue("chatz.utils.retrieval.index_latest", queue="short", doctype=doctype, name=name)
+
+
+def on_doc_trash(doc, method=None):
+	"""doc_events hook: drop a deleted record from the index"""
+	if doc.doctype in get_indexed_doctypes():
+		remove_document(doc.doctype, doc.name)
+
+
+def on_doc_rename(doc, method=None, old=None, new=None, merge=False):
+	"""doc_events hook: re-index a renamed record under its new name"""
+	if doc.doctype in get_indexed_doctypes():
+		remove_document(doc.doctype, old)
+		on_doc_change(doc)
+
+
+def index_document(doctype, name, source=None):
+	"""
+	(Re)index one record: replace its chunks and postings
+
+	Args:
+		doctype (str): Record DocType
+		name (str): Record name
+		source (Document): Chatz Index Source (loaded if not given)
+
+	Returns:
+		int: Number of chunks written
+	"""
+	source = source or frappe.get_cached_doc("Chatz Index Source", doctype)
+	remove_document(doctype, name)
+
+	if not source.enabled or not frappe.db.exists(doctype, name):
+		return 0
+
+	doc = frappe.get_doc(doctype, name)
+	title, text = document_text(doc, source)
+	chunks = chunk_text(text)
+	if not chunks:
+		return 0
+
+	embeddings = embed_texts([f"{title}\n{chunk}" for chunk in chunks]) if source.use_embeddings else None
+
+	now = now_datetime()
+	chunk_rows = []
+	term_rows = []
+	for index, chunk in enumerate(chunks):
+		chunk_name = frappe.generate_hash(length=12)
+		frequencies, length = term_frequencies(f"{title} {chunk}")
+		embedding = json.dumps([round(v, 5) for v in embeddings[index]]) if embeddings else None
+
+		chunk_rows.append((
+			chunk_name, now, now, "Administrator", "Administrator",
+			doctype, name, index, title[:140], chunk, length, embedding
+		))
+		term_rows.extend(
+			(frappe.generate_hash(length=12), now, now, "Administrator", "Administrator",
+			 term[:140], chunk_name, frequency, length)
+			for term, frequency in frequencies.items()
+		)
+
+	frappe.db.bulk_insert(
+		"Chatz Index Chunk",
+		["name", "creation", "modified", "owner", "modified_by",
+		 "source_doctype", "source_name", "chunk_no", "title", "content", "term_count", "embedding"],
+		chunk_rows
+	)
+	frappe.db.bulk_insert(
+		"Chatz Index Term",
+		["name", "creation", "modified", "owner", "modified_by", "term", "chunk", "frequency", "chunk_length"],
+		term_rows
+	)
+	return len(chunk_rows)
+
+
+def remove_document(doctype, name):
+	"""Delete the chunks and postings of a record"""
+	chunks = frappe.get_all(
+		"Chatz Index Chunk",
+		filters={"source_doctype": doctype, "source_name": name},
+		pluck="name"
+	)
+	if chunks:
+		frappe.db.delete("Chatz Index Term", {"chunk": ["in", chunks]})
+		frappe.db.delete("Chatz Index Chunk", {"name": ["in", chunks]})
+
+
+def remove_source(doctype):
+	"""Delete the whole index of a DocType"""
+	frappe.db.sql("""
+		DELETE t FROM `tabChatz Index Term` t
+		INNER JOIN `tabChatz Index Chunk` c ON c.name = t.chunk
+		WHERE c.source_doctype = %s
+	""", doctype)
+	frappe.db.delete("Chatz Index Chunk", {"source_doctype": doctype})
+	frappe.cache().delete_value(INDEX_STATS_KEY)
+
+
+def document_text(doc, source):
+	"""
+	Text of the indexed fields of a record
+
+	Args:
+		doc (Document): Record
+		source (Document): Chatz Index Source
+
+	Returns:
+		tuple: (title, text with one "Label: value" line per field)
+	"""
+	meta = frappe.get_meta(doc.doctype)
+	title_field = source.title_field or meta.title_field
+	title = cstr(doc.get(title_field)) if title_field else ""
+	title = title or doc.name
+
+	lines = []
+	for fieldname in parse_fieldnames(source.fields_to_index):
+		value = doc.get(fieldname)
+		if value in (None, "", []):
+			continue
+
+		df = meta.get_field(fieldname)
+		label = df.label if df else fieldname
+
+		if isinstance(value, list):
+			# Child table: one line per row with its non-empty text values
+			for row in value:
+				row_values = [
+					cstr(v) for k, v in row.as_dict().items()
+					if k not in default_fields and k not in child_table_fields
+					and isinstance(v, (str, int, float)) and v not in ("", 0)
+				]
+				if row_values:
+					lines.append(f"{label}: {', '.join(row_values)}")
+		elif df and df.fieldtype in ("Text Editor", "HTML Editor", "Markdown Editor"):
+			lines.append(f"{label}: {html_to_prompt_text(cstr(value))}")
+		else:
+			lines.append(f"{label}: {cstr(value)}")
+
+	return title, "\n".join(lines)
+
+
+def parse_fieldnames(value):
+	return [f.strip() for f in cstr(value).replace(",", "\n").split("\n") if f.strip()]
+
+
+def rebuild_source(source_doctype):
+	"""
+	Re-index every record of a DocType (background job)
+
+	Args:
+		source_doctype (str): DocType of the Chatz Index Source
+	"""
+	source = frappe.get_doc("Chatz Index Source", source_doctype)
+	remove_source(source_doctype)
+	frappe.db.commit()
+
+	chunks = 0
+	last_name = None
+	while True:
+		filters = {"name": [">", last_name]} if last_name else {}
+		names = frappe.get_all(
+			source_doctype,
+			filters=filters,
+			order_by="name asc",
+			limit=REBUILD_BATCH_SIZE,
+			pluck="name"
+		)
+		if not names:
+			break
+
+		for name in names:
+			chunks += index_document(source_doctype, name, source)
+		frappe.db.commit()
+		last_name = names[-1]
+
+	frappe.db.set_value(
+		"Chatz Index Source",
+		source_doctype,
+		{"indexed_chunks": chunks, "last_indexed": now_datetime()},
+		update_modified=False
+	)
+	frappe.db.commit()
+	frappe.cache().delete_value(INDEX_STATS_KEY)
+
+
+def get_index_stats():
+	"""Chunk count and average chunk length (cached for a few minutes)"""
+	stats = frappe.cache().get_value(INDEX_STATS_KEY)
+	if not stats:
+		row = frappe.db.sql("""
+			SELECT COUNT(*) AS total, AVG(term_count) AS average
+			FROM `tabChatz Index Chunk`
+		""", as_dict=True)[0]
+		stats = {"total": row.total or 0, "average": float(row.average or 0)}
+		frappe.cache().set_value(INDEX_STATS_KEY, stats, expires_in_sec=INDEX_STATS_TTL)
+	return stats
+
+
+def search(query, limit=5):
+	"""
+	Find the best matching indexed snippets the current user may read
+
+	Scores chunks with BM25 from the postings table, re-ranks candidates by
+	embedding similarity when they have embeddings and fastembed is
+	installed, then keeps only records the user has read permission on.
+
+	Args:
+		query (str): User message
+		limit (int): Maximum snippets
+
+	Returns:
+		list: Snippets ({doctype, name, title, content, score}), best first
+	"""
+	terms = list(dict.fromkeys(tokenize(query)))
+	stats = get_index_stats()
+	if not terms or not stats["total"]:
+		return []
+
+	frequencies = dict(frappe.db.sql("""
+		SELECT term, COUNT(*) FROM `tabChatz Index Term`
+		WHERE term IN %(terms)s
+		GROUP BY term
+	""", {"terms": tuple(terms)}))
+	if not frequencies:
+		return []
+
+	# Very common terms add little but cost the most postings
+	selective = [t for t in frequencies if frequencies[t] <= stats["total"] * MAX_TERM_SHARE]
+	query_terms = selective or list(frequencies)
+
+	# The same share of MAX_POSTINGS per term, highest frequency first, so a
+	# capped search still sees the strongest matches of every term
+	values = {f"term_{index}": term for index, term in enumerate(query_terms)}
+	values["limit"] = max(1, MAX_POSTINGS // len(query_terms))
+	postings = frappe.db.sql(" UNION ALL ".join(
+		f"""(
+			SELECT chunk, term, frequency, chunk_length FROM `tabChatz Index Term`
+			WHERE term = %(term_{index})s
+			ORDER BY frequency DESC, chunk ASC
+			LIMIT %(limit)s
+		)"""
+		for index in range(len(query_terms))
+	), values)
+
+	ranked = score_chunks(
+		[t for t in terms if t in query_terms],
+		[(chunk, term, frequency) for chunk, term, frequency, _ in postings],
+		{chunk: length for chunk, _, _, length in postings},
+		frequencies,
+		stats["total"],
+		stats["average"]
+	)[:CANDIDATE_CHUNKS]
+	if not ranked:
+		return []
+
+	scores = dict(ranked)
+	chunks = frappe.get_all(
+		"Chatz Index Chunk",
+		filters={"name": ["in", list(scores)]},
+		fields=["name", "source_doctype", "source_name", "title", "content", "embedding"]
+	)
+	rerank(query, chunks, scores)
+	chunks.sort(key=lambda c: scores[c.name], reverse=True)
+
+	return filter_permitted(chunks, scores, limit)
+
+
+def rerank(query, chunks, scores):
+	"""Blend BM25 with embedding similarity for chunks that have embeddings"""
+	if not any(c.embedding for c in chunks):
+		return
+
+	vectors = embed_texts([query])
+	if not vectors:
+		return
+
+	best = max(scores.values()) or 1
+	for chunk in chunks:
+		if chunk.embedding:
+			similarity = cosine_similarity(vectors[0], json.loads(chunk.embedding))
+			scores[chunk.name] = 0.5 * scores[chunk.name] / best + 0.5 * similarity
+		else:
+			scores[chunk.name] = 0.5 * scores[chunk.name] / best
+
+
+def filter_permitted(chunks, scores, limit):
+	"""Keep chunks of records the current user can read, one snippet per record"""
+	permitted = {}
+	for doctype in {c.source_doctype for c in chunks}:
+		names = [c.source_name for c in chunks if c.source_doctype == doctype]
+		try:
+			permitted[doctype] = set(frappe.get_list(doctype, filters={"name": ["in", names]}, pluck="name"))
+		except frappe.PermissionError:
+			permitted[doctype] = set()
+
+	snippets = []
+	seen = set()
+	for chunk in chunks:
+		key = (chunk.source_doctype, chunk.source_name)
+		if key in seen or chunk.source_name not in permitted.get(chunk.source_doctype, ()):
+			continue
+		seen.add(key)
+		snippets.append({
+			"doctype": chunk.source_doctype,
+			"name": chunk.source_name,
+			"title": chunk.title,
+			"content": chunk.content[:MAX_SNIPPET_CHARS],
+			"score": round(scores[chunk.name], 4)
+		})
+		if len(snippets) >= limit:
+			break
+
+	return snippets
+
+
+def embed_texts(texts):
+	"""
+	Embed texts on the CPU with fastembed
+
+	Returns:
+		list: Vectors, or None if fastembed is not installed
+	"""
+	global _embedding_model
+	if _embedding_model is None:
+		try:
+			from fastembed import TextEmbedding
+		except ImportError:
+			return None
+		_embedding_model = TextEmbedding(EMBEDDING_MODEL)
+
+	return [[float(v) for v in vector] for vector in _embedding_model.embed(texts)]
@@ -0,0 +1,81 @@
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class StackSampler:
+	"""
+	Sampling profiler for a single thread
+
+	A background thread snapshots the target thread's Python stack every
+	`interval` seconds. Stacks are kept in the folded format used by
+	flamegraph.pl, speedscope and inferno ("outer;inner;leaf count"), so
+	sampling costs one dict lookup per frame and no tracing hooks are set.
+	"""
+
+	def __init__(self, thread_id=None, interval=0.005, max_depth=64):
+		"""
+		Args:
+			thread_id (int): Thread to sample (defaults to the calling thread)
+			interval (float): Seconds between samples
+			max_depth (int): Innermost frames kept per stack
+		"""
+		self.thread_id = thread_id or threading.get_ident()
+		self.interval = interval
+		self.max_depth = max_depth
+		self.stacks = Counter()
+		self.samples = 0
+		self.started_at = None
+		self.duration = 0.0
+		self._stop = threading.Event()
+		self._thread = None
+
+	def start(self):
+		self.started_at = time.monotonic()
+		self._thread = threading.Thread(target=self._run, name="chatz-sampler", daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._stop.set()
+		if self._thread:
+			self._thread.join()
+		self.duration = time.monotonic() - self.started_at
+		return self
+
+	def __enter__(self):
+		return self.start()
+
+	def __exit__(self, *exc):
+		self.stop()
+
+	def _run(self):
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			if frame is None:
+				break
+			self.stacks[self._fold(frame)] += 1
+			self.samples += 1
+
+	def _fold(self, frame):
+		names = []
+		while frame is not None and len(names) < self.max_depth:
+			code = frame.f_code
+			names.append(f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})")
+			frame = frame.f_back
+		return ";".join(reversed(names))
+
+	def folded(self):
+		"""Collapsed stacks, one "frame;frame;frame count" line per distinct stack"""
+		return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+
+def _short_path(path):
+	"""Path from the package directory (e.g. frappe/model/document.py)"""
+	parts = path.replace("\\", "/").split("/")
+	for marker in ("site-packages", "apps"):
+		if marker in parts:
+			index = len(parts) - 1 - parts[::-1].index(marker)
+			return "/".join(parts[index + 1:])
+	return "/".join(parts[-2:])
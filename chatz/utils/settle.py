@@ -0,0 +1,20 @@
+from frappe.utils import add_to_date, now_datetime
+
+
+# Rows written within this window are left for the next incremental read
+# (delta sync, export, usage rollups), so a transaction that commits
+# slightly out of order is never skipped by a cursor or watermark
+SETTLE_SECONDS = 2
+
+
+def settled_before(seconds=SETTLE_SECONDS):
+	"""
+	Upper bound of the rows an incremental read started now may take
+
+	Args:
+		seconds (int): Settle window (defaults to SETTLE_SECONDS)
+
+	Returns:
+		datetime: Now, less the settle window
+	"""
+	return add_to_date(now_datetime(), seconds=-seconds)
@@ -0,0 +1,37 @@
+import frappe
+
+
+def stream_in_site_context(generator_fn, *args, **kwargs):
+	"""
+	Wrap a generator so it can be returned in a streaming werkzeug Response
+
+	Frappe tears down the request context (including the database connection)
+	before the WSGI server iterates the response body, so the generator
+	reconnects to the same site as the same user while it runs.
+
+	Args:
+		generator_fn (callable): Generator function to run
+		*args: Positional arguments for generator_fn
+		**kwargs: Keyword arguments for generator_fn
+
+	Returns:
+		generator: Yields whatever generator_fn yields
+	"""
+	site = frappe.local.site
+	sites_path = frappe.local.sites_path
+	user = frappe.session.user
+
+	def generate():
+		# Iterated while the request context is still alive (e.g. in tests)
+		owns_context = not getattr(frappe.local, "initialised", False)
+		if owns_context:
+			frappe.init(site=site, sites_path=sites_path)
+			frappe.connect()
+			frappe.set_user(user)
+		try:
+			yield from generator_fn(*args, **kwargs)
+		finally:
+			if owns_context:
+				frappe.destroy()
+
+	return generate()
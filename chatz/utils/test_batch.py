@@ -0,0 +1,70 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import threading
+import time
+import unittest
+
+from chatz.utils.batch import run_batch
+from chatz.utils.openai_client import UpstreamError
+
+
+class TestRunBatch(unittest.TestCase):
+	def test_bounded_concurrency_and_lazy_reads(self):
+		lock = threading.Lock()
+		state = {"running": 0, "peak": 0, "read": 0}
+
+		def items():
+			for index in range(20):
+				state["read"] += 1
+				yield index, index
+
+		def call(payload):
+			with lock:
+				state["running"] += 1
+				state["peak"] = max(state["peak"], state["running"])
+			time.sleep(0.01)
+			with lock:
+				state["running"] -= 1
+			return payload * 2
+
+		results = []
+		for result in run_batch(items(), call, concurrency=4):
+			# Never more than the calls in flight are read ahead
+			self.assertLessEqual(state["read"] - len(results), 4)
+			results.append(result)
+
+		self.assertEqual(state["peak"], 4)
+		self.assertEqual(sorted(r["output"] for r in results), [i * 2 for i in range(20)])
+		self.assertTrue(all(r["key"] * 2 == r["output"] for r in results))
+
+	def test_retries_transient_errors_only(self):
+		attempts = {"flaky": 0, "bad": 0}
+
+		def call(payload):
+			attempts[payload] += 1
+			if payload == "flaky" and attempts[payload] < 3:
+				raise UpstreamError(503, "overloaded")
+			if payload == "bad":
+				raise UpstreamError(400, "invalid model")
+			return "ok"
+
+		results = {r["key"]: r for r in run_batch(
+			[("flaky", "flaky"), ("bad", "bad")], call, max_retries=2, retry_delay=0.001
+		)}
+
+		self.assertEqual(results["flaky"]["status"], "Done")
+		self.assertEqual(results["flaky"]["attempts"], 3)
+		self.assertEqual(results["bad"]["status"], "Failed")
+		self.assertEqual(results["bad"]["attempts"], 1)
+		self.assertIn("400", results["bad"]["error"])
+
+	def test_stop_reads_no_more_items(self):
+		results = list(run_batch(
+			((i, i) for i in range(50)),
+			lambda payload: payload,
+			concurrency=2,
+			should_stop=lambda: True
+		))
+
+		self.assertLessEqual(len(results), 2)
@@ -0,0 +1,37 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import unittest
+
+from chatz.utils.bm25 import chunk_text, score_chunks, term_frequencies, tokenize
+
+
+class TestBM25(unittest.TestCase):
+	def test_tokenize_drops_stopwords(self):
+		self.assertEqual(tokenize("The Invoice is OVERDUE for ACME_Corp!"), ["invoice", "overdue", "acme", "corp"])
+
+	def test_chunk_text_overlaps(self):
+		words = [f"w{i}" for i in range(450)]
+		chunks = chunk_text(" ".join(words), chunk_words=200, overlap=40)
+		self.assertEqual(len(chunks), 3)
+		self.assertTrue(chunks[1].startswith("w160 "))
+		self.assertTrue(chunks[-1].endswith("w449"))
+		self.assertEqual(chunk_text("  "), [])
+
+	def test_rare_terms_rank_higher(self):
+		docs = {
+			"a": "overdue invoice for acme",
+			"b": "invoice paid in full",
+			"c": "invoice draft",
+		}
+		postings, lengths, frequencies = [], {}, {}
+		for chunk, text in docs.items():
+			counts, length = term_frequencies(text)
+			lengths[chunk] = length
+			for term, count in counts.items():
+				postings.append((chunk, term, count))
+				frequencies[term] = frequencies.get(term, 0) + 1
+
+		ranked = score_chunks(tokenize("overdue invoice"), postings, lengths, frequencies, 3, 2.5)
+		self.assertEqual(ranked[0][0], "a")
+		self.assertEqual(len(ranked), 3)
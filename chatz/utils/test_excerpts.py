@@ -0,0 +1,35 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import unittest
+
+from chatz.utils.excerpts import build_excerpt_index, select_excerpts
+
+
+def filler(label, words):
+	return " ".join(f"{label}{i}" for i in range(words))
+
+
+class TestExcerpts(unittest.TestCase):
+	def test_relevant_chunks_within_budget(self):
+		contract = build_excerpt_index(
+			filler("intro", 300) + " the warranty period is 24 months " + filler("outro", 300)
+		)
+		price_list = build_excerpt_index(filler("price", 300))
+
+		excerpts = select_excerpts([("contract.pdf", contract), ("prices.csv", price_list)], "warranty period?", 3500)
+
+		self.assertEqual(excerpts[0]["file_name"], "contract.pdf")
+		self.assertIn("warranty period is 24 months", excerpts[0]["content"])
+		# The other file still shows its opening chunk if the budget allows
+		self.assertEqual([e["file_name"] for e in excerpts], ["contract.pdf", "prices.csv"])
+		self.assertTrue(excerpts[1]["content"].startswith("price0 "))
+		self.assertLessEqual(sum(len(e["content"]) for e in excerpts), 3500 + 10)
+
+	def test_opening_chunks_when_nothing_matches(self):
+		index = build_excerpt_index(filler("word", 1000))
+		excerpts = select_excerpts([("a.txt", index)], "unrelated question", 10000)
+
+		self.assertEqual(len(excerpts), 1)
+		self.assertTrue(excerpts[0]["content"].startswith("word0 "))
+		self.assertEqual(select_excerpts([("a.txt", index)], "question", 10), [])
@@ -0,0 +1,59 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import unittest
+from datetime import datetime, timedelta
+
+from chatz.utils.history_log import first_messages, format_log_datetime, pack_message, read_messages, unpack_line
+
+
+START = datetime(2026, 10, 19, 9, 0, 0)
+
+
+def make_log(count, context_every=3):
+	lines = []
+	for seq in range(1, count + 1):
+		lines.append(pack_message({
+			"seq": seq,
+			"message_type": "user" if seq % 2 else "assistant",
+			"message_content": f"message {seq}\nsecond line",
+			"created_at": format_log_datetime(START + timedelta(seconds=seq)),
+			# Contexts are only stored when they change
+			"document_context": f'{{"docname": "DOC-{seq}"}}' if seq % context_every == 1 else None
+		}))
+	return "".join(lines)
+
+
+class TestHistoryLog(unittest.TestCase):
+	def test_latest_messages_with_inherited_context(self):
+		messages = read_messages(make_log(10), limit=4)
+
+		self.assertEqual([m["seq"] for m in messages], [7, 8, 9, 10])
+		self.assertEqual(messages[0]["message_content"], "message 7\nsecond line")
+		self.assertEqual(messages[0]["document_context"], '{"docname": "DOC-7"}')
+		self.assertEqual(messages[-1]["document_context"], '{"docname": "DOC-10"}')
+
+		# Context stored before the window is found by reading further back
+		messages = read_messages(make_log(10), limit=2)
+		self.assertEqual(
+			[m["document_context"] for m in messages],
+			['{"docname": "DOC-7"}', '{"docname": "DOC-10"}']
+		)
+
+	def test_messages_since(self):
+		log = make_log(10)
+		since = START + timedelta(seconds=8)
+
+		self.assertEqual([m["seq"] for m in read_messages(log, since=since)], [9, 10])
+		self.assertEqual([m["seq"] for m in read_messages(log, since=since, inclusive=True)], [8, 9, 10])
+		self.assertEqual(read_messages("", limit=5), [])
+
+	def test_first_messages(self):
+		self.assertEqual([m["seq"] for m in first_messages(make_log(10), 3)], [1, 2, 3])
+		self.assertEqual([m["seq"] for m in first_messages(make_log(2), 4)], [1, 2])
+		self.assertEqual(first_messages(None, 2), [])
+
+	def test_lines_written_before_new_fields(self):
+		message = unpack_line('[1,"user","hi","2026-10-19 09:00:00.000000",null,null,null,null,null,null]')
+		self.assertEqual(message["message_content"], "hi")
+		self.assertIsNone(message["compare_group"])
@@ -0,0 +1,44 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import os
+import re
+import unittest
+
+from chatz.utils.markdown import RENDERER_VERSION, render_markdown, split_reasoning
+
+
+JS_RENDERER = os.path.join(os.path.dirname(__file__), "..", "public", "js", "chatz_markdown.js")
+
+
+class TestMarkdown(unittest.TestCase):
+	def test_version_matches_js_renderer(self):
+		with open(JS_RENDERER) as f:
+			js_version = re.search(r"VERSION: (\d+)", f.read()).group(1)
+		self.assertEqual(int(js_version), RENDERER_VERSION)
+
+	def test_escapes_text_and_unsafe_links(self):
+		html = render_markdown("**bold** <script>x</script> [click](javascript:alert(1))")
+
+		self.assertTrue(html.startswith("<strong>bold</strong> &lt;script&gt;x&lt;/script&gt;"))
+		self.assertNotIn("javascript:", html)
+		self.assertNotIn("<a", html)
+
+	def test_links_and_thoughts(self):
+		html = render_markdown(
+			"*Thinking: look up invoice\n\n*Thinking: check status\nSee [SINV-1](/app/sales-invoice/SINV-1)"
+			" or https://erp.example.com/app/todo and https://example.com/docs",
+			"https://erp.example.com"
+		)
+
+		self.assertIn("<span>Thoughts (2)</span>", html)
+		self.assertEqual(html.count('class="chatz-internal-link-btn"'), 2)
+		self.assertIn('data-chatz-url="/app/sales-invoice/SINV-1"', html)
+		self.assertIn('<a href="https://example.com/docs" target="_blank"', html)
+
+	def test_split_reasoning(self):
+		answer, reasoning = split_reasoning("*Thinking: look up invoice\n\n*Thinking: \n*Thinking: check status\n\n\nIt is *paid*.")
+
+		self.assertEqual(answer, "It is *paid*.")
+		self.assertEqual(reasoning, "look up invoice\ncheck status")
+		self.assertEqual(split_reasoning("No thoughts"), ("No thoughts", ""))
@@ -0,0 +1,47 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import os
+import re
+import unittest
+
+from chatz.utils.model_router import COMPLEX_TURN, ROUTE_DEFAULT, ROUTE_FAST, classify_turn, route_model
+
+
+JS_ROUTER = os.path.join(os.path.dirname(__file__), "..", "public", "js", "chatz_router.js")
+
+CONFIG = {
+	"model_name": "gpt-4o",
+	"model_router": {"fast_model": "gpt-4o-mini", "max_words": 8}
+}
+
+
+class TestModelRouter(unittest.TestCase):
+	def test_heuristics_match_js_router(self):
+		with open(JS_ROUTER) as f:
+			js_pattern = re.search(r"const COMPLEX_TURN = /(.+)/i;", f.read()).group(1)
+		self.assertEqual(js_pattern, COMPLEX_TURN.pattern)
+
+	def test_classify_turn(self):
+		self.assertEqual(classify_turn("Who approved SINV-0042?"), (ROUTE_FAST, "short"))
+		self.assertEqual(classify_turn("thanks!"), (ROUTE_FAST, "short"))
+		self.assertEqual(classify_turn("Why was this invoice cancelled?"), (ROUTE_DEFAULT, "complex"))
+		self.assertEqual(classify_turn("Please SUMMARIZE the notes"), (ROUTE_DEFAULT, "complex"))
+		self.assertEqual(classify_turn("fix ```x = 1```"), (ROUTE_DEFAULT, "complex"))
+		# Whole words only: "planet" is not "plan"
+		self.assertEqual(classify_turn("Which planet is closest?"), (ROUTE_FAST, "short"))
+		self.assertEqual(classify_turn("one two three four five", max_words=4), (ROUTE_DEFAULT, "long"))
+
+	def test_route_model(self):
+		self.assertEqual(
+			route_model(CONFIG, "What is the due date?"),
+			{"model": "gpt-4o-mini", "route": ROUTE_FAST, "reason": "short"}
+		)
+		self.assertEqual(
+			route_model(CONFIG, "What is the due date of the last invoice for this customer?"),
+			{"model": "gpt-4o", "route": ROUTE_DEFAULT, "reason": "long"}
+		)
+
+	def test_no_router(self):
+		self.assertIsNone(route_model({"model_name": "gpt-4o", "model_router": None}, "hi"))
+		self.assertIsNone(route_model({"model_name": "gpt-4o"}, "hi"))
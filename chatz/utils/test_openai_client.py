@@ -0,0 +1,73 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import time
+import unittest
+
+from chatz.benchmarks.fake_openai import FakeOpenAIServer
+from chatz.utils.openai_client import ChatCompletionStream, StreamedResponse, UpstreamError, delta_content
+
+
+def wait_for(condition, timeout=2.0):
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		if condition():
+			return True
+		time.sleep(0.01)
+	return condition()
+
+
+class TestChatCompletionStream(unittest.TestCase):
+	def test_streams_until_done(self):
+		with FakeOpenAIServer(ttft=0, tokens_per_second=0, response_tokens=5) as server:
+			stream = ChatCompletionStream(server.base_url, "key", {"model": "fake-small", "messages": []})
+			text = "".join(delta_content(event) for event in stream)
+
+			self.assertEqual(len(text.split()), 5)
+			self.assertTrue(server.requests[-1]["stream"])
+			self.assertTrue(wait_for(lambda: server.stats["completed_streams"] == 1))
+
+	def test_cancel_releases_upstream_promptly(self):
+		# Ten seconds of generation left when the client stops reading
+		with FakeOpenAIServer(ttft=0, tokens_per_second=50, response_tokens=500) as server:
+			events = iter(ChatCompletionStream(server.base_url, "key", {"model": "fake-small", "messages": []}))
+			for _ in range(3):
+				next(events)
+			self.assertEqual(server.stats["active_streams"], 1)
+
+			cancelled = time.monotonic()
+			events.close()
+
+			self.assertTrue(wait_for(lambda: server.stats["active_streams"] == 0, timeout=1.0))
+			self.assertLess(time.monotonic() - cancelled, 1.0)
+			self.assertEqual(server.stats["disconnects"], 1)
+			self.assertEqual(server.stats["completed_streams"], 0)
+
+	def test_error_status_raises(self):
+		with FakeOpenAIServer(ttft=0, error_rate=1.0) as server:
+			with self.assertRaises(UpstreamError) as raised:
+				ChatCompletionStream(server.base_url, "key", {"model": "fake-small", "messages": []})
+			self.assertEqual(raised.exception.status, 500)
+
+	def test_streamed_response_collects_text_and_finish(self):
+		with FakeOpenAIServer(ttft=0, tokens_per_second=0, response_tokens=5) as server:
+			response = StreamedResponse()
+			response.add({"choices": [{"delta": {"reasoning_content": "Checking. "}}]})
+			for event in ChatCompletionStream(server.base_url, "key", {"model": "fake-small", "messages": []}):
+				response.add(event)
+
+			self.assertEqual(len(response.content.split()), 5)
+			self.assertEqual(response.reasoning, "Checking. ")
+			self.assertTrue(response.finished)
+			ttft_ms, response_ms = response.timings()
+			self.assertLessEqual(ttft_ms, response_ms)
+
+		cut_short = StreamedResponse()
+		cut_short.add({"choices": [{"delta": {"content": "Hel"}, "finish_reason": None}]})
+		self.assertFalse(cut_short.finished)
+
+		self.assertIsNone(StreamedResponse().timings()[0])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,154 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import json
+import unittest
+from datetime import datetime
+
+from chatz.utils.prompt_builder import (
+	build_messages, document_diff, html_to_prompt_text, last_sent_document, restore_document, stored_context
+)
+
+
+INVOICE = {
+	"name": "SINV-1", "modified": "2026-03-02 09:00:00", "status": "Draft", "customer": "ACME",
+	"items": [{"name": "row1", "item_code": "A", "qty": 1}, {"name": "row2", "item_code": "B", "qty": 5}]
+}
+
+
+def user_turn(content, document_data):
+	context = {"doctype": "Sales Invoice", "docname": "SINV-1", "document_data": document_data}
+	return {"message_type": "user", "message_content": content, "document_context": json.dumps(context)}
+
+
+class TestPromptBuilder(unittest.TestCase):
+	def test_html_to_prompt_text(self):
+		html = "<h3>Role</h3><p>Be&nbsp;<strong>brief</strong>.</p><ul><li>One</li><li>Two &amp; three</li></ul><p><br></p>"
+		self.assertEqual(html_to_prompt_text(html), "Role\n\nBe brief.\n\n- One\n- Two & three")
+		self.assertEqual(html_to_prompt_text(None), "")
+
+	def test_prefix_cached_layout_keeps_system_message_stable(self):
+		config = {"prompt_layout": "Prefix Cached", "system_prompt_text": "Be brief.", "user": "a@example.com"}
+		context = {"doctype": "ToDo", "docname": "T-1", "document_data": {"status": "Open"}}
+		history = [{"message_type": "user", "message_content": "hi"}, {"message_type": "assistant", "message_content": "hello"}]
+
+		first = build_messages(config, history, "status?", context, datetime(2026, 3, 2, 9, 5, 1))
+		second = build_messages(dict(config, user="b@example.com"), history, "status?", context, datetime(2026, 3, 2, 9, 40, 59))
+
+		self.assertEqual(first[:-1], second[:-1])
+		self.assertEqual(first[0], {"role": "system", "content": "Be brief."})
+		self.assertIn("09:00", first[-1]["content"])
+		self.assertTrue(first[-1]["content"].endswith("status?"))
+
+	def test_history_leaves_out_thoughts(self):
+		history = [
+			{"message_type": "user", "message_content": "*Thinking: typed by the user"},
+			{"message_type": "assistant", "message_content": "*Thinking: check the invoice\n\nIt is paid."}
+		]
+		messages = build_messages({"prompt_layout": "Prefix Cached"}, history, "thanks", None, datetime(2026, 3, 2, 9, 5, 1))
+
+		self.assertEqual(messages[1:3], [
+			{"role": "user", "content": "*Thinking: typed by the user"},
+			{"role": "assistant", "content": "It is paid."}
+		])
+
+	def test_standard_layout_puts_context_in_system_message(self):
+		messages = build_messages({"system_prompt": "Be brief.", "user": "a@example.com"}, [], "hi", None,
+								  datetime(2026, 3, 2, 9, 5, 1))
+		self.assertIn("09:05:01", messages[0]["content"])
+		self.assertEqual(messages[-1], {"role": "user", "content": "hi"})
+
+	def test_attachments_follow_document_data(self):
+		context = {"doctype": "Contract", "docname": "C-1", "document_data": {"status": "Active"}}
+		attachments = [{"file_name": "terms.pdf", "content": "Warranty: 24 months"}, {"file_name": "scan.pdf", "pending": True}]
+		messages = build_messages({"prompt_layout": "Prefix Cached"}, [], "warranty?", context,
+								  datetime(2026, 3, 2, 9, 5, 1), attachments=attachments)
+
+		block = messages[-1]["content"]
+		self.assertLess(block.index("Document Data:"), block.index("Attachments:\n[terms.pdf]\nWarranty: 24 months"))
+		self.assertIn("[scan.pdf] (still being read", block)
+
+	def test_document_diff(self):
+		edited = dict(
+			INVOICE, modified="2026-03-02 10:00:00", status="Submitted",
+			items=[{"name": "row1", "item_code": "A", "qty": 2}, {"name": "row3", "item_code": "C", "qty": 1}]
+		)
+		del edited["customer"]
+
+		self.assertEqual(document_diff(INVOICE, dict(INVOICE, modified="2026-03-02 10:00:00")), {})
+		self.assertEqual(document_diff(INVOICE, edited), {
+			"status": "Submitted",
+			"items": {
+				"added": [{"name": "row3", "item_code": "C", "qty": 1}],
+				"changed": {"row1": {"qty": 2}},
+				"removed": ["row2"]
+			},
+			"customer": None
+		})
+
+	def test_document_sent_once_per_version(self):
+		config = {"prompt_layout": "Prefix Cached"}
+		now = datetime(2026, 3, 2, 9, 5, 1)
+		context = {"doctype": "Sales Invoice", "docname": "SINV-1", "document_data": INVOICE}
+		history = [
+			user_turn("total?", INVOICE),
+			{"message_type": "assistant", "message_content": "It is 6 items."},
+			user_turn("customer?", INVOICE),
+			{"message_type": "assistant", "message_content": "ACME."}
+		]
+
+		messages = build_messages(config, history, "status?", context, now)
+
+		self.assertIn('Document Data:\n```json\n{"name":"SINV-1"', messages[1]["content"])
+		self.assertTrue(messages[1]["content"].endswith("\n---\n\ntotal?"))
+		self.assertEqual(messages[3]["content"], "customer?")
+		self.assertIn("Document Data: unchanged since it was sent earlier", messages[-1]["content"])
+		self.assertNotIn("ACME", messages[-1]["content"])
+
+		edited = dict(INVOICE, modified="2026-03-02 10:00:00", status="Submitted")
+		messages = build_messages(config, history, "status?", dict(context, document_data=edited), now)
+		self.assertIn('Document Changes (since it was sent earlier in this conversation):\n```json\n{"status":"Submitted"}',
+					  messages[-1]["content"])
+
+		self.assertEqual(last_sent_document(history, "Sales Invoice", "SINV-1"), INVOICE)
+		self.assertIsNone(last_sent_document(history, "Sales Invoice", "SINV-2"))
+
+	def test_document_stored_as_sent(self):
+		config = {"prompt_layout": "Prefix Cached"}
+		now = datetime(2026, 3, 2, 9, 5, 1)
+		edited = dict(
+			INVOICE, modified="2026-03-02 10:00:00", status="Submitted",
+			items=[{"name": "row1", "item_code": "A", "qty": 2}, {"name": "row3", "item_code": "C", "qty": 1}]
+		)
+		turns = [("total?", INVOICE), ("customer?", INVOICE), ("status?", edited)]
+
+		# Each turn saved the way the widget and stream_turn save it, and as
+		# if it had saved the whole document
+		history, full_history = [], []
+		for content, data in turns:
+			context = {"doctype": "Sales Invoice", "docname": "SINV-1", "document_data": data}
+			stored = stored_context(context, last_sent_document(history, "Sales Invoice", "SINV-1"))
+			response = {"message_type": "assistant", "message_content": "OK."}
+			history += [{"message_type": "user", "message_content": content, "document_context": json.dumps(stored)}, response]
+			full_history += [user_turn(content, data), response]
+		stored = [json.loads(message["document_context"]) for message in history[::2]]
+
+		self.assertEqual(stored[0]["document_data"], INVOICE)
+		self.assertNotIn("document_data", stored[1])
+		self.assertEqual(stored[1]["document_changes"], {})
+		self.assertEqual(stored[2]["document_changes"], document_diff(INVOICE, edited))
+		self.assertEqual(stored[2]["document_version"], {"modified": "2026-03-02 10:00:00"})
+
+		context = {"doctype": "Sales Invoice", "docname": "SINV-1", "document_data": edited}
+		self.assertEqual(build_messages(config, history, "due?", context, now),
+						 build_messages(config, full_history, "due?", context, now))
+		self.assertEqual(document_diff(last_sent_document(history, "Sales Invoice", "SINV-1"), edited), {})
+		self.assertEqual(last_sent_document(history, "Sales Invoice", "SINV-1")["modified"], edited["modified"])
+
+		# Changes to a version sent before the window are left out, and the
+		# next turn sends (and stores) the whole document again
+		self.assertIsNone(last_sent_document(history[2:], "Sales Invoice", "SINV-1"))
+		self.assertIsNone(restore_document(stored[2]))
+		messages = build_messages(config, history[2:], "due?", context, now)
+		self.assertEqual(messages[1]["content"], "customer?")
+		self.assertIn("Document Data:\n```json", messages[-1]["content"])
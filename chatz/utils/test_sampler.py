@@ -0,0 +1,40 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import threading
+import time
+import unittest
+
+from chatz.utils.sampler import StackSampler
+
+
+def busy_wait(seconds):
+	deadline = time.perf_counter() + seconds
+	total = 0
+	while time.perf_counter() < deadline:
+		total += 1
+	return total
+
+
+class TestStackSampler(unittest.TestCase):
+	def test_folded_stacks_include_sampled_function(self):
+		with StackSampler(interval=0.001) as sampler:
+			busy_wait(0.1)
+
+		self.assertGreater(sampler.samples, 0)
+		lines = sampler.folded().splitlines()
+		self.assertTrue(any("busy_wait (" in line for line in lines))
+
+		# "outer;...;leaf count", outermost frame first
+		stack, count = lines[0].rsplit(" ", 1)
+		self.assertGreater(int(count), 0)
+		self.assertLess(stack.index("test_folded_stacks_include_sampled_function"), stack.index("busy_wait"))
+
+	def test_samples_another_thread(self):
+		worker = threading.Thread(target=busy_wait, args=(0.1,))
+		worker.start()
+		sampler = StackSampler(thread_id=worker.ident, interval=0.001).start()
+		worker.join()
+		sampler.stop()
+
+		self.assertIn("busy_wait", sampler.folded())
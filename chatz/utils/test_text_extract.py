@@ -0,0 +1,64 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import hashlib
+import os
+import tempfile
+import unittest
+import zipfile
+
+from chatz.utils.text_extract import content_hash, extract_text, is_supported
+
+
+DOCX_BODY = (
+	'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+	'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+	'<w:p><w:r><w:t>Delivery terms</w:t></w:r></w:p>'
+	'<w:p><w:r><w:t xml:space="preserve">Goods ship within </w:t></w:r><w:r><w:t>14 days.</w:t></w:r></w:p>'
+	'</w:body></w:document>'
+)
+
+
+class TestTextExtract(unittest.TestCase):
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def write(self, name, data):
+		path = os.path.join(self.tmp.name, name)
+		with open(path, "wb") as f:
+			f.write(data)
+		return path
+
+	def test_csv_rows_are_labelled(self):
+		path = self.write("items.csv", b"\xef\xbb\xbfitem,qty,notes\nBolt,10,\n\nNut,5,metric\n")
+		text, truncated = extract_text(path)
+
+		self.assertEqual(text, "item: Bolt; qty: 10\nitem: Nut; qty: 5; notes: metric\n")
+		self.assertFalse(truncated)
+
+	def test_docx_paragraphs(self):
+		path = os.path.join(self.tmp.name, "terms.docx")
+		with zipfile.ZipFile(path, "w") as archive:
+			archive.writestr("word/document.xml", DOCX_BODY)
+
+		text, _ = extract_text(path)
+		self.assertEqual(text, "Delivery terms\nGoods ship within 14 days.\n")
+
+	def test_plain_text_is_truncated_and_hashed(self):
+		data = ("é" * 100).encode() * 50
+		path = self.write("notes.txt", data)
+
+		text, truncated = extract_text(path, max_chars=120)
+		self.assertEqual(text, "é" * 120)
+		self.assertTrue(truncated)
+		self.assertEqual(content_hash(path), hashlib.md5(data).hexdigest())
+		self.assertEqual(content_hash(self.write("empty.txt", b"")), hashlib.md5(b"").hexdigest())
+
+	def test_unsupported_formats(self):
+		self.assertTrue(is_supported("Report.PDF"))
+		self.assertFalse(is_supported("photo.png"))
+		with self.assertRaises(ValueError):
+			extract_text(self.write("photo.png", b"\x89PNG"))
@@ -0,0 +1,39 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import unittest
+
+from chatz.utils.titles import build_title_messages, clean_title, parse_titles
+
+
+class TestTitles(unittest.TestCase):
+	def test_batch_prompt(self):
+		messages = build_title_messages([
+			[
+				{"message_type": "user", "message_content": "Which invoices\nare overdue?"},
+				{"message_type": "assistant", "message_content": "x" * 400}
+			],
+			[{"message_type": "user", "message_content": "Leave policy"}]
+		])
+
+		self.assertEqual([m["role"] for m in messages], ["system", "user"])
+		prompt = messages[1]["content"]
+		self.assertIn("### Conversation 1\nUser: Which invoices are overdue?", prompt)
+		self.assertIn("Assistant: " + "x" * 300 + "...", prompt)
+		self.assertIn("### Conversation 2\nUser: Leave policy", prompt)
+
+	def test_parse_replies(self):
+		reply = 'Here you go:\n```json\n{"1": "Overdue invoices.", "2": "", "7": "Out of range"}\n```'
+		self.assertEqual(parse_titles(reply, 2), {0: "Overdue invoices"})
+
+		reply = '1. "Overdue invoices"\n2) Leave policy\nnot a title'
+		self.assertEqual(parse_titles(reply, 2), {0: "Overdue invoices", 1: "Leave policy"})
+
+		self.assertEqual(parse_titles("", 3), {})
+		self.assertEqual(parse_titles("{not json", 1), {})
+
+	def test_clean_title(self):
+		self.assertEqual(clean_title("  **Quarterly   sales** "), "Quarterly sales")
+		long_title = clean_title("word " * 30)
+		self.assertLessEqual(len(long_title), 63)
+		self.assertTrue(long_title.endswith("word..."))
@@ -0,0 +1,64 @@
+# Copyright (c) 2025, TierneyMorris Pty Ltd and Contributors
+# See license.txt
+
+import unittest
+
+from chatz.utils.usage import aggregate_usage, context_doctype
+
+
+INVOICE = '{"doctype": "Sales Invoice", "docname": "SINV-0001"}'
+
+
+def message(message_type, content, conversation_id="c1", **fields):
+	return dict({
+		"user": "a@example.com",
+		"conversation_id": conversation_id,
+		"message_type": message_type,
+		"message_content": content,
+		"api_used": "OpenAI",
+		"document_context": INVOICE
+	}, **fields)
+
+
+class TestUsage(unittest.TestCase):
+	def test_context_doctype(self):
+		self.assertEqual(context_doctype(INVOICE), "Sales Invoice")
+		self.assertIsNone(context_doctype(None))
+		self.assertIsNone(context_doctype('{"doctype": ""}'))
+		self.assertIsNone(context_doctype("not json"))
+
+	def test_aggregate_usage(self):
+		groups = aggregate_usage([
+			message("user", "Who approved it?"),
+			message("assistant", "Jane.", model_route="fast", ttft_ms=200, response_ms=400),
+			message("user", "And this one?", conversation_id="c2"),
+			message("assistant", "Bob did.", conversation_id="c2", model_route="fast", response_ms=600),
+			message("user", "Summarize it", document_context=None),
+			message("assistant", "Done", document_context=None, model_route="", ttft_ms=900, response_ms=1000)
+		])
+		groups = {(g["context_doctype"], g["model_route"]): g for g in groups}
+		self.assertEqual(set(groups), {("Sales Invoice", None), ("Sales Invoice", "fast"), (None, None)})
+
+		fast = groups[("Sales Invoice", "fast")]
+		self.assertEqual(fast["user"], "a@example.com")
+		self.assertEqual(fast["chatz_api"], "OpenAI")
+		self.assertEqual(fast["messages"], 2)
+		self.assertEqual(fast["assistant_messages"], 2)
+		self.assertEqual(fast["user_messages"], 0)
+		self.assertEqual(fast["conversations"], 2)
+		self.assertEqual(fast["response_chars"], len("Jane.") + len("Bob did."))
+		self.assertEqual(fast["timed_responses"], 2)
+		# Only one of them has a first token time
+		self.assertEqual(fast["ttft_responses"], 1)
+		# Averages skip messages without the timing, as AVG() does
+		self.assertEqual(fast["avg_ttft_ms"], 200)
+		self.assertEqual(fast["avg_response_ms"], 500)
+
+		untimed = groups[("Sales Invoice", None)]
+		self.assertEqual(untimed["user_messages"], 2)
+		self.assertEqual(untimed["timed_responses"], 0)
+		self.assertEqual(untimed["ttft_responses"], 0)
+		self.assertIsNone(untimed["avg_ttft_ms"])
+
+		# An empty route counts as no route
+		self.assertEqual(groups[(None, None)]["messages"], 2)
@@ -0,0 +1,171 @@
+import codecs
+import csv
+import hashlib
+import mmap
+import os
+import zipfile
+from contextlib import contextmanager
+from xml.etree import ElementTree
+
+
+# Extracted text kept per file; the rest of a huge attachment is dropped
+MAX_EXTRACT_CHARS = 1_000_000
+
+# Bytes decoded or hashed per step when reading through a memory map
+READ_BLOCK_BYTES = 1024 * 1024
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def content_hash(path):
+	"""
+	MD5 of a file's content, as stored in File.content_hash
+
+	Reads through a memory map, so large files are never loaded at once.
+	"""
+	digest = hashlib.md5()
+	with _mapped(path) as data:
+		for start in range(0, len(data), READ_BLOCK_BYTES):
+			digest.update(data[start:start + READ_BLOCK_BYTES])
+	return digest.hexdigest()
+
+
+def file_extension(file_name):
+	return os.path.splitext(file_name or "")[1].lower().lstrip(".")
+
+
+def is_supported(file_name):
+	"""Whether text can be extracted from a file of this name"""
+	return file_extension(file_name) in EXTRACTORS
+
+
+def extract_text(path, file_name=None, max_chars=MAX_EXTRACT_CHARS):
+	"""
+	Extract the text of a PDF, CSV, XLSX, DOCX or plain text file
+
+	Every format is read incrementally (pages, rows, XML events or mapped
+	blocks) and reading stops once max_chars have been collected, so memory
+	stays bounded whatever the file size.
+
+	Args:
+		path (str): File path
+		file_name (str): Name used to pick the format (defaults to the path)
+		max_chars (int): Characters to keep
+
+	Returns:
+		tuple: (text, truncated)
+
+	Raises:
+		ValueError: The format is not supported
+	"""
+	extractor = EXTRACTORS.get(file_extension(file_name or path))
+	if not extractor:
+		raise ValueError(f"Cannot extract text from {file_name or path}")
+
+	pieces = []
+	length = 0
+	pieces_iter = extractor(path)
+	try:
+		for piece in pieces_iter:
+			if not piece:
+				continue
+			if length + len(piece) >= max_chars:
+				pieces.append(piece[:max_chars - length])
+				return "".join(pieces), True
+			pieces.append(piece)
+			length += len(piece)
+	finally:
+		pieces_iter.close()
+
+	return "".join(pieces), False
+
+
+def iter_plain_text(path):
+	"""Decode a text file block by block from a memory map"""
+	decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+	with _mapped(path) as data:
+		for start in range(0, len(data), READ_BLOCK_BYTES):
+			yield decoder.decode(data[start:start + READ_BLOCK_BYTES])
+	yield decoder.decode(b"", final=True)
+
+
+def iter_csv(path):
+	"""Rows as "header: value; ..." lines, so an excerpt is readable on its own"""
+	with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+		yield from _labelled_rows(csv.reader(f))
+
+
+def iter_xlsx(path):
+	"""Rows of every sheet, streamed with openpyxl's read-only mode"""
+	from openpyxl import load_workbook
+
+	workbook = load_workbook(path, read_only=True, data_only=True)
+	try:
+		for sheet in workbook.worksheets:
+			yield f"Sheet: {sheet.title}\n"
+			rows = (
+				["" if value is None else str(value) for value in row]
+				for row in sheet.iter_rows(values_only=True)
+			)
+			yield from _labelled_rows(rows)
+	finally:
+		workbook.close()
+
+
+def iter_docx(path):
+	"""Paragraph text of word/document.xml, parsed as a stream of XML events"""
+	with zipfile.ZipFile(path) as archive, archive.open("word/document.xml") as document:
+		for _event, element in ElementTree.iterparse(document, events=("end",)):
+			if element.tag == WORD_NAMESPACE + "t":
+				yield element.text or ""
+			elif element.tag == WORD_NAMESPACE + "tab":
+				yield "\t"
+			elif element.tag == WORD_NAMESPACE + "p":
+				yield "\n"
+				# Paragraphs are done with; drop them to keep memory flat
+				element.clear()
+
+
+def iter_pdf(path):
+	"""Text of each page; pypdf parses pages lazily from the open file"""
+	from pypdf import PdfReader
+
+	with open(path, "rb") as f:
+		for page in PdfReader(f).pages:
+			yield (page.extract_text() or "") + "\n"
+
+
+EXTRACTORS = {
+	"pdf": iter_pdf,
+	"csv": iter_csv,
+	"xlsx": iter_xlsx,
+	"docx": iter_docx,
+	"txt": iter_plain_text,
+	"md": iter_plain_text
+}
+
+
+def _labelled_rows(rows):
+	header = None
+	for row in rows:
+		if not any(cell.strip() for cell in row):
+			continue
+		if header is None:
+			header = [cell.strip() for cell in row]
+			continue
+		yield "; ".join(
+			f"{header[i] if i < len(header) and header[i] else f'Column {i + 1}'}: {cell.strip()}"
+			for i, cell in enumerate(row)
+			if cell.strip()
+		) + "\n"
+
+
+@contextmanager
+def _mapped(path):
+	"""Read-only memory map of a file (empty bytes for an empty file, which cannot be mapped)"""
+	with open(path, "rb") as f:
+		if os.fstat(f.fileno()).st_size == 0:
+			yield b""
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+			yield data
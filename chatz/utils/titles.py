@@ -0,0 +1,98 @@
+import json
+import re
+
+
+# Characters of each opening message shown to the titling model
+TITLE_EXCERPT_CHARS = 300
+TITLE_MAX_CHARS = 60
+
+TITLE_INSTRUCTIONS = (
+	"You name chat conversations. For each numbered conversation below, write a "
+	"short title of at most six words that says what it is about. Reply with only "
+	"a JSON object mapping each conversation number to its title, for example "
+	'{"1": "Overdue invoices for Acme", "2": "Leave policy question"}.'
+)
+
+_NUMBERED_LINE = re.compile(r'^\s*"?(\d+)"?\s*[.:)\-]\s*(.+)$')
+
+
+def build_title_messages(conversations):
+	"""
+	Chat messages asking for the titles of several conversations at once
+
+	Args:
+		conversations (list): For each conversation, its opening messages
+			({message_type, message_content}), oldest first
+
+	Returns:
+		list: System and user messages; titles are requested by 1-based number
+	"""
+	blocks = []
+	for number, messages in enumerate(conversations, 1):
+		lines = [f"### Conversation {number}"]
+		for message in messages:
+			speaker = "User" if message["message_type"] == "user" else "Assistant"
+			content = " ".join((message.get("message_content") or "").split())
+			if len(content) > TITLE_EXCERPT_CHARS:
+				content = content[:TITLE_EXCERPT_CHARS] + "..."
+			lines.append(f"{speaker}: {content}")
+		blocks.append("\n".join(lines))
+
+	return [
+		{"role": "system", "content": TITLE_INSTRUCTIONS},
+		{"role": "user", "content": "\n\n".join(blocks)}
+	]
+
+
+def parse_titles(content, count):
+	"""
+	Titles from a reply to build_title_messages
+
+	Expects a JSON object keyed by conversation number, possibly wrapped in a
+	code fence or prose; falls back to "1. Title" lines. Numbers outside the
+	batch and empty titles are ignored.
+
+	Args:
+		content (str): Model reply
+		count (int): Conversations in the batch
+
+	Returns:
+		dict: {0-based conversation index: title}
+	"""
+	content = content or ""
+	pairs = []
+
+	start, end = content.find("{"), content.rfind("}")
+	if start != -1 and end > start:
+		try:
+			parsed = json.loads(content[start:end + 1])
+		except ValueError:
+			parsed = None
+		if isinstance(parsed, dict):
+			pairs = [(key, value) for key, value in parsed.items() if isinstance(value, str)]
+
+	if not pairs:
+		for line in content.splitlines():
+			match = _NUMBERED_LINE.match(line)
+			if match:
+				pairs.append(match.groups())
+
+	titles = {}
+	for key, value in pairs:
+		try:
+			index = int(str(key).strip()) - 1
+		except ValueError:
+			continue
+		title = clean_title(value)
+		if 0 <= index < count and title:
+			titles[index] = title
+	return titles
+
+
+def clean_title(text):
+	"""One line of plain text, without quotes, markdown or a trailing full stop"""
+	title = " ".join((text or "").split())
+	title = title.strip("\"'`*#_ ").rstrip(".").strip()
+	if len(title) > TITLE_MAX_CHARS:
+		title = title[:TITLE_MAX_CHARS].rsplit(" ", 1)[0].rstrip(",;:-") + "..."
+	return title
@@ -0,0 +1,66 @@
+import json
+
+
+def context_doctype(document_context):
+	"""DocType of a message's stored document context, if any"""
+	if not document_context:
+		return None
+	try:
+		context = json.loads(document_context)
+	except ValueError:
+		return None
+	return (context.get("doctype") if isinstance(context, dict) else None) or None
+
+
+def aggregate_usage(messages):
+	"""
+	Usage aggregates of messages, as Chatz Usage Daily stores them
+
+	Groups by user, Chatz API, context DocType and model route, like the
+	rollup query over Chatz History, for backends that keep messages
+	outside of it.
+
+	Args:
+		messages (iterable): Message dicts with user, conversation_id, message_type,
+			message_content, api_used, document_context, model_route, ttft_ms and response_ms
+
+	Returns:
+		list: Groups (dicts with the Chatz Usage Daily aggregate fields)
+	"""
+	groups = {}
+	for message in messages:
+		key = (
+			message.get("user"),
+			message.get("api_used"),
+			context_doctype(message.get("document_context")),
+			message.get("model_route") or None
+		)
+		group = groups.get(key)
+		if group is None:
+			group = groups[key] = {
+				"user": key[0], "chatz_api": key[1], "context_doctype": key[2], "model_route": key[3],
+				"messages": 0, "user_messages": 0, "assistant_messages": 0, "conversations": set(),
+				"response_chars": 0, "ttft_ms": [], "response_ms": []
+			}
+
+		group["messages"] += 1
+		group["conversations"].add(message.get("conversation_id"))
+		if message.get("message_type") == "user":
+			group["user_messages"] += 1
+		elif message.get("message_type") == "assistant":
+			group["assistant_messages"] += 1
+			group["response_chars"] += len(message.get("message_content") or "")
+		for field in ("ttft_ms", "response_ms"):
+			if message.get(field) is not None:
+				group[field].append(message[field])
+
+	rows = []
+	for group in groups.values():
+		ttft_ms, response_ms = group.pop("ttft_ms"), group.pop("response_ms")
+		group["conversations"] = len(group["conversations"])
+		group["timed_responses"] = len(response_ms)
+		group["ttft_responses"] = len(ttft_ms)
+		group["avg_ttft_ms"] = sum(ttft_ms) / len(ttft_ms) if ttft_ms else None
+		group["avg_response_ms"] = sum(response_ms) / len(response_ms) if response_ms else None
+		rows.append(group)
+	return rows